@@ -126,6 +126,14 @@ def _inject_popup_announcement():
 
 db.init_app(app)
 
+from services.plan_cache import install_invalidation_hooks as _install_plan_cache_hooks
+from services.plan_changes import install_change_log_hooks as _install_plan_change_hooks
+from services.cell_merge import install_version_hooks as _install_cell_version_hooks
+from services import presence
+_install_plan_cache_hooks()
+_install_plan_change_hooks()
+_install_cell_version_hooks()
+
 def _set_sqlite_pragmas(dbapi_connection, _connection_record):
     if isinstance(dbapi_connection, SQLite3Connection):
         cursor = dbapi_connection.cursor()
@@ -161,12 +169,19 @@ else:
     public_base = str(os.getenv("PUBLIC_BASE_URL", "") or "").strip()
     cors_allowed_origins = [public_base] if public_base else "*"
 
+# Birden fazla işçide emit'ler (odalar dahil) mesaj kuyruğu üzerinden tüm işçilere dağıtılır
+from services import shared_state
+# Birden fazla işçi süreç içi depoyla sessizce yanlış çalışmasın: açılışta dur
+shared_state.require_shared_for_workers()
+_socketio_message_queue = shared_state.message_queue_url()
+
 socketio.init_app(
     app,
     async_mode=_socketio_async_mode,
     cors_allowed_origins=cors_allowed_origins,
     ping_interval=25,
     ping_timeout=60,
+    message_queue=_socketio_message_queue,
 )
 
 # Ensure upload dir exists
@@ -958,7 +973,11 @@ def ensure_schema():
                                 error_message TEXT,
                                 retry_count INTEGER NOT NULL DEFAULT 0,
                                 priority INTEGER NOT NULL DEFAULT 0,
-                                sent_at DATETIME
+                                sent_at DATETIME,
+                                next_attempt_at DATETIME,
+                                lease_owner VARCHAR(64),
+                                lease_until DATETIME,
+                                digest_key VARCHAR(320)
                             )
                         """))
                         db.session.commit()
@@ -968,6 +987,24 @@ def ensure_schema():
                         db.session.execute(_sql_text("CREATE INDEX IF NOT EXISTS ix_mail_queue_priority ON mail_queue (priority)"))
                         db.session.execute(_sql_text("CREATE INDEX IF NOT EXISTS ix_mail_queue_created_at ON mail_queue (created_at)"))
                         db.session.commit()
+                    else:
+                        mqcols = [r[1] for r in mqrows]
+                        if "next_attempt_at" not in mqcols:
+                            db.session.execute(_sql_text("ALTER TABLE mail_queue ADD COLUMN next_attempt_at DATETIME"))
+                            db.session.commit()
+                        if "lease_owner" not in mqcols:
+                            db.session.execute(_sql_text("ALTER TABLE mail_queue ADD COLUMN lease_owner VARCHAR(64)"))
+                            db.session.commit()
+                        if "lease_until" not in mqcols:
+                            db.session.execute(_sql_text("ALTER TABLE mail_queue ADD COLUMN lease_until DATETIME"))
+                            db.session.commit()
+                        if "digest_key" not in mqcols:
+                            db.session.execute(_sql_text("ALTER TABLE mail_queue ADD COLUMN digest_key VARCHAR(320)"))
+                            db.session.commit()
+                    db.session.execute(_sql_text("CREATE INDEX IF NOT EXISTS ix_mail_queue_next_attempt_at ON mail_queue (next_attempt_at)"))
+                    db.session.execute(_sql_text("CREATE INDEX IF NOT EXISTS ix_mail_queue_lease_owner ON mail_queue (lease_owner)"))
+                    db.session.execute(_sql_text("CREATE INDEX IF NOT EXISTS ix_mail_queue_digest_key ON mail_queue (digest_key)"))
+                    db.session.commit()
                 except Exception:
                     pass
 
@@ -1095,19 +1132,21 @@ def _run_startup_tasks_once():
     with __startup_lock:
         if __startup_done:
             return
-        ensure_schema()
-        init_default_data()
-        try:
-            # Initialize users if needed
-            if 'User' in globals():
-                if User.query.count() == 0:
-                    init_users()
-        except Exception:
-            # Don't block the app if user init fails; it can be retried manually
+        # Şema göçü / varsayılan veriler: birden fazla işçi aynı anda ALTER çalıştırmasın
+        with shared_state.critical_section("startup_schema"):
+            ensure_schema()
+            init_default_data()
             try:
-                db.session.rollback()
+                # Initialize users if needed
+                if 'User' in globals():
+                    if User.query.count() == 0:
+                        init_users()
             except Exception:
-                pass
+                # Don't block the app if user init fails; it can be retried manually
+                try:
+                    db.session.rollback()
+                except Exception:
+                    pass
 
         # Optional scheduled SQLite backups
         try:
@@ -1208,6 +1247,27 @@ def _run_startup_tasks_once():
             start_mail_worker(app)
         except Exception as e:
             logging.error(f"Mail worker start failed: {e}")
+
+        # Outbox İşçisi Başlat (hücre kaydı sonrası yan etkiler)
+        try:
+            from services.outbox import start_outbox_worker
+            start_outbox_worker(app)
+        except Exception as e:
+            logging.error(f"Outbox worker start failed: {e}")
+
+        # Süresi dolan hücre kilitlerini temizle (cell_unlocked yayar)
+        try:
+            from services.cell_locks import start_sweeper
+            start_sweeper(app)
+        except Exception as e:
+            logging.error(f"Cell lock sweeper start failed: {e}")
+
+        # Çevrimiçi durumunu (last_seen) toplu olarak veritabanına yaz
+        try:
+            from services.presence import start_presence_worker
+            start_presence_worker(app)
+        except Exception as e:
+            logging.error(f"Presence worker start failed: {e}")
         
         __startup_done = True
 
@@ -1249,7 +1309,8 @@ def _socket_heartbeat(_data=None):
         uid = session.get("user_id")
         if not uid:
             return
-        user = db.session.get(User, uid)
+        # Kayıt bellekteyse heartbeat veritabanına hiç dokunmaz
+        user = int(uid) if presence.get_registry().get(uid) else db.session.get(User, uid)
         if not user:
             return
         now = datetime.now()
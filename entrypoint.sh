@@ -11,4 +11,14 @@ fi
 
 # Uygulamayı başlat
 echo "Starting Gunicorn..."
-exec gunicorn -k eventlet -b 0.0.0.0:5000 --workers 1 --timeout 120 app:app
+# GUNICORN_WORKERS > 1 için SHARED_STATE_URL (Redis) gerekir; bkz. DEPLOYMENT.md
+if [ "${GUNICORN_WORKERS:-1}" -gt 1 ]; then
+    case "${SHARED_STATE_URL:-}" in
+        redis://*|rediss://*|unix://*) ;;
+        *)
+            echo "GUNICORN_WORKERS=${GUNICORN_WORKERS} requires SHARED_STATE_URL=redis://... (see DEPLOYMENT.md)" >&2
+            exit 1
+            ;;
+    esac
+fi
+exec gunicorn -k eventlet -b 0.0.0.0:5000 --workers "${GUNICORN_WORKERS:-1}" --timeout 120 app:app
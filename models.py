@@ -275,6 +275,83 @@ class MailLog(db.Model):
         db.Index("ix_mail_log_ok_created", "ok", "created_at"),
     )
 
+
+class MailLogArchive(db.Model):
+    """
+    Saklama süresini (MAIL_LOG_RETENTION_DAYS) aşan MailLog kayıtları (services/mail_archive.py).
+    Filtrelenen alanlar kolon olarak kalır; gövde, hata ve meta `body_z` içinde zlib ile sıkıştırılmış JSON'dur
+    ve yalnızca okunduğunda açılır. id, hot tablodaki id ile aynıdır.
+    """
+    __tablename__ = "mail_log_archive"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    mail_type = db.Column(db.String(50), nullable=True)
+    kind = db.Column(db.String(30), nullable=False, default="send")
+    ok = db.Column(db.Boolean, nullable=False, default=False)
+    error_code = db.Column(db.String(50), nullable=True)
+
+    to_addr = db.Column(db.String(500), nullable=False, default="")
+    cc_addr = db.Column(db.String(500), nullable=True)
+    subject = db.Column(db.String(255), nullable=False, default="")
+
+    week_start = db.Column(db.Date, nullable=True)
+    team_name = db.Column(db.String(120), nullable=True)
+    project_id = db.Column(db.Integer, nullable=True, index=True)
+    job_id = db.Column(db.Integer, nullable=True, index=True)
+    task_id = db.Column(db.Integer, nullable=True)
+    user_id = db.Column(db.Integer, nullable=True)
+
+    attachments_count = db.Column(db.Integer, nullable=False, default=0)
+    body_size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    # zlib(JSON): body_preview, body_html, error, meta_json, bcc_addr, team_id
+    body_z = db.Column(db.LargeBinary, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_mail_log_archive_type_created", "mail_type", "created_at"),
+        db.Index("ix_mail_log_archive_ok_created", "ok", "created_at"),
+    )
+
+    archived = True
+
+    def _body(self) -> dict:
+        cached = self.__dict__.get("_body_cache")
+        if cached is None:
+            from services.mail_archive import unpack_body
+
+            cached = unpack_body(self.body_z)
+            self.__dict__["_body_cache"] = cached
+        return cached
+
+    @property
+    def body_preview(self):
+        return self._body().get("body_preview")
+
+    @property
+    def body_html(self):
+        return self._body().get("body_html")
+
+    @property
+    def error(self):
+        return self._body().get("error")
+
+    @property
+    def meta_json(self):
+        return self._body().get("meta_json")
+
+    @property
+    def bcc_addr(self):
+        return self._body().get("bcc_addr")
+
+    @property
+    def team_id(self):
+        return self._body().get("team_id")
+
+
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
@@ -573,6 +650,7 @@ class CellLock(db.Model):
     """
     Hücre bazlı kilitleme - Optimistic Locking için
     Bir kullanıcı hücreyi düzenlerken diğer kullanıcıların o hücreyi değiştirmesini engeller
+    Not: Kilitler artık bellekte tutulur (services/cell_locks.py); tablo eski kurulumlarla uyum için duruyor.
     """
     __tablename__ = "cell_lock"
     id = db.Column(db.Integer, primary_key=True)
@@ -704,6 +782,40 @@ class CellVersion(db.Model):
     )
 
 
+class PlanChange(db.Model):
+    """
+    Plan değişiklik günlüğü - Haftalık tablo delta senkronizasyonu için
+    id monoton artan değişiklik sırasıdır (since_version bununla karşılaştırılır).
+    Hücre silinse bile kayıt kalsın diye cell_id'de foreign key yok.
+    """
+    __tablename__ = "plan_change"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    week_start = db.Column(db.Date, nullable=False, index=True)
+    cell_id = db.Column(db.Integer, nullable=True, index=True)
+    project_id = db.Column(db.Integer, nullable=True)
+    work_date = db.Column(db.Date, nullable=True)
+    change_type = db.Column(db.String(20), nullable=False, default="update")  # update/delete
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        db.Index("ix_plan_change_week_id", "week_start", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+class JobSyncQueue(db.Model):
+    """
+    Job senkronizasyonu bekleyen (kirli) hücreler kuyruğu
+    plan_change ile aynı flush'ta yazılır; senkronizasyon motoru işlediği satırları id ile siler.
+    Aynı hücre birden çok kez kuyrukta olabilir, motor tekilleştirir.
+    """
+    __tablename__ = "job_sync_queue"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    cell_id = db.Column(db.Integer, nullable=False, index=True)
+    work_date = db.Column(db.Date, nullable=True)
+    queued_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+
 class TableSnapshot(db.Model):
     """
     Tablo snapshot'ı - Mail gönderimi için
@@ -895,11 +1007,55 @@ class MailQueue(db.Model):
     # Hata yönetimi
     error_message = db.Column(db.Text, nullable=True)
     retry_count = db.Column(db.Integer, nullable=False, default=0)
+    # Tekrar deneme / hız sınırı ertelemesi: bu zamandan önce işlenmez (NULL = hemen)
+    next_attempt_at = db.Column(db.DateTime, nullable=True, index=True)
+    # İşçi kiralaması: öğeyi 'processing' yapan işçi ve kiranın bitişi (süresi geçen öğe kurtarılır)
+    lease_owner = db.Column(db.String(64), nullable=True, index=True)
+    lease_until = db.Column(db.DateTime, nullable=True)
+    # Özet (digest) grubu: "<mail_type>|<alıcı>"; aynı anahtarlı bekleyenler tek mailde birleştirilir
+    digest_key = db.Column(db.String(320), nullable=True, index=True)
     
     # Öncelik
     priority = db.Column(db.Integer, nullable=False, default=0)
 
 
+class MailBlob(db.Model):
+    """
+    MailQueue eklerinin içerik adresli deposu (services/blob_store.py).
+    Dosya instance/mail_blobs altında SHA-256 adıyla durur; ref_count onu kullanan kuyruk satırı sayısıdır.
+    """
+    __tablename__ = "mail_blob"
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.Integer, nullable=False, default=0)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+
+
+class OutboxEvent(db.Model):
+    """
+    Transactional outbox - kayıt sonrası yan etkiler (iş senkronizasyonu, bildirim, socket yayını)
+    Satır, tetikleyen yazımla aynı transaction'da eklenir; arka plan işçisi commit sonrası işler.
+    Durumlar: pending -> processing -> done | failed
+    """
+    __tablename__ = "outbox_event"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # cell_saved, cells_saved
+    idempotency_key = db.Column(db.String(128), nullable=False, unique=True)
+    payload_json = db.Column(db.Text, nullable=False)
+
+    status = db.Column(db.String(20), nullable=False, default="pending", index=True)  # pending, processing, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+    last_error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+
 class RolePermission(db.Model):
     """
     Rol bazlı erişim kontrolü - Hangi rolün hangi sayfaya erişebileceğini belirler
@@ -2,6 +2,7 @@
 from extensions import db
 from models import MailLog, MailQueue
 from services.mail_service import MailService
+from services import excel_export, mail_archive
 from utils import (
     login_required, admin_required, load_mail_settings, _load_mail_settings_file, 
     _csrf_verify, _is_valid_email_address, save_mail_settings, MAIL_PASSWORD_PLACEHOLDER,
@@ -221,38 +222,40 @@ def api_mail_logs():
         status = request.args.get("status") # ok/error
         q = (request.args.get("q") or "").strip().lower()
 
-        query = MailLog.query
+        # ?source=archive: saklama süresini aşıp arşive taşınmış kayıtlar
+        model = mail_archive.log_model(request.args.get("source"))
+        query = model.query
 
         if date_start_str:
             try:
                 ds = datetime.strptime(date_start_str, "%Y-%m-%d")
-                query = query.filter(MailLog.created_at >= ds)
+                query = query.filter(model.created_at >= ds)
             except: pass
         
         if date_end_str:
             try:
                 de = datetime.strptime(date_end_str, "%Y-%m-%d").replace(hour=23, minute=59, second=59)
-                query = query.filter(MailLog.created_at <= de)
+                query = query.filter(model.created_at <= de)
             except: pass
 
         if m_type and m_type != "all":
             # Hem kind hem mail_type kontrol edelim
-            query = query.filter(db.or_(MailLog.kind == m_type, MailLog.mail_type == m_type))
+            query = query.filter(db.or_(model.kind == m_type, model.mail_type == m_type))
         
         if status:
             if status == "ok":
-                query = query.filter(MailLog.ok == True)
+                query = query.filter(model.ok == True)
             elif status == "error":
-                query = query.filter(MailLog.ok == False)
+                query = query.filter(model.ok == False)
         
         if q:
             query = query.filter(db.or_(
-                MailLog.to_addr.ilike(f"%{q}%"),
-                MailLog.subject.ilike(f"%{q}%"),
-                MailLog.team_name.ilike(f"%{q}%")
+                model.to_addr.ilike(f"%{q}%"),
+                model.subject.ilike(f"%{q}%"),
+                model.team_name.ilike(f"%{q}%")
             ))
 
-        paginated = query.order_by(MailLog.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+        paginated = query.order_by(model.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
         
         logs = []
         for row in paginated.items:
@@ -286,7 +289,7 @@ def api_mail_logs():
 @admin_required
 def api_get_mail_log_detail(log_id):
     try:
-        log_entry = MailLog.query.get(log_id)
+        log_entry = mail_archive.get_log(log_id)
         if not log_entry:
             return jsonify({"ok": False, "error": "Log not found"}), 404
             
@@ -309,6 +312,7 @@ def api_get_mail_log_detail(log_id):
             "team_name": log_entry.team_name,
             "user_id": log_entry.user_id,
             "project_id": log_entry.project_id,
+            "archived": bool(getattr(log_entry, "archived", False)),
         }
         return jsonify({"ok": True, "log": data})
     except Exception as e:
@@ -472,7 +476,9 @@ def api_mail_logs_bulk_resend():
 @admin_bp.get("/admin/mail-log/<int:log_id>")
 @admin_required
 def view_mail_log(log_id: int):
-    log_entry = MailLog.query.get_or_404(log_id)
+    log_entry = mail_archive.get_log(log_id)
+    if not log_entry:
+        abort(404)
     return render_template("mail_log_detail.html", log=log_entry)
 
 @admin_bp.get("/admin/fix-db")
@@ -597,23 +603,23 @@ def view_file_inline(filename: str):
 @admin_bp.get("/admin/mail-logs/export")
 @admin_required
 def export_mail_logs():
-    import io
-    from openpyxl import Workbook
     from datetime import datetime
-    
-    # Simple export of all recent logs (limit 1000 for now)
-    try:
-        logs = MailLog.query.order_by(MailLog.created_at.desc()).limit(1000).all()
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Mail Loglari"
-        
-        headers = ["ID", "Tarih", "Tür", "Durum", "Alıcı", "Konu", "Hata Detayı"]
-        ws.append(headers)
-        
-        for log in logs:
-            ws.append([
+
+    # Son 1000 kayıt; satırlar yanıt akarken yazılır (services/excel_export.py)
+    columns = [
+        excel_export.Column("ID", 8),
+        excel_export.Column("Tarih", 20),
+        excel_export.Column("Tür", 24),
+        excel_export.Column("Durum", 12),
+        excel_export.Column("Alıcı", 30),
+        excel_export.Column("Konu", 40),
+        excel_export.Column("Hata Detayı", 40),
+    ]
+
+    def _rows():
+        q = MailLog.query.order_by(MailLog.created_at.desc()).limit(1000)
+        for log in q.yield_per(500):
+            yield [
                 log.id,
                 log.created_at,
                 f"{log.mail_type} ({log.kind})",
@@ -621,21 +627,8 @@ def export_mail_logs():
                 log.to_addr,
                 log.subject,
                 log.error or ""
-            ])
-        
-        out = io.BytesIO()
-        wb.save(out)
-        out.seek(0)
-        
-        fname = f"mail_logs_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
-        
-        return send_file(
-            out,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            as_attachment=True,
-            download_name=fname
-        )
-    except Exception as e:
-        flash(f"Excel oluşturma hatası: {e}", "danger")
-        return redirect(url_for('admin.mail_settings_page'))
+            ]
+
+    fname = f"mail_logs_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
+    return excel_export.xlsx_response([excel_export.Sheet("Mail Loglari", columns, _rows())], fname)
 
@@ -1,7 +1,8 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, Response
 from extensions import db
 from models import MailQueue
-from services.mail_service import MailService
+from services import mail_metrics
+from services.mail_service import MailService, worker_config
 from utils import admin_required
 from datetime import datetime
 
@@ -28,9 +29,22 @@ def mail_queue_page():
         pending=pending,
         failed=failed,
         sent=sent,
+        worker_cfg=worker_config(),
         now=datetime.now()
     )
 
+@admin_mq_bp.get("/admin/mail-queue/metrics")
+@admin_required
+def mail_queue_metrics():
+    """Kuyruk derinliği, gecikme, SMTP aşama süreleri ve hata kodları (JSON veya ?format=prometheus)."""
+    try:
+        data = mail_metrics.collect()
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+    if (request.args.get("format") or "").lower() == "prometheus":
+        return Response(mail_metrics.prometheus_text(data), mimetype="text/plain; version=0.0.4")
+    return jsonify({"ok": True, **data})
+
 @admin_mq_bp.post("/admin/mail-queue/process")
 @admin_required
 def mail_queue_process():
@@ -50,6 +64,7 @@ def mail_queue_retry(mq_id):
         if mq:
             mq.status = 'pending'
             mq.retry_count = 0
+            mq.next_attempt_at = None
             mq.error_message = None
             db.session.commit()
             flash(f"Mail ID {mq_id} tekrar kuyruğa alındı.", "success")
@@ -63,9 +78,7 @@ def mail_queue_retry(mq_id):
 @admin_required
 def mail_queue_delete(mq_id):
     try:
-        mq = db.session.get(MailQueue, mq_id)
-        if mq:
-            db.session.delete(mq)
+        if MailService.purge(MailQueue.query.filter_by(id=mq_id)):
             db.session.commit()
             flash(f"Mail ID {mq_id} silindi.", "success")
         else:
@@ -78,7 +91,7 @@ def mail_queue_delete(mq_id):
 @admin_required
 def mail_queue_clear_failed():
     try:
-        MailQueue.query.filter_by(status='failed').delete()
+        MailService.purge(MailQueue.query.filter_by(status='failed'))
         db.session.commit()
         flash("Tüm hatalı kayıtlar temizlendi.", "success")
     except Exception as e:
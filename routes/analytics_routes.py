@@ -7,7 +7,7 @@ from sqlalchemy.orm import joinedload
 from datetime import datetime, date, timedelta
 import csv
 import io
-import openpyxl
+from services import excel_export
 from services.analytics_helpers import calculate_hours, get_job_km, get_vehicle_info
 from services.analytics_service import AnalyticsRobot, _collect_jobs, _bucket_value, _parse_date
 
@@ -94,17 +94,12 @@ def register_analytics_routes(bp):
             out.seek(0)
             return send_file(out, as_attachment=True, download_name="analytics_export.csv", mimetype="text/csv")
 
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Export"
-        ws.append(headers)
-        for r in rows:
-            ws.append([r.get(h, "") for h in headers])
-
-        buf = io.BytesIO()
-        wb.save(buf)
-        buf.seek(0)
-        return send_file(buf, as_attachment=True, download_name="analytics_export.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        sheet = excel_export.Sheet(
+            "Export",
+            [excel_export.Column(h) for h in headers],
+            ([r.get(h, "") for h in headers] for r in rows),
+        )
+        return excel_export.xlsx_response([sheet], "analytics_export.xlsx")
 
     @bp.post("/api/analytics/tops")
     def api_analytics_tops():
@@ -271,17 +266,12 @@ def register_analytics_routes(bp):
             out.seek(0)
             return send_file(out, as_attachment=True, download_name="enler_export.csv", mimetype="text/csv")
 
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Export"
-        ws.append(["name", "value"])
-        for r in rows:
-            ws.append([r.get("name", ""), r.get("value", "")])
-
-        buf = io.BytesIO()
-        wb.save(buf)
-        buf.seek(0)
-        return send_file(buf, as_attachment=True, download_name="enler_export.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        sheet = excel_export.Sheet(
+            "Export",
+            [excel_export.Column("name", 40), excel_export.Column("value", 15)],
+            ([r.get("name", ""), r.get("value", "")] for r in rows),
+        )
+        return excel_export.xlsx_response([sheet], "enler_export.xlsx")
 
     @bp.post("/api/analytics/cancel-overtime")
     def api_analytics_cancel_overtime():
@@ -402,36 +392,33 @@ def register_analytics_routes(bp):
              start = date(date.today().year, 1, 1)
              end = date.today()
 
-        jobs = Job.query.filter(Job.work_date >= start, Job.work_date <= end).all()
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Export"
-        
-        h_font = openpyxl.styles.Font(bold=True, color="FFFFFF")
-        h_fill = openpyxl.styles.PatternFill("solid", fgColor="4F81BD")
-        
+        columns = []
+        rows = ()
         if type_ == "projects_detailed":
-             ws.append(["Proje Kodu", "Proje Adı", "Alt Proje", "İş Sayısı", "Saat"])
-             for j in jobs:
-                 if j.project:
-                     ws.append([
-                         j.project.project_code, 
-                         j.project.project_name, 
-                         j.subproject.name if j.subproject else "-",
-                         1, 
-                         calculate_hours(j)
-                     ])
+            columns = [excel_export.Column(h) for h in ("Proje Kodu", "Proje Adı", "Alt Proje", "İş Sayısı", "Saat")]
+
+            def _project_rows():
+                q = (
+                    Job.query.options(joinedload(Job.project), joinedload(Job.subproject))
+                    .filter(Job.work_date >= start, Job.work_date <= end)
+                    .order_by(Job.id)
+                )
+                for j in q.yield_per(500):
+                    if j.project:
+                        yield [
+                            j.project.project_code,
+                            j.project.project_name,
+                            j.subproject.name if j.subproject else "-",
+                            1,
+                            calculate_hours(j)
+                        ]
+
+            rows = _project_rows()
         elif type_ == "cities":
-            ws.append(["Plaka/İl", "İş Sayısı"])
-            # Simplified for brevity, logic identical to previous
-            pass 
+            columns = [excel_export.Column("Plaka/İl"), excel_export.Column("İş Sayısı")]
 
-        for cell in ws[1]: cell.font = h_font; cell.fill = h_fill
-        
-        buf = io.BytesIO()
-        wb.save(buf)
-        buf.seek(0)
-        return send_file(buf, as_attachment=True, download_name=f"{type_}.xlsx", mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        sheet = excel_export.Sheet("Export", columns, rows, header_style="header_blue")
+        return excel_export.xlsx_response([sheet], f"{type_}.xlsx")
 
 def _generate_time_buckets(start, end, period):
     buckets = []
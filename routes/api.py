@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify, request, session, g, current_app
 from extensions import db
 from models import User, Notification
 from utils import login_required, _csrf_verify, ONLINE_WINDOW, _touch_user_activity, get_current_user
+from services import presence
 from datetime import datetime
 import time as _time
 
@@ -97,7 +98,7 @@ def api_heartbeat():
     if not uid:
         return jsonify({"ok": False, "error": "auth"}), 401
     try:
-        user = User.query.get(uid)
+        user = int(uid) if presence.get_registry().get(uid) else User.query.get(uid)
         if not user:
             return jsonify({"ok": False, "error": "user"}), 404
         now = datetime.now()
@@ -124,7 +125,6 @@ def api_online_users():
     only_online = only_online_raw in ("1", "true", "yes", "on")
 
     now = datetime.now()
-    cutoff = now - ONLINE_WINDOW
 
     q = User.query.filter(User.is_active == True)
     items = []
@@ -134,9 +134,7 @@ def api_online_users():
         rows = q.order_by(User.email.asc()).all()
 
     for u in rows:
-        last_seen = getattr(u, "last_seen", None)
-        online_since = getattr(u, "online_since", None)
-        is_online = bool(last_seen and last_seen >= cutoff)
+        is_online, last_seen, online_since = presence.state_for(u, now)
 
         if only_online and not is_online:
             continue
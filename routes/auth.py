@@ -3,6 +3,7 @@ from extensions import db
 from models import User, Firma, Seviye, Person, Team, RolePermission
 from utils import login_required, admin_required, planner_or_admin_required, kivanc_required, _csrf_verify, _is_valid_email_address, _rate_limit, _touch_user_activity, get_current_user, ONLINE_WINDOW
 from datetime import datetime
+from services import presence
 from werkzeug.security import generate_password_hash, check_password_hash
 
 auth_bp = Blueprint('auth', __name__)
@@ -130,6 +131,7 @@ def admin_users():
     teams = Team.query.order_by(Team.name.asc()).all()
     now = datetime.now()
     online_cutoff = now - ONLINE_WINDOW
+    online_user_ids = presence.online_user_ids(now)
     current_user = get_current_user()
     is_kivanc = False
     if current_user:
@@ -152,7 +154,7 @@ def admin_users():
     active_tab = request.args.get('tab', '')
     
     return render_template("admin_users.html", users=users, teams=teams, q=q, now=now, 
-                           online_cutoff=online_cutoff, is_kivanc=is_kivanc, 
+                           online_cutoff=online_cutoff, online_user_ids=online_user_ids, is_kivanc=is_kivanc, 
                            permissions_dict=permissions_dict, active_tab=active_tab)
 
 @auth_bp.route("/admin/users/add", methods=["GET", "POST"])
@@ -6,6 +6,7 @@ from utils import login_required, get_current_user, _fetch_announcements, ONLINE
 from datetime import datetime
 from sqlalchemy import or_, and_, desc, func
 from typing import Optional
+from services import presence
 
 chat_bp = Blueprint('chat', __name__)
 
@@ -26,12 +27,7 @@ def _chat_pair_key(a: int, b: int) -> str:
 
 
 def _is_user_online(user_obj: "User", *, now: Optional[datetime] = None) -> bool:
-    if not user_obj:
-        return False
-    now = now or datetime.now()
-    cutoff = now - ONLINE_WINDOW
-    last_seen = getattr(user_obj, "last_seen", None)
-    return bool(last_seen and last_seen >= cutoff)
+    return presence.is_online(user_obj, now)
 
 
 @chat_bp.get("/chat")
@@ -54,7 +50,6 @@ def chat_page():
         return redirect(url_for('auth.login'))
 
     now = datetime.now()
-    cutoff = now - ONLINE_WINDOW
     try:
         rows = User.query.filter(User.is_active == True, User.id != int(user.id)).order_by(User.full_name.asc().nullslast(), User.email.asc()).all()
     except Exception:
@@ -62,8 +57,7 @@ def chat_page():
 
     items = []
     for u in rows:
-        last_seen = getattr(u, "last_seen", None)
-        is_online = bool(last_seen and last_seen >= cutoff)
+        is_online = _is_user_online(u, now=now)
         items.append({
             "id": int(u.id),
             "name": (u.full_name or u.email or u.username or "").strip() or f"User {u.id}",
@@ -122,7 +116,6 @@ def api_chat_users():
     only_online = only_online_raw in ("1", "true", "yes", "on")
 
     now = datetime.now()
-    cutoff = now - ONLINE_WINDOW
     try:
         rows = User.query.filter(User.is_active == True, User.id != int(user.id)).order_by(User.full_name.asc().nullslast(), User.email.asc()).all()
     except Exception:
@@ -133,8 +126,7 @@ def api_chat_users():
         name = (u.full_name or u.email or u.username or "").strip() or f"User {u.id}"
         if q_text and q_text not in name.lower():
             continue
-        last_seen = getattr(u, "last_seen", None)
-        is_online = bool(last_seen and last_seen >= cutoff)
+        is_online = _is_user_online(u, now=now)
         if only_online and not is_online:
             continue
         items.append({
@@ -4,6 +4,7 @@ from models import *
 from utils import *
 import utils
 from services.mail_service import MailService
+from services import plan_cache, plan_changes, availability_service, outbox, job_sync, excel_export, plan_labels, plan_mail, mail_archive, plan_rooms, presence
 from utils import _vehicle_payload
 
 # Explicitly map underscore-prefixed functions from utils (they are not imported by *)
@@ -30,15 +31,12 @@ from datetime import date, datetime, timedelta
 from sqlalchemy import or_, and_, desc, func, case
 import json
 import io
+import hashlib
 import os
 import math
 import re
 import time as _time
 import colorsys
-from openpyxl import Workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.styles.colors import Color
 from werkzeug.utils import secure_filename
 import uuid
 
@@ -600,6 +598,19 @@ def admin_publish_team_week():
 
 
 # ---------- PLAN ----------
+def _plan_week_etag(start: date) -> str:
+    """Haftanın sürümü + kullanıcıya özel sayfa parçaları (csrf, isim) -> ETag."""
+    user_bits = "|".join([
+        str(session.get("user_id") or ""),
+        str(session.get("role") or ""),
+        str(session.get("full_name") or ""),
+        str(session.get("_csrf_token") or ""),
+        iso(date.today()),
+    ])
+    digest = hashlib.sha1(user_bits.encode("utf-8")).hexdigest()[:12]
+    return plan_cache.etag_for_week(start, extra=digest)
+
+
 @planner_bp.get("/plan")
 @login_required
 def plan_week():
@@ -608,19 +619,53 @@ def plan_week():
     start = ws if ws else week_start(d)
     days = [start + timedelta(days=i) for i in range(7)]
 
+    # Hafta değişmediyse (sürüm sayacı aynı) sayfayı yeniden üretme.
+    etag = _plan_week_etag(start)
+    if request.if_none_match.contains_weak(etag) and not session.get("_flashes"):
+        resp = make_response("", 304)
+        resp.set_etag(etag, weak=True)
+        resp.headers["Cache-Control"] = "private, no-cache"
+        return resp
+
+    view = plan_cache.get_week_view(start, _build_plan_week_view)
+
+    resp = make_response(render_template(
+        "plan.html",
+        start=start, days=days,
+        prev_week=iso(start - timedelta(days=7)),
+        next_week=iso(start + timedelta(days=7)),
+        selected_week=iso(start),
+        week_start_iso=iso(start),
+        tr_days=TR_DAYS,
+        today_iso=iso(date.today()),
+        tr_cities=TR_CITIES,  # All 81 Turkish provinces for route starting point
+        **view
+    ))
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
+def _build_plan_week_view(start: date) -> dict:
+    """
+    plan.html için haftaya bağlı verileri hesaplar. Sonuç plan_cache içinde
+    saklandığından ORM nesneleri yerine düz kopyalar (detach_row) döner.
+    """
+    days = [start + timedelta(days=i) for i in range(7)]
+    # Delta senkronizasyonu bu sıradan devam eder; veriden önce okunmalı
+    plan_change_version = plan_changes.current_version()
+
     # Satirdaki isler (sehir bazli) = region != "-" ; proje sablonlari = region == "-"
     # Projeleri sadece bu haftada is eklenmisse goster
     template_projects = Project.query.filter(Project.is_active == True, Project.region == "-").order_by(Project.id.desc()).all()
     
-    # Once bu haftada is eklenmis projeleri bul
-    cells = PlanCell.query.filter(PlanCell.work_date >= days[0], PlanCell.work_date <= days[-1]).all()
-    project_ids_with_work = {c.project_id for c in cells}
-    
+    # Once bu haftada is eklenmis projeleri bul (hücreler + etiketler tek seferde)
+    labels = plan_labels.PlanLabelIndex.load_week(start)
+    cells = labels.cells
+
     # Projeleri goster: sadece bu haftada isi olanlari ekle
-    base_q = Project.query.filter(Project.region != "-")
-    if project_ids_with_work:
-        projects = base_q.filter(Project.id.in_(project_ids_with_work))\
-            .order_by(Project.region.asc(), Project.project_code.asc()).all()
+    if cells:
+        projects = labels.row_projects
         # Dropdown için benzersiz project_code'lara göre grupla (her project_code için en yüksek ID'li projeyi al)
         unique_projects_dict = {}
         for p in projects:
@@ -633,59 +678,16 @@ def plan_week():
         unique_projects_for_dropdown = []
     
     code_colors = {p.project_code: pastel_color(p.project_code) for p in projects}
-    cell_by_key: Dict[Tuple[int, str], PlanCell] = {(c.project_id, iso(c.work_date)): c for c in cells}
+    cell_by_key: Dict[Tuple[int, str], PlanCell] = labels.cell_by_key
 
     # Satır bazında (Proje kolonunda göstermek için) tekil alt proje etiketi
-    row_subproject_label: Dict[int, str] = {}
-    if cells:
-        monday_key = iso(start)
-        sub_ids_by_project: Dict[int, set] = {}
-        for c in cells:
-            sid = int(c.subproject_id or 0)
-            if sid <= 0:
-                continue
-            sub_ids_by_project.setdefault(int(c.project_id), set()).add(sid)
-
-        # Öncelik: bu haftanın Pazartesi (week_start) hücresine set edilen alt proje
-        # (Yoksa: tüm hafta boyunca tekil kalan alt proje)
-        label_id_by_project: Dict[int, int] = {}
-        for pid, sids in sub_ids_by_project.items():
-            monday_cell = cell_by_key.get((int(pid), monday_key))
-            monday_sid = int((monday_cell.subproject_id if monday_cell else 0) or 0)
-            if monday_sid > 0:
-                label_id_by_project[int(pid)] = monday_sid
-            elif len(sids) == 1:
-                label_id_by_project[int(pid)] = next(iter(sids))
-
-        wanted_ids = sorted(set(label_id_by_project.values()))
-        sub_by_id: Dict[int, SubProject] = {}
-        if wanted_ids:
-            for sp in SubProject.query.filter(SubProject.id.in_(wanted_ids)).all():
-                sub_by_id[int(sp.id)] = sp
-
-        for pid, sid in label_id_by_project.items():
-            sp = sub_by_id.get(int(sid))
-            if not sp:
-                continue
-            code = (sp.code or "").strip()
-            row_subproject_label[int(pid)] = f"{sp.name}{f' ({code})' if code else ''}"
+    # Öncelik: bu haftanın Pazartesi (week_start) hücresine set edilen alt proje
+    # (Yoksa: tüm hafta boyunca tekil kalan alt proje)
+    row_subproject_label: Dict[int, str] = labels.row_subproject_labels(start)
 
-    ass_map: Dict[int, list] = {}
-    cell_person_ids: Dict[int, list] = {}
-    if cells:
-        cell_ids = [c.id for c in cells]
-        rows = (
-            db.session.query(CellAssignment.cell_id, Person.full_name)
-            .join(Person, Person.id == CellAssignment.person_id)
-            .filter(CellAssignment.cell_id.in_(cell_ids))
-            .all()
-        )
-        for cid, name in rows:
-            ass_map.setdefault(cid, []).append(name)
-
-        # Cell person IDs for team signature
-        for cid, pid in db.session.query(CellAssignment.cell_id, CellAssignment.person_id).filter(CellAssignment.cell_id.in_(cell_ids)).all():
-            cell_person_ids.setdefault(cid, []).append(pid)
+    ass_map: Dict[int, list] = {c.id: labels.names_for_cell(c.id) for c in cells if labels.cell_person_ids.get(c.id)}
+    # Cell person IDs for team signature
+    cell_person_ids: Dict[int, list] = labels.cell_person_ids
 
     # Overtime data fetching logic:
     # We need to know if a cell has ANY overtime.
@@ -742,175 +744,28 @@ def plan_week():
                 for proj_id in project_ids:
                     cell_grey[(proj_id, k)] = True
 
-    people = Person.query.order_by(Person.full_name.asc()).all()
-    # Netmon firma ID'sini bul
-    netmon_firma = Firma.query.filter_by(name="Netmon").first()
-    netmon_firma_id = netmon_firma.id if netmon_firma else None
-    
-    people_json = []
-    for p in people:
-        person_data = {
+    # Personel x gün müsaitlik matrisi (tablo başına tek sorgu)
+    availability = availability_service.AvailabilityMatrix.load(days)
+
+    people_json = [
+        {
             "id": p.id,
             "full_name": p.full_name,
-            "email": p.email or "",
-            "phone": p.phone or "",
-            "tc_no": p.tc_no or "",
+            "email": p.email,
+            "phone": p.phone,
+            "tc_no": p.tc_no,
             "firma_id": p.firma_id,
-            "firma_name": p.firma.name if p.firma else None,
-            "seviye_name": p.seviye.name if p.seviye else None
+            "firma_name": p.firma_name,
+            "seviye_name": p.seviye_name,
         }
-        people_json.append(person_data)
-
-    status_map = get_person_status_map(days)
-
-    # Aktif durum tiplerini al (özet için görünür olanlar)
-    status_types = PersonnelStatusType.query.filter_by(is_active=True).order_by(PersonnelStatusType.display_order.asc()).all()
-    
-    # Subproject ID -> StatusType eşleştirmesi
-    subproject_to_status = {}
-    for st in status_types:
-        if st.subproject_id:
-            subproject_to_status[st.subproject_id] = st
-    
-    # Status Type JSON listesi (frontend için)
-    status_types_json = [
-        {
-            "id": st.id,
-            "name": st.name,
-            "code": st.code,
-            "color": st.color or "#64748b",
-            "icon": st.icon or "📋",
-            "visible": getattr(st, 'visible_in_summary', True),
-            "subproject_id": st.subproject_id
-        }
-        for st in status_types
+        for p in availability.people
     ]
 
-    # Office tipi (fallback için)
-    office_status_type = next((st for st in status_types if st.code == 'office'), None)
-
-    # Her gün için atama ve durum bilgilerini hesapla
-    busy_map = {}
-    status_assignments_map = {}  # day_iso -> {person_id: status_type_id}
-    
-    for d in days:
-        day_iso = iso(d)
-        
-        # Tüm cell atamalarını al (subproject_id ve project_code ile birlikte)
-        cell_q = db.session.query(
-            CellAssignment.person_id,
-            PlanCell.subproject_id,
-            Project.project_code
-        ).join(PlanCell, PlanCell.id == CellAssignment.cell_id)\
-         .join(Project, Project.id == PlanCell.project_id)\
-         .filter(PlanCell.work_date == d, PlanCell.status != 'cancelled')
-        
-        busy_ids = set()
-        status_assignments = {}  # person_id -> status_type_id
-        
-        for row in cell_q.all():
-            person_id, subproject_id, project_code = row
-            busy_ids.add(person_id)
-            
-            mapped = False
-            # 1. Subproject_id ile eşleşen status type varsa kaydet
-            if subproject_id and subproject_id in subproject_to_status:
-                status_assignments[person_id] = subproject_to_status[subproject_id].id
-                mapped = True
-            
-            # 2. Fallback: Project Code "9026-0001%" ise ve mapped değilse -> Ofis
-            if not mapped and project_code and project_code.startswith("9026-0001") and office_status_type:
-                status_assignments[person_id] = office_status_type.id
-                mapped = True
-        
-        busy_map[day_iso] = busy_ids
-        status_assignments_map[day_iso] = status_assignments
+    status_map = get_person_status_map(days)
+    status_types_json = availability.status_types_json()
 
     # Personel durum özeti
-    personnel_summary = {}
-    for d in days:
-        day_iso = iso(d)
-        busy_ids = busy_map[day_iso]
-        status_assignments = status_assignments_map.get(day_iso, {})
-        
-        # Seviyeler: Ana kadro, Yardımcı, Alt yüklenici
-        summary = {
-            "total_available": [],
-            "ana_kadro_available": [],
-            "yardimci_available": [],
-            "alt_yuklenici_available": []
-        }
-        firm_available = {}
-        
-        # Dinamik status kategorileri için sayaçlar
-        status_counts = {st.id: [] for st in status_types}  # status_type_id -> [isimler]
-        
-        for p in people:
-            st = status_map.get((p.id, day_iso), "available")
-            firm_label = p.firma.name if p.firma else "Firma belirtilmemiş"
-            
-            # PersonDayStatus tablosunda izinli olanlar
-            if st == "leave":
-                # Varsayılan olarak ilk leave tipine ekle
-                for status_type in status_types:
-                    if status_type.code == "leave" or status_type.code == "annual_leave":
-                        status_counts[status_type.id].append(p.full_name)
-                        break
-                continue
-            
-            # Cell ataması ile status type eşleştirmesi
-            if p.id in status_assignments:
-                status_type_id = status_assignments[p.id]
-                if status_type_id in status_counts:
-                    status_counts[status_type_id].append(p.full_name)
-                continue
-            
-            # Normal projede çalışıyor (status type olmayan)
-            if p.id in busy_ids:
-                continue
-            
-            # Boşta
-            summary["total_available"].append(p.full_name)
-            firm_available.setdefault(firm_label, []).append(p.full_name)
-            
-            seviye_name = p.seviye.name if p.seviye else None
-            if seviye_name == "Ana kadro":
-                summary["ana_kadro_available"].append(p.full_name)
-            elif seviye_name == "Yardımcı":
-                summary["yardimci_available"].append(p.full_name)
-            elif seviye_name == "Alt yüklenici":
-                summary["alt_yuklenici_available"].append(p.full_name)
-        
-        # Sonuç sözlüğü
-        day_summary = {
-            "total": len(summary["total_available"]),
-            "ana_kadro": len(summary["ana_kadro_available"]),
-            "yardimci": len(summary["yardimci_available"]),
-            "alt_yuklenici": len(summary["alt_yuklenici_available"]),
-            "total_names": summary["total_available"],
-            "ana_kadro_names": summary["ana_kadro_available"],
-            "yardimci_names": summary["yardimci_available"],
-            "alt_yuklenici_names": summary["alt_yuklenici_available"],
-            "firm_available": firm_available,
-            "firm_available_counts": {k: len(v) for k, v in firm_available.items()},
-            "status_categories": {}  # Dinamik kategoriler
-        }
-        
-        # Dinamik status kategorilerini ekle
-        for st in status_types:
-            cat_key = f"status_{st.id}"
-            day_summary["status_categories"][st.id] = {
-                "id": st.id,
-                "name": st.name,
-                "code": st.code,
-                "color": st.color or "#64748b",
-                "icon": st.icon or "📋",
-                "visible": getattr(st, 'visible_in_summary', True),
-                "count": len(status_counts[st.id]),
-                "names": status_counts[st.id]
-            }
-        
-        personnel_summary[day_iso] = day_summary
+    personnel_summary = availability.week_summary()
 
 
     # iller dropdown: önce TR_CITIES, ayrıca DB'deki mevcut iller (yanlış yazılmış eski şehirler de kaybolmasın)
@@ -971,39 +826,32 @@ def plan_week():
         if payload:
             vehicles_json.append(payload)
 
-    return render_template(
-        "plan.html",
-        start=start, days=days,
-        template_projects=template_projects,
-        projects=projects,
-        unique_projects_for_dropdown=unique_projects_for_dropdown,
-        cell_by_key=cell_by_key,
+    detach = plan_cache.detach_row
+    return dict(
+        template_projects=[detach(p) for p in template_projects],
+        projects=[detach(p) for p in projects],
+        unique_projects_for_dropdown=[detach(p) for p in unique_projects_for_dropdown],
+        cell_by_key={k: detach(c) for k, c in cell_by_key.items()},
         cell_overtime_info=cell_overtime_info,
         row_subproject_label=row_subproject_label,
         ass_map=ass_map,
         cell_person_ids=cell_person_ids,
         cell_grey=cell_grey,
         people_json=people_json,
-                template_projects_json=[
+        template_projects_json=[
             {"id":p.id,"project_code":p.project_code,"project_name":p.project_name,"responsible":p.responsible}
             for p in template_projects
         ],
-        prev_week=iso(start - timedelta(days=7)),
-        next_week=iso(start + timedelta(days=7)),
-        selected_week=iso(start),
-        week_start_iso=iso(start),
         code_colors=code_colors,
-        tr_days=TR_DAYS,
-        today_iso=iso(date.today()),
         status_map=status_map,
         personnel_summary=personnel_summary,
         status_types_json=status_types_json,
         cities=cities,
-        tr_cities=TR_CITIES,  # All 81 Turkish provinces for route starting point
-        vehicles=vehicles,
+        vehicles=[detach(v) for v in vehicles],
         vehicles_json=vehicles_json,
         project_subprojects=project_subprojects,
-        field_users=field_users
+        field_users=[detach(u) for u in field_users],
+        plan_change_version=plan_change_version,
     )
 
 
@@ -1027,223 +875,135 @@ def hsl_to_rgb_hex(hsl_str: str) -> str:
     return f"{int(r*255):02X}{int(g*255):02X}{int(b*255):02X}"
 
 
-@planner_bp.get("/plan/export/excel")
-@login_required
-def plan_export_excel():
-    """Haftalık planı Excel olarak indir"""
-    try:
-        d = parse_date(request.args.get("week_start", "")) or date.today()
-        start = week_start(d)
-        days = [start + timedelta(days=i) for i in range(7)]
-    except Exception:
-        flash("Hafta tarihi geçersiz.", "danger")
-        return redirect(url_for("planner.plan_week"))
+def _plan_export_sheet(labels, days: List[date], title: str):
+    """Plan tablosunun `days` günlerini kapsayan Excel sayfası (etiketler önceden yüklü indeksten)."""
+    projects = labels.projects_between(days[0], days[-1])
 
-    # Projeleri ve hücreleri al
-    cells = PlanCell.query.filter(PlanCell.work_date >= days[0], PlanCell.work_date <= days[-1]).all()
-    project_ids_with_work = {c.project_id for c in cells}
-    
-    base_q = Project.query.filter(Project.region != "-")
-    if project_ids_with_work:
-        projects = base_q.filter(Project.id.in_(project_ids_with_work))\
-            .order_by(Project.region.asc(), Project.project_code.asc()).all()
-    else:
-        projects = []
-    
-    cell_by_key: Dict[Tuple[int, str], PlanCell] = {(c.project_id, iso(c.work_date)): c for c in cells}
-    
     # Proje kodlarına göre renkleri hesapla
     code_colors = {p.project_code: pastel_color(p.project_code) for p in projects}
-    
+
     # Satır bazında (Proje kolonunda göstermek için) tekil alt proje etiketi
-    row_subproject_label: Dict[int, str] = {}
-    if cells:
-        monday_key = iso(start)
-        sub_ids_by_project: Dict[int, set] = {}
-        for c in cells:
-            sid = int(c.subproject_id or 0)
-            if sid <= 0:
-                continue
-            sub_ids_by_project.setdefault(int(c.project_id), set()).add(sid)
-
-        # Öncelik: bu haftanın Pazartesi (week_start) hücresine set edilen alt proje
-        # (Yoksa: tüm hafta boyunca tekil kalan alt proje)
-        label_id_by_project: Dict[int, int] = {}
-        for pid, sids in sub_ids_by_project.items():
-            monday_cell = cell_by_key.get((int(pid), monday_key))
-            monday_sid = int((monday_cell.subproject_id if monday_cell else 0) or 0)
-            if monday_sid > 0:
-                label_id_by_project[int(pid)] = monday_sid
-            elif len(sids) == 1:
-                label_id_by_project[int(pid)] = next(iter(sids))
-
-        wanted_ids = sorted(set(label_id_by_project.values()))
-        sub_by_id: Dict[int, SubProject] = {}
-        if wanted_ids:
-            for sp in SubProject.query.filter(SubProject.id.in_(wanted_ids)).all():
-                sub_by_id[int(sp.id)] = sp
-
-        for pid, sid in label_id_by_project.items():
-            sp = sub_by_id.get(int(sid))
-            if not sp:
-                continue
-            code = (sp.code or "").strip()
-            row_subproject_label[int(pid)] = f"{sp.name}{f' ({code})' if code else ''}"
-    
-    # Personel atamalarını al
-    ass_map: Dict[int, list] = {}
-    if cells:
-        cell_ids = [c.id for c in cells]
-        rows = (
-            db.session.query(CellAssignment.cell_id, Person.full_name)
-            .join(Person, Person.id == CellAssignment.person_id)
-            .filter(CellAssignment.cell_id.in_(cell_ids))
-            .all()
-        )
-        for cid, name in rows:
-            ass_map.setdefault(cid, []).append(name)
-    
-    # Excel dosyası oluştur
-    wb = Workbook()
-    ws = wb.active
-    ws.title = f"Hafta {start.strftime('%d.%m.%Y')}"
-    
+    row_subproject_label = labels.row_subproject_labels(days[0], days[0], days[-1])
+
     # Başlık satırı (gün adı locale'dan bağımsız)
     _gun_adlari = ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma", "Cumartesi", "Pazar"]
-    header_row = ["İL", "PROJE", "SORUMLU"]
+    columns = [
+        excel_export.Column("İL", 15, style=excel_export.CellStyle(fill="F0FDF4", font_color="166534", bold=True)),  # Yeşil açık
+        excel_export.Column("PROJE", 30),
+        excel_export.Column("SORUMLU", 20, style=excel_export.CellStyle(fill="FFFBEB", font_color="92400E")),  # Sarı açık
+    ]
     for d in days:
-        gun_adi = _gun_adlari[d.weekday()]  # 0=Monday
-        header_row.append(d.strftime("%d.%m.%Y") + " " + gun_adi)
-    ws.append(header_row)
-    
-    # Başlık stil - koyu gri arka plan
-    header_fill = PatternFill(start_color="404040", end_color="404040", fill_type="solid")
-    header_font = Font(bold=True, size=12, color="FFFFFF")
-    for cell in ws[1]:
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-    
+        columns.append(excel_export.Column(d.strftime("%d.%m.%Y") + " " + _gun_adlari[d.weekday()], 25))  # 0=Monday
+
     # Renk tanımlamaları
-    il_fill = PatternFill(start_color="F0FDF4", end_color="F0FDF4", fill_type="solid")  # Yeşil açık
-    resp_fill = PatternFill(start_color="FFFBEB", end_color="FFFBEB", fill_type="solid")  # Sarı açık
-    cell_filled_fill = PatternFill(start_color="D1FAE5", end_color="D1FAE5", fill_type="solid")  # Dolu hücre - açık yeşil
-    cell_personnel_fill = PatternFill(start_color="A7F3D0", end_color="A7F3D0", fill_type="solid")  # Personel var - koyu yeşil
-    
-    # Veri satırları
-    row_num = 2
-    for p in projects:
-        # PROJE kolonu: proje kodu + proje adı, karşı firma sorumlusu (varsa), alt proje (varsa)
-        proj_parts = [f"{p.project_code} {p.project_name}"]
-        if p.karsi_firma_sorumlusu:
-            proj_parts.append(p.karsi_firma_sorumlusu)
-        sp_label = row_subproject_label.get(p.id)
-        if sp_label:
-            proj_parts.append(sp_label)
-        proj_text = "\\n".join(proj_parts)
-        
-        row_data = [p.region or "", proj_text, p.responsible or ""]
-        
-        for d in days:
-            k = iso(d)
-            cell = cell_by_key.get((p.id, k))
-            cell_text = ""
-            
-            if cell:
+    cell_filled_style = excel_export.CellStyle(fill="D1FAE5")  # Dolu hücre - açık yeşil
+    cell_personnel_style = excel_export.CellStyle(fill="A7F3D0")  # Personel var - koyu yeşil
+    cell_empty_style = excel_export.CellStyle(fill="FFFFFF")  # Boş hücre - beyaz
+
+    def _rows():
+        for p in projects:
+            # PROJE kolonu: proje kodu + proje adı, karşı firma sorumlusu (varsa), alt proje (varsa)
+            proj_parts = [f"{p.project_code} {p.project_name}"]
+            if p.karsi_firma_sorumlusu:
+                proj_parts.append(p.karsi_firma_sorumlusu)
+            sp_label = row_subproject_label.get(p.id)
+            if sp_label:
+                proj_parts.append(sp_label)
+            proj_text = "\\n".join(proj_parts)
+
+            # PROJE kolonu - proje koduna göre renk
+            rgb_hex = hsl_to_rgb_hex(code_colors.get(p.project_code, '#fef3c7'))
+            row_data = [p.region or "", excel_export.styled(proj_text, excel_export.CellStyle(fill=rgb_hex)), p.responsible or ""]
+
+            for d in days:
+                cell = labels.cell(p.id, d)
+                if not cell:
+                    row_data.append(excel_export.styled("-", cell_empty_style))
+                    continue
+
                 parts = []
                 # Alt proje bilgisi (varsa)
-                if cell.subproject_id:
-                    subproject = SubProject.query.get(cell.subproject_id)
-                    if subproject:
-                        code = (subproject.code or "").strip()
-                        subproject_label = f"{subproject.name}{f' ({code})' if code else ''}"
-                        parts.append(subproject_label)
-                
+                subproject_label = labels.subproject_label_for(cell)
+                if subproject_label:
+                    parts.append(subproject_label)
+
                 # Personel
-                if ass_map.get(cell.id):
-                    parts.append(", ".join(ass_map[cell.id]))
-                
+                names = labels.names_for_cell(cell.id)
+                if names:
+                    parts.append(", ".join(names))
+
                 # Çalışma Saati (Varsa)
                 hours = calculate_hours_from_shift(cell.shift)
                 if hours > 0:
                     parts.append(f"Saat: {hours}")
-                
+
                 # Çalışma Detayı
                 if cell.job_mail_body:
                     parts.append(f"Detay: {cell.job_mail_body}")
-                
+
                 # Not (varsa)
                 if cell.note:
                     parts.append(f"Not: {cell.note}")
-                
-                cell_text = " | ".join(parts) if parts else "-"
-            else:
-                cell_text = "-"
-            
-            row_data.append(cell_text)
-        
-        ws.append(row_data)
-        
-        # İL kolonu - yeşil
-        ws[f'A{row_num}'].fill = il_fill
-        ws[f'A{row_num}'].font = Font(bold=True, color="166534")
-        
-        # PROJE kolonu - proje koduna göre renk
-        proj_color = code_colors.get(p.project_code, '#fef3c7')
-        rgb_hex = hsl_to_rgb_hex(proj_color)
-        proj_fill = PatternFill(start_color=rgb_hex, end_color=rgb_hex, fill_type="solid")
-        ws[f'B{row_num}'].fill = proj_fill
-        
-        # PROJE SORUMLUSU kolonu - sarı
-        ws[f'C{row_num}'].fill = resp_fill
-        ws[f'C{row_num}'].font = Font(color="92400E")
-        
-        # Gün hücreleri - dolu ise renkli
-        col_idx = 4
-        for d in days:
-            k = iso(d)
-            cell = cell_by_key.get((p.id, k))
-            col_letter = get_column_letter(col_idx)
-            
-            if cell and ass_map.get(cell.id):
-                # Personel varsa koyu yeşil
-                ws[f'{col_letter}{row_num}'].fill = cell_personnel_fill
-            elif cell:
-                # Hücre dolu ama personel yok
-                ws[f'{col_letter}{row_num}'].fill = cell_filled_fill
-            else:
-                # Boş hücre - beyaz
-                ws[f'{col_letter}{row_num}'].fill = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
-            
-            col_idx += 1
-        
-        row_num += 1
-    
-    # Sütun genişliklerini ayarla
-    ws.column_dimensions['A'].width = 15  # İL
-    ws.column_dimensions['B'].width = 30  # PROJE
-    ws.column_dimensions['C'].width = 20  # SORUMLU
-    for i in range(4, 11):  # Günler
-        ws.column_dimensions[get_column_letter(i)].width = 25
-    
-    # Satır yüksekliklerini ayarla
-    for row in ws.iter_rows(min_row=2):
-        ws.row_dimensions[row[0].row].height = 60
-    
-    # Excel dosyasını response olarak döndür
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    filename = f"haftalik_plan_{start.strftime('%Y%m%d')}.xlsx"
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name=filename,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+                # Personel varsa koyu yeşil, hücre dolu ama personel yoksa açık yeşil
+                fill_style = cell_personnel_style if names else cell_filled_style
+                row_data.append(excel_export.styled(" | ".join(parts) if parts else "-", fill_style))
+
+            yield row_data
+
+    return excel_export.Sheet(
+        title,
+        columns,
+        _rows(),
+        header_style="header_dark",
+        row_height=60,
+        freeze_panes="D2" if len(days) > 7 else None,
     )
 
 
+@planner_bp.get("/plan/export/excel")
+@login_required
+def plan_export_excel():
+    """
+    Planı Excel olarak indir.
+    - week_start: tek hafta (varsayılan)
+    - start + end: tarih aralığı; layout=weeks her hafta ayrı sayfa (varsayılan),
+      layout=continuous tüm günler tek sayfada
+    """
+    layout = (request.args.get("layout") or "weeks").strip().lower()
+    try:
+        if request.args.get("start") or request.args.get("end"):
+            start, end = plan_labels.check_range(
+                parse_date(request.args.get("start", "")), parse_date(request.args.get("end", ""))
+            )
+            filename = f"plan_{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}.xlsx"
+        else:
+            d = parse_date(request.args.get("week_start", "")) or date.today()
+            start = week_start(d)
+            end = start + timedelta(days=6)
+            filename = f"haftalik_plan_{start.strftime('%Y%m%d')}.xlsx"
+        if layout not in ("weeks", "continuous"):
+            raise ValueError("Geçersiz sayfa düzeni.")
+    except ValueError as e:
+        flash(str(e) or "Hafta tarihi geçersiz.", "danger")
+        return redirect(url_for("planner.plan_week"))
+
+    # Aralığın tüm hücreleri, projeleri ve etiketleri tek seferde (sabit sayıda sorgu)
+    labels = plan_labels.PlanLabelIndex.load(start, end)
+
+    if layout == "continuous":
+        all_days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        title = f"Plan {start.strftime('%d.%m.%Y')}-{end.strftime('%d.%m.%Y')}"
+        sheets = [_plan_export_sheet(labels, all_days, title)]
+    else:
+        # Sayfalar sırayla üretilir; her hafta yazılıp geçilir
+        sheets = (
+            _plan_export_sheet(labels, days, f"Hafta {days[0].strftime('%d.%m.%Y')}")
+            for _ws, days in plan_labels.week_windows(start, end)
+        )
+    return excel_export.xlsx_response(sheets, filename)
+
+
 # ---------- PROJECTS ----------
 @planner_bp.route("/api/next-project-code", methods=["GET"])
 @login_required
@@ -1562,9 +1322,6 @@ def calculate_hours_from_shift(shift_value: str) -> float:
 @observer_required
 def projects_export_excel():
     """Projeleri Excel olarak indir"""
-    from io import BytesIO
-    from flask import send_file
-    
     project_type = request.args.get("type", "main")  # "main" veya "sub"
     show_inactive = request.args.get("show_inactive", "0") == "1"
     search_query = request.args.get("search", "").strip()
@@ -1589,42 +1346,30 @@ def projects_export_excel():
                 )
             )
         
-        projects = base_query.order_by(Project.project_code.asc()).all()
-        
-        # Excel oluştur
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Ana Projeler"
-        
-        # Başlık satırı
-        headers = ["Proje Kodu", "Proje Adı", "Sorumlu", "Karşı Firma Sorumlusu", "Durum"]
-        ws.append(headers)
-        
-        # Başlık stil
-        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        for cell in ws[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-        
-        # Veri satırları
-        for p in projects:
-            ws.append([
-                p.project_code or "",
-                p.project_name or "",
-                p.responsible or "",
-                p.karsi_firma_sorumlusu or "",
-                "Aktif" if p.is_active else "Pasif"
-            ])
-        
-        # Sütun genişlikleri
-        ws.column_dimensions['A'].width = 15
-        ws.column_dimensions['B'].width = 40
-        ws.column_dimensions['C'].width = 25
-        ws.column_dimensions['D'].width = 25
-        ws.column_dimensions['E'].width = 12
-        
+        projects = base_query.order_by(Project.project_code.asc())
+
+        sheet = excel_export.Sheet(
+            "Ana Projeler",
+            [
+                excel_export.Column("Proje Kodu", 15),
+                excel_export.Column("Proje Adı", 40),
+                excel_export.Column("Sorumlu", 25),
+                excel_export.Column("Karşı Firma Sorumlusu", 25),
+                excel_export.Column("Durum", 12),
+            ],
+            (
+                [
+                    p.project_code or "",
+                    p.project_name or "",
+                    p.responsible or "",
+                    p.karsi_firma_sorumlusu or "",
+                    "Aktif" if p.is_active else "Pasif",
+                ]
+                for p in projects.yield_per(500)
+            ),
+            header_style="header_blue",
+        )
+
         filename = f"ana_projeler_{date.today().strftime('%Y%m%d')}.xlsx"
     
     else:  # Alt projeler
@@ -1645,54 +1390,29 @@ def projects_export_excel():
                 )
             )
         
-        subprojects = base_query.order_by(Project.project_code.asc(), SubProject.name.asc()).all()
-        
-        # Excel oluştur
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Alt Projeler"
-        
-        # Başlık satırı
-        headers = ["Proje Kodu", "Proje Adı", "Alt Proje Adı", "Durum"]
-        ws.append(headers)
-        
-        # Başlık stil
-        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        for cell in ws[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-        
-        # Veri satırları
-        for sp in subprojects:
-            p = sp.project
-            ws.append([
-                p.project_code if p else "",
-                p.project_name if p else "",
-                sp.name or "",
-                "Aktif" if (p and p.is_active) else "Pasif"
-            ])
-        
-        # Sütun genişlikleri
-        ws.column_dimensions['A'].width = 15
-        ws.column_dimensions['B'].width = 40
-        ws.column_dimensions['C'].width = 40
-        ws.column_dimensions['D'].width = 12
-        
+        subprojects = (
+            base_query.with_entities(Project.project_code, Project.project_name, SubProject.name, Project.is_active)
+            .order_by(Project.project_code.asc(), SubProject.name.asc())
+        )
+
+        sheet = excel_export.Sheet(
+            "Alt Projeler",
+            [
+                excel_export.Column("Proje Kodu", 15),
+                excel_export.Column("Proje Adı", 40),
+                excel_export.Column("Alt Proje Adı", 40),
+                excel_export.Column("Durum", 12),
+            ],
+            (
+                [code or "", name or "", sp_name or "", "Aktif" if active else "Pasif"]
+                for code, name, sp_name, active in subprojects.yield_per(500)
+            ),
+            header_style="header_blue",
+        )
+
         filename = f"alt_projeler_{date.today().strftime('%Y%m%d')}.xlsx"
-    
-    # Excel dosyasını oluştur
-    buf = BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    
-    return send_file(
-        buf,
-        as_attachment=True,
-        download_name=filename,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+
+    return excel_export.xlsx_response([sheet], filename)
 
 
 @planner_bp.post("/projects/<int:project_id>/delete")
@@ -2272,44 +1992,29 @@ def people_page():
 @login_required
 @observer_required
 def people_excel():
-    people = Person.query.order_by(Person.full_name.asc()).all()
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Personel"
-    
-    # Header
-    headers = ["Ad Soyad", "TC", "Telefon", "Email", "Görev", "Firma", "Seviye", "Durum"]
-    for col_idx, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_idx, value=header)
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Data
-    for row_idx, p in enumerate(people, 2):
-        ws.cell(row=row_idx, column=1, value=p.full_name or "")
-        ws.cell(row=row_idx, column=2, value=p.tc_no or "")
-        ws.cell(row=row_idx, column=3, value=p.phone or "")
-        ws.cell(row=row_idx, column=4, value=p.email or "")
-        ws.cell(row=row_idx, column=5, value=p.role or "")
-        ws.cell(row=row_idx, column=6, value=p.firma.name if p.firma else "")
-        ws.cell(row=row_idx, column=7, value=p.seviye.name if p.seviye else "")
-        ws.cell(row=row_idx, column=8, value=p.durum or "")
-    
-    # Auto-adjust column widths
-    for col_idx in range(1, len(headers) + 1):
-        column_letter = get_column_letter(col_idx)
-        ws.column_dimensions[column_letter].width = 20
-    
-    # Save to BytesIO
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
+    people = (
+        Person.query.options(db.joinedload(Person.firma), db.joinedload(Person.seviye))
+        .order_by(Person.full_name.asc())
+    )
+    columns = [
+        excel_export.Column(h, 20)
+        for h in ["Ad Soyad", "TC", "Telefon", "Email", "Görev", "Firma", "Seviye", "Durum"]
+    ]
+    rows = (
+        [
+            p.full_name or "",
+            p.tc_no or "",
+            p.phone or "",
+            p.email or "",
+            p.role or "",
+            p.firma.name if p.firma else "",
+            p.seviye.name if p.seviye else "",
+            p.durum or "",
+        ]
+        for p in people.yield_per(500)
+    )
     filename = f"personel_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 
-                    as_attachment=True, download_name=filename)
+    return excel_export.xlsx_response([excel_export.Sheet("Personel", columns, rows, header_style="header_navy")], filename)
 
 
 @planner_bp.route("/people/<int:person_id>/edit", methods=["GET", "POST"])
@@ -2355,7 +2060,12 @@ def person_delete(person_id: int):
     # 1. JobAssignment
     JobAssignment.query.filter_by(person_id=person_id).delete()
     
-    # 2. CellAssignment
+    # 2. CellAssignment (toplu silme ORM'i atlar; etkilenen hücreler elle kaydedilir)
+    affected_cells = db.session.query(PlanCell).filter(db.or_(
+        PlanCell.id.in_(db.session.query(CellAssignment.cell_id).filter(CellAssignment.person_id == person_id)),
+        PlanCell.id.in_(db.session.query(TeamOvertime.cell_id).filter(TeamOvertime.person_id == person_id)),
+    ))
+    plan_changes.record_query(affected_cells)
     CellAssignment.query.filter_by(person_id=person_id).delete()
     
     # 3. PersonDayStatus
@@ -2366,6 +2076,8 @@ def person_delete(person_id: int):
     
     db.session.delete(p)
     db.session.commit()
+    outbox.wake()
+    plan_rooms.refresh()
     flash("Personel ve ilişkili atamalar silindi.", "success")
     return redirect(url_for('planner.people_page'))
 
@@ -3053,287 +2765,416 @@ def api_job_mail_last():
     return jsonify({"ok": True, "found": False})
 
 
-@planner_bp.post("/api/cell")
-@login_required
-@observer_required
-def api_cell_set():
+class CellPayloadError(ValueError):
+    """Hücre verisi doğrulama hatası (HTTP durum koduyla birlikte)."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def _payload_int(data: dict, field: str) -> int:
+    """Boş değer 0; sayıya çevrilemeyen değer alan adıyla CellPayloadError."""
+    raw = data.get(field)
+    if raw in (None, "", 0, False):
+        return 0
+    if isinstance(raw, bool) or not isinstance(raw, (int, str)):
+        raise CellPayloadError(f"{field} geçersiz")
     try:
-        data = request.get_json(force=True, silent=True) or {}
-        try:
-            log.debug("api_cell_set data: %s", data)
-        except Exception:
-            pass
-        
-        project_id = int(data.get("project_id", 0))
-        work_date_str = data.get("work_date", "")
-        
-        if not project_id or not work_date_str:
-            return jsonify({"ok": False, "error": "Parametreler eksik (project_id, work_date)"}), 400
-            
-        d = parse_date(work_date_str) or date.today()
-        subproject_id = int(data.get("subproject_id", 0) or 0)
-        if subproject_id and not _subproject_allowed_for_project(subproject_id=subproject_id, project_id=project_id):
-            return jsonify({"ok": False, "error": "Alt proje secimi gecersiz."}), 400
-
-        shift = (data.get("shift") or "").strip()
-        vehicle_info = (data.get("vehicle_info") or "").strip()
-        note = (data.get("note") or "").strip()
-        isdp_info = (data.get("isdp_info") or "").strip()
-        po_info = (data.get("po_info") or "").strip()
-        important_note = (data.get("important_note") or "").strip()
-        team_name = (data.get("team_name") or "").strip()
-        job_mail_body = (data.get("job_mail_body") or "").strip()
-        assigned_user_id = int(data.get("assigned_user_id", 0) or 0)
-        remove_lld_names = _parse_files(data.get("remove_lld_list"))
-        remove_tutanak_names = _parse_files(data.get("remove_tutanak_list"))
-        person_ids = [int(pid) for pid in data.get("person_ids", []) if pid]
-        vehicle_dirty_raw = data.get("vehicle_dirty")
-        if isinstance(vehicle_dirty_raw, str):
-            vehicle_dirty = vehicle_dirty_raw.strip().lower() in {"1", "true", "yes"}
-        else:
-            vehicle_dirty = bool(vehicle_dirty_raw)
-        vehicle_id_specified = "vehicle_id" in data
-        requested_vehicle_id = None
-        if vehicle_id_specified:
-            raw_vehicle_id = data.get("vehicle_id")
-            try:
-                requested_vehicle_id = int(raw_vehicle_id or 0)
-            except Exception:
-                requested_vehicle_id = None
-            if requested_vehicle_id is not None and requested_vehicle_id <= 0:
-                requested_vehicle_id = None
-
-        team_vehicle_requested = False
-        team_vehicle_target_id = None
-        if "team_vehicle_id" in data:
-            team_vehicle_requested = True
-            try:
-                team_vehicle_target_id = int(data.get("team_vehicle_id") or 0)
-            except Exception:
-                team_vehicle_target_id = 0
-        elif vehicle_id_specified:
-            team_vehicle_requested = True
-            team_vehicle_target_id = requested_vehicle_id or 0
+        return int(raw)
+    except (TypeError, ValueError):
+        raise CellPayloadError(f"{field} geçersiz")
 
-        cell = ensure_cell(project_id, d)
-        if subproject_id:
-            cell.subproject_id = subproject_id
-        else:
-            cell.subproject_id = None
-        cell.shift = shift if shift else None
-        cell.vehicle_info = vehicle_info if vehicle_info else None
-        cell.note = note if note else None
-        cell.isdp_info = isdp_info if isdp_info else None
-        cell.po_info = po_info if po_info else None
-        cell.important_note = important_note if important_note else None
-        cell.job_mail_body = job_mail_body if job_mail_body else None
-        cell.assigned_user_id = assigned_user_id if assigned_user_id else None
-
-        # assignment + ekip (team_id)
-        added_ids = set_assignments_and_team(
-            cell,
-            person_ids,
-            preferred_vehicle_info=vehicle_info if (vehicle_dirty or vehicle_info) else None,
-        )
 
-        # Per-person shift/overtime saving
-        person_overtimes = data.get("person_overtimes") or {}
-        
-        # Get current user for created_by
-        current_u_id = get_current_user().id if get_current_user() else 1
-        
-        # Existing records in a map
-        existing_ots = {
-            ot.person_id: ot 
-            for ot in TeamOvertime.query.filter_by(cell_id=cell.id).all()
-        }
-        
-        processed_pids = set()
-        
-        if isinstance(person_overtimes, dict):
-            for pid_str, shift_val in person_overtimes.items():
-                try:
-                    pid = int(pid_str)
-                    if pid not in person_ids:
-                        continue # Skip if person is no longer assigned
-                    
-                    shift_str = (shift_val or "").strip()
-                    # User might send "0" or empty string to clear
-                    if not shift_str:
-                         continue
-                        
-                    processed_pids.add(pid)
-                    # Try to parse float hours from string "2", "2.5", etc.
-                    try:
-                        hours = float(shift_str)
-                    except:
-                        hours = 0.0
-                    
-                    ot = existing_ots.get(pid)
-                    if not ot:
-                        ot = TeamOvertime(
-                            cell_id=cell.id, 
-                            person_id=pid, 
-                            work_date=d,
-                            created_by_user_id=current_u_id
-                        )
-                        db.session.add(ot)
-                    
-                    ot.duration_hours = hours
-                    ot.description = shift_str 
-                    ot.updated_at = datetime.now()
-                    
-                except Exception as ex:
-                    print(f"Error saving person overtime for {pid_str}: {ex}")
-            
-        # Cleanup: Remove overtime records for persons currently assigned BUT who have no overtime value in the payload (cleared)
-        # Javascript sends ALL values. If value is empty, it might be missing from dict or empty string.
-        # If it was missing from dict, it's not in processed_pids.
-        for pid in person_ids:
-            if pid not in processed_pids and pid in existing_ots:
-                db.session.delete(existing_ots[pid])
-        
-        # Cleanup: Remove overtime records for persons NOT in the assignment list anymore
-        for pid, ot in existing_ots.items():
-            if pid not in person_ids:
-                db.session.delete(ot)
+def _payload_text(data: dict, field: str) -> str:
+    raw = data.get(field)
+    if raw is None:
+        return ""
+    if not isinstance(raw, str):
+        raise CellPayloadError(f"{field} metin olmalı")
+    return raw.strip()
 
 
+def _payload_person_ids(data: dict) -> list:
+    raw = data.get("person_ids")
+    if raw in (None, ""):
+        return []
+    if not isinstance(raw, list):
+        raise CellPayloadError("person_ids liste olmalı")
+    out = []
+    for pid in raw:
+        if not pid:
+            continue
+        if isinstance(pid, bool) or not isinstance(pid, (int, str)):
+            raise CellPayloadError("person_ids geçersiz")
+        try:
+            out.append(int(pid))
+        except (TypeError, ValueError):
+            raise CellPayloadError("person_ids geçersiz")
+    return out
 
 
-        team = Team.query.get(cell.team_id) if cell.team_id else None
-        if team and team_vehicle_requested:
-            vehicle_for_team = None
-            if team_vehicle_target_id and team_vehicle_target_id > 0:
-                vehicle_for_team = Vehicle.query.get(team_vehicle_target_id)
-                if not vehicle_for_team:
-                    db.session.rollback()
-                    return jsonify({"ok": False, "error": "Araç bulunamadı"}), 404
-                conflict_team = Team.query.filter(
-                    Team.vehicle_id == team_vehicle_target_id,
-                    Team.id != team.id
-                ).first()
-                if conflict_team:
-                    # Aracı yeni ekibe verebilmek için önce eski ekibin atamasını kaldır
-                    conflict_team.vehicle_id = None
-                    db.session.query(PlanCell).filter(
-                        PlanCell.team_id == conflict_team.id
-                    ).update({PlanCell.vehicle_info: None}, synchronize_session=False)
-            team.vehicle_id = vehicle_for_team.id if vehicle_for_team else None
-            plate = vehicle_for_team.plate if vehicle_for_team else None
-            db.session.flush()
-            db.session.query(PlanCell).filter(PlanCell.team_id == team.id).update(
-                {PlanCell.vehicle_info: plate}, synchronize_session=False
-            )
-            cell.vehicle_info = plate
-
-        # ekip adı (rapor için)
-
-        # remove attachments if requested
-        # remove selected attachments
-        if remove_lld_names:
-            current = _parse_files(cell.lld_hhd_files)
-            remaining = [f for f in current if f not in remove_lld_names]
-            for fname in current:
-                if fname in remove_lld_names:
-                    delete_upload(fname)
-            cell.lld_hhd_files = _dump_files(remaining) if remaining else None
-            if cell.lld_hhd_path and cell.lld_hhd_path in remove_lld_names:
-                delete_upload(cell.lld_hhd_path)
-                cell.lld_hhd_path = None
-        if remove_tutanak_names:
-            current = _parse_files(cell.tutanak_files)
-            remaining = [f for f in current if f not in remove_tutanak_names]
-            for fname in current:
-                if fname in remove_tutanak_names:
-                    delete_upload(fname)
-            cell.tutanak_files = _dump_files(remaining) if remaining else None
-            if cell.tutanak_path and cell.tutanak_path in remove_tutanak_names:
-                delete_upload(cell.tutanak_path)
-                cell.tutanak_path = None
-
-        # updated_at'i güncelle
-        cell.updated_at = datetime.now()
+def _parse_cell_payload(data: dict) -> dict:
+    """
+    /api/cell gövdesini doğrular ve normalize eder (veritabanına yazmaz).
+    Hatalı girişte CellPayloadError fırlatır.
+    """
+    try:
+        project_id = int(data.get("project_id", 0))
+    except (TypeError, ValueError):
+        project_id = 0
+    work_date_str = data.get("work_date", "")
 
-        db.session.commit()
-        team_vehicle_payload = None
-        if cell.team_id:
-            updated_team = Team.query.get(cell.team_id)
-            if updated_team:
-                assigned_vehicle = None
-                if getattr(updated_team, "vehicle_id", None):
-                    assigned_vehicle = Vehicle.query.get(updated_team.vehicle_id)
-                team_vehicle_payload = _vehicle_payload(assigned_vehicle, updated_team.id)
+    if not project_id or not work_date_str:
+        raise CellPayloadError("Parametreler eksik (project_id, work_date)")
 
-        # Alt proje bilgisini al
-        subproject_label = ""
-        if cell.subproject_id:
-            subproject = SubProject.query.get(cell.subproject_id)
-            if subproject:
-                code = (subproject.code or "").strip()
-                subproject_label = f"{subproject.name}{f' ({code})' if code else ''}"
-        
-        curr_u = get_current_user()
-        evt_data = {
-            "cell_id": cell.id,
-            "project_id": cell.project_id,
-            "work_date": iso(cell.work_date),
-            "shift": cell.shift,
-            "note": cell.note,
-            "vehicle_info": cell.vehicle_info,
-            "team_id": cell.team_id,
-            "team_name": cell.team_name,
-            "subproject_id": cell.subproject_id,
-            "subproject_label": subproject_label,
-            "person_ids": [int(pid) for pid in person_ids],
-            "hasAttachment": bool(cell.lld_hhd_files or cell.tutanak_files or cell.lld_hhd_path or cell.tutanak_path),
-            "team_vehicle": team_vehicle_payload,
-            "assigned_user_id": cell.assigned_user_id,
-            "updated_at": cell.updated_at.timestamp() if cell.updated_at else datetime.now().timestamp(),
-            "updated_by": (curr_u.full_name or curr_u.email) if curr_u else "Sistem",
-            "updated_by_id": curr_u.id if curr_u else 0
-        }
-        socketio.emit('cell_updated', evt_data, namespace='/')
+    d = parse_date(work_date_str) or date.today()
+    subproject_id = _payload_int(data, "subproject_id")
+    if subproject_id and not _subproject_allowed_for_project(subproject_id=subproject_id, project_id=project_id):
+        raise CellPayloadError("Alt proje secimi gecersiz.")
 
-        # Hücreye atanan kişi Job'a hemen yansısın (Benim İşlerim'de görünsün)
+    vehicle_dirty_raw = data.get("vehicle_dirty")
+    if isinstance(vehicle_dirty_raw, str):
+        vehicle_dirty = vehicle_dirty_raw.strip().lower() in {"1", "true", "yes"}
+    else:
+        vehicle_dirty = bool(vehicle_dirty_raw)
+    vehicle_id_specified = "vehicle_id" in data
+    requested_vehicle_id = None
+    if vehicle_id_specified:
+        raw_vehicle_id = data.get("vehicle_id")
         try:
-            job = Job.query.filter_by(cell_id=cell.id).first()
-            if job:
-                _sync_job_from_cell(job, cell)
-                db.session.add(job)
+            requested_vehicle_id = int(raw_vehicle_id or 0)
         except Exception:
+            requested_vehicle_id = None
+        if requested_vehicle_id is not None and requested_vehicle_id <= 0:
+            requested_vehicle_id = None
+
+    team_vehicle_requested = False
+    team_vehicle_target_id = None
+    if "team_vehicle_id" in data:
+        team_vehicle_requested = True
+        try:
+            team_vehicle_target_id = int(data.get("team_vehicle_id") or 0)
+        except Exception:
+            team_vehicle_target_id = 0
+    elif vehicle_id_specified:
+        team_vehicle_requested = True
+        team_vehicle_target_id = requested_vehicle_id or 0
+
+    person_ids = _payload_person_ids(data)
+    person_overtimes = data.get("person_overtimes") or {}
+    if not isinstance(person_overtimes, dict):
+        raise CellPayloadError("person_overtimes nesne olmalı")
+
+    return {
+        "project_id": project_id,
+        "work_date": d,
+        "subproject_id": subproject_id,
+        "shift": _payload_text(data, "shift"),
+        "vehicle_info": _payload_text(data, "vehicle_info"),
+        "note": _payload_text(data, "note"),
+        "isdp_info": _payload_text(data, "isdp_info"),
+        "po_info": _payload_text(data, "po_info"),
+        "important_note": _payload_text(data, "important_note"),
+        "team_name": _payload_text(data, "team_name"),
+        "job_mail_body": _payload_text(data, "job_mail_body"),
+        "assigned_user_id": _payload_int(data, "assigned_user_id"),
+        "remove_lld_names": _parse_files(data.get("remove_lld_list")),
+        "remove_tutanak_names": _parse_files(data.get("remove_tutanak_list")),
+        "person_ids": person_ids,
+        "person_overtimes": person_overtimes,
+        "vehicle_dirty": vehicle_dirty,
+        "team_vehicle_requested": team_vehicle_requested,
+        "team_vehicle_target_id": team_vehicle_target_id,
+    }
+
+
+def _apply_cell_payload(payload: dict, current_u_id: int):
+    """
+    Doğrulanmış hücre verisini oturuma uygular; commit ETMEZ (çağıran commit eder).
+    Dönüş: (cell, added_ids)
+    """
+    project_id = payload["project_id"]
+    d = payload["work_date"]
+    person_ids = payload["person_ids"]
+    vehicle_info = payload["vehicle_info"]
+
+    cell = ensure_cell(project_id, d, commit=False)
+    cell.subproject_id = payload["subproject_id"] or None
+    cell.shift = payload["shift"] or None
+    cell.vehicle_info = vehicle_info or None
+    cell.note = payload["note"] or None
+    cell.isdp_info = payload["isdp_info"] or None
+    cell.po_info = payload["po_info"] or None
+    cell.important_note = payload["important_note"] or None
+    cell.job_mail_body = payload["job_mail_body"] or None
+    cell.assigned_user_id = payload["assigned_user_id"] or None
+
+    # assignment + ekip (team_id)
+    added_ids = set_assignments_and_team(
+        cell,
+        person_ids,
+        preferred_vehicle_info=vehicle_info if (payload["vehicle_dirty"] or vehicle_info) else None,
+    )
+
+    # Per-person shift/overtime saving
+    person_overtimes = payload["person_overtimes"]
+
+    # Existing records in a map
+    existing_ots = {
+        ot.person_id: ot
+        for ot in TeamOvertime.query.filter_by(cell_id=cell.id).all()
+    }
+
+    processed_pids = set()
+
+    if isinstance(person_overtimes, dict):
+        for pid_str, shift_val in person_overtimes.items():
             try:
-                db.session.rollback()
+                pid = int(pid_str)
+                if pid not in person_ids:
+                    continue # Skip if person is no longer assigned
+
+                shift_str = (shift_val or "").strip()
+                # User might send "0" or empty string to clear
+                if not shift_str:
+                     continue
+
+                processed_pids.add(pid)
+                # Try to parse float hours from string "2", "2.5", etc.
+                try:
+                    hours = float(shift_str)
+                except:
+                    hours = 0.0
+
+                ot = existing_ots.get(pid)
+                if not ot:
+                    ot = TeamOvertime(
+                        cell_id=cell.id,
+                        person_id=pid,
+                        work_date=d,
+                        created_by_user_id=current_u_id
+                    )
+                    db.session.add(ot)
+
+                ot.duration_hours = hours
+                ot.description = shift_str
+                ot.updated_at = datetime.now()
+
             except Exception:
-                pass
+                log.exception("Error saving person overtime for %s", pid_str)
+
+    # Cleanup: Remove overtime records for persons currently assigned BUT who have no overtime value in the payload (cleared)
+    # Javascript sends ALL values. If value is empty, it might be missing from dict or empty string.
+    # If it was missing from dict, it's not in processed_pids.
+    for pid in person_ids:
+        if pid not in processed_pids and pid in existing_ots:
+            db.session.delete(existing_ots[pid])
+
+    # Cleanup: Remove overtime records for persons NOT in the assignment list anymore
+    for pid, ot in existing_ots.items():
+        if pid not in person_ids:
+            db.session.delete(ot)
 
-        # Ensure Job exists for this cell (assignment panel)
+    team = Team.query.get(cell.team_id) if cell.team_id else None
+    team_vehicle_target_id = payload["team_vehicle_target_id"]
+    if team and payload["team_vehicle_requested"]:
+        vehicle_for_team = None
+        if team_vehicle_target_id and team_vehicle_target_id > 0:
+            vehicle_for_team = Vehicle.query.get(team_vehicle_target_id)
+            if not vehicle_for_team:
+                raise CellPayloadError("Araç bulunamadı", 404)
+            conflict_team = Team.query.filter(
+                Team.vehicle_id == team_vehicle_target_id,
+                Team.id != team.id
+            ).first()
+            if conflict_team:
+                # Aracı yeni ekibe verebilmek için önce eski ekibin atamasını kaldır
+                conflict_team.vehicle_id = None
+                conflict_q = db.session.query(PlanCell).filter(PlanCell.team_id == conflict_team.id)
+                plan_changes.record_query(conflict_q)
+                conflict_q.update({PlanCell.vehicle_info: None, PlanCell.version: PlanCell.version + 1}, synchronize_session=False)
+        team.vehicle_id = vehicle_for_team.id if vehicle_for_team else None
+        plate = vehicle_for_team.plate if vehicle_for_team else None
+        db.session.flush()
+        team_cells_q = db.session.query(PlanCell).filter(PlanCell.team_id == team.id)
+        plan_changes.record_query(team_cells_q)
+        team_cells_q.update({PlanCell.vehicle_info: plate, PlanCell.version: PlanCell.version + 1}, synchronize_session=False)
+        cell.vehicle_info = plate
+
+    # ekip adı (rapor için)
+
+    # remove attachments if requested
+    # remove selected attachments
+    remove_lld_names = payload["remove_lld_names"]
+    remove_tutanak_names = payload["remove_tutanak_names"]
+    if remove_lld_names:
+        current = _parse_files(cell.lld_hhd_files)
+        remaining = [f for f in current if f not in remove_lld_names]
+        for fname in current:
+            if fname in remove_lld_names:
+                delete_upload(fname)
+        cell.lld_hhd_files = _dump_files(remaining) if remaining else None
+        if cell.lld_hhd_path and cell.lld_hhd_path in remove_lld_names:
+            delete_upload(cell.lld_hhd_path)
+            cell.lld_hhd_path = None
+    if remove_tutanak_names:
+        current = _parse_files(cell.tutanak_files)
+        remaining = [f for f in current if f not in remove_tutanak_names]
+        for fname in current:
+            if fname in remove_tutanak_names:
+                delete_upload(fname)
+        cell.tutanak_files = _dump_files(remaining) if remaining else None
+        if cell.tutanak_path and cell.tutanak_path in remove_tutanak_names:
+            delete_upload(cell.tutanak_path)
+            cell.tutanak_path = None
+
+    # updated_at'i güncelle (sürümü ve anlık görüntüyü cell_merge flush hook'u yazar)
+    cell.updated_at = datetime.now()
+    return cell, added_ids
+
+
+def _cell_event_payload(cell: PlanCell, person_ids: List[int], curr_u) -> Tuple[dict, Optional[dict], str]:
+    """Commit sonrası: socket event verisi, ekip aracı ve alt proje etiketi."""
+    team_vehicle_payload = None
+    if cell.team_id:
+        updated_team = Team.query.get(cell.team_id)
+        if updated_team:
+            assigned_vehicle = None
+            if getattr(updated_team, "vehicle_id", None):
+                assigned_vehicle = Vehicle.query.get(updated_team.vehicle_id)
+            team_vehicle_payload = _vehicle_payload(assigned_vehicle, updated_team.id)
+
+    # Alt proje bilgisini al
+    subproject_label = ""
+    if cell.subproject_id:
+        subproject = SubProject.query.get(cell.subproject_id)
+        if subproject:
+            code = (subproject.code or "").strip()
+            subproject_label = f"{subproject.name}{f' ({code})' if code else ''}"
+
+    evt_data = {
+        "cell_id": cell.id,
+        "project_id": cell.project_id,
+        "work_date": iso(cell.work_date),
+        "shift": cell.shift,
+        "note": cell.note,
+        "vehicle_info": cell.vehicle_info,
+        "team_id": cell.team_id,
+        "team_name": cell.team_name,
+        "subproject_id": cell.subproject_id,
+        "subproject_label": subproject_label,
+        "person_ids": [int(pid) for pid in person_ids],
+        "hasAttachment": bool(cell.lld_hhd_files or cell.tutanak_files or cell.lld_hhd_path or cell.tutanak_path),
+        "team_vehicle": team_vehicle_payload,
+        "assigned_user_id": cell.assigned_user_id,
+        "updated_at": cell.updated_at.timestamp() if cell.updated_at else datetime.now().timestamp(),
+        "updated_by": (curr_u.full_name or curr_u.email) if curr_u else "Sistem",
+        "updated_by_id": curr_u.id if curr_u else 0
+    }
+    return evt_data, team_vehicle_payload, subproject_label
+
+
+def _notify_new_assignment(cell: PlanCell, added_ids) -> None:
+    """Yeni eklenen kişilere (User.email eşleşen) 'Yeni atama' bildirimi; commit çağırana ait."""
+    added = list(added_ids or [])
+    if not added:
+        return
+    job = Job.query.filter_by(cell_id=cell.id).first()
+    project = Project.query.get(cell.project_id)
+    title = 'Yeni atama'
+    body = '{} {} | {} | Ekip: {}'.format((project.project_code if project else ''), (project.region if project else ''), iso(cell.work_date), (cell.team_name or ''))
+    link_url = url_for('planner.assignment_page', job_id=job.id) if job else None
+    people_rows = Person.query.filter(Person.id.in_(added)).all()
+    emails = [p.email for p in people_rows if p and p.email]
+    meta = {'project_id': cell.project_id, 'work_date': iso(cell.work_date)}
+    created = _notify_users_by_emails(emails, event='new_assignment', title=title, body=body, link_url=link_url, job_id=(job.id if job else None), meta=meta)
+    if not created:
+        _notify_admins(event='new_assignment', title=title, body=body, link_url=link_url, job_id=(job.id if job else None), meta=meta)
+
+
+CELL_SAVED_EVENT = "cell_saved"
+
+
+def _process_cell_saved(payload: dict) -> None:
+    """
+    Outbox işleyicisi: hücre kaydından sonraki yan etkiler.
+    Socket yayını, Job senkronizasyonu ve yeni atama bildirimleri; bildirimler
+    outbox satırının 'done' durumuyla aynı commit'te yazılır.
+    """
+    # Hücre deltaları yalnızca o haftayı izleyenlere, birleştirilerek gider (services/plan_rooms.py)
+    event = payload.get("event")
+    data = payload.get("data") or {}
+    if event == "cell_updated":
+        plan_rooms.publish_cells([data])
+    elif event == "cells_updated":
+        plan_rooms.publish_cells(data.get("cells") or [])
+    elif event:
+        socketio.emit(event, data, namespace='/')
+
+    entries = payload.get("cells") or []
+    cell_ids = [int(e.get("cell_id")) for e in entries if e.get("cell_id")]
+    if not cell_ids:
+        return
+    cells = {c.id: c for c in PlanCell.query.filter(PlanCell.id.in_(cell_ids)).all()}
+    if not cells:
+        return
+
+    # Hücreye atanan kişi Job'a yansısın (Benim İşlerim'de görünsün)
+    for job in Job.query.filter(Job.cell_id.in_(list(cells.keys()))).all():
+        _sync_job_from_cell(job, cells[job.cell_id])
+        db.session.add(job)
+    # Job'u olmayan hücreler kirli kuyruğa düştü; kuyruğu işçi döngüsü bu turdan sonra boşaltır
+    # (drain kendi commit'ini yapar, burada çağrılırsa 'done' ile aynı commit garantisi bozulur)
+
+    # Notifications: new assignment to newly added people (matching User.email)
+    for e in entries:
+        cell = cells.get(int(e.get("cell_id") or 0))
+        if cell is not None and e.get("added_ids"):
+            _notify_new_assignment(cell, e.get("added_ids"))
+
+
+outbox.register_handler(CELL_SAVED_EVENT, _process_cell_saved)
+
+
+@planner_bp.post("/api/cell")
+@login_required
+@observer_required
+def api_cell_set():
+    try:
+        data = request.get_json(force=True, silent=True) or {}
         try:
-            upsert_jobs_for_range(d, d)
+            log.debug("api_cell_set data: %s", data)
         except Exception:
             pass
 
-        # Notifications: new assignment to newly added people (matching User.email)
         try:
-            added = list(added_ids or [])
-            if added:
-                job = Job.query.filter_by(cell_id=cell.id).first()
-                project = Project.query.get(project_id)
-                title = 'Yeni atama'
-                body = '{} {} | {} | Ekip: {}'.format((project.project_code if project else ''), (project.region if project else ''), iso(d), (cell.team_name or ''))
-                link_url = url_for('planner.assignment_page', job_id=job.id) if job else None
-                people_rows = Person.query.filter(Person.id.in_(added)).all()
-                emails = [p.email for p in people_rows if p and p.email]
-                created = _notify_users_by_emails(emails, event='new_assignment', title=title, body=body, link_url=link_url, job_id=(job.id if job else None), meta={'project_id': project_id, 'work_date': iso(d)})
-                if not created:
-                    _notify_admins(event='new_assignment', title=title, body=body, link_url=link_url, job_id=(job.id if job else None), meta={'project_id': project_id, 'work_date': iso(d)})
-                db.session.commit()
-        except Exception:
-            try:
-                db.session.rollback()
-            except Exception:
-                pass
-        
+            payload = _parse_cell_payload(data)
+        except CellPayloadError as ce:
+            return jsonify({"ok": False, "error": str(ce)}), ce.status
+        d = payload["work_date"]
+        person_ids = payload["person_ids"]
+
+        # Get current user for created_by
+        current_u_id = get_current_user().id if get_current_user() else 1
+        try:
+            cell, added_ids = _apply_cell_payload(payload, current_u_id)
+        except CellPayloadError as ce:
+            db.session.rollback()
+            return jsonify({"ok": False, "error": str(ce)}), ce.status
+
+        # Yan etkiler (socket, Job senkronizasyonu, bildirim) aynı transaction'da outbox'a
+        curr_u = get_current_user()
+        evt_data, team_vehicle_payload, subproject_label = _cell_event_payload(cell, person_ids, curr_u)
+        outbox.enqueue(
+            CELL_SAVED_EVENT,
+            {"event": "cell_updated", "data": evt_data, "cells": [{"cell_id": cell.id, "added_ids": sorted(int(x) for x in (added_ids or []))}]},
+            key=f"{CELL_SAVED_EVENT}:{cell.id}:{cell.updated_at.isoformat()}",
+        )
+        db.session.commit()
+        plan_cache.invalidate_week(d)
+        outbox.wake()
+
         return jsonify({"ok": True, "cell_id": cell.id, "team_id": cell.team_id, "team_name": cell.team_name or "", "team_vehicle": team_vehicle_payload, "subproject_id": cell.subproject_id, "subproject_label": subproject_label})
     except Exception as e:
         db.session.rollback()
@@ -3345,6 +3186,94 @@ def api_cell_set():
         return jsonify({"ok": False, "error": f"Kaydetme hatası: {str(e)}"}), 500
 
 
+CELL_BATCH_MAX = 200
+
+
+@planner_bp.post("/api/cells/batch")
+@login_required
+@observer_required
+def api_cells_batch():
+    """
+    Birden çok hücreyi tek transaction'da kaydet.
+    body: { cells: [<api_cell_set gövdesi>, ...] }
+    Önce hepsi doğrulanır; biri bile hatalıysa hiçbir şey yazılmaz.
+    Hücre başına davranış /api/cell ile aynıdır; socket'e tek 'cells_updated'
+    olayı gider ve iş senkronizasyonu etkilenen tarih aralığı için bir kez çalışır.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    items = data.get("cells")
+    if not isinstance(items, list) or not items:
+        return jsonify({"ok": False, "error": "cells listesi boş"}), 400
+    if len(items) > CELL_BATCH_MAX:
+        return jsonify({"ok": False, "error": f"En fazla {CELL_BATCH_MAX} hücre gönderilebilir"}), 400
+
+    payloads = []
+    errors = []
+    for idx, item in enumerate(items):
+        try:
+            payloads.append(_parse_cell_payload(item if isinstance(item, dict) else {}))
+        except CellPayloadError as ce:
+            errors.append({"index": idx, "error": str(ce)})
+    if errors:
+        return jsonify({"ok": False, "error": "Geçersiz hücre verisi", "errors": errors}), 400
+
+    curr_u = get_current_user()
+    current_u_id = curr_u.id if curr_u else 1
+    applied = []
+    try:
+        for idx, payload in enumerate(payloads):
+            try:
+                cell, added_ids = _apply_cell_payload(payload, current_u_id)
+            except CellPayloadError as ce:
+                db.session.rollback()
+                return jsonify({"ok": False, "error": str(ce), "errors": [{"index": idx, "error": str(ce)}]}), ce.status
+            applied.append((cell, payload["person_ids"], added_ids))
+
+        # Aynı hücre listede birden çok kez geçtiyse son hali geçerli
+        last_by_cell = {}
+        for cell, pids, added in applied:
+            prev = last_by_cell.get(cell.id)
+            merged_added = set(added or set()) | (set(prev[2]) if prev else set())
+            last_by_cell[cell.id] = (cell, pids, merged_added)
+
+        results = []
+        events = []
+        for cell, pids, _added in last_by_cell.values():
+            evt_data, team_vehicle_payload, subproject_label = _cell_event_payload(cell, pids, curr_u)
+            events.append(evt_data)
+            results.append({
+                "cell_id": cell.id,
+                "project_id": cell.project_id,
+                "work_date": iso(cell.work_date),
+                "team_id": cell.team_id,
+                "team_name": cell.team_name or "",
+                "team_vehicle": team_vehicle_payload,
+                "subproject_id": cell.subproject_id,
+                "subproject_label": subproject_label,
+            })
+        outbox.enqueue(
+            CELL_SAVED_EVENT,
+            {
+                "event": "cells_updated",
+                "data": {"cells": events, "updated_by_id": curr_u.id if curr_u else 0},
+                "cells": [
+                    {"cell_id": cid, "added_ids": sorted(int(x) for x in added)}
+                    for cid, (_cell, _pids, added) in last_by_cell.items()
+                ],
+            },
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        log.exception("api_cells_batch error")
+        return jsonify({"ok": False, "error": f"Kaydetme hatası: {str(e)}"}), 500
+
+    plan_cache.invalidate_dates([cell.work_date for cell, _pids, _added in applied])
+    outbox.wake()
+
+    return jsonify({"ok": True, "count": len(results), "cells": results})
+
+
 @planner_bp.post("/api/save_overtime_only")
 @login_required
 @observer_required
@@ -3406,6 +3335,7 @@ def api_save_overtime_only():
         curr_u = get_current_user()
         cell.updated_by_id = curr_u.id if curr_u else 0
         db.session.commit()
+        plan_cache.invalidate_week(d)
 
         # Emit socket event
         try:
@@ -3417,7 +3347,7 @@ def api_save_overtime_only():
                 "updated_at": cell.updated_at.timestamp(),
                 "updated_by": curr_u.full_name if curr_u else "Sistem"
             }
-            socketio.emit('cell_updated', evt_data, namespace='/')
+            plan_rooms.publish_cells([evt_data])
         except: pass
 
         return jsonify({"ok": True})
@@ -3468,8 +3398,9 @@ def api_cell_copy_to_friday():
             next_day += timedelta(days=1)
 
         db.session.commit()
+        plan_cache.invalidate_week(work_date)
         try:
-            socketio.emit("update_table", namespace="/")
+            plan_rooms.refresh(work_date)
         except Exception:
             pass
         return jsonify({"ok": True, "copied_dates": copied_dates})
@@ -3517,7 +3448,8 @@ def api_cell_upload_attachments():
 
         cell.updated_at = datetime.now()
         db.session.commit()
-        socketio.emit('update_table', namespace='/')
+        plan_cache.invalidate_week(d)
+        plan_rooms.refresh(d)
         return jsonify({"ok": True, **updated})
     except ValueError as ve:
         return jsonify({"ok": False, "error": str(ve)}), 400
@@ -3539,7 +3471,8 @@ def api_cell_clear():
     apply_snapshot(cell, {"exists": False})
     cell.updated_at = datetime.now()
     db.session.commit()
-    socketio.emit('update_table', namespace='/')
+    plan_cache.invalidate_week(d)
+    plan_rooms.refresh(d)
     return jsonify({"ok": True, "cleared": True})
 
 
@@ -3566,8 +3499,119 @@ def api_plan_sync():
     
     return jsonify({
         "ok": True,
-        "last_update": max_timestamp,
-        "last_update_str": last_update.isoformat() if last_update else None
+        "last_update": max_timestamp,
+        "last_update_str": last_update.isoformat() if last_update else None
+    })
+
+
+def _plan_cells_payload(cells: List[PlanCell]) -> List[dict]:
+    """Hücre + atama + mesai bilgisini tablo yamalamak için JSON'a çevirir (toplu sorgu)."""
+    if not cells:
+        return []
+    cell_ids = [int(c.id) for c in cells]
+
+    people_by_cell: Dict[int, list] = {}
+    for cid, pid, name in (
+        db.session.query(CellAssignment.cell_id, Person.id, Person.full_name)
+        .join(Person, Person.id == CellAssignment.person_id)
+        .filter(CellAssignment.cell_id.in_(cell_ids))
+        .order_by(CellAssignment.id.asc())
+        .all()
+    ):
+        people_by_cell.setdefault(int(cid), []).append({"id": int(pid), "name": name})
+
+    overtime_by_cell: Dict[int, list] = {}
+    for ot_id, cid, pid, hours, desc_text in (
+        db.session.query(TeamOvertime.id, TeamOvertime.cell_id, TeamOvertime.person_id, TeamOvertime.duration_hours, TeamOvertime.description)
+        .filter(TeamOvertime.cell_id.in_(cell_ids))
+        .all()
+    ):
+        overtime_by_cell.setdefault(int(cid), []).append({
+            "id": int(ot_id),
+            "person_id": pid,
+            "duration_hours": hours or 0.0,
+            "description": desc_text or "",
+        })
+
+    sub_ids = {int(c.subproject_id) for c in cells if c.subproject_id}
+    sub_labels: Dict[int, str] = {}
+    if sub_ids:
+        for sp in SubProject.query.filter(SubProject.id.in_(sub_ids)).all():
+            code = (sp.code or "").strip()
+            sub_labels[int(sp.id)] = f"{sp.name}{f' ({code})' if code else ''}"
+
+    out = []
+    for c in cells:
+        assignments = people_by_cell.get(int(c.id), [])
+        out.append({
+            "id": int(c.id),
+            "cell_id": int(c.id),
+            "project_id": int(c.project_id),
+            "work_date": iso(c.work_date),
+            "shift": c.shift or "",
+            "note": c.note or "",
+            "vehicle_info": c.vehicle_info or "",
+            "team_id": c.team_id or 0,
+            "team_name": c.team_name or "",
+            "subproject_id": c.subproject_id or 0,
+            "subproject_label": sub_labels.get(int(c.subproject_id or 0), ""),
+            "important_note": c.important_note or "",
+            "status": c.status or "active",
+            "cancellation_reason": c.cancellation_reason or "",
+            "version": c.version or 1,
+            "hasAttachment": bool(c.lld_hhd_files or c.tutanak_files or c.lld_hhd_path or c.tutanak_path),
+            "person_ids": [p["id"] for p in assignments],
+            "assignments": assignments,
+            "overtimes": overtime_by_cell.get(int(c.id), []),
+            "updated_at": c.updated_at.timestamp() if c.updated_at else None,
+        })
+    return out
+
+
+# ---------- API: PLAN WEEK DELTA (Sayfa yenilemeden tablo güncelleme) ----------
+@planner_bp.get("/api/plan/week")
+@login_required
+def api_plan_week_delta():
+    """
+    Haftanın hücrelerini döndürür. since_version verilirse yalnızca o sıra
+    numarasından sonra değişen hücreler (ve silinenler) gelir.
+    """
+    d = parse_date(request.args.get("week_start", "")) or date.today()
+    start = week_start(d)
+    since_raw = (request.args.get("since_version") or "").strip()
+    try:
+        since_version = int(since_raw) if since_raw else None
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "since_version geçersiz"}), 400
+
+    # Budanmış aralıktan kalan imleç delta ile kapatılamaz: tam yükleme
+    if since_version is not None and since_version >= 0 and not plan_changes.is_stale(since_version):
+        version, changes = plan_changes.changes_since(start, since_version)
+        deleted = [
+            {"cell_id": cid, "project_id": pid, "work_date": iso(wd)}
+            for cid, pid, wd, change_type in changes
+            if change_type == "delete"
+        ]
+        changed_ids = [cid for cid, _pid, _wd, change_type in changes if change_type != "delete"]
+        cells = PlanCell.query.filter(PlanCell.id.in_(changed_ids)).all() if changed_ids else []
+        live_ids = {int(c.id) for c in cells}
+        for cid, pid, wd, change_type in changes:
+            if change_type != "delete" and cid not in live_ids:
+                deleted.append({"cell_id": cid, "project_id": pid, "work_date": iso(wd)})
+        full = False
+    else:
+        version = plan_changes.current_version()
+        cells = PlanCell.query.filter(PlanCell.work_date >= start, PlanCell.work_date <= start + timedelta(days=6)).all()
+        deleted = []
+        full = True
+
+    return jsonify({
+        "ok": True,
+        "week_start": iso(start),
+        "version": version,
+        "full": full,
+        "cells": _plan_cells_payload(cells),
+        "deleted": deleted,
     })
 
 
@@ -4150,48 +4194,31 @@ def api_availability():
     d = parse_date(request.args.get("date", "")) or date.today()
     shift = (request.args.get("shift") or "").strip()
 
-    # izinli/üretimde olanları çek
-    st_rows = PersonDayStatus.query.filter_by(work_date=d).all()
-    status_by_person = {r.person_id: r.status for r in st_rows}
-
-    # çalışanlar
-    q = db.session.query(CellAssignment.person_id).join(PlanCell, PlanCell.id == CellAssignment.cell_id)\
-        .filter(PlanCell.work_date == d)
+    day = iso(d)
+    matrix = availability_service.load_day(d)
+    leave_mask = matrix.status_mask(day, "leave")
+    production_mask = matrix.status_mask(day, "production")
     if shift:
         # Hem yeni hem eski formatı kontrol et
-        normalized_shift = normalize_shift(shift)
-        q = q.filter(db.or_(PlanCell.shift == shift, PlanCell.shift == normalized_shift))
-    busy_ids = {r[0] for r in q.distinct().all()}
-
-    people = Person.query.order_by(Person.full_name.asc()).all()
+        assigned_mask = matrix.assigned_mask(day, [shift, normalize_shift(shift)])
+    else:
+        assigned_mask = matrix.assigned_mask(day)
 
     # “boşta” = çalışmıyor + status available (default)
-    available = []
-    busy = []
-    leave = []
-    production = []
-
-    for p in people:
-        st = status_by_person.get(p.id, "available")
-        if st == "leave":
-            leave.append({"id": p.id, "name": p.full_name})
-            continue
-        if st == "production":
-            production.append({"id": p.id, "name": p.full_name})
-            continue
+    rest = matrix.all_mask & ~leave_mask & ~production_mask
+    busy_mask = rest & assigned_mask
+    available_mask = rest & ~assigned_mask
 
-        if p.id in busy_ids:
-            busy.append({"id": p.id, "name": p.full_name})
-        else:
-            available.append({"id": p.id, "name": p.full_name})
+    def _items(mask):
+        return [{"id": p.id, "name": p.full_name} for p in matrix.rows(mask)]
 
     return jsonify({
-        "date": iso(d),
+        "date": day,
         "shift": shift,
-        "available": available,
-        "busy": busy,
-        "leave": leave,
-        "production": production
+        "available": _items(available_mask),
+        "busy": _items(busy_mask),
+        "leave": _items(leave_mask),
+        "production": _items(production_mask & ~leave_mask)
     })
 
 
@@ -4294,6 +4321,7 @@ def api_person_status():
         db.session.delete(row)
 
     db.session.commit()
+    plan_cache.invalidate_week(d)
     return jsonify({"ok": True})
 
 
@@ -4309,53 +4337,21 @@ def api_personnel_idle():
     work_date_str = request.args.get("work_date", "")
     d = parse_date(work_date_str) or date.today()
     
-    # Tüm aktif personelleri al
-    people = Person.query.filter(Person.durum == "Aktif").order_by(Person.full_name.asc()).all()
-    
-    # O gün çalışan personelleri bul (normal projeler)
-    busy_q = db.session.query(CellAssignment.person_id).join(PlanCell, PlanCell.id == CellAssignment.cell_id)\
-        .filter(PlanCell.work_date == d, PlanCell.status != 'cancelled')
-    busy_ids = {r[0] for r in busy_q.distinct().all()}
-    
-    # 9026-0001 projesine atananlar (izin/raporlu/ofis - bunlar da boşta değil)
-    office_q = db.session.query(CellAssignment.person_id)\
-        .join(PlanCell, PlanCell.id == CellAssignment.cell_id)\
-        .join(Project, Project.id == PlanCell.project_id)\
-        .filter(PlanCell.work_date == d, Project.project_code.like("9026-0001%"))
-    office_leave_ids = {r[0] for r in office_q.distinct().all()}
-    
-    # O gün izinli/raporlu olan personelleri bul (PersonDayStatus tablosu)
-    status_q = PersonDayStatus.query.filter(
-        PersonDayStatus.work_date == d,
-        PersonDayStatus.status != "available"
-    ).all()
-    status_map = {s.person_id: s for s in status_q}
-    
-    idle_list = []
-    for p in people:
-        # Normal projede çalışıyor
-        if p.id in busy_ids and p.id not in office_leave_ids:
-            continue
-        
-        # 9026-0001 projesine atanmış (izin/raporlu/ofis)
-        if p.id in office_leave_ids:
-            continue
-        
-        # PersonDayStatus'de izinli/raporlu
-        status_rec = status_map.get(p.id)
-        if status_rec and status_rec.status != "available":
-            continue
-        
-        # Boşta
-        idle_list.append({
+    # Aktif personel; çalışan, 9026-0001 (izin/raporlu/ofis) projesine atanan ve
+    # PersonDayStatus'de izinli/raporlu olanlar boşta sayılmaz.
+    matrix = availability_service.load_day(d, active_only=True)
+    idle_list = [
+        {
             "id": p.id,
             "full_name": p.full_name,
-            "role": p.role or "",
-            "firma_name": p.firma.name if p.firma else "",
-            "seviye_name": p.seviye.name if p.seviye else "",
-            "email": p.email or "",
-            "phone": p.phone or ""
-        })
+            "role": p.role,
+            "firma_name": p.firma_name or "",
+            "seviye_name": p.seviye_name or "",
+            "email": p.email,
+            "phone": p.phone
+        }
+        for p in matrix.rows(matrix.idle_mask(iso(d)))
+    ]
     
     return jsonify({
         "ok": True,
@@ -4600,6 +4596,7 @@ def api_personnel_bulk_status():
         updated_count += 1
     
     db.session.commit()
+    plan_cache.invalidate_week(d)
     
     result = {
         "ok": True,
@@ -4623,78 +4620,47 @@ def api_personnel_day_summary():
     """
     work_date_str = request.args.get("work_date", "")
     d = parse_date(work_date_str) or date.today()
+    day = iso(d)
     
-    # Tüm aktif personeller
-    people = Person.query.filter(Person.durum == "Aktif").all()
-    
-    # O gün çalışanlar
-    busy_q = db.session.query(CellAssignment.person_id).join(PlanCell, PlanCell.id == CellAssignment.cell_id)\
-        .filter(PlanCell.work_date == d, PlanCell.status != 'cancelled')
-    busy_ids = {r[0] for r in busy_q.distinct().all()}
-    
-    # PersonDayStatus kayıtları
-    status_recs = PersonDayStatus.query.filter(PersonDayStatus.work_date == d).all()
-    status_by_person = {s.person_id: s for s in status_recs}
-    
-    # Durum tipleri
-    status_types = PersonnelStatusType.query.filter_by(is_active=True).order_by(PersonnelStatusType.display_order.asc()).all()
-    
-    # Sayaçlar
-    idle_list = []
-    by_status_type = {st.id: [] for st in status_types}
-    by_seviye = {"Ana kadro": [], "Yardımcı": [], "Alt yüklenici": []}
-    
-    for p in people:
-        seviye_name = p.seviye.name if p.seviye else None
-        firma_name = p.firma.name if p.firma else ""
-        
-        if p.id in busy_ids:
-            continue  # Çalışıyor, sayma
-        
-        status_rec = status_by_person.get(p.id)
-        
-        if status_rec and status_rec.status != "available":
-            # Durum tipi varsa
-            if status_rec.status_type_id and status_rec.status_type_id in by_status_type:
-                by_status_type[status_rec.status_type_id].append({
-                    "id": p.id,
-                    "full_name": p.full_name,
-                    "firma": firma_name,
-                    "seviye": seviye_name
-                })
-        else:
-            # Boşta
-            idle_list.append({
-                "id": p.id,
-                "full_name": p.full_name,
-                "firma": firma_name,
-                "seviye": seviye_name
-            })
-            if seviye_name in by_seviye:
-                by_seviye[seviye_name].append(p.full_name)
+    # Aktif personel x gün matrisi
+    matrix = availability_service.load_day(d, active_only=True)
+    free_mask = matrix.active_mask & ~matrix.busy.get(day, 0)
+    not_available = free_mask & matrix.not_available_mask(day)
+    idle_mask = free_mask & ~not_available
+
+    def _person(p):
+        return {
+            "id": p.id,
+            "full_name": p.full_name,
+            "firma": p.firma_name or "",
+            "seviye": p.seviye_name
+        }
+
+    idle_list = [_person(p) for p in matrix.rows(idle_mask)]
     
     # Status type sayıları
     status_counts = {}
-    for st in status_types:
+    type_masks = matrix.status_type.get(day, {})
+    for st in matrix.status_types:
+        persons = [_person(p) for p in matrix.rows(not_available & type_masks.get(st.id, 0))]
         status_counts[st.code] = {
             "id": st.id,
             "name": st.name,
             "icon": st.icon,
             "color": st.color,
-            "count": len(by_status_type.get(st.id, [])),
-            "persons": by_status_type.get(st.id, [])
+            "count": len(persons),
+            "persons": persons
         }
     
     return jsonify({
         "ok": True,
-        "work_date": iso(d),
+        "work_date": day,
         "idle": {
             "count": len(idle_list),
             "persons": idle_list,
             "by_seviye": {
-                "ana_kadro": len(by_seviye.get("Ana kadro", [])),
-                "yardimci": len(by_seviye.get("Yardımcı", [])),
-                "alt_yuklenici": len(by_seviye.get("Alt yüklenici", []))
+                key: bin(idle_mask & matrix.seviye_masks.get(name, 0)).count("1")
+                for key, name in availability_service.SEVIYE_KEYS
             }
         },
         "by_status": status_counts
@@ -4789,7 +4755,8 @@ def api_copy_monday_to_week():
         apply_snapshot(dst, snap)
 
     db.session.commit()
-    socketio.emit('update_table', namespace='/')
+    plan_cache.invalidate_range(ws, ws + timedelta(days=6))
+    plan_rooms.refresh(ws)
     return jsonify({"ok": True})
 
 
@@ -4815,7 +4782,8 @@ def api_copy_week_to_next():
             apply_snapshot(dst, snapshot_cell(src_map.get((p.id, src_start + timedelta(days=i)))))
 
     db.session.commit()
-    socketio.emit('update_table', namespace='/')
+    plan_cache.invalidate_range(dst_start, dst_start + timedelta(days=6))
+    plan_rooms.refresh(dst_start)
     return jsonify({"ok": True})
 
 
@@ -4892,7 +4860,8 @@ def api_copy_week_from_previous():
             # Boş hücre de oluşturuldu, böylece proje görünecek
 
     db.session.commit()
-    socketio.emit('update_table', namespace='/')
+    plan_cache.invalidate_range(dst_start, dst_end)
+    plan_rooms.refresh(dst_start)
     return jsonify({
         "ok": True, 
         "copied_count": copied_count,
@@ -4936,7 +4905,7 @@ def api_project_create_from_plan():
         cell.subproject_id = (subproject_id if subproject_id else None) 
  
     db.session.commit() 
-    socketio.emit('update_table') 
+    plan_rooms.refresh(ws)
     
     return jsonify({"ok": True, "project_id": p.id, "existed": False})
 
@@ -4979,7 +4948,7 @@ def api_plan_row_update():
         cell = ensure_cell(row_p.id, ws) 
         cell.subproject_id = (subproject_id if subproject_id else None) 
     db.session.commit() 
-    socketio.emit('update_table', namespace='/') 
+    plan_rooms.refresh()
     return jsonify({"ok": True}) 
 
 
@@ -5024,11 +4993,12 @@ def api_plan_row_delete():
         TeamOvertime.query.filter(TeamOvertime.cell_id.in_(cell_ids)).delete(synchronize_session=False)
         
         # 3. Son olarak PlanCell'leri sil
+        plan_changes.record_cells(cells, "delete")
         PlanCell.query.filter(PlanCell.id.in_(cell_ids)).delete(synchronize_session=False)
 
     db.session.delete(p)
     db.session.commit()
-    socketio.emit('update_table')
+    plan_rooms.refresh()
     return jsonify({"ok": True})
 
 
@@ -5113,7 +5083,7 @@ def api_plan_row_copy():
             db.session.add(new_assignment)
     
     db.session.commit()
-    socketio.emit('update_table')
+    plan_rooms.refresh()
     
     return jsonify({"ok": True, "new_project_id": new_p.id})
 
@@ -5158,7 +5128,8 @@ def api_move_cell():
         apply_snapshot(src, dst_snap)
 
     db.session.commit()
-    socketio.emit('update_table', namespace='/')
+    plan_cache.invalidate_dates([from_d, to_d])
+    plan_rooms.refresh(from_d, to_d)
     return jsonify({"ok": True})
 
 
@@ -5657,8 +5628,6 @@ def reports_page():
     subproject_id = int(request.args.get("subproject_id", 0) or 0)
     team_name = (request.args.get("team_name") or "").strip()
 
-    upsert_jobs_for_range(start, end)
-
     # Filters data
     projects = Project.query.filter(Project.region != "-").order_by(Project.region.asc(), Project.project_code.asc()).all()
     cities = sorted({(p.region or "").strip() for p in projects if (p.region or "").strip()})
@@ -5817,8 +5786,6 @@ def reports_excel():
     subproject_id = int(request.args.get("subproject_id", 0) or 0)
     team_name = (request.args.get("team_name") or "").strip()
 
-    upsert_jobs_for_range(start, end)
-
     q0 = Job.query.filter(Job.work_date >= start, Job.work_date <= end).join(Project, Project.id == Job.project_id)
     if city:
         q0 = q0.filter(Project.region == city)
@@ -5927,50 +5894,39 @@ def reports_excel():
                 n.link_url or "",
             ])
 
-    wb = Workbook()
+    def _open_job_rows():
+        for j in jobs_all:
+            if _normalize_kanban_status(getattr(j, "kanban_status", None)) == "CLOSED":
+                continue
+            p = j.project
+            yield [
+                int(j.id),
+                iso(j.work_date) if j.work_date else "",
+                (p.region if p else ""),
+                (p.project_code if p else ""),
+                (p.project_name if p else ""),
+                (j.subproject.name if getattr(j, "subproject", None) else ""),
+                j.team_name or "",
+                _normalize_kanban_status(getattr(j, "kanban_status", None)),
+                j.status,
+                j.updated_at.strftime("%Y-%m-%d %H:%M") if j.updated_at else "",
+            ]
+
+    def _cols(*headers):
+        return [excel_export.Column(h) for h in headers]
+
+    sheets = [
+        excel_export.Sheet(
+            "Acik Isler",
+            _cols("ID", "Date", "City", "Project Code", "Project Name", "Sub-Project", "Team", "Kanban", "Status", "Updated At"),
+            _open_job_rows(),
+        ),
+        excel_export.Sheet("Ekip Performans", _cols("Ekip", "Toplam", "Açık", "Tamamlandı", "Sorun", "Ort. Kapanış (Saat)"), team_rows),
+        excel_export.Sheet("Hata Kuyrugu", _cols("Created At", "Event", "Read", "Title", "Body", "Link"), error_rows),
+    ]
+    return excel_export.xlsx_response(sheets, f"reports_{iso(ws)}.xlsx")
 
-    ws1 = wb.active
-    ws1.title = "Acik Isler"
-    ws1.append(["ID", "Date", "City", "Project Code", "Project Name", "Sub-Project", "Team", "Kanban", "Status", "Updated At"])
-    for j in jobs_all:
-        if _normalize_kanban_status(getattr(j, "kanban_status", None)) == "CLOSED":
-            continue
-        p = j.project
-        ws1.append([
-            int(j.id),
-            iso(j.work_date) if j.work_date else "",
-            (p.region if p else ""),
-            (p.project_code if p else ""),
-            (p.project_name if p else ""),
-            (j.subproject.name if getattr(j, "subproject", None) else ""),
-            j.team_name or "",
-            _normalize_kanban_status(getattr(j, "kanban_status", None)),
-            j.status,
-            j.updated_at.strftime("%Y-%m-%d %H:%M") if j.updated_at else "",
-        ])
 
-    ws2 = wb.create_sheet("Ekip Performans")
-    ws2.append(["Ekip", "Toplam", "Açık", "Tamamlandı", "Sorun", "Ort. Kapanış (Saat)"])
-    for r in team_rows:
-        ws2.append(r)
-
-    ws3 = wb.create_sheet("Hata Kuyrugu")
-    ws3.append(["Created At", "Event", "Read", "Title", "Body", "Link"])
-    for r in error_rows:
-        ws3.append(r)
-
-    for wsht in [ws1, ws2, ws3]:
-        for c in range(1, wsht.max_column + 1):
-            wsht.cell(row=1, column=c).font = Font(bold=True)
-        for c in range(1, wsht.max_column + 1):
-            wsht.column_dimensions[get_column_letter(c)].width = 22
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    filename = f"reports_{iso(ws)}.xlsx"
-    return send_file(buf, as_attachment=True, download_name=filename,
-                     mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 # ---------- ADVANCED REPORTS ----------
 def _parse_date_range_args() -> Tuple[date, date]:
     start_s = (request.args.get("start") or "").strip()
@@ -6083,8 +6039,6 @@ def reports_advanced_page():
         page_size = 50
     page_size = max(10, min(200, page_size))
 
-    upsert_jobs_for_range(start, end)
-
     today = date.today()
     q = _build_advanced_jobs_query(start, end, status, project_id, subproject_id, team_name, city, only_overdue, only_problem)
 
@@ -6450,7 +6404,6 @@ def api_reports_advanced():
         page_size = 50
     page_size = max(10, min(200, page_size))
 
-    upsert_jobs_for_range(start, end)
     q = _build_advanced_jobs_query(start, end, status, project_id, subproject_id, team_name, city, only_overdue, only_problem)
 
     today = date.today()
@@ -6580,8 +6533,6 @@ def reports_advanced_xlsx():
     elif subproject_id and (not _subproject_allowed_for_project(subproject_id=subproject_id, project_id=project_id)):
         subproject_id = 0
 
-    upsert_jobs_for_range(start, end)
-
     q = _build_advanced_jobs_query(start, end, status, project_id, subproject_id, team_name, city, only_overdue, only_problem)
     jobs = q.order_by(Job.work_date.asc(), Project.region.asc(), Project.project_code.asc()).all()
 
@@ -6625,80 +6576,84 @@ def reports_advanced_xlsx():
     mail_rows = MailLog.query.filter(
         MailLog.created_at >= datetime.combine(start, datetime.min.time()),
         MailLog.created_at <= datetime.combine(end, datetime.max.time())
-    ).order_by(MailLog.created_at.desc()).all()
-
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = "Dashboard"
-    ws1.append(["Start", iso(start)])
-    ws1.append(["End", iso(end)])
-    ws1.append([])
-    ws1.append(["Total Jobs", total_jobs])
-    ws1.append(["Beklemede", pending])
-    ws1.append(["Tamamlandı", completed])
-    ws1.append(["Sorun", problem])
-    ws1.append(["Overdue", overdue])
-    ws1.append(["Completion Rate (%)", completion_rate])
-    ws1.append([])
-    ws1.append(["Filters", ""])
-    ws1.append(["Status", status or "(all)"])
-    ws1.append(["City", city or "(all)"])
-    ws1.append(["Project ID", project_id or 0])
-    ws1.append(["Team", team_name or "(all)"])
-    ws1.append(["Only Overdue", "1" if only_overdue else "0"])
-    ws1.append(["Sadece Sorun", "1" if only_problem else "0"])
-    ws1.append(["Include Leave", "1" if include_leave else "0"])
-
-    ws2 = wb.create_sheet("Jobs")
-    ws2.append(["Date", "City", "Project Code", "Project Name", "Team", "Status", "People", "Shift", "Vehicle"])
-    for j in jobs:
-        p = j.project
-        ws2.append([
-            iso(j.work_date),
-            (p.region if p else ""),
-            (p.project_code if p else ""),
-            (p.project_name if p else ""),
-            j.team_name or "",
-            j.status,
-            people_count.get(j.id, 0),
-            j.shift or "",
-            j.vehicle_info or "",
-        ])
+    ).order_by(MailLog.created_at.desc()).limit(2000)
+
+    dashboard_rows = [
+        ["End", iso(end)],
+        [],
+        ["Total Jobs", total_jobs],
+        ["Beklemede", pending],
+        ["Tamamlandı", completed],
+        ["Sorun", problem],
+        ["Overdue", overdue],
+        ["Completion Rate (%)", completion_rate],
+        [],
+        ["Filters", ""],
+        ["Status", status or "(all)"],
+        ["City", city or "(all)"],
+        ["Project ID", project_id or 0],
+        ["Team", team_name or "(all)"],
+        ["Only Overdue", "1" if only_overdue else "0"],
+        ["Sadece Sorun", "1" if only_problem else "0"],
+        ["Include Leave", "1" if include_leave else "0"],
+    ]
 
-    ws3 = wb.create_sheet("Teams")
-    team_counts = {}
+    def _job_rows():
+        for j in jobs:
+            p = j.project
+            yield [
+                iso(j.work_date),
+                (p.region if p else ""),
+                (p.project_code if p else ""),
+                (p.project_name if p else ""),
+                j.team_name or "",
+                j.status,
+                people_count.get(j.id, 0),
+                j.shift or "",
+                j.vehicle_info or "",
+            ]
+
+    # Ekip özetleri tek geçişte
+    team_stats = {}
     for j in jobs:
         key = (j.team_name or "").strip() or "-"
-        team_counts[key] = team_counts.get(key, 0) + 1
-    ws3.append(["Ekip", "İş", "Tamamlandı", "Sorun", "Geciken"])
-    for name, cnt in sorted(team_counts.items(), key=lambda x: (-x[1], x[0])):
-        t_completed = sum(1 for j in jobs if ((j.team_name or "").strip() or "-") == name and j.status == "completed")
-        t_problem = sum(1 for j in jobs if ((j.team_name or "").strip() or "-") == name and j.status == "problem")
-        t_overdue = sum(1 for j in jobs if ((j.team_name or "").strip() or "-") == name and j.status != "completed" and j.work_date < today)
-        ws3.append([name, cnt, t_completed, t_problem, t_overdue])
-
-    ws4 = wb.create_sheet("MailLogs")
-    ws4.append(["Created At", "Kind", "OK", "To", "Subject", "Error"])
-    for r in mail_rows[:2000]:
-        ws4.append([
-            r.created_at.strftime("%Y-%m-%d %H:%M") if r.created_at else "",
-            r.kind or "",
-            "1" if r.ok else "0",
-            r.to_addr or "",
-            r.subject or "",
-            (r.error or "")[:200],
-        ])
-
-    for wsht in [ws1, ws2, ws3, ws4]:
-        for c in range(1, wsht.max_column + 1):
-            wsht.column_dimensions[get_column_letter(c)].width = 22
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    filename = f"advanced_reports_{iso(start)}_{iso(end)}.xlsx"
-    return send_file(buf, as_attachment=True, download_name=filename,
-                     mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        t = team_stats.setdefault(key, [0, 0, 0, 0])
+        t[0] += 1
+        if j.status == "completed":
+            t[1] += 1
+        if j.status == "problem":
+            t[2] += 1
+        if j.status != "completed" and j.work_date < today:
+            t[3] += 1
+    team_rows = [[name] + vals for name, vals in sorted(team_stats.items(), key=lambda x: (-x[1][0], x[0]))]
+
+    def _mail_rows():
+        for r in mail_rows:
+            yield [
+                r.created_at.strftime("%Y-%m-%d %H:%M") if r.created_at else "",
+                r.kind or "",
+                "1" if r.ok else "0",
+                r.to_addr or "",
+                r.subject or "",
+                (r.error or "")[:200],
+            ]
+
+    def _cols(*headers):
+        return [excel_export.Column(h) for h in headers]
+
+    sheets = [
+        # İlk satır eski düzendeki gibi başlık stili almadan "Start" satırı
+        excel_export.Sheet("Dashboard", _cols("Start", iso(start)), dashboard_rows, header_style=None),
+        excel_export.Sheet(
+            "Jobs",
+            _cols("Date", "City", "Project Code", "Project Name", "Team", "Status", "People", "Shift", "Vehicle"),
+            _job_rows(),
+            header_style=None,
+        ),
+        excel_export.Sheet("Teams", _cols("Ekip", "İş", "Tamamlandı", "Sorun", "Geciken"), team_rows, header_style=None),
+        excel_export.Sheet("MailLogs", _cols("Created At", "Kind", "OK", "To", "Subject", "Error"), _mail_rows(), header_style=None),
+    ]
+    return excel_export.xlsx_response(sheets, f"advanced_reports_{iso(start)}_{iso(end)}.xlsx")
 
 
 @planner_bp.get("/api/job_detail")
@@ -6840,34 +6795,37 @@ def mail_log_page():
     ok_filter = (request.args.get("ok", "").strip())
     mail_type_filter = (request.args.get("mail_type", "").strip())
     q_filter = (request.args.get("q", "").strip())
+    # Kaynak: hot tablo ya da arşiv (?source=archive)
+    source = "archive" if request.args.get("source") == "archive" else ""
+    model = mail_archive.log_model(source)
     
     # Sayfalama
     page = int(request.args.get("page", 1) or 1)
     per_page = 100
     
-    q = MailLog.query
+    q = model.query
     
     # Tarih filtresi
     if start_date and end_date:
-        q = q.filter(MailLog.created_at >= datetime.combine(start_date, datetime.min.time()))
-        q = q.filter(MailLog.created_at <= datetime.combine(end_date, datetime.max.time()))
+        q = q.filter(model.created_at >= datetime.combine(start_date, datetime.min.time()))
+        q = q.filter(model.created_at <= datetime.combine(end_date, datetime.max.time()))
     
     if team_name:
-        q = q.filter(MailLog.team_name == team_name)
+        q = q.filter(model.team_name == team_name)
     
     if ok_filter in ("0", "1"):
-        q = q.filter(MailLog.ok == (ok_filter == "1"))
+        q = q.filter(model.ok == (ok_filter == "1"))
     
     if mail_type_filter:
-        q = q.filter(MailLog.mail_type == mail_type_filter)
+        q = q.filter(model.mail_type == mail_type_filter)
     
     if q_filter:
         # Arama: to_addr veya subject'te ara
         q = q.filter(
             db.or_(
-                MailLog.to_addr.ilike(f"%{q_filter}%"),
-                MailLog.subject.ilike(f"%{q_filter}%"),
-                MailLog.cc_addr.ilike(f"%{q_filter}%")
+                model.to_addr.ilike(f"%{q_filter}%"),
+                model.subject.ilike(f"%{q_filter}%"),
+                model.cc_addr.ilike(f"%{q_filter}%")
             )
         )
     
@@ -6876,7 +6834,7 @@ def mail_log_page():
     total_pages = (total_count + per_page - 1) // per_page
     
     # Sayfalama uygula
-    rows = q.order_by(MailLog.created_at.desc()).offset((page - 1) * per_page).limit(per_page).all()
+    rows = q.order_by(model.created_at.desc()).offset((page - 1) * per_page).limit(per_page).all()
     
     return render_template(
         "mail_log.html",
@@ -6889,7 +6847,9 @@ def mail_log_page():
         q_filter=q_filter,
         page=page,
         total_pages=total_pages,
-        total_count=total_count
+        total_count=total_count,
+        source=source,
+        retention_days=mail_archive.MAIL_LOG_RETENTION_DAYS,
     )
 
 
@@ -6913,40 +6873,36 @@ def mail_log_excel():
     ok_filter = (request.args.get("ok", "").strip())
     mail_type_filter = (request.args.get("mail_type", "").strip())
     q_filter = (request.args.get("q", "").strip())
+    source = "archive" if request.args.get("source") == "archive" else ""
+    model = mail_archive.log_model(source)
 
-    q = MailLog.query
+    q = model.query
     
     # Tarih filtresi
     if start_date and end_date:
-        q = q.filter(MailLog.created_at >= datetime.combine(start_date, datetime.min.time()))
-        q = q.filter(MailLog.created_at <= datetime.combine(end_date, datetime.max.time()))
+        q = q.filter(model.created_at >= datetime.combine(start_date, datetime.min.time()))
+        q = q.filter(model.created_at <= datetime.combine(end_date, datetime.max.time()))
     
     if team_name:
-        q = q.filter(MailLog.team_name == team_name)
+        q = q.filter(model.team_name == team_name)
     
     if ok_filter in ("0", "1"):
-        q = q.filter(MailLog.ok == (ok_filter == "1"))
+        q = q.filter(model.ok == (ok_filter == "1"))
     
     if mail_type_filter:
-        q = q.filter(MailLog.mail_type == mail_type_filter)
+        q = q.filter(model.mail_type == mail_type_filter)
     
     if q_filter:
         q = q.filter(
             db.or_(
-                MailLog.to_addr.ilike(f"%{q_filter}%"),
-                MailLog.subject.ilike(f"%{q_filter}%"),
-                MailLog.cc_addr.ilike(f"%{q_filter}%")
+                model.to_addr.ilike(f"%{q_filter}%"),
+                model.subject.ilike(f"%{q_filter}%"),
+                model.cc_addr.ilike(f"%{q_filter}%")
             )
         )
     
-    rows = q.order_by(MailLog.created_at.desc()).all()
-
-    wb = Workbook()
-    sh = wb.active
-    sh.title = "MailLog"
-    sh.append(["Tarih", "Tip", "Durum", "To", "CC", "Konu", "Hafta", "Ekip", "Boyut", "Hata"])
-    for r in rows:
-        sh.append([
+    rows = (
+        [
             r.created_at.strftime("%Y-%m-%d %H:%M") if r.created_at else "",
             r.mail_type or r.kind or "",
             "OK" if r.ok else "ERR",
@@ -6957,34 +6913,33 @@ def mail_log_excel():
             r.team_name or "",
             (r.body_size_bytes or 0),
             (r.error or "")[:500],
-        ])
-    for c in range(1, 11):
-        sh.cell(row=1, column=c).font = Font(bold=True)
-    sh.column_dimensions["A"].width = 18
-    sh.column_dimensions["B"].width = 12
-    sh.column_dimensions["C"].width = 8
-    sh.column_dimensions["D"].width = 35
-    sh.column_dimensions["E"].width = 35
-    sh.column_dimensions["F"].width = 50
-    sh.column_dimensions["G"].width = 12
-    sh.column_dimensions["H"].width = 18
-    sh.column_dimensions["I"].width = 10
-    sh.column_dimensions["J"].width = 60
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    filename = f"mail_log_{start_date.isoformat()}_{end_date.isoformat()}.xlsx"
-    return send_file(buf, as_attachment=True, download_name=filename,
-                     mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        ]
+        for r in q.order_by(model.created_at.desc()).yield_per(500)
+    )
+    columns = [
+        excel_export.Column("Tarih", 18),
+        excel_export.Column("Tip", 12),
+        excel_export.Column("Durum", 8),
+        excel_export.Column("To", 35),
+        excel_export.Column("CC", 35),
+        excel_export.Column("Konu", 50),
+        excel_export.Column("Hafta", 12),
+        excel_export.Column("Ekip", 18),
+        excel_export.Column("Boyut", 10),
+        excel_export.Column("Hata", 60),
+    ]
+    filename = f"mail_log_{'arsiv_' if source else ''}{start_date.isoformat()}_{end_date.isoformat()}.xlsx"
+    return excel_export.xlsx_response([excel_export.Sheet("MailLog", columns, rows)], filename)
 
 
 @planner_bp.get("/api/mail/log/detail/<int:log_id>")
 @login_required
 @admin_required
 def api_mail_log_detail(log_id: int):
-    """Mail log detayını getir"""
-    log = MailLog.query.get_or_404(log_id)
+    """Mail log detayını getir (arşivdeki kayıtların gövdesi burada açılır)"""
+    log = mail_archive.get_log(log_id)
+    if not log:
+        return jsonify({"ok": False, "error": "Log bulunamadı"}), 404
     
     # Meta bilgisini parse et
     meta = {}
@@ -7021,6 +6976,7 @@ def api_mail_log_detail(log_id: int):
             "body_size_bytes": log.body_size_bytes,
             "sent_at": log.sent_at.isoformat() if log.sent_at else None,
             "meta": meta,
+            "archived": bool(getattr(log, "archived", False)),
         }
     })
 
@@ -7031,7 +6987,9 @@ def api_mail_log_detail(log_id: int):
 def api_mail_log_resend(log_id: int):
     """Mail logunu yeniden gönder (düzenlenmiş içerikle)"""
     data = request.get_json(force=True, silent=True) or {}
-    log = MailLog.query.get_or_404(log_id)
+    log = mail_archive.get_log(log_id)
+    if not log:
+        return jsonify({"ok": False, "error": "Log bulunamadı"}), 404
     
     # Yeni alıcı/konu bilgisi
     new_to = data.get("to_addr", log.to_addr)
@@ -7088,7 +7046,9 @@ def api_mail_log_resend(log_id: int):
 @admin_required
 def api_mail_log_delete(log_id: int):
     """Mail logunu sil"""
-    log = MailLog.query.get_or_404(log_id)
+    log = mail_archive.get_log(log_id)
+    if not log:
+        return jsonify({"ok": False, "error": "Log bulunamadı"}), 404
     try:
         db.session.delete(log)
         db.session.commit()
@@ -7385,7 +7345,6 @@ def api_jobs_for_mail():
     elif subproject_id and (not _subproject_allowed_for_project(subproject_id=subproject_id, project_id=project_id)):
         subproject_id = 0
 
-    upsert_jobs_for_range(start, end)
     q = _build_advanced_jobs_query(start, end, status, project_id, subproject_id, team_name, city, only_overdue, only_problem)
     if q_text:
         like = f"%{q_text}%"
@@ -7665,18 +7624,16 @@ def portal_where():
                 people_by_job.setdefault(int(jid), []).append(full_name)
 
     now = datetime.now()
-    cutoff = now - ONLINE_WINDOW
     online_user_ids = set()
     online_team_ids = set()
     try:
-        online_user_ids = {
-            int(uid) for (uid,) in db.session.query(User.id).filter(User.is_active == True, User.last_seen != None, User.last_seen >= cutoff).all()
-            if uid
-        }
-        online_team_ids = {
-            int(tid) for (tid,) in db.session.query(User.team_id).filter(User.is_active == True, User.team_id != None, User.last_seen != None, User.last_seen >= cutoff).distinct().all()
-            if tid
-        }
+        seen_ids = presence.online_user_ids(now)
+        online_user_ids = set()
+        if seen_ids:
+            for uid, tid in db.session.query(User.id, User.team_id).filter(User.is_active == True, User.id.in_(seen_ids)).all():
+                online_user_ids.add(int(uid))
+                if tid:
+                    online_team_ids.add(int(tid))
     except Exception:
         try:
             db.session.rollback()
@@ -8045,8 +8002,9 @@ def api_job_reschedule(job_id: int):
                 job.closed_at = None
                 db.session.add(job)
             db.session.commit()
+            plan_cache.invalidate_week(target_date)
             try:
-                socketio.emit("update_table", namespace="/")
+                plan_rooms.refresh(target_date)
             except Exception:
                 pass
             return jsonify({
@@ -8087,8 +8045,9 @@ def api_job_reschedule(job_id: int):
         db.session.add(dst_cell)
         db.session.add(job)
         db.session.commit()
+        plan_cache.invalidate_dates([src_cell.work_date, target_date])
         try:
-            socketio.emit("update_table", namespace="/")
+            plan_rooms.refresh(src_cell.work_date, target_date)
         except Exception:
             pass
         return jsonify({
@@ -8399,57 +8358,49 @@ def admin_reports_xlsx():
     except Exception:
         media_counts = {}
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Reports"
-    ws.append([
-        "Report ID",
-        "Job ID",
-        "Submitted At",
-        "Outcome",
-        "ISDP",
-        "User",
-        "City",
-        "Project Code",
-        "Sub-Project",
-        "Team",
-        "Review Status",
-        "Reviewed At",
-        "Review Note",
-        "Media Count",
-    ])
-
-    for r in rows:
-        j = r.job
-        p = j.project if j else None
-        u = r.user or r.created_by_user
-        ws.append([
-            int(r.id),
-            int(r.job_id or 0),
-            r.submitted_at.strftime("%Y-%m-%d %H:%M") if r.submitted_at else "",
-            r.outcome or "",
-            r.isdp_status or "",
-            (u.full_name or u.email) if u else "",
-            (p.region if p else ""),
-            (p.project_code if p else ""),
-            (j.subproject.name if (j and getattr(j, "subproject", None)) else ""),
-            (j.team_name if j else ""),
-            r.review_status or "pending",
-            r.reviewed_at.strftime("%Y-%m-%d %H:%M") if r.reviewed_at else "",
-            r.review_note or "",
-            media_counts.get(int(r.id), 0),
-        ])
-
-    for c in range(1, ws.max_column + 1):
-        ws.cell(row=1, column=c).font = Font(bold=True)
-        ws.column_dimensions[get_column_letter(c)].width = 22
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
+    def _report_rows():
+        for r in rows:
+            j = r.job
+            p = j.project if j else None
+            u = r.user or r.created_by_user
+            yield [
+                int(r.id),
+                int(r.job_id or 0),
+                r.submitted_at.strftime("%Y-%m-%d %H:%M") if r.submitted_at else "",
+                r.outcome or "",
+                r.isdp_status or "",
+                (u.full_name or u.email) if u else "",
+                (p.region if p else ""),
+                (p.project_code if p else ""),
+                (j.subproject.name if (j and getattr(j, "subproject", None)) else ""),
+                (j.team_name if j else ""),
+                r.review_status or "pending",
+                r.reviewed_at.strftime("%Y-%m-%d %H:%M") if r.reviewed_at else "",
+                r.review_note or "",
+                media_counts.get(int(r.id), 0),
+            ]
+
+    columns = [
+        excel_export.Column(h)
+        for h in [
+            "Report ID",
+            "Job ID",
+            "Submitted At",
+            "Outcome",
+            "ISDP",
+            "User",
+            "City",
+            "Project Code",
+            "Sub-Project",
+            "Team",
+            "Review Status",
+            "Reviewed At",
+            "Review Note",
+            "Media Count",
+        ]
+    ]
     filename = f"admin_reports_{iso(start)}_{iso(end)}.xlsx"
-    return send_file(buf, as_attachment=True, download_name=filename,
-                     mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    return excel_export.xlsx_response([excel_export.Sheet("Reports", columns, _report_rows())], filename)
 
 
 @planner_bp.route("/admin/reports/<int:report_id>", methods=["GET", "POST"])
@@ -9038,149 +8989,21 @@ def api_preview_team_email():
 def api_send_weekly_emails():
     data = request.get_json(force=True, silent=True) or {}
     ws = parse_date(data.get("week_start", "")) or week_start(date.today())
-    start = ws
-    end = ws + timedelta(days=6)
-
-    people = Person.query.order_by(Person.full_name.asc()).all()
-    tasks: Dict[int, List[dict]] = {p.id: [] for p in people}
 
-    rows = (
-        db.session.query(
-            Person.id, Person.full_name, Person.email,
-            PlanCell.work_date,
-            Project.region, Project.project_code, Project.project_name,
-            PlanCell.shift, PlanCell.note, PlanCell.vehicle_info,
-            PlanCell.job_mail_body, PlanCell.lld_hhd_files, PlanCell.tutanak_files, PlanCell.lld_hhd_path, PlanCell.tutanak_path,
-            Team.name, PlanCell.team_name
-        )
-        .join(CellAssignment, CellAssignment.person_id == Person.id)
-        .join(PlanCell, PlanCell.id == CellAssignment.cell_id)
-        .join(Project, Project.id == PlanCell.project_id)
-        .outerjoin(Team, Team.id == PlanCell.team_id)
-        .filter(PlanCell.work_date >= start, PlanCell.work_date <= end)
-        .order_by(Person.full_name.asc(), PlanCell.work_date.asc())
-        .all()
+    # Şablon bir kez derlenir, satırlar tek sorgudan üretilir, tüm mailler tek INSERT ile kuyruğa girer
+    batch = plan_mail.PlanMailBatch.load(ws)
+    queued = batch.enqueue(
+        mail_type="weekly",
+        subject=f"Haftalik Plan - {iso(ws)}",
+        heading="Haftalik Is Plani",
+        intro="Merhaba {name}, asagida bu haftaki planin yer aliyor.",
+        user_id=getattr(get_current_user(), "id", None),
     )
-
-    for pid, pname, pemail, wd, region, pcode, pname2, shift, note, vehicle, job_mail_body, lld_list_str, tut_list_str, lld_single, tut_single, tname, tname_alt in rows:
-        effective_team = (tname or tname_alt or "").strip()
-        lld_list = _parse_files(lld_list_str)
-        tut_list = _parse_files(tut_list_str)
-        if lld_single and not lld_list:
-            lld_list = [lld_single]
-        if tut_single and not tut_list:
-            tut_list = [tut_single]
-        tasks[pid].append({
-            "date": iso(wd),
-            "where": region,
-            "project": f"{pcode} - {pname2}",
-            "shift": shift or "",
-            "note": note or "",
-            "vehicle": vehicle or "",
-            "team": effective_team,
-            "job_mail_body": job_mail_body or "",
-            "lld_hhd_files": lld_list,
-            "tutanak_files": tut_list,
-        })
-
-    sent = 0
-    skipped = 0
     errors = []
-
-    for p in people:
-        if not p.email:
-            skipped += 1
-            continue
-        items = tasks.get(p.id, [])
-        if not items:
-            skipped += 1
-            continue
-
-        rows_html = ""
-        attachments_paths = set()
-        for it in items:
-            for f in it.get("lld_hhd_files") or []:
-                attachments_paths.add(f)
-            for f in it.get("tutanak_files") or []:
-                attachments_paths.add(f)
-
-            job_mail_html = html.escape(it.get("job_mail_body") or "").replace("\n", "<br>")
-            note_html = html.escape(it.get("note") or "").replace("\n", "<br>")
-            where_html = html.escape(it.get("where") or "")
-            project_html = html.escape(it.get("project") or "")
-            shift_html = html.escape(it.get("shift") or "")
-            vehicle_html = html.escape(it.get("vehicle") or "")
-            team_html = html.escape(it.get("team") or "")
-            lld_names = ", ".join([os.path.basename(x) for x in (it.get("lld_hhd_files") or [])])
-            tutanak_names = ", ".join([os.path.basename(x) for x in (it.get("tutanak_files") or [])])
-            rows_html += f"""
-              <tr>
-                <td>{it['date']}</td>
-                <td>{where_html}</td>
-                <td>{project_html}</td>
-                <td>{shift_html}</td>
-                <td>{vehicle_html}</td>
-                <td>{team_html}</td>
-                <td>{job_mail_html}</td>
-                <td>{note_html}</td>
-                <td>{lld_names}</td>
-                <td>{tutanak_names}</td>
-              </tr>
-            """
-
-        table_html = f"""
-          <table border="1" cellpadding="6" cellspacing="0" style="border-collapse:collapse; width:100%; font-size:13px;">
-            <thead>
-              <tr>
-                <th>Tarih</th><th>Il</th><th>Proje</th><th>Vardiya</th><th>Arac</th><th>Ekip</th><th>Is Detay Maili</th><th>Is Detayi</th><th>LLD/HHD</th><th>Tutanak</th>
-              </tr>
-            </thead>
-            <tbody>{rows_html}</tbody>
-          </table>
-        """
-
-        subject = f"Haftalik Plan - {iso(ws)}"
-        email_html = render_template(
-            "email_base.html",
-            title=subject,
-            heading="Haftalik Is Plani",
-            intro=f"Merhaba {html.escape(p.full_name or '')}, asagida bu haftaki planin yer aliyor.",
-            body_html=table_html,
-            table_headers=None,
-            table_rows=None,
-            footer=f"Hafta baslangic: {iso(ws)}",
-        )
-
-        attachments_payload = []
-        for fname in attachments_paths:
-            full_path = os.path.join(current_app.config["UPLOAD_FOLDER"], fname)
-            if not fname or not os.path.exists(full_path):
-                continue
-            with open(full_path, "rb") as f:
-                data_blob = f.read()
-            ctype = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
-            attachments_payload.append({
-                "filename": os.path.basename(full_path),
-                "data": data_blob,
-                "content_type": ctype
-            })
-
-        ok = MailService.send(
-            mail_type="weekly",
-            recipients=[p.email],
-            subject=subject,
-            html=email_html,
-            attachments=attachments_payload,
-            week_start=ws,
-            user_id=getattr(current_user, "id", None),
-            meta={"type": "weekly", "attachments": sorted(list(attachments_paths))},
-        )
-        if ok:
-            sent += 1
-        else:
-            errors.append(f"{p.full_name}: Mail gonderimi basarisiz")
-
-    return jsonify({"ok": True, "sent": sent, "skipped": skipped, "errors": errors})
+    if batch.recipients and not queued:
+        errors.append("Mailler kuyruga eklenemedi")
+    skipped = Person.query.count() - len(batch.recipients)
+    return jsonify({"ok": True, "sent": queued, "skipped": skipped, "errors": errors})
 
 
 @planner_bp.post("/api/send_team_emails")
@@ -9189,156 +9012,22 @@ def api_send_weekly_emails():
 def api_send_team_emails():
     data = request.get_json(force=True, silent=True) or {}
     ws = parse_date(data.get("week_start", "")) or week_start(date.today())
-    start = ws
-    end = ws + timedelta(days=6)
     team_name = (data.get("team_name") or "").strip()
     if not team_name:
         return jsonify({"ok": False, "error": "Ekip adi gerekli"}), 400
 
-    people = Person.query.order_by(Person.full_name.asc()).all()
-    tasks: Dict[int, List[dict]] = {p.id: [] for p in people}
-
-    rows = (
-        db.session.query(
-            Person.id, Person.full_name, Person.email,
-            PlanCell.work_date,
-            Project.region, Project.project_code, Project.project_name,
-            PlanCell.shift, PlanCell.note, PlanCell.vehicle_info,
-            PlanCell.job_mail_body, PlanCell.lld_hhd_files, PlanCell.tutanak_files, PlanCell.lld_hhd_path, PlanCell.tutanak_path,
-            Team.name, PlanCell.team_name
-        )
-        .join(CellAssignment, CellAssignment.person_id == Person.id)
-        .join(PlanCell, PlanCell.id == CellAssignment.cell_id)
-        .join(Project, Project.id == PlanCell.project_id)
-        .outerjoin(Team, Team.id == PlanCell.team_id)
-        .filter(PlanCell.work_date >= start, PlanCell.work_date <= end)
-        .order_by(Person.full_name.asc(), PlanCell.work_date.asc())
-        .all()
+    batch = plan_mail.PlanMailBatch.load(ws, team_name=team_name)
+    queued = batch.enqueue(
+        mail_type="team",
+        subject=f"Ekip Plani ({team_name}) - {iso(ws)}",
+        heading=f"Ekip Plani: {html.escape(team_name)}",
+        intro="Merhaba {name}, bu ekip icin planin:",
+        user_id=getattr(get_current_user(), "id", None),
     )
-
-    for pid, pname, pemail, wd, region, pcode, pname2, shift, note, vehicle, job_mail_body, lld_list_str, tut_list_str, lld_single, tut_single, tname, tname_alt in rows:
-        effective_team = (tname or tname_alt or "").strip()
-        if effective_team != team_name:
-            continue
-
-        lld_list = _parse_files(lld_list_str)
-        tut_list = _parse_files(tut_list_str)
-        if lld_single and not lld_list:
-            lld_list = [lld_single]
-        if tut_single and not tut_list:
-            tut_list = [tut_single]
-
-        tasks[pid].append({
-            "date": iso(wd),
-            "where": region,
-            "project": f"{pcode} - {pname2}",
-            "shift": shift or "",
-            "note": note or "",
-            "vehicle": vehicle or "",
-            "team": effective_team,
-            "job_mail_body": job_mail_body or "",
-            "lld_hhd_files": lld_list,
-            "tutanak_files": tut_list,
-        })
-
-    sent = 0
-    skipped = 0
     errors = []
-
-    for p in people:
-        items = tasks.get(p.id, [])
-        if not items:
-            continue
-        if not p.email:
-            skipped += 1
-            continue
-
-        rows_html = ""
-        attachments_paths = set()
-        for it in items:
-            for f in it.get("lld_hhd_files") or []:
-                attachments_paths.add(f)
-            for f in it.get("tutanak_files") or []:
-                attachments_paths.add(f)
-
-            job_mail_html = html.escape(it.get("job_mail_body") or "").replace("\n", "<br>")
-            note_html = html.escape(it.get("note") or "").replace("\n", "<br>")
-            where_html = html.escape(it.get("where") or "")
-            project_html = html.escape(it.get("project") or "")
-            shift_html = html.escape(it.get("shift") or "")
-            vehicle_html = html.escape(it.get("vehicle") or "")
-            team_html = html.escape(it.get("team") or "")
-            lld_names = ", ".join([os.path.basename(x) for x in (it.get("lld_hhd_files") or [])])
-            tutanak_names = ", ".join([os.path.basename(x) for x in (it.get("tutanak_files") or [])])
-            rows_html += f"""
-              <tr>
-                <td>{it['date']}</td>
-                <td>{where_html}</td>
-                <td>{project_html}</td>
-                <td>{shift_html}</td>
-                <td>{vehicle_html}</td>
-                <td>{team_html}</td>
-                <td>{job_mail_html}</td>
-                <td>{note_html}</td>
-                <td>{lld_names}</td>
-                <td>{tutanak_names}</td>
-              </tr>
-            """
-
-        table_html = f"""
-          <table border="1" cellpadding="6" cellspacing="0" style="border-collapse:collapse; width:100%; font-size:13px;">
-            <thead>
-              <tr>
-                <th>Tarih</th><th>Il</th><th>Proje</th><th>Vardiya</th><th>Arac</th><th>Ekip</th><th>Is Detay Maili</th><th>Is Detayi</th><th>LLD/HHD</th><th>Tutanak</th>
-              </tr>
-            </thead>
-            <tbody>{rows_html}</tbody>
-          </table>
-        """
-
-        subject = f"Ekip Plani ({team_name}) - {iso(ws)}"
-        email_html = render_template(
-            "email_base.html",
-            title=subject,
-            heading=f"Ekip Plani: {html.escape(team_name)}",
-            intro=f"Merhaba {html.escape(p.full_name or '')}, bu ekip icin planin:",
-            body_html=table_html,
-            table_headers=None,
-            table_rows=None,
-            footer=f"Hafta baslangic: {iso(ws)}",
-        )
-
-        attachments_payload = []
-        for fname in attachments_paths:
-            full_path = os.path.join(current_app.config["UPLOAD_FOLDER"], fname)
-            if not fname or not os.path.exists(full_path):
-                continue
-            with open(full_path, "rb") as f:
-                data_blob = f.read()
-            ctype = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
-            attachments_payload.append({
-                "filename": os.path.basename(full_path),
-                "data": data_blob,
-                "content_type": ctype
-            })
-
-        ok = MailService.send(
-            mail_type="team",
-            recipients=[p.email],
-            subject=subject,
-            html=email_html,
-            attachments=attachments_payload,
-            week_start=ws,
-            team_name=team_name,
-            user_id=getattr(current_user, "id", None),
-            meta={"type": "team", "attachments": sorted(list(attachments_paths))},
-        )
-        if ok:
-            sent += 1
-        else:
-            errors.append(f"{p.full_name}: Mail gonderimi basarisiz")
-
-    return jsonify({"ok": True, "sent": sent, "skipped": skipped, "errors": errors})
+    if batch.recipients and not queued:
+        errors.append("Mailler kuyruga eklenemedi")
+    return jsonify({"ok": True, "sent": queued, "skipped": len(batch.without_email), "errors": errors})
 
 
 # ---------- TIMESHEET EXCEL ----------
@@ -9361,7 +9050,11 @@ def timesheet_excel():
     days = [start + timedelta(days=i) for i in range(7)]
     
     # Tüm aktif personeli al
-    people = Person.query.filter(Person.durum == "Aktif").order_by(Person.full_name.asc()).all()
+    people = (
+        Person.query.options(db.joinedload(Person.firma), db.joinedload(Person.seviye))
+        .filter(Person.durum == "Aktif")
+        .order_by(Person.full_name.asc())
+    )
     
     # Tüm atamaları çek - daha detaylı bilgi
     rows = (
@@ -9416,123 +9109,88 @@ def timesheet_excel():
     # Personel durumlarını çek (izin, üretimde vb.)
     st = get_person_status_map(days)
     
-    # Excel dosyası oluştur
-    wb = Workbook()
-    wsht = wb.active
-    wsht.title = f"Timesheet {start.strftime('%d.%m.%Y')}"
-    
-    # Başlık satırı
-    header = ["Personel", "Firma", "Seviye"]
+    # Başlık satırı; hafta sonu günleri renkli, tüm hücreler üstten hizalı ve kaydırmalı
+    weekend_style = excel_export.CellStyle(fill="FEF3C7", wrap=True)
+    columns = [
+        excel_export.Column("Personel", 25, style="wrap_top"),
+        excel_export.Column("Firma", 18, style="wrap_top"),
+        excel_export.Column("Seviye", 12, style="wrap_top"),
+    ]
     for i, dday in enumerate(days):
-        header.append(f"{dday.strftime('%d.%m')}\\n{TR_DAYS[i]}")
-    header.append("Toplam\\nMesai")
-    
-    wsht.append(header)
-    
-    # Başlık stili
-    header_fill = PatternFill(start_color="3B82F6", end_color="3B82F6", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    for c in range(1, len(header)+1):
-        cell = wsht.cell(row=1, column=c)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    
-    # Veri satırları
-    r = 2
-    for p in people:
-        row = [
-            p.full_name or "",
-            p.firma.name if p.firma else "",
-            p.seviye.name if p.seviye else ""
-        ]
-        
-        for dday in days:
-            k = iso(dday)
-            tasks = mp.get((p.id, k), [])
-            
-            if tasks:
-                cell_parts = []
-                for task in tasks:
-                    parts = []
-                    # Şehir
-                    if task["city"]:
-                        parts.append(task["city"])
-                    # Proje kodu ve adı
-                    if task["project_code"]:
-                        parts.append(f"{task['project_code']} {task['project_name']}")
-                    # Alt proje
-                    if task["subproject"]:
-                        parts.append(task["subproject"])
-                    
-                    # Normal Çalışma Saati
-                    work_hours = calculate_hours_from_shift(task["shift"])
-                    if work_hours and work_hours > 0:
-                        parts.append(f"Çalışma: {work_hours} saat")
-
-                    # Mesai saati
-                    overtime = overtime_map.get((p.id, k), 0)
-                    if overtime and overtime > 0:
-                        parts.append(f"Mesai: +{overtime} saat")
-                    
-                    # Önemli not
-                    if task["important_note"]:
-                        parts.append(f"Not: {task['important_note']}")
-                    
-                    cell_parts.append(" | ".join(parts))
-                
-                row.append("\\n".join(cell_parts))
-            else:
-                stv = st.get((p.id, k), "available")
-                status_map = {
-                    "leave": "IZINLI",
-                    "production": "URETIMDE",
-                    "available": "",
-                    "sick": "HASTA",
-                    "permission": "IZIN",
-                }
-                row.append(status_map.get(stv, ""))
-        
-        # Toplam mesai
-        total_overtime = sum(overtime_map.get((p.id, iso(d)), 0) for d in days)
-        row.append(f"{total_overtime} saat" if total_overtime > 0 else "")
-        
-        wsht.append(row)
-        r += 1
-    
-    # Sütun genişliklerini ayarla
-    wsht.column_dimensions["A"].width = 25
-    wsht.column_dimensions["B"].width = 18
-    wsht.column_dimensions["C"].width = 12
-    for i in range(4, 11):
-        wsht.column_dimensions[get_column_letter(i)].width = 40
-    wsht.column_dimensions["K"].width = 12
-    
-    # Satır yüksekliği ve hücre stili
-    for rr in range(2, wsht.max_row + 1):
-        wsht.row_dimensions[rr].height = 45
-        for cc in range(1, wsht.max_column + 1):
-            cell = wsht.cell(row=rr, column=cc)
-            cell.alignment = Alignment(vertical="top", wrap_text=True)
-            
-            # Hafta sonu günlerini renklendir
-            if cc >= 4 and cc <= 10:
-                day_idx = cc - 4
-                if day_idx >= 5:
-                    cell.fill = PatternFill(start_color="FEF3C7", end_color="FEF3C7", fill_type="solid")
-    
-    # Excel dosyasını döndür
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    
-    filename = f"timesheet_{start.strftime('%Y%m%d')}.xlsx"
-    return send_file(
-        buf,
-        as_attachment=True,
-        download_name=filename,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        columns.append(excel_export.Column(
+            f"{dday.strftime('%d.%m')}\\n{TR_DAYS[i]}", 40,
+            style=(weekend_style if i >= 5 else "wrap_top"),
+        ))
+    columns.append(excel_export.Column("Toplam\\nMesai", 12, style="wrap_top"))
+
+    status_map = {
+        "leave": "IZINLI",
+        "production": "URETIMDE",
+        "available": "",
+        "sick": "HASTA",
+        "permission": "IZIN",
+    }
+
+    def _rows():
+        for p in people.yield_per(500):
+            row = [
+                p.full_name or "",
+                p.firma.name if p.firma else "",
+                p.seviye.name if p.seviye else ""
+            ]
+
+            for dday in days:
+                k = iso(dday)
+                tasks = mp.get((p.id, k), [])
+
+                if tasks:
+                    cell_parts = []
+                    for task in tasks:
+                        parts = []
+                        # Şehir
+                        if task["city"]:
+                            parts.append(task["city"])
+                        # Proje kodu ve adı
+                        if task["project_code"]:
+                            parts.append(f"{task['project_code']} {task['project_name']}")
+                        # Alt proje
+                        if task["subproject"]:
+                            parts.append(task["subproject"])
+
+                        # Normal Çalışma Saati
+                        work_hours = calculate_hours_from_shift(task["shift"])
+                        if work_hours and work_hours > 0:
+                            parts.append(f"Çalışma: {work_hours} saat")
+
+                        # Mesai saati
+                        overtime = overtime_map.get((p.id, k), 0)
+                        if overtime and overtime > 0:
+                            parts.append(f"Mesai: +{overtime} saat")
+
+                        # Önemli not
+                        if task["important_note"]:
+                            parts.append(f"Not: {task['important_note']}")
+
+                        cell_parts.append(" | ".join(parts))
+
+                    row.append("\\n".join(cell_parts))
+                else:
+                    stv = st.get((p.id, k), "available")
+                    row.append(status_map.get(stv, ""))
+
+            # Toplam mesai
+            total_overtime = sum(overtime_map.get((p.id, iso(d)), 0) for d in days)
+            row.append(f"{total_overtime} saat" if total_overtime > 0 else "")
+            yield row
+
+    sheet = excel_export.Sheet(
+        f"Timesheet {start.strftime('%d.%m.%Y')}",
+        columns,
+        _rows(),
+        header_style="header_sky",
+        row_height=45,
     )
+    return excel_export.xlsx_response([sheet], f"timesheet_{start.strftime('%Y%m%d')}.xlsx")
 
 
 
@@ -9904,7 +9562,6 @@ def board_page():
 @planner_or_admin_required
 def kanban_page():
     start, end = _parse_date_range_args()
-    upsert_jobs_for_range(start, end)
 
     q = Job.query.filter(Job.work_date >= start, Job.work_date <= end)
     q = q.join(Project, Project.id == Job.project_id)
@@ -9951,8 +9608,6 @@ def api_board_jobs():
     unassigned_only = _parse_bool_arg("unassigned_only", default=False)
     published_only = _parse_bool_arg("published_only", default=False)
 
-    upsert_jobs_for_range(start, end)
-
     base_q = _build_board_jobs_query(
         start=start,
         end=end,
@@ -10464,8 +10119,6 @@ def board_export_xlsx():
             ids = []
         ids = sorted({int(x) for x in ids if int(x or 0) > 0})
 
-    upsert_jobs_for_range(start, end)
-
     base_q = _build_board_jobs_query(
         start=start,
         end=end,
@@ -10483,76 +10136,69 @@ def board_export_xlsx():
     if ids:
         base_q = base_q.filter(Job.id.in_(ids))
 
-    rows = (
+    rows_q = (
         base_q.with_entities(Job, Project, SubProject, User)
         .order_by(Job.work_date.asc(), Project.region.asc(), Project.project_code.asc(), Job.id.asc())
         .limit(20000)
-        .all()
     )
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Jobs"
-    ws.append([
-        "Job ID",
-        "Date",
-        "City",
-        "Project Code",
-        "Project Name",
-        "Sub-Project",
-        "Assigned User",
-        "Team",
-        "Kanban Status",
-        "Published",
-        "Published At",
-        "Closed At",
-    ])
-
-    for j, p, sp, u in rows:
-        assigned = (u.full_name or u.email) if u else ""
-        ws.append([
-            int(j.id),
-            iso(j.work_date) if j.work_date else "",
-            (p.region if p else ""),
-            (p.project_code if p else ""),
-            (p.project_name if p else ""),
-            (sp.name if sp else ""),
-            assigned,
-            (j.team_name or ""),
-            _normalize_kanban_status(getattr(j, "kanban_status", None)),
-            "1" if bool(getattr(j, "is_published", False)) else "0",
-            j.published_at.strftime("%Y-%m-%d %H:%M") if getattr(j, "published_at", None) else "",
-            j.closed_at.strftime("%Y-%m-%d %H:%M") if getattr(j, "closed_at", None) else "",
-        ])
-
-    ws2 = wb.create_sheet("Summary")
-    ws2.append(["Metric", "Value"])
-    ws2.append(["Total Jobs", len(rows)])
-    by_status = {}
-    for j, _, _, _ in rows:
-        st = _normalize_kanban_status(getattr(j, "kanban_status", None))
-        by_status[st] = by_status.get(st, 0) + 1
-    for st, cnt in sorted(by_status.items(), key=lambda x: (KANBAN_STATUS_ORDER.get(x[0], 99), x[0])):
-        ws2.append([f"Status: {st}", cnt])
-
-    for wsht in [ws, ws2]:
-        for c in range(1, wsht.max_column + 1):
-            wsht.cell(row=1, column=c).font = Font(bold=True)
-            wsht.column_dimensions[get_column_letter(c)].width = 22
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    filename = f"board_export_{iso(start)}_{iso(end)}.xlsx"
-    return send_file(buf, as_attachment=True, download_name=filename,
-                     mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    # Özet sayfası satırlar akarken doldurulur (ikinci sayfa birinciden sonra yazılır)
+    by_status: Dict[str, int] = {}
+    total = [0]
+
+    def _job_rows():
+        for j, p, sp, u in rows_q.yield_per(500):
+            st = _normalize_kanban_status(getattr(j, "kanban_status", None))
+            by_status[st] = by_status.get(st, 0) + 1
+            total[0] += 1
+            assigned = (u.full_name or u.email) if u else ""
+            yield [
+                int(j.id),
+                iso(j.work_date) if j.work_date else "",
+                (p.region if p else ""),
+                (p.project_code if p else ""),
+                (p.project_name if p else ""),
+                (sp.name if sp else ""),
+                assigned,
+                (j.team_name or ""),
+                st,
+                "1" if bool(getattr(j, "is_published", False)) else "0",
+                j.published_at.strftime("%Y-%m-%d %H:%M") if getattr(j, "published_at", None) else "",
+                j.closed_at.strftime("%Y-%m-%d %H:%M") if getattr(j, "closed_at", None) else "",
+            ]
+
+    def _summary_rows():
+        yield ["Total Jobs", total[0]]
+        for st, cnt in sorted(by_status.items(), key=lambda x: (KANBAN_STATUS_ORDER.get(x[0], 99), x[0])):
+            yield [f"Status: {st}", cnt]
+
+    job_columns = [
+        excel_export.Column(h)
+        for h in [
+            "Job ID",
+            "Date",
+            "City",
+            "Project Code",
+            "Project Name",
+            "Sub-Project",
+            "Assigned User",
+            "Team",
+            "Kanban Status",
+            "Published",
+            "Published At",
+            "Closed At",
+        ]
+    ]
+    sheets = [
+        excel_export.Sheet("Jobs", job_columns, _job_rows()),
+        excel_export.Sheet("Summary", [excel_export.Column("Metric"), excel_export.Column("Value")], _summary_rows()),
+    ]
+    return excel_export.xlsx_response(sheets, f"board_export_{iso(start)}_{iso(end)}.xlsx")
 
 @planner_bp.get("/board.xlsx")
 @login_required
 @planner_or_admin_required
 def board_xlsx():
     start, end = _parse_date_range_args()
-    upsert_jobs_for_range(start, end)
 
     q = Job.query.join(Project, Project.id == Job.project_id).filter(Job.work_date >= start, Job.work_date <= end)
     jobs = q.order_by(Job.work_date.asc(), Project.region.asc(), Project.project_code.asc()).all()
@@ -10570,59 +10216,50 @@ def board_xlsx():
             if r.job_id not in latest_fb:
                 latest_fb[r.job_id] = r
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Board"
-    ws.append([
-        "Job ID",
-        "Date",
-        "City",
-        "Project Code",
-        "Project Name",
-        "Sub-Project",
-        "Team",
-        "Assigned User",
-        "Job Status",
-        "Kanban",
-        "Published At",
-        "Last Report At",
-        "Review Status",
-    ])
-
-    for j in jobs:
-        p = j.project
-        fb = latest_fb.get(j.id)
-        assigned = ""
-        try:
-            assigned = (j.assigned_user.full_name or j.assigned_user.email) if j.assigned_user else ""
-        except Exception:
+    def _board_rows():
+        for j in jobs:
+            p = j.project
+            fb = latest_fb.get(j.id)
             assigned = ""
-        ws.append([
-            int(j.id),
-            iso(j.work_date) if j.work_date else "",
-            (p.region if p else ""),
-            (p.project_code if p else ""),
-            (p.project_name if p else ""),
-            (j.subproject.name if getattr(j, "subproject", None) else ""),
-            j.team_name or "",
-            assigned,
-            j.status or "",
-            _normalize_kanban_status(getattr(j, "kanban_status", None)),
-            j.published_at.strftime("%Y-%m-%d %H:%M") if getattr(j, "published_at", None) else "",
-            fb.submitted_at.strftime("%Y-%m-%d %H:%M") if (fb and fb.submitted_at) else "",
-            (fb.review_status if fb else ""),
-        ])
-
-    for c in range(1, ws.max_column + 1):
-        ws.cell(row=1, column=c).font = Font(bold=True)
-        ws.column_dimensions[get_column_letter(c)].width = 22
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    filename = f"board_{iso(start)}_{iso(end)}.xlsx"
-    return send_file(buf, as_attachment=True, download_name=filename,
-                     mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            try:
+                assigned = (j.assigned_user.full_name or j.assigned_user.email) if j.assigned_user else ""
+            except Exception:
+                assigned = ""
+            yield [
+                int(j.id),
+                iso(j.work_date) if j.work_date else "",
+                (p.region if p else ""),
+                (p.project_code if p else ""),
+                (p.project_name if p else ""),
+                (j.subproject.name if getattr(j, "subproject", None) else ""),
+                j.team_name or "",
+                assigned,
+                j.status or "",
+                _normalize_kanban_status(getattr(j, "kanban_status", None)),
+                j.published_at.strftime("%Y-%m-%d %H:%M") if getattr(j, "published_at", None) else "",
+                fb.submitted_at.strftime("%Y-%m-%d %H:%M") if (fb and fb.submitted_at) else "",
+                (fb.review_status if fb else ""),
+            ]
+
+    columns = [
+        excel_export.Column(h)
+        for h in [
+            "Job ID",
+            "Date",
+            "City",
+            "Project Code",
+            "Project Name",
+            "Sub-Project",
+            "Team",
+            "Assigned User",
+            "Job Status",
+            "Kanban",
+            "Published At",
+            "Last Report At",
+            "Review Status",
+        ]
+    ]
+    return excel_export.xlsx_response([excel_export.Sheet("Board", columns, _board_rows())], f"board_{iso(start)}_{iso(end)}.xlsx")
 
 
 @planner_bp.get("/api/job/<int:job_id>/latest_report")
@@ -14,19 +14,22 @@ Gerçek Zamanlı Özellikler API'leri
 from flask import Blueprint, request, jsonify, render_template, session, current_app
 from extensions import db, socketio
 from werkzeug.utils import secure_filename
-from flask_socketio import emit, join_room, leave_room
+from flask_socketio import emit, join_room, leave_room, rooms
 from models import (
-    PlanCell, CellAssignment, CellLock, CellCancellation, CellVersion,
+    PlanCell, CellAssignment, CellCancellation, CellVersion,
     TeamOvertime, VoiceMessage, UserSettings, TableSnapshot,
     User, Team, Person, Project, SubProject, Job
 )
 from utils import login_required, get_current_user, planner_or_admin_required, _csrf_verify, _sync_job_from_cell
 from datetime import datetime, timedelta
+from sqlalchemy import update as sa_update
+from sqlalchemy.orm.attributes import set_committed_value
 import json
 import os
 import base64
 import uuid
 from services.mail_service import MailService
+from services import cell_locks, cell_merge, plan_cache, plan_labels, plan_rooms
 
 realtime_bp = Blueprint('realtime', __name__)
 
@@ -55,69 +58,38 @@ def api_cell_lock():
     except:
         return jsonify({"ok": False, "error": "invalid_date"}), 400
     
-    # Hücreyi bul veya oluştur
-    cell = PlanCell.query.filter_by(project_id=project_id, work_date=work_date).first()
-    if not cell:
-        cell = PlanCell(project_id=project_id, work_date=work_date)
-        db.session.add(cell)
-        db.session.commit()
+    # Kilit bellekte (services/cell_locks.py) tutulur; hücre satırı yalnızca okunur
+    cell_id = db.session.query(PlanCell.id).filter_by(project_id=project_id, work_date=work_date).scalar()
+    user_name = user.full_name or user.email or user.username or ""
+    ok, rec = cell_locks.acquire(project_id, work_date, user.id, user_name=user_name, cell_id=cell_id)
+    expires_at = datetime.fromtimestamp(rec["expires_at"])
     
-    now = datetime.now()
-    expires_at = now + timedelta(seconds=60)  # 60 saniye kilit süresi
-    
-    # Mevcut kilidi kontrol et
-    existing_lock = CellLock.query.filter_by(cell_id=cell.id).first()
-    
-    if existing_lock:
-        # Kilit süresi dolmuş mu?
-        if existing_lock.expires_at < now:
-            # Süresi dolmuş, yeni kilit oluştur
-            existing_lock.user_id = user.id
-            existing_lock.locked_at = now
-            existing_lock.expires_at = expires_at
-            db.session.commit()
-        elif existing_lock.user_id != user.id:
-            # Başka kullanıcı tarafından kilitli
-            lock_user = User.query.get(existing_lock.user_id)
-            lock_user_name = (lock_user.full_name or lock_user.email or lock_user.username or "") if lock_user else "Bilinmeyen"
-            return jsonify({
-                "ok": False,
-                "error": "locked",
-                "locked_by": lock_user_name,
-                "locked_by_id": existing_lock.user_id,
-                "expires_at": existing_lock.expires_at.isoformat()
-            }), 409
-        else:
-            # Aynı kullanıcı, süreyi uzat
-            existing_lock.expires_at = expires_at
-            db.session.commit()
-    else:
-        # Yeni kilit oluştur
-        new_lock = CellLock(
-            cell_id=cell.id,
-            user_id=user.id,
-            locked_at=now,
-            expires_at=expires_at
-        )
-        db.session.add(new_lock)
-        db.session.commit()
+    if not ok:
+        # Başka kullanıcı tarafından kilitli
+        return jsonify({
+            "ok": False,
+            "error": "locked",
+            "locked_by": rec.get("locked_by") or "Bilinmeyen",
+            "locked_by_id": rec["owner"],
+            "expires_at": expires_at.isoformat()
+        }), 409
     
     # Diğer kullanıcılara bildir
     try:
-        socketio.emit("cell_locked", {
+        plan_rooms.emit_to_weeks("cell_locked", {
             "project_id": project_id,
             "work_date": work_date_str,
-            "cell_id": cell.id,
-            "locked_by": user.full_name or user.email or user.username,
+            "cell_id": cell_id,
+            "locked_by": user_name,
             "locked_by_id": user.id,
             "expires_at": expires_at.isoformat()
-        }, room="plan_updates", namespace="/")
+        }, work_date)
     except:
         pass
     
     return jsonify({
         "ok": True,
-        "cell_id": cell.id,
+        "cell_id": cell_id,
         "expires_at": expires_at.isoformat()
     })
 
@@ -189,28 +161,21 @@ def api_cell_unlock():
         return jsonify({"ok": False, "error": "csrf"}), 400
     
     cell_id = int(data.get("cell_id") or 0)
-    if not cell_id:
-        return jsonify({"ok": False, "error": "missing_cell_id"}), 400
-    
-    lock = CellLock.query.filter_by(cell_id=cell_id).first()
-    if lock:
-        # Sadece kilidi oluşturan kaldırabilir
-        if lock.user_id == user.id:
-            project_id = lock.cell.project_id if lock.cell else 0
-            work_date = lock.cell.work_date.isoformat() if lock.cell and lock.cell.work_date else ""
-            
-            db.session.delete(lock)
-            db.session.commit()
-            
-            # Diğer kullanıcılara bildir
-            try:
-                socketio.emit("cell_unlocked", {
-                    "cell_id": cell_id,
-                    "project_id": project_id,
-                    "work_date": work_date
-                }, room="plan_updates", namespace="/")
-            except:
-                pass
+    project_id = int(data.get("project_id") or 0)
+    work_date = (data.get("work_date") or "").strip()[:10]
+    if not (project_id and work_date):
+        if not cell_id:
+            return jsonify({"ok": False, "error": "missing_cell_id"}), 400
+        row = db.session.query(PlanCell.project_id, PlanCell.work_date).filter(PlanCell.id == cell_id).first()
+        if not row:
+            return jsonify({"ok": True})
+        project_id, work_date = row
+    
+    # Sadece kilidi oluşturan kaldırabilir
+    rec = cell_locks.release(project_id, work_date, user.id)
+    if rec:
+        # Diğer kullanıcılara bildir
+        cell_locks.emit_unlocked(rec)
     
     return jsonify({"ok": True})
 
@@ -223,22 +188,15 @@ def api_cell_locks():
     if not user:
         return jsonify({"ok": False, "error": "auth"}), 401
     
-    now = datetime.now()
-    
-    # Süresi dolmamış kilitleri getir
-    locks = CellLock.query.filter(CellLock.expires_at > now).all()
-    
     items = []
-    for lock in locks:
-        lock_user = User.query.get(lock.user_id)
-        cell = lock.cell
+    for rec in cell_locks.active_locks():
         items.append({
-            "cell_id": lock.cell_id,
-            "project_id": cell.project_id if cell else 0,
-            "work_date": cell.work_date.isoformat() if cell and cell.work_date else "",
-            "locked_by": (lock_user.full_name or lock_user.email or lock_user.username or "") if lock_user else "",
-            "locked_by_id": lock.user_id,
-            "expires_at": lock.expires_at.isoformat()
+            "cell_id": rec.get("cell_id"),
+            "project_id": rec.get("project_id") or 0,
+            "work_date": rec.get("work_date") or "",
+            "locked_by": rec.get("locked_by") or "",
+            "locked_by_id": rec["owner"],
+            "expires_at": datetime.fromtimestamp(rec["expires_at"]).isoformat()
         })
     
     return jsonify({"ok": True, "locks": items})
@@ -246,6 +204,23 @@ def api_cell_locks():
 
 # ============== ÇAKIŞMA ÇÖZÜMÜ (CONFLICT RESOLUTION) ==============
 
+def _version_conflict(cell, expected_version: int, conflicts: list, base_missing: bool):
+    return jsonify({
+        "ok": False,
+        "error": "version_conflict",
+        "expected_version": expected_version,
+        "current_version": cell.version or 1,
+        "conflicts": conflicts,
+        "base_missing": base_missing,
+        "current_data": {
+            "shift": cell.shift,
+            "note": cell.note,
+            "vehicle_info": cell.vehicle_info,
+            "updated_at": cell.updated_at.isoformat() if cell.updated_at else None
+        }
+    }), 409
+
+
 @realtime_bp.post("/api/cell/save-with-version")
 @login_required
 def api_cell_save_with_version():
@@ -270,76 +245,46 @@ def api_cell_save_with_version():
     
     # Versiyon kontrolü
     current_version = cell.version or 1
+    changes = cell_merge.parse_changes(data)
+    merged = False
+    merged_fields = []
     
     if expected_version > 0 and expected_version != current_version:
-        # Çakışma var!
-        return jsonify({
-            "ok": False,
-            "error": "version_conflict",
-            "expected_version": expected_version,
-            "current_version": current_version,
-            "current_data": {
-                "shift": cell.shift,
-                "note": cell.note,
-                "vehicle_info": cell.vehicle_info,
-                "updated_at": cell.updated_at.isoformat() if cell.updated_at else None
-            }
-        }), 409
-    
-    # Eski veriyi kaydet
-    old_data = {
-        "shift": cell.shift,
-        "note": cell.note,
-        "vehicle_info": cell.vehicle_info,
-        "team_id": cell.team_id,
-        "subproject_id": cell.subproject_id
-    }
+        # Araya başka kayıt girmiş: okunan sürüme göre alan bazlı birleştir
+        base = cell_merge.base_snapshot(cell.id, expected_version)
+        conflicts = None
+        if base is not None:
+            changes, conflicts, merged_fields = cell_merge.three_way(base, changes, cell_merge.snapshot(cell))
+        if base is None or conflicts:
+            return _version_conflict(cell, expected_version, conflicts or [], base is None)
+        merged = True
+    
+    # Versiyonu koşullu artır: okuma ile yazma arasında başka bir işçi kaydettiyse satır eşleşmez
+    claimed = db.session.execute(
+        sa_update(PlanCell)
+        .where(PlanCell.id == cell.id, PlanCell.version == cell.version)
+        .values(version=current_version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        cell = PlanCell.query.get(cell_id)
+        if not cell:
+            return jsonify({"ok": False, "error": "cell_not_found"}), 404
+        return _version_conflict(cell, expected_version, [], False)
+
+    # Yeni veriyi uygula (birleştirmede yalnızca bu istemcinin değiştirdiği alanlar)
+    for field, value in changes.items():
+        setattr(cell, field, value)
     
-    # Yeni veriyi uygula
-    if "shift" in data:
-        cell.shift = (data.get("shift") or "").strip() or None
-    if "note" in data:
-        cell.note = (data.get("note") or "").strip() or None
-    if "vehicle_info" in data:
-        cell.vehicle_info = (data.get("vehicle_info") or "").strip() or None
-    if "team_id" in data:
-        cell.team_id = int(data.get("team_id") or 0) or None
-    if "subproject_id" in data:
-        cell.subproject_id = int(data.get("subproject_id") or 0) or None
-    if "important_note" in data:
-        cell.important_note = (data.get("important_note") or "").strip() or None
-    if "isdp_info" in data:
-        cell.isdp_info = (data.get("isdp_info") or "").strip() or None
-    if "po_info" in data:
-        cell.po_info = (data.get("po_info") or "").strip() or None
-    if "job_mail_body" in data:
-        cell.job_mail_body = (data.get("job_mail_body") or "").strip() or None
-    if "assigned_user_id" in data:
-        cell.assigned_user_id = int(data.get("assigned_user_id") or 0) or None
-    
-    # Versiyonu artır
-    cell.version = current_version + 1
+    set_committed_value(cell, "version", current_version + 1)
     cell.updated_at = datetime.now()
     
-    # Versiyon geçmişi kaydet
-    version_record = CellVersion(
-        cell_id=cell.id,
-        version=cell.version,
-        data_json=json.dumps({
-            "shift": cell.shift,
-            "note": cell.note,
-            "vehicle_info": cell.vehicle_info,
-            "team_id": cell.team_id,
-            "subproject_id": cell.subproject_id,
-            "important_note": cell.important_note
-        }),
-        changed_by_user_id=user.id,
-        changed_at=datetime.now(),
-        change_type="update"
-    )
-    db.session.add(version_record)
+    # Versiyon geçmişi kaydet (sonraki birleştirmelerin tabanı)
+    cell_merge.record_version(cell, user.id)
     
     db.session.commit()
+    plan_cache.invalidate_week(cell.work_date)
 
     # Hücreye atanan kişi Job'a yansısın (Benim İşlerim'de görünsün)
     try:
@@ -355,14 +300,13 @@ def api_cell_save_with_version():
             pass
 
     # Kilidi kaldır
-    lock = CellLock.query.filter_by(cell_id=cell.id).first()
-    if lock and lock.user_id == user.id:
-        db.session.delete(lock)
-        db.session.commit()
+    rec = cell_locks.release(cell.project_id, cell.work_date, user.id)
+    if rec:
+        cell_locks.emit_unlocked(rec)
     
     # Diğer kullanıcılara bildir
     try:
-        socketio.emit("cell_updated", {
+        plan_rooms.publish_cells([{
             "cell_id": cell.id,
             "project_id": cell.project_id,
             "work_date": cell.work_date.isoformat(),
@@ -373,14 +317,17 @@ def api_cell_save_with_version():
             "note": cell.note,
             "vehicle_info": cell.vehicle_info,
             "status": cell.status
-        }, room="plan_updates", namespace="/")
+        }])
     except:
         pass
     
     return jsonify({
         "ok": True,
         "cell_id": cell.id,
-        "version": cell.version
+        "version": cell.version,
+        "merged": merged,
+        "merged_fields": merged_fields,
+        "data": cell_merge.snapshot(cell),
     })
 
 
@@ -458,7 +405,7 @@ def api_update_task_date():
     target_cell.assigned_user_id = source_cell.assigned_user_id
     target_cell.lld_hhd_files = source_cell.lld_hhd_files
     target_cell.tutanak_files = source_cell.tutanak_files
-    target_cell.version = 1
+    target_cell.version = (target_cell.version or 0) + 1
     
     # Kaynak hücreyi temizle
     source_cell.shift = None
@@ -474,6 +421,11 @@ def api_update_task_date():
     source_cell.assigned_user_id = None
     source_cell.lld_hhd_files = None
     source_cell.tutanak_files = None
+    source_cell.version = (source_cell.version or 1) + 1
+    
+    # Taşıma sonrası sürümlerin anlık görüntüsü (sürümlü kayıtlar bunlara göre birleşir)
+    cell_merge.record_version(source_cell, user.id, "move")
+    cell_merge.record_version(target_cell, user.id, "move")
     
     # Atamaları taşı
     for assignment in assignments:
@@ -486,6 +438,7 @@ def api_update_task_date():
         db.session.add(new_assignment)
     
     db.session.commit()
+    plan_cache.invalidate_dates([old_date, new_date])
     
     # Diğer kullanıcılara bildir
     # Diğer kullanıcılara bildir
@@ -502,7 +455,7 @@ def api_update_task_date():
                     "color": p.color or "" 
                 })
         
-        socketio.emit("task_moved", {
+        plan_rooms.emit_to_weeks("task_moved", {
             "source_cell_id": source_cell.id,
             "target_cell_id": target_cell.id,
             "project_id": project_id,
@@ -519,7 +472,7 @@ def api_update_task_date():
                 "subproject_id": target_cell.subproject_id,
                 "assignments": assignments_data
             }
-        }, room="plan_updates", namespace="/")
+        }, old_date, new_date)
     except Exception as e:
         print(f"Socket emit error: {e}")
         pass
@@ -608,6 +561,7 @@ def api_cell_cancel():
     cell.cancelled_by_user_id = user.id
     cell.cancellation_reason = reason
     cell.version = (cell.version or 1) + 1
+    cell_merge.record_version(cell, user.id, "cancel")
     
     # İptal kaydı oluştur
     cancellation = CellCancellation(
@@ -622,10 +576,11 @@ def api_cell_cancel():
     )
     db.session.add(cancellation)
     db.session.commit()
+    plan_cache.invalidate_week(cell.work_date)
     
     # Diğer kullanıcılara bildir
     try:
-        socketio.emit("cell_cancelled", {
+        plan_rooms.emit_to_weeks("cell_cancelled", {
             "cell_id": cell.id,
             "project_id": cell.project_id,
             "work_date": cell.work_date.isoformat(),
@@ -634,7 +589,7 @@ def api_cell_cancel():
             "reason": reason,
             "cancelled_at": now.isoformat(),
             "has_file": bool(file_path_db)
-        }, room="plan_updates", namespace="/")
+        }, cell.work_date)
     except:
         pass
     
@@ -676,18 +631,20 @@ def api_cell_restore():
     cell.cancelled_by_user_id = None
     cell.cancellation_reason = None
     cell.version = (cell.version or 1) + 1
+    cell_merge.record_version(cell, user.id, "restore")
     
     db.session.commit()
+    plan_cache.invalidate_week(cell.work_date)
     
     # Diğer kullanıcılara bildir
     try:
-        socketio.emit("cell_restored", {
+        plan_rooms.emit_to_weeks("cell_restored", {
             "cell_id": cell.id,
             "project_id": cell.project_id,
             "work_date": cell.work_date.isoformat(),
             "restored_by": user.full_name or user.email or user.username,
             "restored_by_id": user.id
-        }, room="plan_updates", namespace="/")
+        }, cell.work_date)
     except:
         pass
     
@@ -743,10 +700,11 @@ def api_overtime_add():
     )
     db.session.add(overtime)
     db.session.commit()
+    plan_cache.invalidate_week(work_date)
     
     # Diğer kullanıcılara bildir
     try:
-        socketio.emit("overtime_added", {
+        plan_rooms.emit_to_weeks("overtime_added", {
             "id": overtime.id,
             "cell_id": cell_id,
             "person_id": person_id,
@@ -755,7 +713,7 @@ def api_overtime_add():
             "duration_hours": duration_hours,
             "description": description,
             "created_by": user.full_name or user.email or user.username
-        }, room="plan_updates", namespace="/")
+        }, work_date)
     except:
         pass
     
@@ -970,15 +928,17 @@ def api_overtime_delete():
     ot = TeamOvertime.query.get(ot_id)
     if ot:
         cell_id = ot.cell_id
+        ot_date = ot.work_date
         db.session.delete(ot)
         db.session.commit()
+        plan_cache.invalidate_week(ot_date)
         
         remaining = TeamOvertime.query.filter_by(cell_id=cell_id).count()
         try:
-             socketio.emit("overtime_deleted", {
+             plan_rooms.emit_to_weeks("overtime_deleted", {
                 "cell_id": cell_id,
                 "remaining_count": remaining
-             }, room="plan_updates", namespace="/")
+             }, ot_date)
         except: pass
         
         return jsonify({"ok": True})
@@ -1031,6 +991,7 @@ def api_cell_paste():
     
     cell.updated_at = datetime.now()
     cell.version = (cell.version or 1) + 1
+    cell_merge.record_version(cell, user.id)
     
     # Personel atamaları
     # Önce eskileri sil
@@ -1044,6 +1005,7 @@ def api_cell_paste():
             db.session.add(new_assign)
             
     db.session.commit()
+    plan_cache.invalidate_week(cell.work_date)
     
     # Socket emit
     try:
@@ -1059,7 +1021,7 @@ def api_cell_paste():
                     "color": p.color or "" 
                 })
 
-        socketio.emit("cell_updated", {
+        plan_rooms.publish_cells([{
             "cell_id": cell.id,
             "project_id": cell.project_id,
             "work_date": cell.work_date.isoformat(),
@@ -1071,7 +1033,7 @@ def api_cell_paste():
             "status": cell.status,
             "subproject_id": cell.subproject_id,
             "assignments": assignments_data
-        }, room="plan_updates", namespace="/")
+        }])
     except:
         pass
         
@@ -1261,9 +1223,22 @@ def api_table_snapshot():
         week_start = datetime.strptime(week_start_str, "%Y-%m-%d").date()
     except:
         return jsonify({"ok": False, "error": "invalid_date"}), 400
+
+    # Opsiyonel aralık (aylık / çok haftalık snapshot)
+    end_str = (data.get("end") or "").strip()
+    layout = (data.get("layout") or "weeks").strip().lower()
+    end = None
+    if end_str:
+        try:
+            end = datetime.strptime(end_str, "%Y-%m-%d").date()
+            plan_labels.check_range(week_start, end)
+        except ValueError as e:
+            return jsonify({"ok": False, "error": "invalid_range", "message": str(e)}), 400
+        if layout not in ("weeks", "continuous"):
+            return jsonify({"ok": False, "error": "invalid_layout"}), 400
         
     # Generate HTML on backend
-    html_content = generate_full_plan_html(week_start)
+    html_content = generate_full_plan_html(week_start, end, layout)
     
     snapshot = TableSnapshot(
         week_start=week_start,
@@ -1279,56 +1254,59 @@ def api_table_snapshot():
     })
 
 
-def generate_full_plan_html(week_start):
-    """Haftalık plan tablosunu HTML olarak oluştur"""
+def generate_full_plan_html(week_start, end=None, layout="weeks"):
+    """
+    Plan tablosunu HTML olarak oluştur.
+    end verilmezse tek hafta; verilirse [week_start, end] aralığı
+    (layout="weeks": hafta hafta ayrı tablolar, "continuous": tek tablo).
+    """
     start = week_start
-    days = [start + timedelta(days=i) for i in range(7)]
-    week_end = days[-1]
-    
-    # Projeleri ve hücreleri al
-    cells = PlanCell.query.filter(PlanCell.work_date >= days[0], PlanCell.work_date <= days[-1]).all()
-    project_ids_with_work = {c.project_id for c in cells}
-    
-    projects = []
-    if project_ids_with_work:
-        projects = Project.query.filter(Project.id.in_(project_ids_with_work))\
-            .order_by(Project.region.asc(), Project.project_code.asc()).all()
-            
-    cell_by_key = {(c.project_id, c.work_date.isoformat()): c for c in cells}
-    
-    # Personel atamalarını al
-    ass_map = {}
-    if cells:
-        cell_ids = [c.id for c in cells]
-        rows = (
-            db.session.query(CellAssignment.cell_id, Person.full_name)
-            .join(Person, Person.id == CellAssignment.person_id)
-            .filter(CellAssignment.cell_id.in_(cell_ids))
-            .all()
+    if end is None:
+        end = start + timedelta(days=6)
+        layout = "single"
+
+    # Projeler, hücreler ve personel adları aralık için tek seferde (Excel / haftalık tablo ile ortak indeks)
+    labels = plan_labels.PlanLabelIndex.load(start, end)
+
+    if layout == "single":
+        return _plan_table_html(labels, [start + timedelta(days=i) for i in range(7)])
+    if layout == "continuous":
+        return _plan_table_html(labels, [start + timedelta(days=i) for i in range((end - start).days + 1)])
+
+    parts = []
+    for _ws, days in plan_labels.week_windows(start, end):
+        parts.append(
+            f'<h3 style="font-family: sans-serif; margin: 16px 0 8px;">'
+            f'{days[0].strftime("%d.%m.%Y")} - {days[-1].strftime("%d.%m.%Y")}</h3>'
         )
-        for cid, name in rows:
-            ass_map.setdefault(cid, []).append(name)
+        parts.append(_plan_table_html(labels, days))
+    return "".join(parts)
+
+
+def _plan_table_html(labels, days):
+    """Verilen günler için tek bir plan tablosu (parçalar listede toplanıp bir kez birleştirilir)."""
+    projects = labels.projects_between(days[0], days[-1], include_templates=True)
 
     # HTML Başlangıç
-    html = """
+    html = ["""
     <table style="border-collapse: collapse; width: 100%; border: 1px solid #e2e8f0; font-family: sans-serif; font-size: 13px;">
         <thead>
             <tr style="background-color: #f8fafc;">
                 <th style="border: 1px solid #e2e8f0; padding: 10px; text-align: left; width: 100px;">İL</th>
                 <th style="border: 1px solid #e2e8f0; padding: 10px; text-align: left;">PROJE</th>
                 <th style="border: 1px solid #e2e8f0; padding: 10px; text-align: left; width: 120px;">SORUMLU</th>
-    """
+    """]
     
     TR_DAYS = ["Pzt", "Sal", "Çar", "Per", "Cum", "Cmt", "Paz"]
-    for i, d in enumerate(days):
-        bg = "#fef3c7" if i >= 5 else "#f8fafc"
-        html += f'<th style="border: 1px solid #e2e8f0; padding: 10px; text-align: center; width: 100px; background-color: {bg}">{d.strftime("%d.%m")}<br>{TR_DAYS[i]}</th>'
+    for d in days:
+        bg = "#fef3c7" if d.weekday() >= 5 else "#f8fafc"
+        html.append(f'<th style="border: 1px solid #e2e8f0; padding: 10px; text-align: center; width: 100px; background-color: {bg}">{d.strftime("%d.%m")}<br>{TR_DAYS[d.weekday()]}</th>')
     
-    html += """
+    html.append("""
             </tr>
         </thead>
         <tbody>
-    """
+    """)
     
     for p in projects:
         # Proje verisi
@@ -1336,29 +1314,29 @@ def generate_full_plan_html(week_start):
         
         region_bg = "#f0fdf4" # Açık yeşil
         
-        html += f"""
+        html.append(f"""
         <tr>
             <td style="border: 1px solid #e2e8f0; padding: 8px; background-color: {region_bg}; font-weight: bold; color: #166534;">{p.region or '-'}</td>
             <td style="border: 1px solid #e2e8f0; padding: 8px;">{proj_info}</td>
             <td style="border: 1px solid #e2e8f0; padding: 8px;">{p.responsible or ''}</td>
-        """
+        """)
         
-        for i, d in enumerate(days):
-            k = d.isoformat()
-            cell = cell_by_key.get((p.id, k))
+        for d in days:
+            cell = labels.cell(p.id, d)
             
             content = "-"
             bg_color = "#ffffff"
             
-            if i >= 5: # Haftasonu
+            if d.weekday() >= 5: # Haftasonu
                 bg_color = "#fffbeb"
             
             if cell:
                 parts = []
                 
                 # Personel
-                if ass_map.get(cell.id):
-                    parts.append(", ".join(ass_map[cell.id]))
+                names = labels.names_for_cell(cell.id)
+                if names:
+                    parts.append(", ".join(names))
                     bg_color = "#dcfce7" # Dolu yeşil
                 elif cell.note or getattr(cell, "job_mail_body", None) or cell.shift:
                     bg_color = "#d1fae5" # Sadece not/detay/saat varsa açık yeşil
@@ -1378,16 +1356,16 @@ def generate_full_plan_html(week_start):
                 if parts:
                     content = "<br>".join(parts)
             
-            html += f'<td style="border: 1px solid #e2e8f0; padding: 8px; vertical-align: top; background-color: {bg_color};">{content}</td>'
+            html.append(f'<td style="border: 1px solid #e2e8f0; padding: 8px; vertical-align: top; background-color: {bg_color};">{content}</td>')
         
-        html += "</tr>"
+        html.append("</tr>")
             
-    html += """
+    html.append("""
         </tbody>
     </table>
-    """
+    """)
     
-    return html
+    return "".join(html)
 
 
 @realtime_bp.post("/api/table/send-email")
@@ -1710,6 +1688,30 @@ def on_leave_plan_updates():
     leave_room("plan_updates")
 
 
+@socketio.on("join_plan_week")
+def on_join_plan_week(data):
+    """Plan sayfasının gösterdiği haftanın odasına katıl (önceki hafta odasından çıkar)"""
+    current_user = get_current_user()
+    if not current_user or not current_user.is_authenticated:
+        return
+    room = plan_rooms.week_room((data or {}).get("week_start"))
+    if not room:
+        return
+    for r in rooms():
+        if r.startswith(plan_rooms.ROOM_PREFIX) and r != room:
+            leave_room(r)
+    join_room(room)
+    join_room(plan_rooms.ALL_WEEKS_ROOM)
+
+
+@socketio.on("leave_plan_week")
+def on_leave_plan_week():
+    """Hafta odalarından ayrıl"""
+    for r in rooms():
+        if r.startswith(plan_rooms.ROOM_PREFIX) or r == plan_rooms.ALL_WEEKS_ROOM:
+            leave_room(r)
+
+
 @socketio.on("cell_editing_start")
 def on_cell_editing_start(data):
     """Hücre düzenleme başladı bildirimi"""
@@ -1722,7 +1724,7 @@ def on_cell_editing_start(data):
         "work_date": data.get("work_date"),
         "user_id": current_user.id,
         "user_name": current_user.full_name or current_user.email or current_user.username
-    }, room="plan_updates", include_self=False)
+    }, room=plan_rooms.week_room(data.get("work_date")) or plan_rooms.ALL_WEEKS_ROOM, include_self=False)
 
 
 @socketio.on("cell_editing_end")
@@ -1736,7 +1738,7 @@ def on_cell_editing_end(data):
         "project_id": data.get("project_id"),
         "work_date": data.get("work_date"),
         "user_id": current_user.id
-    }, room="plan_updates", include_self=False)
+    }, room=plan_rooms.week_room(data.get("work_date")) or plan_rooms.ALL_WEEKS_ROOM, include_self=False)
 
 
 @socketio.on("join_task_updates")
@@ -5,11 +5,13 @@ Görev Takip Sistemi - Routes
 import os
 import json
 import threading
+import uuid
 from datetime import datetime, date, timedelta
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, current_app
 from werkzeug.utils import secure_filename
 from extensions import db, socketio
 from models import User, Task, TaskLog, TaskAttachment, Project, SubProject
+from services import shared_state
 
 tasks_bp = Blueprint("tasks", __name__, url_prefix="/tasks")
 
@@ -220,6 +222,13 @@ def send_task_email(task, event_type="created", changed_by_user=None, extra_cont
                 "task_id": task.id,
                 "project_codes": task.project_codes,
             },
+            # Özet açıksa (MAIL_DIGEST_SECONDS) aynı kişiye giden bildirimler tek mailde birleşir
+            digest={
+                "title": f"{task.task_no} - {task.subject}",
+                "intro": action_text,
+                "body_html": body_html,
+                "recipient_name": assigned_user_name if recipient_email == getattr(task.assigned_user, "email", None) else "",
+            },
         )
         log.info(f"Gorev bildirimi sonucu: ok={ok} {task.task_no} -> {recipient_email} ({event_type})")
         return ok
@@ -373,18 +382,28 @@ def _generate_task_email_html(task, action_text, context, extra_html=""):
 
 
 # --- Süresi geçen görevler için mail hatırlatma ---
-_deadline_mail_state = {"last_run_date": None, "running": False}
+DEADLINE_MAIL_LOCK_TTL_SECONDS = 3600
+
+
+def _deadline_mail_key(today: date) -> str:
+    return f"tasks:deadline_mail:{today.isoformat()}"
 
 
 def _send_deadline_emails_once_per_day_async():
     """
     Gün içinde bir kez süresi geçmiş görevler için mail gönder.
     Ağır çalışmayı HTTP yanıtından ayırmak için arka planda thread kullanır.
+    Günün tamamlandı bilgisi ve çalışma kilidi paylaşılan durumda tutulur (tüm işçilerde tek çalışma).
     """
     today = date.today()
-    if _deadline_mail_state.get("last_run_date") == today:
-        return
-    if _deadline_mail_state.get("running"):
+    state = shared_state.get_state()
+    try:
+        if state.get(_deadline_mail_key(today)):
+            return
+        owner = f"{shared_state.process_owner()}:{uuid.uuid4().hex}"
+        if not state.acquire_lock("tasks:deadline_mail", owner, DEADLINE_MAIL_LOCK_TTL_SECONDS):
+            return
+    except Exception:
         return
 
     # App context'i thread'e taşımak için
@@ -393,18 +412,20 @@ def _send_deadline_emails_once_per_day_async():
     def runner(app_obj):
         with app_obj.app_context():
             try:
-                _deadline_mail_state["running"] = True
-                _send_deadline_emails()
-                _deadline_mail_state["last_run_date"] = today
+                # Kilidi beklerken başka bir işçi bitirmiş olabilir
+                if not state.get(_deadline_mail_key(today)):
+                    _send_deadline_emails()
+                    state.set(_deadline_mail_key(today), True, ttl=2 * 24 * 3600)
             except Exception as exc:
                 import logging
                 logging.getLogger(__name__).exception("deadline email kontrolü başarısız: %s", exc)
             finally:
-                _deadline_mail_state["running"] = False
+                state.release_lock("tasks:deadline_mail", owner)
 
     try:
         threading.Thread(target=runner, args=(app,), daemon=True).start()
     except Exception as e:
+        state.release_lock("tasks:deadline_mail", owner)
         print(f"Error starting deadline mail thread: {e}")
 
 
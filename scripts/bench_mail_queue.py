@@ -0,0 +1,206 @@
+"""
+Mail kuyruğu verim testi (gerçek sağlayıcı olmadan).
+
+Yerel SMTP alıcısını (scripts/smtp_sink.py) başlatır, MailQueue'ya N adet
+gerçekçi öğe (HTML tablo + ortak ekler) ekler ve MailService.process_queue
+ile boşaltır. Rapor: mail/sn, kuyruğa giriş -> teslim gecikmesi (p50/p95),
+tekrar denemeler, SMTP bağlantı / oturum sayıları.
+
+Tekrar denemeler normalde dakikalarca geri çekilir (mail_rate.backoff_seconds);
+test beklemez: zamanı gelmemiş bekleyenler "ileri sarılır" ve kaç tur
+sürdüğü raporlanır.
+
+Varsayılan olarak geçici bir SQLite veritabanı kullanılır (gerçek veriye dokunmaz):
+    python scripts/bench_mail_queue.py -n 200 --latency-ms 20 --fail-rate 0.05
+    python scripts/bench_mail_queue.py -n 500 --workers 2 --json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.smtp_sink import SmtpSink  # noqa: E402
+
+ROW_HTML = "<tr><td>{d}</td><td>Istanbul</td><td>P{i} - Fiber Altyapi</td><td>08:30 - 18:00</td><td>34 AB {i}</td><td>Ekip {t}</td><td>Kurulum ve test</td></tr>"
+
+
+def _percentile(vals, q):
+    if not vals:
+        return None
+    vals = sorted(vals)
+    return vals[min(len(vals) - 1, max(0, int(round(q * (len(vals) - 1)))))]
+
+
+def _messages(count, recipients, attachments, cfg):
+    for i in range(count):
+        rows = "".join(ROW_HTML.format(d=f"2026-01-{(k % 28) + 1:02d}", i=i, t=i % 7) for k in range(8))
+        yield dict(
+            mail_type="weekly",
+            recipients=[f"user{i}-{j}@bench{i % 5}.example.test" for j in range(recipients)],
+            subject=f"Haftalik Plan #{i}",
+            html=f"<p>Merhaba Kisi {i},</p><table>{rows}</table>",
+            attachments=attachments,
+            meta={"type": "weekly", "bench": True},
+            cfg_override=cfg,
+        )
+
+
+def run_benchmark(app, *, count=200, recipients=1, attachments=1, attachment_kb=256, latency=0.0,
+                  fail_rate=0.0, drop_rate=0.0, workers=1, seed=1, max_passes=200) -> dict:
+    """Kuyruğu doldurup boşaltır; ölçümleri sözlük olarak döner (app bağlamı gerekmez)."""
+    from extensions import db
+    from models import MailQueue
+    from services import blob_store, mail_metrics, mail_rate, smtp_pool
+    from services.mail_service import MailService
+
+    rng = random.Random(seed)
+    with SmtpSink(latency=latency, fail_rate=fail_rate, drop_rate=drop_rate, seed=seed) as sink, \
+            tempfile.TemporaryDirectory() as tmp, app.app_context():
+        # Hız sınırı ölçümü bozmasın; recipients_per_message = alıcı sayısı (tek mesaj)
+        cfg = sink.mail_cfg(rate_per_minute=10 ** 6, rate_burst=10 ** 6, recipients_per_message=recipients)
+        stored = []
+        for k in range(attachments):
+            path = os.path.join(tmp, f"ek-{k}.pdf")
+            with open(path, "wb") as f:
+                f.write(rng.randbytes(attachment_kb * 1024))
+            sha, size = blob_store.put_file(path)
+            stored.append({"filename": f"ek-{k}.pdf", "content_type": "application/pdf", "blob": sha, "size": size})
+
+        mail_rate.reset()
+        mail_metrics.reset()
+        smtp_pool.close_all()
+        pool_before = smtp_pool.get_pool().stats()
+
+        t0 = time.perf_counter()
+        queued = MailService.send_many(list(_messages(count, recipients, stored, cfg)))
+        enqueue_seconds = time.perf_counter() - t0
+        ids = [r[0] for r in db.session.query(MailQueue.id).filter(MailQueue.meta_json.like('%"bench": true%')).all()]
+        db.session.remove()
+
+        passes = 0
+        fast_forwards = 0
+        started = time.perf_counter()
+        while passes < max_passes:
+            passes += 1
+            claimed = []
+            threads = [
+                threading.Thread(target=lambda k=k: claimed.append(MailService.process_queue(app, worker_id=f"bench-{k + 1}")))
+                for k in range(workers)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            if any(claimed):
+                continue
+            left = MailQueue.query.filter(MailQueue.id.in_(ids), MailQueue.status.in_(["pending", "processing"])).count()
+            if not left:
+                break
+            # Geri çekilmeyi beklemeden ileri sar
+            MailQueue.query.filter(MailQueue.id.in_(ids), MailQueue.status == "pending").update(
+                {"next_attempt_at": None}, synchronize_session=False
+            )
+            db.session.commit()
+            fast_forwards += 1
+        elapsed = time.perf_counter() - started
+        smtp_pool.close_all()
+
+        items = MailQueue.query.filter(MailQueue.id.in_(ids)).all()
+        created = {}
+        for it in items:
+            for addr in json.loads(it.recipients):
+                created[addr] = it.created_at
+        first_seen = {}
+        for m in sink.messages:
+            for addr in m.rcpts:
+                first_seen.setdefault(addr, m.received_at)
+        latencies = [
+            max(0.0, first_seen[a] - created[a].timestamp()) for a in created if a in first_seen and created[a]
+        ]
+        statuses = {}
+        for it in items:
+            statuses[it.status] = statuses.get(it.status, 0) + 1
+        sent = statuses.get("sent", 0)
+        pool_after = smtp_pool.get_pool().stats()
+        snap = mail_metrics.get_metrics().snapshot()
+
+        return {
+            "count": count,
+            "queued": queued,
+            "enqueue_seconds": round(enqueue_seconds, 4),
+            "elapsed_seconds": round(elapsed, 4),
+            "mails_per_second": round(sent / elapsed, 2) if elapsed > 0 else None,
+            "latency_p50": _percentile(latencies, 0.5),
+            "latency_p95": _percentile(latencies, 0.95),
+            "statuses": statuses,
+            "retries": sum(int(it.retry_count or 0) for it in items),
+            "passes": passes,
+            "fast_forwards": fast_forwards,
+            "errors": snap["errors"],
+            "deferred": snap["deferred"],
+            "smtp_connects": pool_after["connects"] - pool_before["connects"],
+            "smtp_reuses": pool_after["reuses"] - pool_before["reuses"],
+            "sink": sink.stats(),
+        }
+
+
+def _load_app(db_url):
+    os.environ["DB_URL"] = db_url
+    from app import app, ensure_schema
+    from extensions import db
+
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+        ensure_schema()
+    return app
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Mail kuyruğu verim testi (yerel SMTP alıcısı ile)")
+    ap.add_argument("-n", "--count", type=int, default=200, help="kuyruğa eklenecek mail sayısı")
+    ap.add_argument("--recipients", type=int, default=1, help="mail başına alıcı")
+    ap.add_argument("--attachments", type=int, default=1, help="her maile eklenen (ortak) dosya sayısı")
+    ap.add_argument("--attachment-kb", type=int, default=256)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="alıcının DATA başına gecikmesi")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="451 geçici hata olasılığı")
+    ap.add_argument("--drop-rate", type=float, default=0.0, help="bağlantı kopması olasılığı")
+    ap.add_argument("--workers", type=int, default=1, help="eşzamanlı process_queue çağrısı")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--db-url", default=None, help="varsayılan: geçici SQLite")
+    ap.add_argument("--json", action="store_true", help="sonucu JSON yaz")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _load_app(args.db_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        app.instance_path = tmp
+        result = run_benchmark(
+            app, count=args.count, recipients=args.recipients, attachments=args.attachments,
+            attachment_kb=args.attachment_kb, latency=args.latency_ms / 1000.0, fail_rate=args.fail_rate,
+            drop_rate=args.drop_rate, workers=args.workers, seed=args.seed,
+        )
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    fmt = lambda v: "-" if v is None else f"{v * 1000:.1f} ms"  # noqa: E731
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {result['count']} mail, {args.workers} işçi")
+    print(f"  Kuyruğa ekleme : {result['enqueue_seconds']:.3f} sn")
+    print(f"  Boşaltma       : {result['elapsed_seconds']:.3f} sn  ({result['mails_per_second']} mail/sn)")
+    print(f"  Gecikme        : p50 {fmt(result['latency_p50'])}  p95 {fmt(result['latency_p95'])}")
+    print(f"  Durumlar       : {result['statuses']}")
+    print(f"  Tekrar deneme  : {result['retries']} (tur: {result['passes']}, ileri sarma: {result['fast_forwards']})")
+    print(f"  Hatalar        : {result['errors'] or '-'}  Ertelenen: {result['deferred'] or '-'}")
+    print(f"  SMTP           : {result['smtp_connects']} bağlantı, {result['smtp_reuses']} yeniden kullanım")
+    print(f"  Alıcı          : {result['sink']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Yerel (süreç içi) SMTP alıcısı - mail yolunu gerçek sağlayıcıya gitmeden ölçmek için.
+
+Gerçek bir TCP soketi dinler; smtplib ile (havuz, login, DATA) birebir
+konuşur ama mesajları yalnızca bellekte kaydeder. Gecikme ve hata enjekte
+edilebilir:
+    latency      DATA cevabından önce beklenen süre (sn)
+    fail_rate    DATA'ya "451 geçici hata" dönme olasılığı
+    drop_rate    DATA sırasında bağlantıyı koparma olasılığı
+
+Kullanım:
+    with SmtpSink(latency=0.02, fail_rate=0.05) as sink:
+        cfg = sink.mail_cfg()        # send_email_smtp / MailService için cfg_override
+        ...
+        sink.messages                # [(mail_from, [rcpt], boyut, alındığı an)]
+"""
+import random
+import socketserver
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+
+class SinkMessage(NamedTuple):
+    mail_from: str
+    rcpts: List[str]
+    size: int
+    received_at: float  # time.time()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode("ascii"))
+        self.wfile.flush()
+
+    def handle(self):
+        sink: "SmtpSink" = self.server.sink
+        with sink._lock:
+            sink.connections += 1
+        self._reply("220 smtp-sink ESMTP")
+        mail_from, rcpts = "", []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            verb = line.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.wfile.write(b"250-smtp-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+                self.wfile.flush()
+            elif verb == "AUTH":
+                with sink._lock:
+                    sink.logins += 1
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                mail_from, rcpts = line.split(":", 1)[1].strip().strip("<>"), []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                rcpts.append(line.split(":", 1)[1].strip().strip("<>"))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk:
+                        return
+                    if chunk in (b".\r\n", b".\n"):
+                        break
+                    size += len(chunk)
+                if sink.latency:
+                    time.sleep(sink.latency)
+                roll = sink._roll()
+                if roll < sink.drop_rate:
+                    with sink._lock:
+                        sink.dropped += 1
+                    return
+                if roll < sink.drop_rate + sink.fail_rate:
+                    with sink._lock:
+                        sink.failed += 1
+                    self._reply("451 4.3.0 Temporary failure (injected)")
+                else:
+                    with sink._lock:
+                        sink.messages.append(SinkMessage(mail_from, list(rcpts), size, time.time()))
+                    self._reply("250 2.0.0 Queued")
+                mail_from, rcpts = "", []
+            elif verb == "RSET":
+                mail_from, rcpts = "", []
+                self._reply("250 OK")
+            elif verb == "NOOP":
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SmtpSink:
+    def __init__(self, *, latency: float = 0.0, fail_rate: float = 0.0, drop_rate: float = 0.0,
+                 seed: Optional[int] = None, host: str = "127.0.0.1", port: int = 0):
+        self.latency = float(latency)
+        self.fail_rate = float(fail_rate)
+        self.drop_rate = float(drop_rate)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.messages: List[SinkMessage] = []
+        self.connections = 0
+        self.logins = 0
+        self.failed = 0
+        self.dropped = 0
+        self._server = _Server((host, port), _Handler)
+        self._server.sink = self
+        self._thread: Optional[threading.Thread] = None
+
+    def _roll(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def mail_cfg(self, **extra) -> dict:
+        host, port = self.address
+        cfg = {
+            "host": host,
+            "port": port,
+            "user": "bench@example.test",
+            "password": "bench",
+            "from_addr": "bench@example.test",
+            "use_tls": False,
+            "use_ssl": False,
+        }
+        cfg.update(extra)
+        return cfg
+
+    def start(self) -> "SmtpSink":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="smtp-sink", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "accepted": len(self.messages),
+                "failed_injected": self.failed,
+                "dropped_injected": self.dropped,
+                "connections": self.connections,
+                "logins": self.logins,
+            }
+
+    def __enter__(self) -> "SmtpSink":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
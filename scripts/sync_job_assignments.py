@@ -21,8 +21,10 @@ def main():
     end = date.today() + timedelta(days=90)
 
     with app.app_context():
-        upsert_jobs_for_range(start, end)
+        diff = upsert_jobs_for_range(start, end)
         print(f"Job atamalari senkronize edildi: {start} - {end}")
+        if diff is not None:
+            print(f"JobAssignment: +{diff.rows_added} / -{diff.rows_removed} satir")
     return 0
 
 if __name__ == "__main__":
@@ -24,6 +24,8 @@ from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from flask import current_app
 
+from services import settings_cache
+
 log = logging.getLogger('arvento')
 
 # =================== ENCRYPTION ===================
@@ -114,6 +116,10 @@ def load_arvento_settings() -> Dict[str, Any]:
     Dönen dict: username, pin1, pin2, language (şifreli değerler)
     """
     path = _get_settings_path()
+    return settings_cache.get(path, lambda: _read_settings_file(path))
+
+
+def _read_settings_file(path: str) -> Dict[str, Any]:
     if not os.path.exists(path):
         return {}
     
@@ -149,6 +155,7 @@ def save_arvento_settings(username: str, pin1: str, pin2: str, language: str = "
         os.chmod(path, 0o600)
     except Exception:
         pass
+    settings_cache.invalidate(path)
     
     log.info("Arvento settings saved successfully")
 
@@ -159,17 +166,22 @@ def get_decrypted_credentials() -> Dict[str, str]:
     Bu fonksiyon sadece backend içinde kullanılmalı!
     Dönen bilgiler asla log'lanmamalı veya frontend'e gönderilmemeli.
     """
-    settings = load_arvento_settings()
-    if not settings:
-        return {}
-    
-    try:
+    def _decrypt() -> Dict[str, str]:
+        settings = load_arvento_settings()
+        if not settings:
+            return {}
         return {
             'username': decrypt_value(settings.get('username', '')),
             'pin1': decrypt_value(settings.get('pin1', '')),
             'pin2': decrypt_value(settings.get('pin2', '')),
             'language': settings.get('language', 'TR')
         }
+
+    # Her araç sorgusunda şifre çözülmez; ayar dosyası veya anahtar değişince yeniden çözülür
+    try:
+        return settings_cache.get(
+            _get_settings_path(), _decrypt, tag="credentials", extra=os.getenv('ARVENTO_ENCRYPTION_KEY')
+        )
     except Exception as e:
         log.error(f"Failed to decrypt credentials: {type(e).__name__}")
         return {}
@@ -0,0 +1,97 @@
+"""
+Küme farkı ile atama eşitleme (CellAssignment / JobAssignment).
+
+Eski akış her senkronizasyonda sahibin (hücre/iş) tüm atamalarını silip
+yeniden ekliyordu. Burada mevcut (sahip, kişi) çiftleri tek sorguda okunur,
+istenen kümeyle farkı alınır ve yalnızca değişen satırlar toplu INSERT ve
+`DELETE ... WHERE (sahip, person_id) IN (...)` ile yazılır.
+Commit çağırana aittir.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, Set, Tuple
+
+from sqlalchemy import select, tuple_
+
+# SQLite değişken sınırına takılmamak için parça boyu (çift başına 2 parametre)
+CHUNK = 400
+
+
+@dataclass
+class LinkDiff:
+    added: Dict[int, Set[int]] = field(default_factory=dict)
+    removed: Dict[int, Set[int]] = field(default_factory=dict)
+
+    @property
+    def rows_added(self) -> int:
+        return sum(len(v) for v in self.added.values())
+
+    @property
+    def rows_removed(self) -> int:
+        return sum(len(v) for v in self.removed.values())
+
+    @property
+    def changed(self) -> int:
+        return self.rows_added + self.rows_removed
+
+    def merge(self, other: "LinkDiff") -> "LinkDiff":
+        for k, v in other.added.items():
+            self.added.setdefault(k, set()).update(v)
+        for k, v in other.removed.items():
+            self.removed.setdefault(k, set()).update(v)
+        return self
+
+
+def _chunks(items: List, size: int = CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def reconcile(model, owner_attr: str, desired: Mapping[int, Iterable[int]]) -> LinkDiff:
+    """
+    `model` tablosunda her sahip için kişi kümesini `desired` ile eşitler.
+    model: CellAssignment veya JobAssignment; owner_attr: "cell_id" / "job_id".
+    desired'da olmayan sahiplere dokunulmaz.
+    """
+    from extensions import db
+
+    target: Dict[int, Set[int]] = {
+        int(owner): {int(p) for p in (people or []) if p}
+        for owner, people in (desired or {}).items()
+        if owner
+    }
+    diff = LinkDiff()
+    if not target:
+        return diff
+
+    table = model.__table__
+    owner_col = table.c[owner_attr]
+    person_col = table.c.person_id
+
+    # Bekleyen ORM nesneleri (yeni hücre/iş) önce veritabanına insin
+    db.session.flush()
+
+    current: Dict[int, Set[int]] = {owner: set() for owner in target}
+    owners = list(target.keys())
+    for part in _chunks(owners, CHUNK * 2):
+        rows = db.session.execute(select(owner_col, person_col).where(owner_col.in_(part))).fetchall()
+        for owner, pid in rows:
+            current[int(owner)].add(int(pid))
+
+    to_insert: List[dict] = []
+    to_delete: List[Tuple[int, int]] = []
+    for owner, want in target.items():
+        have = current.get(owner, set())
+        add = want - have
+        rem = have - want
+        if add:
+            diff.added[owner] = add
+            to_insert.extend({owner_attr: owner, "person_id": pid} for pid in sorted(add))
+        if rem:
+            diff.removed[owner] = rem
+            to_delete.extend((owner, pid) for pid in sorted(rem))
+
+    for part in _chunks(to_delete):
+        db.session.execute(table.delete().where(tuple_(owner_col, person_col).in_(part)))
+    if to_insert:
+        db.session.execute(table.insert(), to_insert)
+    return diff
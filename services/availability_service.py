@@ -0,0 +1,316 @@
+"""
+Personel müsaitlik motoru (plan özeti, boşta personel, gün özeti).
+
+Bir tarih aralığı için CellAssignment/PlanCell, PersonDayStatus ve
+PersonnelStatusType verilerini tabloda birer sorguyla yükler ve personel x gün
+matrisini bit kümeleri olarak tutar: her gün/kategori için bir int, i. bit
+people[i] kişisini temsil eder. Sayımlar ve listeler (boşta, ana kadro, yardımcı,
+alt yüklenici, durum tipleri) bu kümeler üzerinde &, |, ~ ile hesaplanır; kişi
+başına sorgu veya lazy firma/seviye yüklemesi yapılmaz.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from extensions import db
+from models import CellAssignment, Firma, Person, PersonDayStatus, PersonnelStatusType, PlanCell, Project, Seviye
+
+OFFICE_PROJECT_PREFIX = "9026-0001"
+NO_FIRM_LABEL = "Firma belirtilmemiş"
+SEVIYE_KEYS = (
+    ("ana_kadro", "Ana kadro"),
+    ("yardimci", "Yardımcı"),
+    ("alt_yuklenici", "Alt yüklenici"),
+)
+
+
+@dataclass(frozen=True)
+class PersonRow:
+    id: int
+    full_name: str
+    email: str
+    phone: str
+    tc_no: str
+    role: str
+    durum: str
+    firma_id: Optional[int]
+    firma_name: Optional[str]
+    seviye_name: Optional[str]
+
+
+@dataclass(frozen=True)
+class StatusTypeRow:
+    id: int
+    name: str
+    code: str
+    color: str
+    icon: str
+    visible: bool
+    subproject_id: Optional[int]
+
+
+def _iso(d: date) -> str:
+    return d.strftime("%Y-%m-%d")
+
+
+def bits(mask: int) -> Iterable[int]:
+    """Yield the set bit positions of `mask` in ascending order."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class AvailabilityMatrix:
+    """
+    Personel x gün durum matrisi. Örnek üretmek için `AvailabilityMatrix.load(days)`.
+
+    Gün bazında tutulan kümeler:
+      - busy:        iptal edilmemiş bir hücreye atanmış
+      - assigned:    herhangi bir hücreye atanmış (iptal dahil), vardiya kırılımı `assigned_by_shift`
+      - office:      9026-0001% projesine atanmış (iptal dahil)
+      - mapped[st]:  iptal edilmemiş hücrenin alt projesi (veya ofis fallback'i) ile durum tipine eşlenen
+      - status[s]:   PersonDayStatus.status değeri s olan
+      - status_type[st]: PersonDayStatus.status_type_id == st ve status != available
+    """
+
+    def __init__(self, days: Sequence[date], people: List[PersonRow], status_types: List[StatusTypeRow]):
+        self.days = list(days)
+        self.people = people
+        self.status_types = status_types
+        self.index: Dict[int, int] = {p.id: i for i, p in enumerate(people)}
+        self.all_mask = (1 << len(people)) - 1
+
+        self.active_mask = 0
+        self.seviye_masks: Dict[str, int] = {}
+        self.firm_masks: Dict[str, int] = {}
+        for i, p in enumerate(people):
+            bit = 1 << i
+            if p.durum == "Aktif":
+                self.active_mask |= bit
+            if p.seviye_name:
+                self.seviye_masks[p.seviye_name] = self.seviye_masks.get(p.seviye_name, 0) | bit
+            label = p.firma_name or NO_FIRM_LABEL
+            self.firm_masks[label] = self.firm_masks.get(label, 0) | bit
+
+        keys = [_iso(d) for d in self.days]
+        self.busy: Dict[str, int] = {k: 0 for k in keys}
+        self.assigned: Dict[str, int] = {k: 0 for k in keys}
+        self.assigned_by_shift: Dict[str, Dict[str, int]] = {k: {} for k in keys}
+        self.office: Dict[str, int] = {k: 0 for k in keys}
+        self.mapped: Dict[str, Dict[int, int]] = {k: {} for k in keys}
+        self.status: Dict[str, Dict[str, int]] = {k: {} for k in keys}
+        self.status_type: Dict[str, Dict[int, int]] = {k: {} for k in keys}
+
+    # ---------- loading ----------
+    @classmethod
+    def load(cls, days: Sequence[date], *, active_only: bool = False) -> "AvailabilityMatrix":
+        days = sorted(days)
+        if not days:
+            days = [date.today()]
+        start, end = days[0], days[-1]
+
+        people_q = (
+            db.session.query(
+                Person.id, Person.full_name, Person.email, Person.phone, Person.tc_no,
+                Person.role, Person.durum, Person.firma_id, Firma.name, Seviye.name,
+            )
+            .outerjoin(Firma, Firma.id == Person.firma_id)
+            .outerjoin(Seviye, Seviye.id == Person.seviye_id)
+        )
+        if active_only:
+            people_q = people_q.filter(Person.durum == "Aktif")
+        people = [
+            PersonRow(
+                id=int(pid), full_name=name, email=email or "", phone=phone or "", tc_no=tc or "",
+                role=role or "", durum=durum or "", firma_id=firma_id,
+                firma_name=firma_name, seviye_name=seviye_name,
+            )
+            for pid, name, email, phone, tc, role, durum, firma_id, firma_name, seviye_name
+            in people_q.order_by(Person.full_name.asc(), Person.id.asc()).all()
+        ]
+
+        status_types = [
+            StatusTypeRow(
+                id=int(st.id), name=st.name, code=st.code, color=st.color or "#64748b",
+                icon=st.icon or "📋", visible=bool(getattr(st, "visible_in_summary", True)),
+                subproject_id=st.subproject_id,
+            )
+            for st in PersonnelStatusType.query.filter_by(is_active=True)
+            .order_by(PersonnelStatusType.display_order.asc()).all()
+        ]
+
+        m = cls(days, people, status_types)
+
+        sub_to_status = {st.subproject_id: st.id for st in status_types if st.subproject_id}
+        office_type_id = next((st.id for st in status_types if st.code == "office"), None)
+
+        rows = (
+            db.session.query(
+                CellAssignment.person_id, PlanCell.work_date, PlanCell.status,
+                PlanCell.subproject_id, PlanCell.shift, Project.project_code,
+            )
+            .join(PlanCell, PlanCell.id == CellAssignment.cell_id)
+            .join(Project, Project.id == PlanCell.project_id)
+            .filter(PlanCell.work_date >= start, PlanCell.work_date <= end)
+            .all()
+        )
+        for person_id, work_date, cell_status, subproject_id, shift, project_code in rows:
+            i = m.index.get(person_id)
+            k = _iso(work_date)
+            if i is None or k not in m.busy:
+                continue
+            bit = 1 << i
+            m.assigned[k] |= bit
+            if shift:
+                by_shift = m.assigned_by_shift[k]
+                by_shift[shift] = by_shift.get(shift, 0) | bit
+            is_office = bool(project_code and project_code.startswith(OFFICE_PROJECT_PREFIX))
+            if is_office:
+                m.office[k] |= bit
+            if cell_status == "cancelled":
+                continue
+            m.busy[k] |= bit
+            st_id = sub_to_status.get(subproject_id) if subproject_id else None
+            if st_id is None and is_office:
+                st_id = office_type_id
+            if st_id is not None:
+                m.mapped[k][st_id] = m.mapped[k].get(st_id, 0) | bit
+
+        status_rows = (
+            db.session.query(PersonDayStatus.person_id, PersonDayStatus.work_date,
+                             PersonDayStatus.status, PersonDayStatus.status_type_id)
+            .filter(PersonDayStatus.work_date >= start, PersonDayStatus.work_date <= end)
+            .all()
+        )
+        for person_id, work_date, status, status_type_id in status_rows:
+            i = m.index.get(person_id)
+            k = _iso(work_date)
+            if i is None or k not in m.status:
+                continue
+            bit = 1 << i
+            s = status or "available"
+            m.status[k][s] = m.status[k].get(s, 0) | bit
+            if status_type_id and s != "available":
+                m.status_type[k][status_type_id] = m.status_type[k].get(status_type_id, 0) | bit
+        return m
+
+    # ---------- helpers ----------
+    def rows(self, mask: int) -> List[PersonRow]:
+        return [self.people[i] for i in bits(mask)]
+
+    def names(self, mask: int) -> List[str]:
+        return [self.people[i].full_name for i in bits(mask)]
+
+    def status_mask(self, day_iso: str, *statuses: str) -> int:
+        by_status = self.status.get(day_iso, {})
+        mask = 0
+        for s in statuses:
+            mask |= by_status.get(s, 0)
+        return mask
+
+    def not_available_mask(self, day_iso: str) -> int:
+        by_status = self.status.get(day_iso, {})
+        mask = 0
+        for s, m in by_status.items():
+            if s != "available":
+                mask |= m
+        return mask
+
+    def assigned_mask(self, day_iso: str, shifts: Optional[Iterable[str]] = None) -> int:
+        if not shifts:
+            return self.assigned.get(day_iso, 0)
+        by_shift = self.assigned_by_shift.get(day_iso, {})
+        mask = 0
+        for s in set(shifts):
+            mask |= by_shift.get(s, 0)
+        return mask
+
+    def idle_mask(self, day_iso: str) -> int:
+        """Aktif, iptal edilmemiş işi/ofis ataması olmayan ve izinli olmayan personel."""
+        return (
+            self.active_mask
+            & ~self.busy.get(day_iso, 0)
+            & ~self.office.get(day_iso, 0)
+            & ~self.not_available_mask(day_iso)
+        )
+
+    # ---------- plan grid summary ----------
+    def day_summary(self, day_iso: str) -> dict:
+        """plan.html personel özeti (tek gün)."""
+        leave_mask = self.status_mask(day_iso, "leave")
+        rest = self.all_mask & ~leave_mask
+
+        leave_type_id = next((st.id for st in self.status_types if st.code in ("leave", "annual_leave")), None)
+        category_masks: Dict[int, int] = {st.id: 0 for st in self.status_types}
+        if leave_type_id is not None:
+            category_masks[leave_type_id] |= leave_mask
+
+        mapped = self.mapped.get(day_iso, {})
+        for st in self.status_types:
+            m = mapped.get(st.id, 0) & rest
+            category_masks[st.id] |= m
+            rest &= ~m
+
+        available = rest & ~self.busy.get(day_iso, 0)
+        counts = {key: available & self.seviye_masks.get(name, 0) for key, name in SEVIYE_KEYS}
+
+        firm_available = {}
+        for label, fmask in self.firm_masks.items():
+            m = available & fmask
+            if m:
+                firm_available[label] = m
+        # Firma listesi kişilerin (isim) sırasına göre oluşsun
+        firm_order = sorted(firm_available, key=lambda lbl: (firm_available[lbl] & -firm_available[lbl]).bit_length())
+        firm_names = {lbl: self.names(firm_available[lbl]) for lbl in firm_order}
+
+        return {
+            "total": bin(available).count("1"),
+            "ana_kadro": bin(counts["ana_kadro"]).count("1"),
+            "yardimci": bin(counts["yardimci"]).count("1"),
+            "alt_yuklenici": bin(counts["alt_yuklenici"]).count("1"),
+            "total_names": self.names(available),
+            "ana_kadro_names": self.names(counts["ana_kadro"]),
+            "yardimci_names": self.names(counts["yardimci"]),
+            "alt_yuklenici_names": self.names(counts["alt_yuklenici"]),
+            "firm_available": firm_names,
+            "firm_available_counts": {k: len(v) for k, v in firm_names.items()},
+            "status_categories": {
+                st.id: {
+                    "id": st.id,
+                    "name": st.name,
+                    "code": st.code,
+                    "color": st.color,
+                    "icon": st.icon,
+                    "visible": st.visible,
+                    "count": bin(category_masks[st.id]).count("1"),
+                    "names": self.names(category_masks[st.id]),
+                }
+                for st in self.status_types
+            },
+        }
+
+    def week_summary(self) -> Dict[str, dict]:
+        return {_iso(d): self.day_summary(_iso(d)) for d in self.days}
+
+    def status_types_json(self) -> List[dict]:
+        return [
+            {
+                "id": st.id,
+                "name": st.name,
+                "code": st.code,
+                "color": st.color,
+                "icon": st.icon,
+                "visible": st.visible,
+                "subproject_id": st.subproject_id,
+            }
+            for st in self.status_types
+        ]
+
+
+def load_week(start: date, *, active_only: bool = False) -> AvailabilityMatrix:
+    return AvailabilityMatrix.load([start + timedelta(days=i) for i in range(7)], active_only=active_only)
+
+
+def load_day(d: date, *, active_only: bool = False) -> AvailabilityMatrix:
+    return AvailabilityMatrix.load([d], active_only=active_only)
@@ -0,0 +1,185 @@
+"""
+İçerik adresli (SHA-256) ek dosya deposu - MailQueue ekleri.
+
+Ekler kuyruk satırına base64 olarak gömülmez; `instance/mail_blobs/ab/<sha256>`
+altına bir kez yazılır ve satır yalnızca özetini (blob) tutar. Aynı dosya
+birçok kişiye giden haftalık mailde tek kopya olarak kalır. Hangi blob'un
+kaç kuyruk satırınca kullanıldığı `mail_blob.ref_count` ile izlenir;
+satır gönderilince veya silinince referans bırakılır, sayacı sıfıra düşen
+blob'lar `collect_garbage` ile (bekleme süresinden sonra) silinir.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import BinaryIO, Iterable, Iterator, Tuple
+
+from flask import current_app
+
+log = logging.getLogger(__name__)
+
+BLOB_DIR = "mail_blobs"
+CHUNK_SIZE = 64 * 1024
+# Sayacı sıfırlanan blob bu süre sonra silinir (aynı anda yeniden eklenen dosyayla yarışmamak için)
+GC_GRACE_SECONDS = 3600
+
+
+def _root() -> str:
+    return os.path.join(current_app.instance_path, BLOB_DIR)
+
+
+def path_for(sha: str) -> str:
+    sha = (sha or "").lower()
+    if len(sha) != 64 or any(c not in "0123456789abcdef" for c in sha):
+        raise ValueError(f"Geçersiz blob anahtarı: {sha!r}")
+    return os.path.join(_root(), sha[:2], sha)
+
+
+def _store(chunks: Iterable[bytes]) -> Tuple[str, int]:
+    root = _root()
+    os.makedirs(root, exist_ok=True)
+    h = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=root, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                h.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+        sha = h.hexdigest()
+        final = path_for(sha)
+        if os.path.exists(final):
+            os.remove(tmp)
+            # Yetim dosya taraması yeni kullanılan dosyayı silmesin
+            os.utime(final)
+        else:
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            os.replace(tmp, final)
+        return sha, size
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _file_chunks(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def put_bytes(data: bytes) -> Tuple[str, int]:
+    """Veriyi depolar; (sha256, boyut) döner. Aynı içerik ikinci kez yazılmaz."""
+    data = data or b""
+    return _store(data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE))
+
+
+def put_file(path: str) -> Tuple[str, int]:
+    """Dosyayı belleğe almadan parça parça özetleyip depolar."""
+    return _store(_file_chunks(path))
+
+
+def open_blob(sha: str) -> BinaryIO:
+    return open(path_for(sha), "rb")
+
+
+def add_refs(refs: Iterable[Tuple[str, int]]) -> None:
+    """(sha, boyut) başına referans sayacını artırır. Commit çağırana aittir."""
+    from extensions import db
+    from models import MailBlob
+
+    counts = Counter()
+    sizes = {}
+    for sha, size in refs:
+        counts[sha] += 1
+        sizes[sha] = int(size or 0)
+    if not counts:
+        return
+    table = MailBlob.__table__
+    now = datetime.now()
+    for sha, n in counts.items():
+        res = db.session.execute(
+            table.update().where(table.c.sha256 == sha).values(ref_count=table.c.ref_count + n, updated_at=now)
+        )
+        if res.rowcount:
+            continue
+        db.session.execute(
+            table.insert().values(sha256=sha, size=sizes[sha], ref_count=n, created_at=now, updated_at=now)
+        )
+
+
+def release(shas: Iterable[str]) -> None:
+    """Referansları bırakır; dosya hemen silinmez (bkz. collect_garbage). Commit çağırana aittir."""
+    from extensions import db
+    from models import MailBlob
+
+    table = MailBlob.__table__
+    now = datetime.now()
+    for sha, n in Counter(s for s in shas if s).items():
+        db.session.execute(
+            table.update().where(table.c.sha256 == sha).values(ref_count=table.c.ref_count - n, updated_at=now)
+        )
+
+
+def collect_garbage(grace_seconds: int = GC_GRACE_SECONDS) -> int:
+    """
+    Referansı kalmamış blob'ları siler ve kayıtsız kalmış geçici/yetim dosyaları temizler.
+    Dönüş: silinen blob sayısı.
+    """
+    from extensions import db
+    from models import MailBlob
+
+    cutoff = datetime.now() - timedelta(seconds=grace_seconds)
+    table = MailBlob.__table__
+    stale = [
+        r[0]
+        for r in db.session.query(MailBlob.sha256)
+        .filter(MailBlob.ref_count <= 0, MailBlob.updated_at < cutoff)
+        .all()
+    ]
+    removed = 0
+    for sha in stale:
+        # Bu arada yeniden referans aldıysa satır silinmez, dosyaya dokunulmaz
+        res = db.session.execute(
+            table.delete().where(table.c.sha256 == sha, table.c.ref_count <= 0, table.c.updated_at < cutoff)
+        )
+        db.session.commit()
+        if not res.rowcount:
+            continue
+        try:
+            os.remove(path_for(sha))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            log.warning("Blob dosyası silinemedi: %s", sha)
+        removed += 1
+
+    # Kuyruk satırı commit edilemeden kalan dosyalar (kaydı olmayan) ve yarım kalmış geçici dosyalar
+    root = _root()
+    if os.path.isdir(root):
+        known = None
+        limit = time.time() - grace_seconds
+        for dirpath, _dirs, files in os.walk(root):
+            for name in files:
+                full = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(full) >= limit:
+                        continue
+                    if not name.startswith(".tmp-"):
+                        if known is None:
+                            known = {r[0] for r in db.session.query(MailBlob.sha256).all()}
+                        if name in known:
+                            continue
+                    os.remove(full)
+                except OSError:
+                    continue
+    return removed
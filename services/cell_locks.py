@@ -0,0 +1,274 @@
+"""
+Hücre düzenleme kilitleri (TTL'li, veritabanına yazmadan).
+
+Planlayıcılar düzenlerken kilidi sürekli yeniler; eskiden her kilit / uzatma
+bir PlanCell ekleme + CellLock okuma/yazma ve iki commit demekti. Kilitler
+artık bir `LockStore` içinde tutulur:
+
+- `acquire` karşılaştır-ve-ata: kilit boşsa, süresi dolmuşsa ya da aynı
+  kullanıcınınsa alınır/uzatılır; başkasınınsa mevcut kayıt döner.
+- `release` yalnızca sahibi eşleşirse kaldırır.
+- `sweep` süresi dolanları siler ve her biri için `cell_unlocked` yayar;
+  `start_sweeper` bunu arka planda `SWEEP_INTERVAL_SECONDS` aralıkla çalıştırır.
+
+Depo seçimi (ortam değişkeni CELL_LOCK_BACKEND):
+    memory (varsayılan)   süreç içi sözlük (tek işçi)
+    redis://host:6379/0   paylaşılan depo (çok işçili kurulum, `redis` paketi gerekir)
+Belirtilmezse SHARED_STATE_URL bir Redis adresiyse o kullanılır.
+
+Kilit anahtarı "<project_id>:<YYYY-MM-DD>" olup hücre satırı olmadan da çalışır.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+LOCK_TTL_SECONDS = 60
+SWEEP_INTERVAL_SECONDS = 5
+
+
+def lock_key(project_id: int, work_date) -> str:
+    wd = work_date.isoformat() if hasattr(work_date, "isoformat") else str(work_date)[:10]
+    return f"{int(project_id)}:{wd}"
+
+
+class MemoryLockStore:
+    """Süreç içi depo; tüm işlemler tek bir kilit altında atomiktir."""
+
+    def __init__(self):
+        self._locks: Dict[str, dict] = {}
+        self._mutex = threading.Lock()
+
+    def acquire(self, key: str, owner: int, ttl: float, info: dict, now: Optional[float] = None) -> Tuple[bool, dict]:
+        now = time.time() if now is None else now
+        with self._mutex:
+            cur = self._locks.get(key)
+            if cur and cur["owner"] != owner and cur["expires_at"] > now:
+                return False, dict(cur)
+            rec = dict(info, key=key, owner=owner, expires_at=now + ttl)
+            rec["locked_at"] = cur["locked_at"] if cur and cur["owner"] == owner and cur["expires_at"] > now else now
+            self._locks[key] = rec
+            return True, dict(rec)
+
+    def release(self, key: str, owner: int) -> Optional[dict]:
+        with self._mutex:
+            cur = self._locks.get(key)
+            if not cur or cur["owner"] != owner:
+                return None
+            return self._locks.pop(key)
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[dict]:
+        now = time.time() if now is None else now
+        with self._mutex:
+            cur = self._locks.get(key)
+            return dict(cur) if cur and cur["expires_at"] > now else None
+
+    def active(self, now: Optional[float] = None) -> List[dict]:
+        now = time.time() if now is None else now
+        with self._mutex:
+            return [dict(r) for r in self._locks.values() if r["expires_at"] > now]
+
+    def pop_expired(self, now: Optional[float] = None) -> List[dict]:
+        now = time.time() if now is None else now
+        with self._mutex:
+            expired = [k for k, r in self._locks.items() if r["expires_at"] <= now]
+            return [self._locks.pop(k) for k in expired]
+
+    def clear(self) -> None:
+        with self._mutex:
+            self._locks.clear()
+
+
+# Redis deposu: kilit <prefix>:lock:<key> hash'inde (owner, exp, data), süre sırası <prefix>:exp zset'inde.
+# Karşılaştır-ve-ata adımları Lua betikleriyle sunucuda atomik çalışır.
+_ACQUIRE_LUA = """
+local owner = redis.call('HGET', KEYS[1], 'owner')
+local exp = tonumber(redis.call('HGET', KEYS[1], 'exp') or '0')
+local now = tonumber(ARGV[2])
+if owner and owner ~= ARGV[1] and exp > now then
+  return {0, redis.call('HGET', KEYS[1], 'data')}
+end
+redis.call('HSET', KEYS[1], 'owner', ARGV[1], 'exp', ARGV[3], 'data', ARGV[4])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[5])
+return {1, ARGV[4]}
+"""
+
+_RELEASE_LUA = """
+if redis.call('HGET', KEYS[1], 'owner') ~= ARGV[1] then
+  return false
+end
+local data = redis.call('HGET', KEYS[1], 'data')
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[2])
+return data
+"""
+
+_SWEEP_LUA = """
+local now = tonumber(ARGV[1])
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 200)
+local out = {}
+for _, k in ipairs(due) do
+  local hk = ARGV[2] .. k
+  local exp = tonumber(redis.call('HGET', hk, 'exp') or '0')
+  if exp <= now then
+    local data = redis.call('HGET', hk, 'data')
+    redis.call('DEL', hk)
+    redis.call('ZREM', KEYS[1], k)
+    if data then table.insert(out, data) end
+  else
+    redis.call('ZADD', KEYS[1], exp, k)
+  end
+end
+return out
+"""
+
+
+class RedisLockStore:
+    """Çok işçili kurulumlar için paylaşılan depo (süre dolumu tüm işçilerde tek kez yayılır)."""
+
+    def __init__(self, url: str, prefix: str = "planner:cell_lock"):
+        import redis  # isteğe bağlı bağımlılık
+
+        self._r = redis.Redis.from_url(url, decode_responses=True)
+        self._prefix = prefix
+        self._exp_key = f"{prefix}:exp"
+        self._acquire = self._r.register_script(_ACQUIRE_LUA)
+        self._release = self._r.register_script(_RELEASE_LUA)
+        self._sweep = self._r.register_script(_SWEEP_LUA)
+
+    def _hkey(self, key: str) -> str:
+        return f"{self._prefix}:lock:{key}"
+
+    def acquire(self, key: str, owner: int, ttl: float, info: dict, now: Optional[float] = None) -> Tuple[bool, dict]:
+        now = time.time() if now is None else now
+        cur = self.get(key, now)
+        locked_at = cur["locked_at"] if cur and cur["owner"] == owner else now
+        rec = dict(info, key=key, owner=owner, expires_at=now + ttl, locked_at=locked_at)
+        ok, data = self._acquire(
+            keys=[self._hkey(key), self._exp_key],
+            args=[str(owner), now, rec["expires_at"], json.dumps(rec), key],
+        )
+        return bool(ok), json.loads(data) if data else rec
+
+    def release(self, key: str, owner: int) -> Optional[dict]:
+        data = self._release(keys=[self._hkey(key), self._exp_key], args=[str(owner), key])
+        return json.loads(data) if data else None
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[dict]:
+        now = time.time() if now is None else now
+        data = self._r.hget(self._hkey(key), "data")
+        rec = json.loads(data) if data else None
+        return rec if rec and rec["expires_at"] > now else None
+
+    def active(self, now: Optional[float] = None) -> List[dict]:
+        now = time.time() if now is None else now
+        keys = self._r.zrangebyscore(self._exp_key, f"({now}", "+inf")
+        if not keys:
+            return []
+        pipe = self._r.pipeline()
+        for k in keys:
+            pipe.hget(self._hkey(k), "data")
+        return [r for r in (json.loads(d) for d in pipe.execute() if d) if r["expires_at"] > now]
+
+    def pop_expired(self, now: Optional[float] = None) -> List[dict]:
+        now = time.time() if now is None else now
+        return [json.loads(d) for d in self._sweep(keys=[self._exp_key], args=[now, f"{self._prefix}:lock:"])]
+
+    def clear(self) -> None:
+        for k in self._r.zrange(self._exp_key, 0, -1):
+            self._r.delete(self._hkey(k))
+        self._r.delete(self._exp_key)
+
+
+def _make_store():
+    from services import shared_state
+
+    # Ayrıca belirtilmemişse paylaşılan durum deposu (SHARED_STATE_URL) kullanılır
+    backend = (os.getenv("CELL_LOCK_BACKEND") or shared_state.shared_url() or "memory").strip()
+    if backend.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            return RedisLockStore(backend)
+        except Exception as e:
+            log.error(f"CELL_LOCK_BACKEND kullanılamıyor, süreç içi depoya dönülüyor: {e}")
+    return MemoryLockStore()
+
+
+_store = _make_store()
+
+
+def get_store():
+    return _store
+
+
+def set_store(store) -> None:
+    """Depoyu değiştir (testler / özel kurulumlar)."""
+    global _store
+    _store = store
+
+
+def acquire(project_id: int, work_date, user_id: int, *, user_name: str = "", cell_id: Optional[int] = None,
+            ttl: float = LOCK_TTL_SECONDS) -> Tuple[bool, dict]:
+    key = lock_key(project_id, work_date)
+    info = {
+        "project_id": int(project_id),
+        "work_date": key.split(":", 1)[1],
+        "cell_id": cell_id,
+        "locked_by": user_name,
+    }
+    return _store.acquire(key, int(user_id), ttl, info)
+
+
+def release(project_id: int, work_date, user_id: int) -> Optional[dict]:
+    return _store.release(lock_key(project_id, work_date), int(user_id))
+
+
+def active_locks() -> List[dict]:
+    return _store.active()
+
+
+def _emit_unlocked(rec: dict, reason: str) -> None:
+    from services import plan_rooms
+
+    plan_rooms.emit_to_weeks("cell_unlocked", {
+        "cell_id": rec.get("cell_id"),
+        "project_id": rec.get("project_id"),
+        "work_date": rec.get("work_date"),
+        "reason": reason,
+    }, rec.get("work_date"))
+
+
+def emit_unlocked(rec: dict) -> None:
+    _emit_unlocked(rec, "released")
+
+
+def sweep(now: Optional[float] = None) -> int:
+    """Süresi dolan kilitleri kaldırır ve `cell_unlocked` yayar; kaldırılan sayısını döner."""
+    expired = _store.pop_expired(now)
+    for rec in expired:
+        _emit_unlocked(rec, "expired")
+    return len(expired)
+
+
+def start_sweeper(app) -> None:
+    """Süresi dolan kilitleri arka planda temizleyen thread'i başlatır (süreç başına bir kez)."""
+    if getattr(app, "_cell_lock_sweeper_started", False):
+        return
+    if getattr(app, "config", {}).get("TESTING"):
+        log.info("Cell lock sweeper skipped (TESTING=1).")
+        return
+
+    def sweeper():
+        while True:
+            time.sleep(SWEEP_INTERVAL_SECONDS)
+            try:
+                sweep()
+            except Exception as e:
+                log.error(f"Cell lock sweep error: {e}")
+
+    t = threading.Thread(target=sweeper, name="cell-lock-sweeper", daemon=True)
+    t.start()
+    setattr(app, "_cell_lock_sweeper_started", True)
@@ -0,0 +1,176 @@
+"""
+Hücre sürüm çakışmalarında alan bazlı üç yönlü birleştirme.
+
+İstemci hücreyi `version` ile okur ve değiştirdiği alanları geri yollar. Bu arada
+başka biri hücreyi kaydettiyse eskiden doğrudan 409 dönüyordu. Artık:
+
+- base   : istemcinin okuduğu sürüm (`CellVersion.data_json`, o sürümün anlık görüntüsü)
+- mine   : istekteki alanlar
+- theirs : hücrenin şu anki hali
+
+Yalnızca istemcinin değiştirdiği alanlar (mine != base) yazılır. Aynı alanı
+diğer taraf da farklı bir değere değiştirdiyse (theirs != base ve mine != theirs)
+gerçek çakışmadır. Taban anlık görüntüsünde olmayan alanlarda (eski kayıtlar)
+mine != theirs ise yine çakışma sayılır.
+
+Sürümü artıran her yol `record_version` ile anlık görüntü yazmalıdır; aksi halde
+o sürümden gelen kayıtlar birleştirilemez ve eskisi gibi tümüyle 409 alır.
+
+Birleştirilebilir alanlarından biri değişen her hücrenin sürümünü `_before_flush`
+oturum hook'u artırır ve anlık görüntüsünü yazar (kopyalama, taşıma, geri alma gibi
+tüm yollar için tek yer). Sürümü kendisi yöneten yollar (save-with-version'ın
+koşullu UPDATE'i, iptal/geri yükleme) `version`'ı değiştirip `record_version`
+çağırır; hook bu hücreleri atlar. ORM'i atlayan toplu UPDATE'ler (ekip aracı)
+`version`'ı SQL'de artırır; anlık görüntüleri olmadığından o sürümlerden gelen
+kayıtlar 409 alır.
+"""
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from extensions import db
+from models import CellVersion
+
+
+def _text(v) -> Optional[str]:
+    return (str(v) if v is not None else "").strip() or None
+
+
+def _int_id(v) -> Optional[int]:
+    try:
+        return int(v or 0) or None
+    except (TypeError, ValueError):
+        return None
+
+
+# Birleştirilebilir alanlar ve istek değerinin normalize edilmesi
+MERGE_FIELDS = {
+    "shift": _text,
+    "note": _text,
+    "vehicle_info": _text,
+    "team_id": _int_id,
+    "subproject_id": _int_id,
+    "important_note": _text,
+    "isdp_info": _text,
+    "po_info": _text,
+    "job_mail_body": _text,
+    "assigned_user_id": _int_id,
+}
+
+_MISSING = object()
+
+
+def snapshot(cell) -> Dict[str, Any]:
+    return {f: getattr(cell, f, None) for f in MERGE_FIELDS}
+
+
+def parse_changes(data: dict) -> Dict[str, Any]:
+    """İstekte bulunan birleştirilebilir alanlar (normalize edilmiş)."""
+    return {f: parse(data.get(f)) for f, parse in MERGE_FIELDS.items() if f in data}
+
+
+def _version_row(cell, user_id: int, change_type: str) -> CellVersion:
+    return CellVersion(
+        cell_id=cell.id,
+        version=cell.version or 1,
+        data_json=json.dumps(snapshot(cell)),
+        changed_by_user_id=user_id,
+        changed_at=datetime.now(),
+        change_type=change_type,
+    )
+
+
+def record_version(cell, user_id: int, change_type: str = "update") -> CellVersion:
+    """Hücrenin güncel sürümü için anlık görüntü ekler (commit çağırana aittir)."""
+    rec = _version_row(cell, user_id, change_type)
+    db.session.add(rec)
+    return rec
+
+
+def _request_user_id() -> Optional[int]:
+    try:
+        from flask import has_request_context, session as http_session
+
+        if has_request_context():
+            return int(http_session.get("user_id") or 0) or None
+    except (RuntimeError, TypeError, ValueError):
+        pass
+    return None
+
+
+def _before_flush(session, _flush_context, _instances) -> None:
+    """Birleştirilebilir alanı değişen kayıtlı hücrelerde sürümü artırır ve anlık görüntü ekler."""
+    from sqlalchemy import inspect
+    from models import PlanCell
+
+    recorded = None
+    for cell in list(session.dirty):
+        if not isinstance(cell, PlanCell) or cell.id is None:
+            continue
+        attrs = inspect(cell).attrs
+        if attrs.version.history.has_changes():
+            continue  # sürümü yol kendisi artırdı
+        if not any(attrs[f].history.has_changes() for f in MERGE_FIELDS):
+            continue
+        if recorded is None:
+            recorded = {v.cell_id for v in session.new if isinstance(v, CellVersion)}
+        if cell.id in recorded:
+            continue  # save-with-version: koşullu UPDATE ile artırıp kaydetti
+        cell.version = (cell.version or 1) + 1
+        user_id = _request_user_id()
+        if user_id:
+            # Kullanıcısız yazımlarda (arka plan işleri) anlık görüntü yok: o sürümden gelen kayıt 409 alır
+            session.add(_version_row(cell, user_id, "update"))
+
+
+_hooks_installed = False
+
+
+def install_version_hooks() -> None:
+    """Sürüm artırma hook'unu kaydeder (idempotent)."""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    event.listen(Session, "before_flush", _before_flush)
+    _hooks_installed = True
+
+
+def base_snapshot(cell_id: int, version: int) -> Optional[Dict[str, Any]]:
+    """`version` sürümündeki alanlar; kayıt yoksa None (aynı sürüm birden çok yazıldıysa en yenisi)."""
+    rec = (
+        CellVersion.query.filter_by(cell_id=cell_id, version=version)
+        .order_by(CellVersion.id.desc())
+        .first()
+    )
+    if not rec:
+        return None
+    try:
+        data = json.loads(rec.data_json or "{}")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def three_way(base: Dict[str, Any], mine: Dict[str, Any], theirs: Dict[str, Any]) -> Tuple[Dict[str, Any], List[dict], List[str]]:
+    """
+    Dönüş: (yazılacak alanlar, çakışmalar, diğer taraftan korunan alanlar).
+    Çakışma öğesi: {"field", "base", "mine", "theirs"}.
+    """
+    to_apply: Dict[str, Any] = {}
+    conflicts: List[dict] = []
+    for field, value in mine.items():
+        b = base.get(field, _MISSING)
+        t = theirs.get(field)
+        if b is not _MISSING and value == b:
+            continue  # istemci bu alana dokunmadı
+        if value == t:
+            continue  # iki taraf aynı sonuca varmış
+        if b is _MISSING or t != b:
+            conflicts.append({"field": field, "base": None if b is _MISSING else b, "mine": value, "theirs": t})
+            continue
+        to_apply[field] = value
+    kept = [f for f in MERGE_FIELDS if f in base and theirs.get(f) != base.get(f) and f not in to_apply]
+    return to_apply, conflicts, kept
@@ -0,0 +1,231 @@
+"""
+Ortak, akışlı (streaming) Excel dışa aktarma motoru.
+
+Tüm .xlsx uçları openpyxl'in write-only kipini kullanır: satırlar bir
+üreteçten (generator) okunup doğrudan sayfa XML'ine yazılır, bellekte tam
+bir çalışma kitabı tutulmaz. Stiller adlandırılmış (NamedStyle) olarak kitap
+başına bir kez kaydedilir ve hücrelere adla verilir. Dosya geçici bir dosyaya
+yazılıp parça parça yanıta akıtılır; uzun dışa aktarmalarda belirli
+aralıklarla `time.sleep(0)` ile eventlet hub'ına sıra verilir.
+
+Kullanım:
+    cols = [Column("Ad", 25), Column("Durum", 12)]
+    rows = ([p.full_name, styled(p.durum, "wrap_top")] for p in q.yield_per(500))
+    return xlsx_response([Sheet("Personel", cols, rows)], "personel.xlsx")
+"""
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Sequence, Union
+
+from flask import Response, stream_with_context
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import coordinate_to_tuple
+from openpyxl.worksheet.views import Pane, Selection
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+CHUNK_SIZE = 64 * 1024
+# Bu kadar satırda bir eventlet hub'ına sıra ver
+YIELD_EVERY = 200
+# Bu boyuta kadar geçici dosya bellekte kalır, aşınca diske taşar
+SPOOL_MAX = 8 * 1024 * 1024
+
+
+def _solid(rgb: str) -> PatternFill:
+    return PatternFill(start_color=rgb, end_color=rgb, fill_type="solid")
+
+
+def _header(name: str, rgb: Optional[str] = None, *, size: Optional[int] = None, wrap: bool = False) -> NamedStyle:
+    if not rgb:
+        return NamedStyle(name=name, font=Font(bold=True))
+    return NamedStyle(
+        name=name,
+        font=Font(bold=True, color="FFFFFF", size=size) if size else Font(bold=True, color="FFFFFF"),
+        fill=_solid(rgb),
+        alignment=Alignment(horizontal="center", vertical="center", wrap_text=wrap),
+    )
+
+
+# Hazır adlandırılmış stiller (yalnızca kullanılanlar kitaba eklenir)
+NAMED_STYLES: Dict[str, Callable[[], NamedStyle]] = {
+    "header": lambda: _header("header"),
+    "header_dark": lambda: _header("header_dark", "404040", size=12),
+    "header_blue": lambda: _header("header_blue", "4F81BD"),
+    "header_navy": lambda: _header("header_navy", "366092"),
+    "header_sky": lambda: _header("header_sky", "3B82F6", size=11, wrap=True),
+    "wrap_top": lambda: NamedStyle(name="wrap_top", alignment=Alignment(vertical="top", wrap_text=True)),
+}
+
+
+class CellStyle(NamedTuple):
+    """Dinamik stil (ör. proje koduna göre renk); kitapta ilk kullanımda adlandırılmış stile çevrilir."""
+    fill: Optional[str] = None
+    font_color: Optional[str] = None
+    bold: bool = False
+    wrap: bool = False
+
+    @property
+    def name(self) -> str:
+        return f"cs_{self.fill or ''}_{self.font_color or ''}_{int(self.bold)}_{int(self.wrap)}"
+
+    def build(self) -> NamedStyle:
+        ns = NamedStyle(name=self.name)
+        if self.fill:
+            ns.fill = _solid(self.fill)
+        if self.font_color or self.bold:
+            ns.font = Font(bold=self.bold, color=self.font_color)
+        if self.wrap:
+            ns.alignment = Alignment(vertical="top", wrap_text=True)
+        return ns
+
+
+StyleRef = Union[str, CellStyle, None]
+
+
+class Styled(NamedTuple):
+    value: Any
+    style: StyleRef
+
+
+def styled(value: Any, style: StyleRef) -> Any:
+    """Satır üretecinde tek bir hücreye stil vermek için."""
+    return Styled(value, style) if style else value
+
+
+@dataclass
+class Column:
+    header: str
+    width: Optional[float] = 22
+    style: StyleRef = None  # Sütundaki veri hücrelerinin varsayılan stili
+
+
+@dataclass
+class Sheet:
+    title: str
+    columns: Sequence[Column]
+    rows: Iterable[Sequence[Any]] = ()
+    header_style: StyleRef = "header"
+    header_height: Optional[float] = None
+    row_height: Optional[float] = None
+    freeze_panes: Optional[str] = None
+
+
+def _freeze(ws, ref: str) -> None:
+    """
+    Bölmeyi doğrudan sayfa görünümüne yazar. write-only kipte <sheetViews> ilk
+    satırla birlikte XML'e geçer; bu yüzden satırlar eklenmeden önce çağrılmalıdır.
+    """
+    row, col = coordinate_to_tuple(ref)
+    if row <= 1 and col <= 1:
+        return
+    x_split, y_split = col - 1, row - 1
+    if x_split and y_split:
+        active = "bottomRight"
+    else:
+        active = "topRight" if x_split else "bottomLeft"
+    view = ws.sheet_view
+    view.pane = Pane(xSplit=x_split or None, ySplit=y_split or None, topLeftCell=ref, activePane=active, state="frozen")
+    view.selection = [Selection(pane=active, activeCell=ref, sqref=ref)]
+
+
+class StreamingWorkbook:
+    """Write-only kitap + adlandırılmış stil kaydı."""
+
+    def __init__(self):
+        self.wb = Workbook(write_only=True)
+        self._styles: set = set()
+
+    def style_name(self, style: StyleRef) -> Optional[str]:
+        if not style:
+            return None
+        if isinstance(style, CellStyle):
+            name, factory = style.name, style.build
+        else:
+            name, factory = style, NAMED_STYLES.get(style)
+            if factory is None:
+                raise KeyError(f"Tanımsız Excel stili: {style}")
+        if name not in self._styles:
+            self.wb.add_named_style(factory())
+            self._styles.add(name)
+        return name
+
+    def _cell(self, ws, value, style: StyleRef):
+        if isinstance(value, Styled):
+            value, style = value.value, value.style
+        if not style:
+            return value
+        c = WriteOnlyCell(ws, value=value)
+        c.style = self.style_name(style)
+        return c
+
+    def add_sheet(self, sheet: Sheet) -> int:
+        """Sayfayı yazar; yazılan veri satırı sayısını döndürür."""
+        ws = self.wb.create_sheet(title=(sheet.title or "Sheet")[:31])
+        for idx, col in enumerate(sheet.columns, 1):
+            if col.width:
+                ws.column_dimensions[get_column_letter(idx)].width = col.width
+        if sheet.freeze_panes:
+            _freeze(ws, sheet.freeze_panes)
+
+        row_no = 1
+        if sheet.columns:
+            if sheet.header_height:
+                ws.row_dimensions[row_no].height = sheet.header_height
+            ws.append([self._cell(ws, c.header, sheet.header_style) for c in sheet.columns])
+            row_no += 1
+
+        col_styles = [c.style for c in sheet.columns]
+        n_styles = len(col_styles)
+        written = 0
+        for row in sheet.rows:
+            # write-only kipte satır yüksekliği satır yazılmadan önce verilmeli
+            if sheet.row_height:
+                ws.row_dimensions[row_no].height = sheet.row_height
+            ws.append([
+                self._cell(ws, value, col_styles[i] if i < n_styles else None)
+                for i, value in enumerate(row)
+            ])
+            row_no += 1
+            written += 1
+            if written % YIELD_EVERY == 0:
+                time.sleep(0)
+        return written
+
+    def iter_bytes(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        tmp = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+        try:
+            self.wb.save(tmp)
+            tmp.seek(0)
+            while True:
+                chunk = tmp.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+                time.sleep(0)
+        finally:
+            tmp.close()
+
+
+def build_chunks(sheets: Iterable[Sheet]) -> Iterator[bytes]:
+    """Sayfaları sırayla yazar ve dosyayı parça parça üretir (sayfa listesi de üreteç olabilir)."""
+    book = StreamingWorkbook()
+    for sheet in sheets:
+        book.add_sheet(sheet)
+    if not book.wb.worksheets:
+        book.add_sheet(Sheet("Sheet", []))
+    yield from book.iter_bytes()
+
+
+def xlsx_response(sheets: Iterable[Sheet], filename: str) -> Response:
+    """
+    Akışlı .xlsx indirme yanıtı.
+    Satır üreteçleri yanıt gövdesi akarken, istek bağlamında (DB oturumu açıkken) tüketilir.
+    """
+    resp = Response(stream_with_context(build_chunks(sheets)), mimetype=XLSX_MIMETYPE)
+    resp.headers.set("Content-Disposition", "attachment", filename=filename)
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
@@ -0,0 +1,62 @@
+"""
+Olay güdümlü Job senkronizasyonu.
+
+Hücre yazımları (bkz. services/plan_changes.py) job_sync_queue'ya kirli hücre
+satırı ekler. `sync_dirty_cells` yalnızca bu hücreleri Job/JobAssignment ile
+eşitler ve işlediği kuyruk satırlarını siler. Kuyruk boşsa hiçbir şey yazmaz;
+bu sayede /kanban, /api/board/jobs ve raporlar gibi okuma uçları salt okunur kalır.
+Motoru outbox işçisi çalıştırır (commit sonrası uyandırılır).
+"""
+import logging
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def pending_count() -> int:
+    from extensions import db
+    from models import JobSyncQueue
+
+    return int(db.session.query(db.func.count(JobSyncQueue.id)).scalar() or 0)
+
+
+def sync_dirty_cells(limit: int = BATCH_SIZE) -> int:
+    """
+    Kuyruğun başındaki en fazla `limit` satırı işler ve commit eder.
+    Dönüş: işlenen kuyruk satırı sayısı (0 ise veritabanına yazılmadı).
+    """
+    from extensions import db
+    from models import JobSyncQueue
+    from utils import sync_jobs_for_cells
+
+    rows = (
+        db.session.query(JobSyncQueue.id, JobSyncQueue.cell_id)
+        .order_by(JobSyncQueue.id.asc())
+        .limit(limit)
+        .all()
+    )
+    if not rows:
+        return 0
+
+    queue_ids = [int(r[0]) for r in rows]
+    try:
+        sync_jobs_for_cells([r[1] for r in rows])
+        # Yalnızca okunan satırlar silinir; bu arada eklenenler sonraki tura kalır
+        JobSyncQueue.query.filter(JobSyncQueue.id.in_(queue_ids)).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(queue_ids)
+
+
+def drain(limit: int = BATCH_SIZE, max_rounds: int = 100) -> int:
+    """Kuyruk boşalana kadar işle. Dönüş: toplam işlenen satır."""
+    total = 0
+    for _ in range(max_rounds):
+        n = sync_dirty_cells(limit)
+        total += n
+        if n < limit:
+            break
+    return total
@@ -0,0 +1,139 @@
+"""
+MailLog saklama / arşivleme.
+
+create_mail_log her gönderim için önizleme ve çoğu zaman tam HTML gövde
+saklar; tablo sınırsız büyür ve mail log sayfası, API ve Excel dökümü her
+seferinde daha büyük tabloyu tarar. Bu modül `MAIL_LOG_RETENTION_DAYS`
+günden eski kayıtları `mail_log_archive` tablosuna taşır:
+
+- Filtrelenen alanlar (tarih, tür, durum, alıcı, konu, ekip...) kolon olarak kalır.
+- Gövde, hata metni ve meta tek bir zlib ile sıkıştırılmış JSON (`body_z`) olur;
+  arayüz bunları yalnızca detay açıldığında çözer (MailLogArchive özellikleri).
+- Taşıma partiler halinde yapılır (ekle + sil aynı commit'te), böylece hot tablo
+  kilitlenmez ve yarıda kesilen bir çalışma veri kaybetmez.
+
+Ayarlar (ortam değişkeni):
+    MAIL_LOG_RETENTION_DAYS  hot tabloda tutulacak gün (0 = arşivleme kapalı)
+"""
+import json
+import logging
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+
+log = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name) or default))
+    except ValueError:
+        return default
+
+
+MAIL_LOG_RETENTION_DAYS = _env_int("MAIL_LOG_RETENTION_DAYS", 90)
+ARCHIVE_BATCH_SIZE = 500
+# Mail işçisinin arşivlemeyi çalıştırma aralığı
+ARCHIVE_INTERVAL_SECONDS = 6 * 3600
+
+# Sıkıştırılan alanlar (geri kalanı kolon olarak kopyalanır)
+BODY_FIELDS = ("body_preview", "body_html", "error", "meta_json", "bcc_addr", "team_id")
+COLUMN_FIELDS = (
+    "id", "created_at", "mail_type", "kind", "ok", "error_code", "to_addr", "cc_addr", "subject",
+    "week_start", "team_name", "project_id", "job_id", "task_id", "user_id",
+    "attachments_count", "body_size_bytes", "sent_at",
+)
+
+
+def pack_body(values: dict) -> Optional[bytes]:
+    body = {k: values.get(k) for k in BODY_FIELDS if values.get(k) is not None}
+    if not body:
+        return None
+    return zlib.compress(json.dumps(body, ensure_ascii=False).encode("utf-8"), 6)
+
+
+def unpack_body(data: Optional[bytes]) -> dict:
+    if not data:
+        return {}
+    try:
+        return json.loads(zlib.decompress(data).decode("utf-8"))
+    except Exception as e:
+        log.error(f"MailLogArchive body decode error: {e}")
+        return {}
+
+
+def archive_older_than(days: Optional[int] = None, batch_size: int = ARCHIVE_BATCH_SIZE, now: Optional[datetime] = None) -> int:
+    """
+    `days` günden eski MailLog kayıtlarını arşive taşır; taşınan kayıt sayısını döner.
+    Uygulama bağlamı içinde çağrılır.
+    """
+    from extensions import db
+    from models import MailLog, MailLogArchive
+
+    days = MAIL_LOG_RETENTION_DAYS if days is None else days
+    if days <= 0:
+        return 0
+    cutoff = (now or datetime.now()) - timedelta(days=days)
+    archived_at = datetime.now()
+    cols = [getattr(MailLog, f) for f in COLUMN_FIELDS + BODY_FIELDS]
+    moved = 0
+    while True:
+        rows = (
+            db.session.query(*cols)
+            .filter(MailLog.created_at < cutoff)
+            .order_by(MailLog.created_at.asc(), MailLog.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        ids = [r.id for r in rows]
+        try:
+            # Önceki yarım kalmış bir çalışmadan arşive geçmiş olanlar tekrar eklenmez
+            done = {i for (i,) in db.session.query(MailLogArchive.id).filter(MailLogArchive.id.in_(ids)).all()}
+            values = []
+            for r in rows:
+                if r.id in done:
+                    continue
+                m = r._mapping
+                v = {f: m[f] for f in COLUMN_FIELDS}
+                v["kind"] = v["kind"] or "send"
+                v["ok"] = bool(v["ok"])
+                v["to_addr"] = v["to_addr"] or ""
+                v["subject"] = v["subject"] or ""
+                v["attachments_count"] = v["attachments_count"] or 0
+                v["body_size_bytes"] = v["body_size_bytes"] or 0
+                v["archived_at"] = archived_at
+                v["body_z"] = pack_body(m)
+                values.append(v)
+            if values:
+                db.session.execute(MailLogArchive.__table__.insert(), values)
+            MailLog.query.filter(MailLog.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            log.error(f"MailLog archive error: {e}")
+            break
+        moved += len(ids)
+        if len(rows) < batch_size:
+            break
+    if moved:
+        log.info(f"MailLog: {moved} kayıt arşive taşındı (>{days} gün).")
+    return moved
+
+
+def get_log(log_id: int):
+    """Hot tablodaki kaydı, yoksa arşivdekini döner (ikisi de yoksa None)."""
+    from extensions import db
+    from models import MailLog, MailLogArchive
+
+    return db.session.get(MailLog, log_id) or db.session.get(MailLogArchive, log_id)
+
+
+def log_model(source: Optional[str]):
+    """Liste / dışa aktarma ekranları için kaynak tablo: ?source=archive ise arşiv."""
+    from models import MailLog, MailLogArchive
+
+    return MailLogArchive if (source or "").strip() == "archive" else MailLog
+
@@ -0,0 +1,177 @@
+"""
+Bildirim maillerinin alıcı bazında özetlenmesi (digest).
+
+Görev bildirimleri ve süre bitimi mailleri her olay için ayrı kuyruk satırı
+oluşturur; 15 gecikmiş görevi olan kişi 15 mail alır. Özet açıkken
+(`MAIL_DIGEST_SECONDS` > 0) uygun mailler kuyruğa `digest_key`
+("<mail_type>|<alıcı>") ile ve pencere kadar ileri tarihli eklenir. İşçi,
+göndermeden önce penceresi dolan grupları tek satırda birleştirir:
+
+- Tek alıcılı, ekli / cc / bcc olmayan ve `MAIL_DIGEST_TYPES` içindeki mailler uygundur.
+- Her mail kendi bölümünü (`_digest`: başlık, açıklama, gövde) meta içinde taşır.
+- Grup tek satırsa normal gönderilir; birden çoksa satırlar kiralanır, yerine
+  tek özet satırı eklenir ve kaynak satırlar silinir (aynı işlemde). Özet satırı
+  ilk görevin task_id'sini taşır, tüm görevler meta'daki `task_ids` listesindedir.
+
+Ayarlar (ortam değişkeni):
+    MAIL_DIGEST_SECONDS  birleştirme penceresi, sn (0 = kapalı)
+    MAIL_DIGEST_TYPES    virgülle ayrılmış mail türleri
+"""
+import html as _html
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TYPES = "deadline_expired,reminder,task_created,task_assigned,task_status_changed,task_comment,task"
+
+
+def _window_seconds() -> int:
+    try:
+        return max(0, int(os.getenv("MAIL_DIGEST_SECONDS") or 0))
+    except ValueError:
+        return 0
+
+
+MAIL_DIGEST_SECONDS = _window_seconds()
+MAIL_DIGEST_TYPES = frozenset(
+    t.strip() for t in (os.getenv("MAIL_DIGEST_TYPES") or DEFAULT_TYPES).split(",") if t.strip()
+)
+
+# Özet mail başlıkları (mail_type -> başlık)
+DIGEST_TITLES = {
+    "deadline_expired": "Süresi Dolan Görevler",
+    "reminder": "Görev Hatırlatmaları",
+    "task_created": "Yeni Görevler",
+    "task_assigned": "Atanan Görevler",
+    "task_status_changed": "Görev Durum Güncellemeleri",
+    "task_comment": "Görev Yorumları",
+}
+
+
+def digest_key(mail_type: str, recipients: Sequence[str], *, cc=None, bcc=None, attachments=None) -> Optional[str]:
+    """Mail özetlenebiliyorsa grup anahtarı, değilse None."""
+    if MAIL_DIGEST_SECONDS <= 0 or mail_type not in MAIL_DIGEST_TYPES:
+        return None
+    if len(recipients) != 1 or cc or bcc or attachments:
+        return None
+    return f"{mail_type}|{recipients[0].strip().lower()}"[:320]
+
+
+def hold_until(now: Optional[datetime] = None) -> datetime:
+    return (now or datetime.now()) + timedelta(seconds=MAIL_DIGEST_SECONDS)
+
+
+def _section(d: dict) -> str:
+    return (
+        '<div style="border: 1px solid #e2e8f0; border-radius: 8px; padding: 16px; margin-bottom: 16px;">'
+        f'<div style="font-size: 15px; font-weight: 700; color: #1e3a5f; margin-bottom: 6px;">{_html.escape(d.get("title") or "")}</div>'
+        f'<div style="font-size: 14px; color: #334155; margin-bottom: 10px;">{d.get("intro") or ""}</div>'
+        f'{d.get("body_html") or ""}'
+        "</div>"
+    )
+
+
+def render_digest(mail_type: str, sections: List[dict]) -> tuple:
+    """Bölümleri görev maillerinin ortak çerçevesiyle (utils.render_email_base) tek maile çevirir."""
+    from utils import render_email_base
+
+    title = DIGEST_TITLES.get(mail_type, "Görev Bildirimleri")
+    n = len(sections)
+    recipient_name = next((s.get("recipient_name") for s in sections if s.get("recipient_name")), "")
+    return render_email_base(
+        subject=f"[Görev] {title} ({n})",
+        header_title=title,
+        header_subtitle=f"{n} bildirim",
+        recipient_name=_html.escape(recipient_name),
+        action_message=f"Son {max(1, MAIL_DIGEST_SECONDS // 60)} dakikadaki {n} bildirim tek mailde toplandı.",
+        main_content="".join(_section(s) for s in sections),
+        action_by="Sistem",
+    )
+
+
+def _shared(values):
+    """Tüm satırlarda aynıysa o değer, değilse None."""
+    distinct = set(values)
+    return distinct.pop() if len(distinct) == 1 else None
+
+
+def coalesce(worker_id: Optional[str] = None) -> int:
+    """
+    Penceresi dolan (en eski satırı zamanı gelmiş) grupları birleştirir.
+    Dönüş: birleştirilen (silinen) kaynak satır sayısı. Uygulama bağlamı içinde çağrılır.
+    """
+    from extensions import db
+    from models import MailQueue
+    from services.mail_service import MAIL_LEASE_SECONDS, MailService
+    from sqlalchemy import func
+
+    now = datetime.now()
+    groups = (
+        db.session.query(MailQueue.digest_key)
+        .filter(MailQueue.status == "pending", MailQueue.digest_key != None)
+        .group_by(MailQueue.digest_key)
+        .having(func.count(MailQueue.id) > 1, func.min(MailQueue.next_attempt_at) <= now)
+        .all()
+    )
+    merged = 0
+    for (key,) in groups:
+        token = f"{worker_id or 'w'}:digest:{uuid.uuid4().hex[:12]}"
+        # Diğer işçiler aynı satırları almasın: önce kirala
+        MailQueue.query.filter(MailQueue.digest_key == key, MailQueue.status == "pending").update(
+            {"status": "processing", "lease_owner": token, "lease_until": now + timedelta(seconds=MAIL_LEASE_SECONDS)},
+            synchronize_session=False,
+        )
+        db.session.commit()
+        rows = MailQueue.query.filter(MailQueue.lease_owner == token).order_by(MailQueue.created_at.asc(), MailQueue.id.asc()).all()
+        if len(rows) < 2:
+            for r in rows:
+                r.status = "pending"
+                MailService._end_lease(r)
+            db.session.commit()
+            continue
+        try:
+            metas = [json.loads(r.meta_json) if r.meta_json else {} for r in rows]
+            sections = [m.get("_digest") or {"title": r.subject, "body_html": r.html_content} for r, m in zip(rows, metas)]
+            subject, html_body = render_digest(rows[0].mail_type, sections)
+            task_ids = [r.task_id for r in rows if r.task_id]
+            db.session.add(MailQueue(
+                mail_type=rows[0].mail_type,
+                recipients=rows[0].recipients,
+                subject=subject,
+                html_content=html_body,
+                meta_json=json.dumps({
+                    "type": "digest",
+                    "count": len(rows),
+                    "task_ids": task_ids,
+                    "items": [{"subject": r.subject, "task_id": r.task_id, "event_type": m.get("event_type")} for r, m in zip(rows, metas)],
+                }, ensure_ascii=False),
+                # Loglar ve MailLog bağlantıları için: görev ilk satırınki, diğerleri ortaksa korunur
+                task_id=task_ids[0] if task_ids else None,
+                user_id=_shared(r.user_id for r in rows),
+                project_id=_shared(r.project_id for r in rows),
+                job_id=_shared(r.job_id for r in rows),
+                status="pending",
+                created_at=min(r.created_at for r in rows),
+                retry_count=0,
+                priority=max(int(r.priority or 0) for r in rows),
+            ))
+            MailService.purge(MailQueue.query.filter(MailQueue.lease_owner == token))
+            db.session.commit()
+            merged += len(rows)
+        except Exception as e:
+            db.session.rollback()
+            log.error(f"MailQueue digest error ({key}): {e}")
+            # Birleştirilemeyen satırlar tek tek gönderilir
+            MailQueue.query.filter(MailQueue.lease_owner == token).update(
+                {"status": "pending", "lease_owner": None, "lease_until": None, "digest_key": None},
+                synchronize_session=False,
+            )
+            db.session.commit()
+    if merged:
+        log.info(f"MailQueue: {merged} bildirim özet maillerde birleştirildi.")
+    return merged
@@ -0,0 +1,315 @@
+"""
+Mail kuyruğu gözlemlenebilirliği: gönderim gecikmesi, SMTP aşama süreleri, hata kodları, kuyruk derinliği.
+
+İki kaynak birleştirilir:
+- Veritabanı (süreçten bağımsız): duruma göre kuyruk derinliği, zamanı gelmiş
+  bekleyenler, en eski bekleyenin yaşı, son pencerede gönderilenler ve
+  kuyruğa giriş -> gönderim gecikmesi (created_at -> processed_at).
+- Bu sürecin kayıtları (mail işçisinin çalıştığı süreç): SMTP aşama süreleri
+  (connect / tls / auth / data), hata kodları ve ertelemeler; son
+  `WINDOW_SECONDS` saniyelik kayan pencerede tutulur.
+
+`/admin/mail-queue/metrics` JSON, `?format=prometheus` ile Prometheus metin formatı döner.
+
+Birden fazla işçide (services/shared_state paylaşılansa) süreç kayıtları yalnızca
+mail işçisinin sahibinde oluşur. Sahip `publish` ile bunları ve SMTP havuzu
+sayaçlarını PUBLISH_SECONDS aralıkla paylaşılan depoya yazar; diğer süreçler
+`collect` içinde kendi (boş) sayaçları yerine bu kopyayı döner.
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+WINDOW_SECONDS = 900
+# Pencerede tutulacak en fazla olay (bellek sınırı)
+MAX_EVENTS = 20000
+
+PHASES = ("connect", "tls", "auth", "data")
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Mail işçisinin sahibinin yayınladığı kayıtlar (paylaşılan depoda)
+SHARED_KEY = "mail_metrics:worker"
+PUBLISH_SECONDS = 15
+
+log = logging.getLogger("planner.mail_metrics")
+
+
+def _quantile(sorted_vals: List[float], q: float) -> Optional[float]:
+    if not sorted_vals:
+        return None
+    idx = min(len(sorted_vals) - 1, max(0, int(round(q * (len(sorted_vals) - 1)))))
+    return sorted_vals[idx]
+
+
+def summarize(values: Iterable[float]) -> dict:
+    vals = sorted(values)
+    out = {"count": len(vals), "avg": (sum(vals) / len(vals)) if vals else None, "max": vals[-1] if vals else None}
+    for q in QUANTILES:
+        out[f"p{int(q * 100)}"] = _quantile(vals, q)
+    return out
+
+
+class MailMetrics:
+    def __init__(self, window_seconds: int = WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self._events = deque(maxlen=MAX_EVENTS)  # (monotonic, kind, key, value)
+        self._totals: Counter = Counter()
+        self._phase_sums: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, kind: str, key: str, value: float = 1.0) -> None:
+        with self._lock:
+            self._events.append((time.monotonic(), kind, key, value))
+            self._totals[(kind, key)] += 1
+            if kind == "phase":
+                self._phase_sums[key] = self._phase_sums.get(key, 0.0) + value
+
+    def observe_phase(self, phase: str, seconds: float) -> None:
+        self._add("phase", phase, float(seconds))
+
+    def count_sent(self, attempts: int = 1) -> None:
+        self._add("sent", "", float(attempts))
+
+    def count_error(self, code: str) -> None:
+        self._add("error", code or "unknown")
+
+    def count_deferred(self, reason: str = "throttled") -> None:
+        self._add("deferred", reason)
+
+    def _window(self) -> list:
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            while self._events and self._events[0][0] < cutoff:
+                self._events.popleft()
+            return list(self._events)
+
+    def snapshot(self) -> dict:
+        events = self._window()
+        phases = {p: [] for p in PHASES}
+        errors: Counter = Counter()
+        deferred: Counter = Counter()
+        attempts = []
+        for _ts, kind, key, value in events:
+            if kind == "phase":
+                phases.setdefault(key, []).append(value)
+            elif kind == "error":
+                errors[key] += 1
+            elif kind == "deferred":
+                deferred[key] += 1
+            elif kind == "sent":
+                attempts.append(value)
+        with self._lock:
+            totals = {
+                "sent": self._totals[("sent", "")],
+                "errors": {k: n for (kind, k), n in self._totals.items() if kind == "error"},
+                "deferred": {k: n for (kind, k), n in self._totals.items() if kind == "deferred"},
+                "phases": {
+                    k: {"count": n, "sum": self._phase_sums.get(k, 0.0)}
+                    for (kind, k), n in self._totals.items() if kind == "phase"
+                },
+            }
+        return {
+            "window_seconds": self.window_seconds,
+            "sent": len(attempts),
+            "attempts_per_sent": (sum(attempts) / len(attempts)) if attempts else None,
+            "smtp_phases": {k: summarize(v) for k, v in phases.items()},
+            "errors": dict(errors),
+            "deferred": dict(deferred),
+            "totals": totals,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._events.clear()
+            self._totals.clear()
+            self._phase_sums.clear()
+
+
+_metrics = MailMetrics()
+
+
+def get_metrics() -> MailMetrics:
+    return _metrics
+
+
+def observe_phase(phase: str, seconds: float) -> None:
+    _metrics.observe_phase(phase, seconds)
+
+
+def count_sent(attempts: int = 1) -> None:
+    _metrics.count_sent(attempts)
+
+
+def count_error(code: str) -> None:
+    _metrics.count_error(code)
+
+
+def count_deferred(reason: str = "throttled") -> None:
+    _metrics.count_deferred(reason)
+
+
+def reset() -> None:
+    global _last_publish
+    _metrics.reset()
+    _last_publish = 0.0
+
+
+class phase_timer:
+    """`with phase_timer("auth"): ...` - blok süresini aşama olarak kaydeder (hata olsa da)."""
+
+    def __init__(self, phase: str):
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe_phase(self.phase, time.perf_counter() - self.started)
+        return False
+
+
+def queue_stats(window_seconds: int = WINDOW_SECONDS) -> dict:
+    """Kuyruk derinliği ve gecikme (veritabanından; tüm süreçler için geçerli)."""
+    from extensions import db
+    from models import MailQueue
+    from sqlalchemy import func
+
+    now = datetime.now()
+    depth = {status: int(n) for status, n in db.session.query(MailQueue.status, func.count(MailQueue.id)).group_by(MailQueue.status).all()}
+    due = (
+        MailQueue.query.filter(
+            MailQueue.status == "pending",
+            (MailQueue.next_attempt_at == None) | (MailQueue.next_attempt_at <= now),
+        ).count()
+    )
+    oldest = db.session.query(func.min(MailQueue.created_at)).filter(MailQueue.status == "pending").scalar()
+    since = now - timedelta(seconds=window_seconds)
+    rows = (
+        db.session.query(MailQueue.created_at, MailQueue.processed_at)
+        .filter(MailQueue.status == "sent", MailQueue.processed_at >= since)
+        .all()
+    )
+    latencies = [max(0.0, (p - c).total_seconds()) for c, p in rows if c and p]
+    return {
+        "depth": depth,
+        "due": due,
+        "oldest_pending_seconds": max(0.0, (now - oldest).total_seconds()) if oldest else 0.0,
+        "sent_in_window": len(rows),
+        "throughput_per_minute": len(rows) * 60.0 / window_seconds,
+        "latency_seconds": summarize(latencies),
+    }
+
+
+_last_publish = 0.0
+
+
+def publish(force: bool = False) -> bool:
+    """Bu sürecin kayıtlarını paylaşılan depoya yazar (mail işçisi döngüsünden, en çok PUBLISH_SECONDS'ta bir)."""
+    global _last_publish
+    from services import shared_state, smtp_pool
+
+    if not shared_state.is_shared():
+        return False
+    now = time.monotonic()
+    if not force and now - _last_publish < PUBLISH_SECONDS:
+        return False
+    _last_publish = now
+    try:
+        shared_state.get_state().set(
+            SHARED_KEY,
+            {"pid": os.getpid(), "worker": _metrics.snapshot(), "smtp_pool": smtp_pool.get_pool().stats()},
+            ttl=PUBLISH_SECONDS * 4,
+        )
+    except Exception as e:
+        log.error(f"Mail metrics publish error: {e}")
+        return False
+    return True
+
+
+def _worker_sections() -> dict:
+    """İşçi ve SMTP havuzu bölümleri: mail işçisinin sahibi değilsek sahibin yayınladığı kopya."""
+    from services import shared_state, smtp_pool
+    from services.mail_service import WORKER_LOCK
+
+    local = {"pid": os.getpid(), "worker": _metrics.snapshot(), "smtp_pool": smtp_pool.get_pool().stats()}
+    if not shared_state.is_shared() or shared_state.singleton_held(WORKER_LOCK):
+        return local
+    try:
+        published = shared_state.get_state().get(SHARED_KEY)
+    except Exception as e:
+        log.error(f"Mail metrics read error: {e}")
+        published = None
+    return published or local
+
+
+def collect() -> dict:
+    """Uç nokta çıktısı (uygulama bağlamı içinde çağrılır)."""
+    from services.mail_service import worker_config
+
+    sections = _worker_sections()
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "pid": os.getpid(),
+        "worker_pid": sections["pid"],
+        "queue": queue_stats(_metrics.window_seconds),
+        "worker": sections["worker"],
+        "workers": worker_config(),
+        "smtp_pool": sections["smtp_pool"],
+    }
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(data: dict) -> str:
+    """collect() çıktısını Prometheus metin formatına çevirir."""
+    lines: List[str] = []
+
+    def metric(name: str, mtype: str, help_text: str, samples: Iterable[tuple]):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {mtype}")
+        for labels, value in samples:
+            if value is None:
+                continue
+            lbl = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{lbl}}} {float(value):g}" if lbl else f"{name} {float(value):g}")
+
+    q = data["queue"]
+    w = data["worker"]
+    totals = w["totals"]
+    metric("mail_queue_depth", "gauge", "Mail queue rows by status.", [({"status": s}, n) for s, n in sorted(q["depth"].items())])
+    metric("mail_queue_due", "gauge", "Pending rows whose next attempt is due.", [({}, q["due"])])
+    metric("mail_queue_oldest_pending_seconds", "gauge", "Age of the oldest pending row.", [({}, q["oldest_pending_seconds"])])
+    metric("mail_queue_throughput_per_minute", "gauge", "Mails sent per minute over the window.", [({}, q["throughput_per_minute"])])
+    lat = q["latency_seconds"]
+    metric(
+        "mail_queue_latency_seconds", "gauge", "Enqueue to send latency over the window.",
+        [({"quantile": f"{qq:g}"}, lat[f"p{int(qq * 100)}"]) for qq in QUANTILES] + [({"quantile": "1"}, lat["max"])],
+    )
+    metric("mail_workers", "gauge", "Configured mail worker threads.", [({}, data["workers"]["workers"])])
+    metric("mail_sent_total", "counter", "Mails sent by the mail worker process.", [({}, totals["sent"])])
+    metric("mail_errors_total", "counter", "Send errors by code.", [({"code": c}, n) for c, n in sorted(totals["errors"].items())])
+    metric("mail_deferred_total", "counter", "Sends deferred by rate or domain limits.", [({"reason": r}, n) for r, n in sorted(totals["deferred"].items())])
+
+    phase_samples = []
+    for phase, s in sorted(w["smtp_phases"].items()):
+        for qq in QUANTILES:
+            phase_samples.append(({"phase": phase, "quantile": f"{qq:g}"}, s[f"p{int(qq * 100)}"]))
+    metric("mail_smtp_phase_seconds", "summary", "SMTP phase durations (quantiles over the window).", phase_samples)
+    lines.extend(
+        f'mail_smtp_phase_seconds_{suffix}{{phase="{_label(phase)}"}} {float(v[key]):g}'
+        for phase, v in sorted(totals["phases"].items())
+        for suffix, key in (("sum", "sum"), ("count", "count"))
+    )
+
+    pool = data["smtp_pool"]
+    metric("mail_smtp_connects_total", "counter", "SMTP connections opened.", [({}, pool["connects"])])
+    metric("mail_smtp_reuses_total", "counter", "Pooled SMTP sessions reused.", [({}, pool["reuses"])])
+    metric("mail_smtp_idle_sessions", "gauge", "Idle pooled SMTP sessions.", [({}, pool["idle"])])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,182 @@
+"""
+SMTP sunucusu başına gönderim hız sınırı (token bucket) ve kuyruk geri çekilme süreleri.
+
+Her SMTP mesajı sunucunun kovasından bir jeton harcar. Kova dakikada
+`rate_per_minute` hızla dolar ve en fazla `rate_burst` jeton birikir. Kuyruk
+işçisi jeton yoksa beklemez; `Throttled` alır, öğeyi `next_attempt_at` ile
+ileri tarihe kurar ve sıradaki öğeye geçer. Doğrudan gönderimler
+(ör. test maili) jeton açılana kadar bekler.
+
+Ayarlar mail_settings.json veya ortam değişkenlerinden gelir (bkz. utils.load_mail_settings):
+    rate_per_minute         (SMTP_RATE_PER_MINUTE)   dakikadaki mesaj
+    rate_burst              (SMTP_RATE_BURST)        art arda gönderilebilecek mesaj
+    recipients_per_message  (SMTP_RCPT_PER_MESSAGE)  bir SMTP mesajındaki alıcı (1 = herkese ayrı mesaj)
+
+Ayrıca alıcı alan adı (domain) başına eşzamanlı gönderim sınırı (`DomainSlots`):
+birden çok kuyruk işçisi aynı alan adına aynı anda en fazla N mesaj gönderir.
+"""
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+DEFAULT_RATE_PER_MINUTE = 40
+DEFAULT_BURST = 5
+DEFAULT_RCPT_PER_MESSAGE = 1
+
+# Kuyruk tekrar denemeleri: 30 sn, 1 dk, 2 dk, ... en fazla 30 dk
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 1800
+
+
+class Throttled(Exception):
+    """Sunucunun kovasında jeton yok; `retry_after` saniye sonra tekrar denenmeli."""
+
+    def __init__(self, host: str, retry_after: float, reason: str = "rate_limit"):
+        super().__init__(f"SMTP rate limit: {host} ({retry_after:.1f}s)")
+        self.host = host
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class RateConfig(NamedTuple):
+    rate_per_minute: float = DEFAULT_RATE_PER_MINUTE
+    burst: int = DEFAULT_BURST
+    recipients_per_message: int = DEFAULT_RCPT_PER_MESSAGE
+
+    @classmethod
+    def from_settings(cls, cfg: dict) -> "RateConfig":
+        def _num(key, default, cast):
+            try:
+                v = cast(cfg.get(key) or default)
+                return v if v > 0 else default
+            except (TypeError, ValueError):
+                return default
+
+        return cls(
+            rate_per_minute=_num("rate_per_minute", DEFAULT_RATE_PER_MINUTE, float),
+            burst=_num("rate_burst", DEFAULT_BURST, int),
+            recipients_per_message=_num("recipients_per_message", DEFAULT_RCPT_PER_MESSAGE, int),
+        )
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = float(rate_per_minute) / 60.0
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def try_take(self, n: float = 1.0) -> float:
+        """Jeton varsa alır ve 0 döner; yoksa almadan, yeterli jeton için beklenecek süreyi döner."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= n:
+            self.tokens -= n
+            return 0.0
+        return (n - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class RateLimiter:
+    def __init__(self):
+        self._buckets: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, host: str, rc: RateConfig, n: int = 1) -> float:
+        key = (host or "").lower()
+        with self._lock:
+            entry = self._buckets.get(key)
+            # Ayar değiştiyse kova yeniden kurulur
+            if entry is None or entry[0] != (rc.rate_per_minute, rc.burst):
+                entry = ((rc.rate_per_minute, rc.burst), TokenBucket(rc.rate_per_minute, rc.burst))
+                self._buckets[key] = entry
+            return entry[1].try_take(n)
+
+    def acquire(self, host: str, rc: RateConfig, n: int = 1, max_wait: Optional[float] = None) -> None:
+        """
+        Jeton alır. Beklenecek süre `max_wait`'i aşarsa Throttled fırlatır;
+        max_wait=None ise jeton açılana kadar bekler.
+        """
+        while True:
+            wait = self.try_acquire(host, rc, n)
+            if wait <= 0:
+                return
+            if max_wait is not None and wait > max_wait:
+                raise Throttled(host, wait)
+            time.sleep(wait)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+_limiter = RateLimiter()
+
+
+def acquire(host: str, rc: RateConfig, n: int = 1, max_wait: Optional[float] = None) -> None:
+    _limiter.acquire(host, rc, n, max_wait)
+
+
+def reset() -> None:
+    _limiter.reset()
+
+
+class DomainSlots:
+    """Alan adı başına eşzamanlılık sayacı (işçi thread'leri arasında paylaşılır)."""
+
+    def __init__(self, default_limit: int, limits: Optional[Dict[str, int]] = None):
+        self.default_limit = max(1, int(default_limit))
+        self.limits = {k.lower(): max(1, int(v)) for k, v in (limits or {}).items()}
+        self._active: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def limit_for(self, domain: str) -> int:
+        return self.limits.get(domain, self.default_limit)
+
+    def try_acquire(self, domains: Iterable[str]) -> Optional[List[str]]:
+        """Tüm alan adları için yer varsa hepsini birden alır; yoksa hiçbirini almaz (None)."""
+        wanted = sorted({(d or "").lower() for d in domains if d})
+        with self._lock:
+            if any(self._active.get(d, 0) >= self.limit_for(d) for d in wanted):
+                return None
+            for d in wanted:
+                self._active[d] = self._active.get(d, 0) + 1
+        return wanted
+
+    def release(self, domains: Optional[Iterable[str]]) -> None:
+        with self._lock:
+            for d in domains or []:
+                n = self._active.get(d, 0) - 1
+                if n > 0:
+                    self._active[d] = n
+                else:
+                    self._active.pop(d, None)
+
+    def active(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._active)
+
+
+def parse_domain_limits(value: Optional[str]) -> Dict[str, int]:
+    """Örn. 'gmail.com=1, firma.com.tr=4' -> {"gmail.com": 1, "firma.com.tr": 4}"""
+    out: Dict[str, int] = {}
+    for part in (value or "").replace(";", ",").split(","):
+        name, sep, num = part.partition("=")
+        if not sep:
+            continue
+        try:
+            out[name.strip().lower()] = int(num)
+        except ValueError:
+            continue
+    return out
+
+
+def email_domain(addr: str) -> str:
+    return (addr or "").rsplit("@", 1)[-1].strip().lower() if "@" in (addr or "") else ""
+
+
+def backoff_seconds(attempt: int) -> float:
+    """`attempt`. başarısız denemeden sonra beklenecek süre (±%20 sapmalı üstel)."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** max(0, int(attempt) - 1)))
+    return delay * random.uniform(0.8, 1.2)
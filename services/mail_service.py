@@ -3,6 +3,8 @@ import re
 import json
 import base64
 import time
+import uuid
+import threading
 from datetime import datetime, timedelta
 from threading import Thread
 from typing import List, Optional, Sequence, Union, Dict, Any
@@ -12,6 +14,7 @@ try:
 except Exception:
     os = None
 
+from services import blob_store, mail_archive, mail_digest, mail_metrics, mail_rate, shared_state
 from utils import (
     send_email_smtp,
     create_mail_log,
@@ -22,6 +25,79 @@ from utils import (
 log = logging.getLogger(__name__)
 
 
+def _env_int(name: str, default: int) -> int:
+    try:
+        v = int((os.getenv(name) if os is not None else None) or default)
+        return v if v > 0 else default
+    except (TypeError, ValueError):
+        return default
+
+
+# Eşzamanlı kuyruk işçisi sayısı
+MAIL_WORKERS = _env_int("MAIL_WORKERS", 2)
+# Bir işçinin tek seferde kiraladığı öğe; SMTP oturumları havuzdan paylaşılır
+MAIL_BATCH_SIZE = _env_int("MAIL_BATCH_SIZE", 20)
+# Kira süresi: bu süre içinde bitmeyen 'processing' öğesi kurtarılır
+MAIL_LEASE_SECONDS = 300
+# Kiradan önce biter; kalan öğeler kuyruğa geri bırakılır
+MAIL_BATCH_SECONDS = 180
+# Yeni kayıt yoksa işçiler bu kadar bekler (MailService.send hemen uyandırır)
+MAIL_POLL_SECONDS = 10
+# Alıcı alan adı başına eşzamanlı gönderim (MAIL_DOMAIN_LIMITS="gmail.com=1,firma.com=4" ile özelleştirilir)
+MAIL_DOMAIN_CONCURRENCY = _env_int("MAIL_DOMAIN_CONCURRENCY", 2)
+# Alan adı dolu olduğunda öğe bu kadar ertelenir
+MAIL_DOMAIN_BUSY_SECONDS = 2
+# Geçici hatalarda en fazla deneme; aralar mail_rate.backoff_seconds ile büyür
+MAIL_MAX_ATTEMPTS = 5
+# Ek blob deposu çöp toplama aralığı
+BLOB_GC_INTERVAL_SECONDS = 600
+# Tüm işçilerde tek mail havuzu (services.shared_state.hold_singleton)
+WORKER_LOCK = "mail_worker"
+
+_domain_slots = mail_rate.DomainSlots(
+    MAIL_DOMAIN_CONCURRENCY,
+    mail_rate.parse_domain_limits(os.getenv("MAIL_DOMAIN_LIMITS") if os is not None else None),
+)
+
+# Yeni kayıt bildirimi: sayaç + koşul, bekleyen işçileri kaçırmadan uyandırır
+_wake_cond = threading.Condition()
+_wake_seq = 0
+
+
+def _notify_local() -> None:
+    global _wake_seq
+    with _wake_cond:
+        _wake_seq += 1
+        _wake_cond.notify_all()
+
+
+def wake_workers() -> None:
+    """Kuyruğa yeni mail eklendi; bekleyen işçileri hemen uyandır (havuz başka süreçteyse paylaşılan sinyalle)."""
+    _notify_local()
+    if not shared_state.singleton_held(WORKER_LOCK):
+        shared_state.signal(WORKER_LOCK)
+
+
+def _wait_for_work(seen: int, timeout: float) -> int:
+    with _wake_cond:
+        if _wake_seq == seen:
+            _wake_cond.wait(timeout)
+        return _wake_seq
+
+
+def worker_config() -> dict:
+    """Yönetim sayfasında gösterilen işçi / eşzamanlılık ayarları."""
+    return {
+        "workers": MAIL_WORKERS,
+        "batch_size": MAIL_BATCH_SIZE,
+        "lease_seconds": MAIL_LEASE_SECONDS,
+        "poll_seconds": MAIL_POLL_SECONDS,
+        "domain_concurrency": _domain_slots.default_limit,
+        "domain_limits": dict(_domain_slots.limits),
+        "active_domains": _domain_slots.active(),
+    }
+
+
 def _normalize_emails(value: Union[str, Sequence[str], None]) -> List[str]:
     if not value:
         return []
@@ -90,45 +166,15 @@ def _format_queue_error(exc: Exception) -> str:
         return str(exc) or "unknown"
 
 
-def _try_acquire_worker_lock(app) -> bool:
+def _try_acquire_worker_lock(app, on_acquired=None) -> bool:
     """
-    Best-effort inter-process lock so we don't start multiple mail workers.
-    Uses a file lock under instance_path.
+    Best-effort inter-process lock so we don't start multiple mail worker pools.
+    File lock under instance_path, or a leased lock in the shared state store
+    (services.shared_state) when several workers/hosts share one.
     """
-    try:
-        if getattr(app, "config", {}).get("TESTING"):
-            return False
-
-        if os is None:
-            return True
-
-        instance_path = getattr(app, "instance_path", None) or "instance"
-        os.makedirs(instance_path, exist_ok=True)
-        lock_path = os.path.join(instance_path, "mail_worker.lock")
-
-        f = open(lock_path, "a+")
-        # store handle on app to keep lock alive
-        setattr(app, "_mail_worker_lock_handle", f)
-
-        if os.name == "nt":
-            import msvcrt
-
-            try:
-                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
-                return True
-            except OSError:
-                return False
-        else:
-            import fcntl
-
-            try:
-                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
-                return True
-            except OSError:
-                return False
-    except Exception:
-        # If locking fails for any unexpected reason, don't block the app from starting.
-        return True
+    if getattr(app, "config", {}).get("TESTING"):
+        return False
+    return shared_state.hold_singleton(app, WORKER_LOCK, on_acquired=on_acquired)
 
 
 class MailService:
@@ -170,155 +216,303 @@ class MailService:
         week_start=None,
         meta: Optional[Dict[str, Any]] = None,
         cfg_override: Optional[dict] = None,
+        digest: Optional[dict] = None,
     ):
         """
         Maili kuyruğa ekler (Asenkron gönderim).
+        digest: özet açıksa maili başkalarıyla birleştirirken kullanılacak bölüm
+        ({"title", "intro", "body_html", "recipient_name"}); bkz. services/mail_digest.py
         """
         from extensions import db
         from models import MailQueue
 
-        rcpt_list = _normalize_emails(recipients)
-        if not rcpt_list:
-            log.warning(f"MailQueue: Alıcı listesi boş, mail kuyruğa eklenmedi. Subject: {subject}")
-            return False
-
         try:
-            # Attachment'ları serialize et (varsa)
-            atts_data = []
-            if attachments:
-                for att in attachments:
-                    try:
-                        # binary veriyi base64 string'e çevir
-                        data_b64 = None
-                        if att.get("data"):
-                            data_b64 = base64.b64encode(att["data"]).decode("utf-8")
-                        
-                        atts_data.append({
-                            "filename": att.get("filename"),
-                            "content_type": att.get("content_type"),
-                            "data_b64": data_b64
-                        })
-                    except Exception as e:
-                        log.error(f"Attachment serialization error: {e}")
-
-            # Meta verisini hazırla
-            meta_final = meta or {}
-            if atts_data:
-                meta_final["_attachments"] = atts_data
-            
-            # Diğer opsiyonel alanları meta içinde sakla (week_start, team_name vb. loglama için gerekli olabilir)
-            if week_start:
-                meta_final["_week_start"] = str(week_start)
-            if team_name:
-                meta_final["_team_name"] = team_name
-            if cfg_override:
-                meta_final["_cfg_override"] = cfg_override
-
-            # Kuyruğa ekle
-            mq = MailQueue(
-                mail_type=mail_type,
-                recipients=json.dumps(rcpt_list, ensure_ascii=False),
-                subject=subject,
-                html_content=html,
-                cc=json.dumps(_normalize_emails(cc), ensure_ascii=False) if cc else None,
-                bcc=json.dumps(_normalize_emails(bcc), ensure_ascii=False) if bcc else None,
-                meta_json=json.dumps(meta_final, ensure_ascii=False),
-                user_id=user_id,
-                project_id=project_id,
-                job_id=job_id,
-                task_id=task_id,
-                status="pending",
-                created_at=datetime.now(),
-                retry_count=0
+            values, blob_refs = MailService._queue_values(
+                mail_type=mail_type, recipients=recipients, subject=subject, html=html,
+                attachments=attachments, cc=cc, bcc=bcc, user_id=user_id, project_id=project_id,
+                job_id=job_id, task_id=task_id, team_name=team_name, week_start=week_start,
+                meta=meta, cfg_override=cfg_override, digest=digest,
             )
-            
-            db.session.add(mq)
+            if values is None:
+                return False
+            db.session.add(MailQueue(**values))
+            blob_store.add_refs(blob_refs)
             db.session.commit()
+            wake_workers()
             return True
             
         except Exception as e:
             log.exception(f"MailQueue insert failed: {e}")
+            try:
+                db.session.rollback()
+            except Exception:
+                pass
             return False
 
     @staticmethod
-    def process_queue(app):
+    def send_many(messages: Sequence[dict]) -> int:
+        """
+        Birçok maili tek toplu INSERT ve tek commit ile kuyruğa ekler (haftalık / ekip gönderimleri).
+        Her öğe `send` ile aynı anahtarları taşır. Dönüş: kuyruğa eklenen mail sayısı
+        (hata olursa hiçbiri eklenmez, 0).
+        """
+        from extensions import db
+        from models import MailQueue
+
+        rows = []
+        blob_refs = []
+        try:
+            for m in messages:
+                values, refs = MailService._queue_values(**m)
+                if values is None:
+                    continue
+                rows.append(values)
+                blob_refs.extend(refs)
+            if not rows:
+                return 0
+            db.session.execute(MailQueue.__table__.insert(), rows)
+            blob_store.add_refs(blob_refs)
+            db.session.commit()
+            wake_workers()
+            return len(rows)
+        except Exception as e:
+            log.exception(f"MailQueue bulk insert failed: {e}")
+            try:
+                db.session.rollback()
+            except Exception:
+                pass
+            return 0
+
+    @staticmethod
+    def _serialize_attachments(attachments: Optional[List[dict]]):
+        """
+        Ekleri blob deposuna yazar; satır yalnızca SHA-256 referansını tutar.
+        Önceden depolanmış ek ({"blob", "size"}) tekrar okunmaz.
+        Dönüş: (meta için ek listesi, add_refs için [(sha, boyut)]).
+        """
+        atts_data = []
+        blob_refs = []
+        for att in attachments or []:
+            try:
+                if att.get("blob"):
+                    sha, size = att["blob"], att.get("size") or 0
+                elif att.get("path"):
+                    sha, size = blob_store.put_file(att["path"])
+                elif att.get("data"):
+                    sha, size = blob_store.put_bytes(att["data"])
+                else:
+                    continue
+                blob_refs.append((sha, size))
+                atts_data.append({
+                    "filename": att.get("filename"),
+                    "content_type": att.get("content_type"),
+                    "blob": sha,
+                    "size": size,
+                })
+            except Exception as e:
+                log.error(f"Attachment serialization error: {e}")
+        return atts_data, blob_refs
+
+    @staticmethod
+    def _queue_values(
+        *,
+        mail_type: str,
+        recipients: Union[str, Sequence[str]],
+        subject: str,
+        html: str,
+        attachments: Optional[List[dict]] = None,
+        cc: Union[str, Sequence[str], None] = None,
+        bcc: Union[str, Sequence[str], None] = None,
+        context: Optional[dict] = None,
+        user_id: Optional[int] = None,
+        project_id: Optional[int] = None,
+        job_id: Optional[int] = None,
+        task_id: Optional[int] = None,
+        team_name: Optional[str] = None,
+        week_start=None,
+        meta: Optional[Dict[str, Any]] = None,
+        cfg_override: Optional[dict] = None,
+        digest: Optional[dict] = None,
+    ):
+        """MailQueue satırının kolon değerleri ve blob referansları; alıcı yoksa (None, [])."""
+        rcpt_list = _normalize_emails(recipients)
+        if not rcpt_list:
+            log.warning(f"MailQueue: Alıcı listesi boş, mail kuyruğa eklenmedi. Subject: {subject}")
+            return None, []
+
+        atts_data, blob_refs = MailService._serialize_attachments(attachments)
+
+        # Meta verisini hazırla
+        meta_final = dict(meta or {})
+        if atts_data:
+            meta_final["_attachments"] = atts_data
+        
+        # Diğer opsiyonel alanları meta içinde sakla (week_start, team_name vb. loglama için gerekli olabilir)
+        if week_start:
+            meta_final["_week_start"] = str(week_start)
+        if team_name:
+            meta_final["_team_name"] = team_name
+        if cfg_override:
+            meta_final["_cfg_override"] = cfg_override
+
+        # Özetlenebilir bildirim: pencere dolana kadar bekletilir, aynı anahtarlılarla birleştirilir
+        key = None
+        if digest and not cfg_override:
+            key = mail_digest.digest_key(mail_type, rcpt_list, cc=cc, bcc=bcc, attachments=atts_data)
+        if key:
+            meta_final["_digest"] = digest
+
+        values = dict(
+            mail_type=mail_type,
+            recipients=json.dumps(rcpt_list, ensure_ascii=False),
+            subject=subject,
+            html_content=html,
+            cc=json.dumps(_normalize_emails(cc), ensure_ascii=False) if cc else None,
+            bcc=json.dumps(_normalize_emails(bcc), ensure_ascii=False) if bcc else None,
+            meta_json=json.dumps(meta_final, ensure_ascii=False),
+            user_id=user_id,
+            project_id=project_id,
+            job_id=job_id,
+            task_id=task_id,
+            status="pending",
+            created_at=datetime.now(),
+            retry_count=0,
+            digest_key=key,
+            next_attempt_at=mail_digest.hold_until() if key else None,
+        )
+        return values, blob_refs
+
+    @staticmethod
+    def _remember_delivered(item, meta: dict, delivered: List[str]) -> None:
+        """Kısmi gönderimde teslim edilen alıcıları öğenin meta'sına yazar (commit çağırana ait)."""
+        if delivered:
+            meta["_delivered"] = delivered
+            item.meta_json = json.dumps(meta, ensure_ascii=False)
+
+    @staticmethod
+    def _release_blobs(meta: dict) -> bool:
+        """meta içindeki blob referanslarını bırakır ve siler (tekrar çağrılması güvenli). Commit çağırana aittir."""
+        shas = []
+        for att in meta.get("_attachments") or []:
+            sha = att.pop("blob", None)
+            if sha:
+                shas.append(sha)
+        if shas:
+            blob_store.release(shas)
+        return bool(shas)
+
+    @staticmethod
+    def purge(query) -> int:
+        """
+        Kuyruk satırlarını siler; eklerin blob referanslarını bırakır.
+        (query.delete() ORM'i atladığından referanslar sızardı.) Commit çağırana aittir.
+        """
+        from extensions import db
+
+        n = 0
+        for item in query.all():
+            try:
+                MailService._release_blobs(json.loads(item.meta_json) if item.meta_json else {})
+            except ValueError:
+                pass
+            db.session.delete(item)
+            n += 1
+        return n
+
+    @staticmethod
+    def _end_lease(item) -> None:
+        item.lease_owner = None
+        item.lease_until = None
+
+    @staticmethod
+    def process_queue(app, worker_id: Optional[str] = None) -> int:
         """
         Kuyruktaki pending mailleri işler.
+        Birden çok işçi aynı anda çağırabilir: öğeler tek UPDATE ile kiralanır (lease_owner/lease_until).
+        Dönüş: kiralanan öğe sayısı.
         """
         with app.app_context():
             from extensions import db
             from models import MailQueue
-            from sqlalchemy import text as _sql_text
+            from sqlalchemy import select, update
 
-            # Pending veya Retry durumundaki mailleri al (En eski 5 tane)
-            # Basit kilitleme mekanizması: status='processing' yapacağız.
-            # Race condition ihtimali var ama tek worker olduğu sürece sorun yok.
-            
             try:
                 # --- RECOVERY ---
-                # 5 dakikadan uzun süredir 'processing' durumunda kalanları kurtar
-                timeout_threshold = datetime.now() - timedelta(minutes=5)
+                # Kirası dolmuş 'processing' öğelerini kurtar (kirasız eski kayıtlar için 5 dk kuralı)
+                now = datetime.now()
+                timeout_threshold = now - timedelta(seconds=MAIL_LEASE_SECONDS)
                 stuck_items = MailQueue.query.filter(
                     MailQueue.status == 'processing',
-                    (MailQueue.processed_at < timeout_threshold) | (MailQueue.processed_at == None)
+                    ((MailQueue.lease_until != None) & (MailQueue.lease_until < now))
+                    | ((MailQueue.lease_until == None)
+                       & ((MailQueue.processed_at < timeout_threshold) | (MailQueue.processed_at == None)))
                 ).all()
                 
                 if stuck_items:
                     log.warning(f"MailQueue: Recovering {len(stuck_items)} stuck items.")
                     for item in stuck_items:
                         item.error_message = f"Timeout/Crash recovery. Last status: {item.status}"
+                        MailService._end_lease(item)
                         item.retry_count += 1
-                        if item.retry_count < 3:
+                        if item.retry_count < MAIL_MAX_ATTEMPTS:
                             item.status = 'pending' # Tekrar dene
+                            item.next_attempt_at = datetime.now() + timedelta(seconds=mail_rate.backoff_seconds(item.retry_count))
                         else:
                             item.status = 'failed'
                     db.session.commit()
 
-                # Retry zamanı gelmiş olanları da al (basit mantık: failed ve retry_count < 3)
-                # Şimdilik sadece pending'e odaklanalım veya failed olup retry hakkı olanları pending'e çeken ayrı bir job yapabiliriz.
-                # Basitlik adına: Sadece 'pending' olanları al.
-                # IMPORTANT: Claim items atomically to avoid double-send if multiple workers exist.
-                # We select candidates, then update with status='pending' guard. Only claimed rows are processed.
-                candidates = (
-                    MailQueue.query.filter_by(status="pending")
-                    .order_by(MailQueue.priority.desc(), MailQueue.created_at.asc())
-                    .limit(5)
-                    .all()
-                )
-
-                if not candidates:
-                    return
+                # Penceresi dolan bildirim gruplarını tek özet maile çevir
+                if mail_digest.MAIL_DIGEST_SECONDS > 0:
+                    mail_digest.coalesce(worker_id)
 
+                # Tekrar denemeler ve hız sınırı ertelemeleri 'pending' + next_attempt_at ile bekler;
+                # yalnızca zamanı gelmiş olanları al.
+                # Kiralama tek UPDATE ... WHERE id IN (SELECT ... LIMIT n) AND status='pending' ile atomiktir;
+                # işçiler birbirinin öğesini alamaz, yalnızca kendi token'ıyla işaretlenen satırlar işlenir.
+                token = f"{worker_id or 'w'}:{uuid.uuid4().hex[:12]}"
                 now = datetime.now()
-                claimed_ids = []
-                for it in candidates:
-                    try:
-                        res = db.session.execute(
-                            _sql_text(
-                                "UPDATE mail_queue "
-                                "SET status='processing', processed_at=:now "
-                                "WHERE id=:id AND status='pending'"
-                            ),
-                            {"now": now, "id": int(it.id)},
-                        )
-                        if getattr(res, "rowcount", 0) == 1:
-                            claimed_ids.append(int(it.id))
-                    except Exception:
-                        # If claim fails for a row, skip it rather than risking double-send.
-                        continue
-
+                due = (
+                    select(MailQueue.id)
+                    .where(
+                        MailQueue.status == "pending",
+                        (MailQueue.next_attempt_at == None) | (MailQueue.next_attempt_at <= now),
+                    )
+                    .order_by(MailQueue.priority.desc(), MailQueue.created_at.asc())
+                    .limit(MAIL_BATCH_SIZE)
+                    .scalar_subquery()
+                )
+                db.session.execute(
+                    update(MailQueue.__table__)
+                    .where(MailQueue.__table__.c.id.in_(due), MailQueue.__table__.c.status == "pending")
+                    .values(
+                        status="processing",
+                        processed_at=now,
+                        lease_owner=token,
+                        lease_until=now + timedelta(seconds=MAIL_LEASE_SECONDS),
+                    )
+                )
                 db.session.commit()
 
-                if not claimed_ids:
-                    return
-
                 queue_items = (
-                    MailQueue.query.filter(MailQueue.id.in_(claimed_ids))
+                    MailQueue.query.filter(MailQueue.lease_owner == token, MailQueue.status == "processing")
                     .order_by(MailQueue.priority.desc(), MailQueue.created_at.asc())
                     .all()
                 )
-
-                for item in queue_items:
+                if not queue_items:
+                    return 0
+
+                batch_started = time.monotonic()
+                for idx, item in enumerate(queue_items):
+                    if time.monotonic() - batch_started > MAIL_BATCH_SECONDS:
+                        rest = [int(it.id) for it in queue_items[idx:]]
+                        MailQueue.query.filter(
+                            MailQueue.id.in_(rest), MailQueue.status == "processing", MailQueue.lease_owner == token
+                        ).update({"status": "pending", "lease_owner": None, "lease_until": None}, synchronize_session=False)
+                        db.session.commit()
+                        log.info(f"MailQueue: batch time budget reached, released {len(rest)} items.")
+                        break
+                    meta: Dict[str, Any] = {}
+                    delivered: List[str] = []
                     try:
                         # Verileri hazırla
                         recipients = _parse_stored_list(item.recipients)
@@ -326,35 +520,62 @@ class MailService:
                         bcc = _parse_stored_list(item.bcc) if item.bcc else []
                         meta = json.loads(item.meta_json) if item.meta_json else {}
                         
-                        # Attachment'ları deserialize et
+                        # Ekler: blob dosyasından gönderim anında okunur (eski satırlarda base64 gömülü)
                         attachments = []
-                        if meta.get("_attachments"):
-                            for att in meta["_attachments"]:
-                                if att.get("data_b64"):
-                                    attachments.append({
-                                        "filename": att.get("filename"),
-                                        "content_type": att.get("content_type"),
-                                        "data": base64.b64decode(att["data_b64"])
-                                    })
+                        for att in meta.get("_attachments") or []:
+                            if att.get("blob"):
+                                attachments.append({
+                                    "filename": att.get("filename"),
+                                    "content_type": att.get("content_type"),
+                                    "path": blob_store.path_for(att["blob"]),
+                                })
+                            elif att.get("data_b64"):
+                                attachments.append({
+                                    "filename": att.get("filename"),
+                                    "content_type": att.get("content_type"),
+                                    "data": base64.b64decode(att["data_b64"])
+                                })
                         
                         cfg_override = meta.get("_cfg_override")
+                        # Önceki denemelerde teslim edilen alıcılar tekrar gönderilmez
+                        delivered = list(meta.get("_delivered") or [])
                         
+                        # Alıcı alan adlarında eşzamanlılık sınırı doluysa kısa süre ertele
+                        domains = [mail_rate.email_domain(a) for a in _normalize_emails(recipients + cc + bcc)]
+                        slots = _domain_slots.try_acquire(domains)
+                        if slots is None:
+                            raise mail_rate.Throttled(",".join(sorted(set(domains))), MAIL_DOMAIN_BUSY_SECONDS, reason="domain_busy")
+
                         # Gönder
                         # send_email_smtp loglama yapmaz, exception fırlatır.
-                        send_email_smtp(
-                            # Always pass a comma separated string to avoid list->str bugs
-                            to_addr=",".join(_normalize_emails(recipients)),
-                            subject=item.subject,
-                            html_body=item.html_content,
-                            attachments=attachments,
-                            cc_addrs=",".join(_normalize_emails(cc)) if cc else None,
-                            bcc_addrs=",".join(_normalize_emails(bcc)) if bcc else None,
-                            cfg_override=cfg_override
-                        )
+                        # Hız sınırında beklemez (Throttled); öğe ertelenir, sıradakine geçilir.
+                        try:
+                            send_email_smtp(
+                                # Always pass a comma separated string to avoid list->str bugs
+                                to_addr=",".join(_normalize_emails(recipients)),
+                                subject=item.subject,
+                                html_body=item.html_content,
+                                attachments=attachments,
+                                cc_addrs=",".join(_normalize_emails(cc)) if cc else None,
+                                bcc_addrs=",".join(_normalize_emails(bcc)) if bcc else None,
+                                cfg_override=cfg_override,
+                                delivered=delivered,
+                                max_wait=0,
+                            )
+                        finally:
+                            _domain_slots.release(slots)
                         
                         # Başarılı -> önce status'u kalıcı hale getir, sonra logla.
                         item.status = 'sent'
                         item.error_message = None
+                        item.next_attempt_at = None
+                        # Gönderim anı: kuyruğa giriş -> gönderim gecikmesi bu alandan ölçülür
+                        item.processed_at = datetime.now()
+                        MailService._end_lease(item)
+                        meta.pop("_delivered", None)
+                        # Gönderilen satırın eklerine artık gerek yok; yalnızca dosya adları kalır
+                        MailService._release_blobs(meta)
+                        item.meta_json = json.dumps(meta, ensure_ascii=False)
                         try:
                             db.session.commit()
                         except Exception:
@@ -364,6 +585,7 @@ class MailService:
                                 pass
                             # If we cannot persist status, don't log (it could cause retries/double-send).
                             continue
+                        mail_metrics.count_sent(attempts=int(item.retry_count or 0) + 1)
 
                         create_mail_log(
                             kind="send",
@@ -381,19 +603,36 @@ class MailService:
                             meta=meta
                         )
 
+                    except mail_rate.Throttled as e:
+                        # Hız / alan adı sınırı: deneme sayılmaz, yer açılınca tekrar sıraya girer
+                        mail_metrics.count_deferred(e.reason)
+                        item.status = "pending"
+                        MailService._end_lease(item)
+                        item.next_attempt_at = datetime.now() + timedelta(seconds=e.retry_after)
+                        MailService._remember_delivered(item, meta, delivered)
+                        try:
+                            db.session.commit()
+                        except Exception:
+                            db.session.rollback()
+                        continue
+
                     except Exception as e:
                         # Başarısız -> Logla ve retry mantığı
                         log.error(f"MailQueue send error (ID: {item.id}): {e}")
+                        mail_metrics.count_error(_mail_error_meta_from_exc(e).get("error_code"))
                         item.error_message = _format_queue_error(e)
+                        MailService._end_lease(item)
 
                         permanent = _is_permanent_send_error(e)
                         if permanent:
                             item.status = "failed"
-                            item.retry_count = max(int(item.retry_count or 0), 3)
+                            item.retry_count = max(int(item.retry_count or 0), MAIL_MAX_ATTEMPTS)
                         else:
                             item.retry_count += 1
-                            if item.retry_count < 3:
+                            if item.retry_count < MAIL_MAX_ATTEMPTS:
                                 item.status = "pending"
+                                item.next_attempt_at = datetime.now() + timedelta(seconds=mail_rate.backoff_seconds(item.retry_count))
+                                MailService._remember_delivered(item, meta, delivered)
                             else:
                                 item.status = "failed"
 
@@ -431,16 +670,20 @@ class MailService:
                                 pass
                      
                     # No extra commit here: each branch commits in its own safe place.
+
+                return len(queue_items)
                     
             except Exception as e:
                 log.exception(f"MailQueue worker loop error: {e}")
+                return 0
 
 def start_mail_worker(app):
     """
-    Arka planda mail kuyruğunu işleyen thread'i başlatır.
+    Arka planda mail kuyruğunu işleyen MAIL_WORKERS adet thread'i başlatır.
+    İşçiler öğeleri kiralayarak (lease) paylaşır; MailService.send commit sonrası hepsini uyandırır.
     """
     # In-process guard: this may be called from multiple startup paths.
-    # Ensure we only spawn a single worker thread per process.
+    # Ensure we only spawn a single worker pool per process.
     try:
         if getattr(app, "_mail_worker_started", False):
             return
@@ -463,26 +706,81 @@ def start_mail_worker(app):
     except Exception:
         pass
 
-    # Inter-process lock (best effort). If we cannot lock, don't start another worker.
-    if not _try_acquire_worker_lock(app):
-        log.info("MailQueue worker not started (another process holds the lock).")
-        return
-
-    def worker():
-        log.info("MailQueue worker started.")
+    def worker(worker_id: str):
+        log.info(f"MailQueue worker {worker_id} started.")
+        seen = _wake_seq
+        last_gc = 0.0
+        last_archive = 0.0
         while True:
+            # Kiralama kaçtıysa başka süreç havuzu devralmış olabilir: geri alınana kadar gönderme
+            if not shared_state.singleton_held(WORKER_LOCK):
+                seen = _wait_for_work(seen, MAIL_POLL_SECONDS)
+                continue
+            claimed = 0
             try:
-                MailService.process_queue(app)
+                claimed = MailService.process_queue(app, worker_id=worker_id) or 0
             except Exception as e:
                 log.error(f"MailQueue worker fatal error: {e}")
-            
-            # 10 saniye bekle
-            time.sleep(10)
 
-    t = Thread(target=worker, daemon=True)
-    t.start()
+            # Uzun süre boşta kalan SMTP oturumlarını kapat
+            try:
+                from services import smtp_pool
+
+                smtp_pool.reap_idle()
+            except Exception:
+                pass
+
+            # Sayaçlar diğer işçilerin /metrics yanıtlarında da görünsün (yalnızca ilk işçi)
+            if worker_id.endswith("-1"):
+                mail_metrics.publish()
+
+            # Referansı kalmamış ek blob'larını ara sıra temizle (yalnızca ilk işçi)
+            if worker_id.endswith("-1") and time.monotonic() - last_gc > BLOB_GC_INTERVAL_SECONDS:
+                last_gc = time.monotonic()
+                try:
+                    with app.app_context():
+                        blob_store.collect_garbage()
+                except Exception as e:
+                    log.error(f"Mail blob GC error: {e}")
+
+            # Saklama süresini aşan mail loglarını arşive taşı (yalnızca ilk işçi)
+            if worker_id.endswith("-1") and time.monotonic() - last_archive > mail_archive.ARCHIVE_INTERVAL_SECONDS:
+                last_archive = time.monotonic()
+                try:
+                    with app.app_context():
+                        mail_archive.archive_older_than()
+                except Exception as e:
+                    log.error(f"MailLog archive error: {e}")
+
+            # Tam parti alındıysa kuyrukta daha fazlası olabilir: beklemeden devam
+            if claimed >= MAIL_BATCH_SIZE:
+                seen = _wake_seq
+                continue
+            # Yeni mail eklenene (wake_workers) ya da MAIL_POLL_SECONDS dolana kadar bekle
+            seen = _wait_for_work(seen, MAIL_POLL_SECONDS)
+
+    def spawn_pool():
+        pid = os.getpid() if os is not None else 0
+        threads = []
+        for i in range(MAIL_WORKERS):
+            t = Thread(target=worker, args=(f"{pid}-{i + 1}",), name=f"mail-worker-{i + 1}", daemon=True)
+            t.start()
+            threads.append(t)
+        log.info(f"MailQueue worker pool started: {MAIL_WORKERS} workers.")
+        shared_state.relay_signals(WORKER_LOCK, _notify_local)
+        try:
+            setattr(app, "_mail_worker_threads", threads)
+        except Exception:
+            pass
+
     try:
         setattr(app, "_mail_worker_started", True)
-        setattr(app, "_mail_worker_thread", t)
     except Exception:
         pass
+
+    # Inter-process lock (best effort). If we cannot lock, don't start another pool;
+    # with a shared state store this process takes over when the holder's lease lapses.
+    if not _try_acquire_worker_lock(app, on_acquired=spawn_pool):
+        log.info("MailQueue worker not started (another process holds the lock).")
+        return
+    spawn_pool()
@@ -0,0 +1,298 @@
+"""
+Transactional outbox - kayıt sonrası yan etkiler için kalıcı kuyruk.
+
+Hücre kaydı gibi sıcak yollar yan etkileri (Job senkronizasyonu, bildirim,
+socket yayını) satır içinde yapmaz; `enqueue` ile aynı transaction'a bir
+OutboxEvent ekler ve commit'ten sonra `wake` ile işçiyi uyandırır. İşçi
+olayları sırayla işler, hata olursa üstel bekleme ile yeniden dener.
+Aynı idempotency_key ile ikinci kez eklenen olay yok sayılır; işleyicinin
+yazdıkları ile 'done' durumu aynı commit'te kalıcı olur.
+
+İşçi RETENTION_INTERVAL_SECONDS'ta bir `prune_done` ile eski 'done' olayları ve
+`plan_changes.prune` ile eski değişiklik günlüğünü temizler. job_sync_queue
+satırları işlendikleri anda silindiği için ayrıca budanmaz.
+"""
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from threading import Event, Thread
+from typing import Callable, Dict, Optional
+
+from services import shared_state
+
+try:
+    import os
+except Exception:
+    os = None
+
+log = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BATCH_SIZE = 20
+POLL_SECONDS = 2.0
+DONE_RETENTION_DAYS = 7
+RETENTION_INTERVAL_SECONDS = 3600
+WORKER_LOCK = "outbox_worker"
+STUCK_AFTER = timedelta(minutes=5)
+
+_handlers: Dict[str, Callable[[dict], None]] = {}
+_wake_event = Event()
+
+
+def register_handler(kind: str, fn: Callable[[dict], None]) -> None:
+    """`kind` türündeki olaylar için işleyici kaydet (payload dict alır)."""
+    _handlers[kind] = fn
+
+
+def new_key(prefix: str) -> str:
+    return f"{prefix}:{uuid.uuid4().hex}"
+
+
+def enqueue(kind: str, payload: dict, key: Optional[str] = None):
+    """
+    Çağıranın transaction'ına bir olay ekler; commit çağırana aittir.
+    Aynı anahtarla zaten bir olay varsa yenisi eklenmez ve mevcut satır döner.
+    """
+    from extensions import db
+    from models import OutboxEvent
+
+    key = (key or new_key(kind))[:128]
+    existing = OutboxEvent.query.filter_by(idempotency_key=key).first()
+    if existing:
+        return existing
+    ev = OutboxEvent(
+        kind=kind,
+        idempotency_key=key,
+        payload_json=json.dumps(payload or {}, ensure_ascii=False, default=str),
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.now(),
+    )
+    db.session.add(ev)
+    return ev
+
+
+def wake() -> None:
+    """Commit sonrası: işçiyi bir sonraki yoklamayı beklemeden uyandır (başka süreçteyse paylaşılan sinyalle)."""
+    _wake_event.set()
+    if not shared_state.singleton_held(WORKER_LOCK):
+        shared_state.signal(WORKER_LOCK)
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(300, 2 ** max(0, int(attempts))))
+
+
+def _recover_stuck(db, OutboxEvent) -> None:
+    threshold = datetime.now() - STUCK_AFTER
+    stuck = OutboxEvent.query.filter(
+        OutboxEvent.status == "processing",
+        (OutboxEvent.locked_at < threshold) | (OutboxEvent.locked_at == None),
+    ).all()
+    if not stuck:
+        return
+    log.warning(f"Outbox: Recovering {len(stuck)} stuck events.")
+    for ev in stuck:
+        ev.status = "pending"
+        ev.last_error = "Timeout/Crash recovery"
+    db.session.commit()
+
+
+def _claim(db, OutboxEvent, limit: int):
+    from sqlalchemy import text as _sql_text
+
+    now = datetime.now()
+    candidates = (
+        db.session.query(OutboxEvent.id)
+        .filter(OutboxEvent.status == "pending", OutboxEvent.next_attempt_at <= now)
+        .order_by(OutboxEvent.id.asc())
+        .limit(limit)
+        .all()
+    )
+    claimed = []
+    for (ev_id,) in candidates:
+        res = db.session.execute(
+            _sql_text(
+                "UPDATE outbox_event SET status='processing', locked_at=:now "
+                "WHERE id=:id AND status='pending'"
+            ),
+            {"now": now, "id": int(ev_id)},
+        )
+        if getattr(res, "rowcount", 0) == 1:
+            claimed.append(int(ev_id))
+    db.session.commit()
+    return claimed
+
+
+def _run_one(app, db, OutboxEvent, ev_id: int) -> bool:
+    ev = db.session.get(OutboxEvent, ev_id)
+    if ev is None:
+        return False
+    handler = _handlers.get(ev.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"Outbox handler yok: {ev.kind}")
+        payload = json.loads(ev.payload_json or "{}")
+        # url_for vb. için istek bağlamı gerekiyor
+        with app.test_request_context("/"):
+            handler(payload)
+        ev = db.session.get(OutboxEvent, ev_id)
+        ev.status = "done"
+        ev.attempts = int(ev.attempts or 0) + 1
+        ev.last_error = None
+        ev.processed_at = datetime.now()
+        db.session.commit()
+        return True
+    except Exception as e:
+        try:
+            db.session.rollback()
+        except Exception:
+            pass
+        log.error(f"Outbox event error (ID: {ev_id}): {e}")
+        ev = db.session.get(OutboxEvent, ev_id)
+        if ev is None:
+            return False
+        ev.attempts = int(ev.attempts or 0) + 1
+        ev.last_error = str(e)[:2000]
+        if ev.attempts >= MAX_ATTEMPTS:
+            ev.status = "failed"
+            ev.processed_at = datetime.now()
+        else:
+            ev.status = "pending"
+            ev.next_attempt_at = datetime.now() + _backoff(ev.attempts)
+        db.session.commit()
+        return False
+
+
+def process_pending(app, limit: int = BATCH_SIZE) -> int:
+    """
+    Zamanı gelmiş pending olayları sırayla işler.
+    Dönüş: bu turda sahiplenilen olay sayısı.
+    """
+    with app.app_context():
+        from extensions import db
+        from models import OutboxEvent
+
+        try:
+            _recover_stuck(db, OutboxEvent)
+            claimed = _claim(db, OutboxEvent, limit)
+        except Exception as e:
+            try:
+                db.session.rollback()
+            except Exception:
+                pass
+            log.exception(f"Outbox claim error: {e}")
+            return 0
+
+        for ev_id in claimed:
+            try:
+                _run_one(app, db, OutboxEvent, ev_id)
+            except Exception as e:
+                try:
+                    db.session.rollback()
+                except Exception:
+                    pass
+                log.exception(f"Outbox worker loop error: {e}")
+        return len(claimed)
+
+
+def _sync_dirty_jobs(app) -> None:
+    """Outbox dışında kalan yazım yollarının kirli hücreleri (bkz. services/job_sync.py)."""
+    from services import job_sync
+
+    with app.app_context():
+        try:
+            job_sync.drain()
+        except Exception as e:
+            log.exception(f"Job sync error: {e}")
+
+
+def prune_done(now: Optional[datetime] = None, days: int = DONE_RETENTION_DAYS) -> int:
+    """`days` günden önce tamamlanan olayları siler (uygulama bağlamında); 'failed' satırlar incelenmek üzere kalır."""
+    from extensions import db
+    from models import OutboxEvent
+
+    cutoff = (now or datetime.now()) - timedelta(days=days)
+    n = (
+        db.session.query(OutboxEvent)
+        .filter(OutboxEvent.status == "done", OutboxEvent.processed_at != None, OutboxEvent.processed_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+    db.session.commit()
+    return int(n or 0)
+
+
+def _apply_retention(app) -> None:
+    from services import plan_changes
+
+    with app.app_context():
+        try:
+            events = prune_done()
+            changes = plan_changes.prune()
+            if events or changes:
+                log.info(f"Retention: {events} outbox events, {changes} plan changes pruned.")
+        except Exception as e:
+            from extensions import db
+
+            db.session.rollback()
+            log.exception(f"Retention error: {e}")
+
+
+def drain(app, max_rounds: int = 50) -> None:
+    """Kuyrukta zamanı gelmiş olay kalmayana kadar işle (testler / elle tetikleme); işçi döngüsü gibi sonunda kirli hücreleri de senkronlar."""
+    for _ in range(max_rounds):
+        if not process_pending(app):
+            break
+    _sync_dirty_jobs(app)
+
+
+def _try_acquire_worker_lock(app, on_acquired=None) -> bool:
+    """Tüm süreçlerde tek outbox işçisi (dosya kilidi ya da paylaşılan durumda kiralık kilit)."""
+    return shared_state.hold_singleton(app, WORKER_LOCK, on_acquired=on_acquired)
+
+
+def start_outbox_worker(app) -> None:
+    """
+    Arka planda outbox kuyruğunu işleyen thread'i başlatır.
+    """
+    if getattr(app, "_outbox_worker_started", False):
+        return
+    if getattr(app, "config", {}).get("TESTING"):
+        log.info("Outbox worker skipped (TESTING=1).")
+        return
+    if os is not None and str(os.getenv("OUTBOX_WORKER_ENABLE", "1") or "").strip() in ("0", "false", "no", "off"):
+        log.info("Outbox worker disabled via OUTBOX_WORKER_ENABLE=0.")
+        return
+    def worker():
+        log.info("Outbox worker started.")
+        next_retention = 0.0
+        while True:
+            _wake_event.wait(POLL_SECONDS)
+            _wake_event.clear()
+            if not shared_state.singleton_held(WORKER_LOCK):
+                continue  # kiralama kaçtı; geri alınana kadar başka süreç işler
+            try:
+                while process_pending(app) >= BATCH_SIZE:
+                    pass
+                _sync_dirty_jobs(app)
+                if time.monotonic() >= next_retention:
+                    next_retention = time.monotonic() + RETENTION_INTERVAL_SECONDS
+                    _apply_retention(app)
+            except Exception as e:
+                log.error(f"Outbox worker fatal error: {e}")
+                time.sleep(1)
+
+    def spawn():
+        t = Thread(target=worker, daemon=True)
+        t.start()
+        setattr(app, "_outbox_worker_thread", t)
+        shared_state.relay_signals(WORKER_LOCK, _wake_event.set)
+
+    setattr(app, "_outbox_worker_started", True)
+    # Kilit başka süreçteyse başlatma; paylaşılan durumda kiralama düşünce devralınır
+    if not _try_acquire_worker_lock(app, on_acquired=spawn):
+        log.info("Outbox worker not started (another process holds the lock).")
+        return
+    spawn()
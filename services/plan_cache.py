@@ -0,0 +1,287 @@
+"""
+Process-local read model cache for the weekly plan grid (/plan).
+
+Every week has a version counter that is bumped after a cell mutation commits.
+The expensive, week-scoped part of plan_week (cells, assignments, overtime,
+labels, personnel summary, ...) is built once per (week version, catalog version)
+and served from memory until the next bump.
+
+"Catalog" data (people, projects, vehicles, status types, ...) is shared by all
+weeks; it is tracked with a single counter that is bumped automatically from a
+SQLAlchemy flush hook (see install_invalidation_hooks).
+
+With a shared state store (services.shared_state) the version counters live in
+the store, so a write handled by one worker invalidates the views of all others.
+"""
+import logging
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Optional
+
+log = logging.getLogger(__name__)
+
+# Changes to instances of these models invalidate every cached week.
+CATALOG_MODELS = {
+    "Person", "Firma", "Seviye", "Project", "SubProject", "Vehicle",
+    "PersonnelStatusType", "User", "Announcement", "AnnouncementRead",
+}
+# User rows are touched for presence on almost every request; these columns
+# never show up on the plan page and must not thrash the cache.
+_IGNORED_USER_ATTRS = {"last_seen", "online_since"}
+# Models that only count as catalog changes when one of these columns changes.
+# A team's vehicle is bulk-copied onto its cells in every week.
+_CATALOG_ATTRS = {"Team": {"vehicle_id"}}
+
+MAX_CACHED_WEEKS = 32
+
+# Unique per process start: a restarted worker never answers 304 for an ETag
+# handed out by its previous incarnation.
+_EPOCH = secrets.token_hex(4)
+_shared_epoch: Optional[str] = None
+
+_lock = threading.RLock()
+_week_versions: Dict[str, int] = {}
+_catalog_version = 0
+_views: "OrderedDict[str, tuple]" = OrderedDict()
+_hooks_installed = False
+
+
+def _week_key(d) -> str:
+    if isinstance(d, datetime):
+        d = d.date()
+    if isinstance(d, str):
+        d = datetime.strptime(d[:10], "%Y-%m-%d").date()
+    ws = d - timedelta(days=d.weekday())
+    return ws.strftime("%Y-%m-%d")
+
+
+def _shared_store():
+    """Paylaşılan durum deposu (çok işçili kurulum) ya da None."""
+    from services import shared_state
+
+    return shared_state.get_state() if shared_state.is_shared() else None
+
+
+def _stamp(key: str):
+    """(week version, catalog version). With a shared store every worker sees the same counters."""
+    store = _shared_store()
+    if store is not None:
+        try:
+            return int(store.get(f"plan_cache:week:{key}", 0) or 0), int(store.get("plan_cache:catalog", 0) or 0)
+        except Exception:
+            log.debug("plan_cache shared version read failed", exc_info=True)
+    with _lock:
+        return _week_versions.get(key, 0), _catalog_version
+
+
+def _epoch() -> str:
+    global _shared_epoch
+    store = _shared_store()
+    if store is None:
+        return _EPOCH
+    if _shared_epoch is None:
+        try:
+            store.add("plan_cache:epoch", _EPOCH)
+            _shared_epoch = str(store.get("plan_cache:epoch") or _EPOCH)
+        except Exception:
+            return _EPOCH
+    return _shared_epoch
+
+
+def week_version(d) -> int:
+    return _stamp(_week_key(d))[0]
+
+
+def catalog_version() -> int:
+    store = _shared_store()
+    if store is not None:
+        try:
+            return int(store.get("plan_cache:catalog", 0) or 0)
+        except Exception:
+            log.debug("plan_cache shared version read failed", exc_info=True)
+    with _lock:
+        return _catalog_version
+
+
+def invalidate_week(d) -> int:
+    """Bump the version of the week containing `d`. Call after the write committed."""
+    if not d:
+        return 0
+    key = _week_key(d)
+    with _lock:
+        ver = _week_versions.get(key, 0) + 1
+        _week_versions[key] = ver
+        _views.pop(key, None)
+    store = _shared_store()
+    if store is not None:
+        try:
+            ver = store.incr(f"plan_cache:week:{key}")
+        except Exception:
+            log.debug("plan_cache shared version bump failed", exc_info=True)
+    return ver
+
+
+def invalidate_dates(dates: Iterable) -> None:
+    """Bump every distinct week touched by `dates` once."""
+    seen = set()
+    for d in dates or []:
+        if not d:
+            continue
+        key = _week_key(d)
+        if key in seen:
+            continue
+        seen.add(key)
+        invalidate_week(key)
+
+
+def invalidate_range(start: date, end: date) -> None:
+    if not start or not end:
+        return
+    d = start - timedelta(days=start.weekday())
+    while d <= end:
+        invalidate_week(d)
+        d += timedelta(days=7)
+
+
+def invalidate_catalog() -> int:
+    global _catalog_version
+    with _lock:
+        _catalog_version += 1
+        _views.clear()
+        ver = _catalog_version
+    store = _shared_store()
+    if store is not None:
+        try:
+            ver = store.incr("plan_cache:catalog")
+        except Exception:
+            log.debug("plan_cache shared version bump failed", exc_info=True)
+    return ver
+
+
+def etag_for_week(d, *, extra: str = "") -> str:
+    """Weak-ETag token (without quotes) for the rendered plan page of a week."""
+    key = _week_key(d)
+    wv, cv = _stamp(key)
+    token = f"plan-{_epoch()}-{key}-{wv}-{cv}"
+    if extra:
+        token = f"{token}-{extra}"
+    return token
+
+
+def get_week_view(d, builder: Callable[[date], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Return the cached view for the week of `d`, building it with `builder(week_start)`
+    on a miss. The version is read *before* building so a write that commits while
+    the view is being built is never hidden behind the new version number.
+    """
+    key = _week_key(d)
+    stamp = _stamp(key)
+    with _lock:
+        hit = _views.get(key)
+        if hit and hit[0] == stamp:
+            _views.move_to_end(key)
+            return hit[1]
+
+    view = builder(datetime.strptime(key, "%Y-%m-%d").date())
+
+    current = _stamp(key)
+    with _lock:
+        if current == stamp:
+            _views[key] = (stamp, view)
+            _views.move_to_end(key)
+            while len(_views) > MAX_CACHED_WEEKS:
+                _views.popitem(last=False)
+    return view
+
+
+def clear() -> None:
+    global _catalog_version
+    with _lock:
+        _views.clear()
+        _week_versions.clear()
+        _catalog_version = 0
+
+
+def detach_row(obj, *extra_attrs: str) -> Optional[SimpleNamespace]:
+    """
+    Copy the column values of an ORM instance into a plain namespace so it can be
+    cached across requests/sessions without lazy loads or DetachedInstanceError.
+    """
+    if obj is None:
+        return None
+    from sqlalchemy import inspect as sa_inspect
+
+    data = {attr.key: getattr(obj, attr.key) for attr in sa_inspect(obj).mapper.column_attrs}
+    for name in extra_attrs:
+        data[name] = getattr(obj, name, None)
+    return SimpleNamespace(**data)
+
+
+def _is_catalog_change(obj) -> bool:
+    name = type(obj).__name__
+    if name in _CATALOG_ATTRS:
+        watched = _CATALOG_ATTRS[name]
+        ignored = None
+    elif name == "User":
+        watched = None
+        ignored = _IGNORED_USER_ATTRS
+    elif name in CATALOG_MODELS:
+        return True
+    else:
+        return False
+    from sqlalchemy import inspect as sa_inspect
+
+    try:
+        state = sa_inspect(obj)
+        for attr in state.mapper.column_attrs:
+            if watched is not None and attr.key not in watched:
+                continue
+            if ignored and attr.key in ignored:
+                continue
+            if state.attrs[attr.key].history.has_changes():
+                return True
+    except Exception:
+        return True
+    return False
+
+
+def _after_flush(session, _flush_context):
+    try:
+        if session.info.get("_plan_cache_catalog_dirty"):
+            return
+        for obj in list(session.new) + list(session.deleted):
+            if type(obj).__name__ in CATALOG_MODELS:
+                session.info["_plan_cache_catalog_dirty"] = True
+                return
+        for obj in session.dirty:
+            if _is_catalog_change(obj):
+                session.info["_plan_cache_catalog_dirty"] = True
+                return
+    except Exception:
+        log.debug("plan_cache flush hook failed", exc_info=True)
+
+
+def _after_commit(session):
+    if session.info.pop("_plan_cache_catalog_dirty", False):
+        invalidate_catalog()
+
+
+def _after_rollback(session):
+    session.info.pop("_plan_cache_catalog_dirty", None)
+
+
+def install_invalidation_hooks() -> None:
+    """Register the session hooks that bump the catalog version (idempotent)."""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_soft_rollback", lambda session, _tx: _after_rollback(session))
+    _hooks_installed = True
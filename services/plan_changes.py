@@ -0,0 +1,233 @@
+"""
+Plan değişiklik günlüğü (PlanChange) - haftalık tablo delta senkronizasyonu.
+
+PlanCell, CellAssignment ve TeamOvertime üzerindeki her ORM yazımı aynı
+transaction içinde plan_change tablosuna bir satır ekler (session flush hook).
+ORM'i atlayan toplu update/delete yapan yerler `record_cells` ile elle yazar.
+İstemci son gördüğü sıra numarasını (since_version) gönderir, sunucu yalnızca
+o haftada bundan sonra değişen hücreleri döndürür.
+Aynı satırlar job_sync_queue'ya da düşer (bkz. services/job_sync.py).
+
+Günlük sınırsız büyümesin diye `prune` PLAN_CHANGE_RETENTION_DAYS günden eski
+satırları siler (outbox işçisi periyodik çağırır). Silinen aralıktan kalan bir
+since_version için `is_stale` True döner; istemci o zaman haftayı tümüyle yükler.
+"""
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import func, select
+
+log = logging.getLogger(__name__)
+
+_hooks_installed = False
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name) or default))
+    except ValueError:
+        return default
+
+
+# Açık kalan bir sekme bu süre içinde dönerse delta ile devam eder, sonra tam yükleme
+PLAN_CHANGE_RETENTION_DAYS = _env_int("PLAN_CHANGE_RETENTION_DAYS", 14)
+PRUNE_BATCH_SIZE = 5000
+
+def _week_start(d: date) -> date:
+    return d - timedelta(days=d.weekday())
+
+
+def _collect(session) -> Tuple[Dict[int, tuple], set]:
+    """
+    Flush edilen nesnelerden değişen hücreleri çıkarır.
+    Dönüş: ({cell_id: (project_id, work_date, change_type)}, {yalnızca id'si bilinen cell_id'ler})
+    """
+    from models import CellAssignment, PlanCell, TeamOvertime
+
+    known: Dict[int, tuple] = {}
+    unresolved = set()
+
+    for obj in session.deleted:
+        if isinstance(obj, PlanCell) and obj.id:
+            known[int(obj.id)] = (obj.project_id, obj.work_date, "delete")
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, PlanCell):
+            if obj.id and int(obj.id) not in known and (obj in session.new or session.is_modified(obj, include_collections=False)):
+                known[int(obj.id)] = (obj.project_id, obj.work_date, "update")
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (CellAssignment, TeamOvertime)):
+            cid = getattr(obj, "cell_id", None)
+            if cid and int(cid) not in known:
+                unresolved.add(int(cid))
+    return known, unresolved
+
+
+def _write(session, known: Dict[int, tuple], unresolved: Iterable[int]) -> None:
+    from models import JobSyncQueue, PlanCell, PlanChange
+
+    connection = session.connection()
+
+    unresolved = [cid for cid in unresolved if cid not in known]
+    if unresolved:
+        rows = connection.execute(
+            select(PlanCell.id, PlanCell.project_id, PlanCell.work_date).where(PlanCell.id.in_(unresolved))
+        ).fetchall()
+        for cid, pid, wd in rows:
+            known[int(cid)] = (pid, wd, "update")
+
+    now = datetime.now()
+    values = [
+        {
+            "week_start": _week_start(wd),
+            "cell_id": cid,
+            "project_id": pid,
+            "work_date": wd,
+            "change_type": change_type,
+            "changed_at": now,
+        }
+        for cid, (pid, wd, change_type) in known.items()
+        if wd is not None
+    ]
+    if values:
+        connection.execute(PlanChange.__table__.insert(), values)
+        # Aynı hücreler Job senkronizasyonu için kirli kuyruğuna
+        connection.execute(
+            JobSyncQueue.__table__.insert(),
+            [{"cell_id": v["cell_id"], "work_date": v["work_date"], "queued_at": now} for v in values],
+        )
+        weeks = session.info.setdefault("_plan_change_weeks", set())
+        weeks.update(v["week_start"] for v in values)
+
+
+def _after_flush(session, _flush_context):
+    try:
+        known, unresolved = _collect(session)
+        if known or unresolved:
+            _write(session, known, unresolved)
+    except Exception:
+        log.exception("plan_change log yazılamadı")
+        raise
+
+
+def record_cells(cells: Iterable, change_type: str = "update") -> None:
+    """
+    ORM'i atlayan (query.update/delete) yazımlar için elle kayıt.
+    `cells` PlanCell nesneleri veya (cell_id, project_id, work_date) üçlüleri olabilir.
+    Çağıranın transaction'ına yazar; commit çağırana aittir.
+    """
+    from extensions import db
+
+    known: Dict[int, tuple] = {}
+    for c in cells or []:
+        if hasattr(c, "project_id") and hasattr(c, "work_date"):
+            cid, pid, wd = c.id, c.project_id, c.work_date
+        else:
+            cid, pid, wd = tuple(c)
+        if cid:
+            known[int(cid)] = (pid, wd, change_type)
+    if known:
+        _write(db.session, known, [])
+
+
+def record_query(query, change_type: str = "update") -> None:
+    """Toplu update/delete'ten önce: PlanCell sorgusunun eşlediği hücreleri kaydet."""
+    from models import PlanCell
+
+    record_cells(query.with_entities(PlanCell.id, PlanCell.project_id, PlanCell.work_date).all(), change_type)
+
+
+def current_version() -> int:
+    from extensions import db
+    from models import PlanChange
+
+    return int(db.session.query(func.max(PlanChange.id)).scalar() or 0)
+
+
+def is_stale(since_version: int) -> bool:
+    """since_version'dan sonraki kayıtların bir kısmı silindiyse (budama) True."""
+    from extensions import db
+    from models import PlanChange
+
+    oldest = db.session.query(func.min(PlanChange.id)).scalar()
+    return oldest is not None and int(since_version or 0) < int(oldest) - 1
+
+
+def prune(now: datetime = None, days: int = None) -> int:
+    """
+    `days` günden eski plan_change satırlarını parça parça siler; silinen satır sayısını döner.
+    En son satır her zaman kalır: current_version() sıfıra dönmesin (uygulama bağlamında).
+    """
+    from extensions import db
+    from models import PlanChange
+
+    cutoff = (now or datetime.now()) - timedelta(days=days or PLAN_CHANGE_RETENTION_DAYS)
+    # Boşluk kalmasın diye kesim bir id sınırıdır: sınıra kadar her şey silinir
+    boundary = db.session.query(func.max(PlanChange.id)).filter(PlanChange.changed_at < cutoff).scalar()
+    boundary = min(int(boundary or 0), current_version() - 1)
+    total = 0
+    while boundary > 0:
+        ids = [
+            i for (i,) in db.session.query(PlanChange.id)
+            .filter(PlanChange.id <= boundary)
+            .order_by(PlanChange.id.asc())
+            .limit(PRUNE_BATCH_SIZE)
+            .all()
+        ]
+        if not ids:
+            break
+        db.session.query(PlanChange).filter(PlanChange.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        total += len(ids)
+    return total
+
+
+def changes_since(week_start: date, since_version: int) -> Tuple[int, List[tuple]]:
+    """
+    (yeni sürüm, [(cell_id, project_id, work_date, change_type), ...]) döndürür.
+    Aynı hücre birden çok kez değiştiyse yalnızca son kayıt gelir.
+    """
+    from extensions import db
+    from models import PlanChange
+
+    version = current_version()
+    rows = (
+        db.session.query(PlanChange.id, PlanChange.cell_id, PlanChange.project_id, PlanChange.work_date, PlanChange.change_type)
+        .filter(PlanChange.week_start == week_start, PlanChange.id > int(since_version or 0), PlanChange.id <= version)
+        .order_by(PlanChange.id.asc())
+        .all()
+    )
+    latest: Dict[int, tuple] = {}
+    for _id, cid, pid, wd, change_type in rows:
+        latest[int(cid)] = (int(cid), pid, wd, change_type)
+    return version, list(latest.values())
+
+
+def _after_commit(session):
+    weeks = session.info.pop("_plan_change_weeks", None)
+    if weeks:
+        # Günlüğe düşen her hafta, /plan önbelleğinde de geçersiz olsun
+        from services import outbox, plan_cache
+
+        plan_cache.invalidate_dates(weeks)
+        # Kirli hücreler için Job senkronizasyonunu tetikle
+        outbox.wake()
+
+
+def _after_rollback(session):
+    session.info.pop("_plan_change_weeks", None)
+
+
+def install_change_log_hooks() -> None:
+    """Register the session hooks that write plan_change rows (idempotent)."""
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_soft_rollback", lambda session, _tx: _after_rollback(session))
+    _hooks_installed = True
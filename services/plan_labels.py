@@ -0,0 +1,173 @@
+"""
+Plan etiket indeksi - bir tarih aralığındaki hücrelerin başvurduğu tüm etiketler.
+
+Haftalık tablo (plan_week), Excel dışa aktarma ve HTML snapshot aynı veriye
+ihtiyaç duyar: hücreler, işi olan projeler, alt proje / ekip / araç / personel
+adları. Hücre başına `SubProject.query.get` gibi sorgular yerine hepsi sabit
+sayıda toplu sorguyla bir kez yüklenir; aralıktaki hücre sayısından bağımsızdır.
+"""
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Tek istekte dışa aktarılabilecek en uzun aralık (yaklaşık iki çeyrek)
+MAX_RANGE_DAYS = 186
+
+
+def check_range(start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    """Aralık parametrelerini doğrular; hatalıysa kullanıcıya gösterilecek mesajla ValueError."""
+    if not start or not end:
+        raise ValueError("Başlangıç ve bitiş tarihi gerekli.")
+    if end < start:
+        raise ValueError("Bitiş tarihi başlangıçtan önce olamaz.")
+    if (end - start).days + 1 > MAX_RANGE_DAYS:
+        raise ValueError(f"Tarih aralığı en fazla {MAX_RANGE_DAYS} gün olabilir.")
+    return start, end
+
+
+def week_windows(start: date, end: date) -> Iterator[Tuple[date, List[date]]]:
+    """[start, end] aralığını haftalara böler: (hafta başı, aralığa düşen günler)."""
+    ws = start - timedelta(days=start.weekday())
+    while ws <= end:
+        days = [ws + timedelta(days=i) for i in range(7)]
+        yield ws, [d for d in days if start <= d <= end]
+        ws += timedelta(days=7)
+
+
+def subproject_label(name: Optional[str], code: Optional[str]) -> str:
+    code = (code or "").strip()
+    return f"{name}{f' ({code})' if code else ''}"
+
+
+@dataclass
+class PlanLabelIndex:
+    start: date
+    end: date
+    cells: list = field(default_factory=list)
+    # İşi olan projeler (İL, proje kodu sırasıyla); şablon projeler (region == "-") dahil
+    projects: list = field(default_factory=list)
+    cell_by_key: Dict[Tuple[int, str], object] = field(default_factory=dict)
+    cell_person_ids: Dict[int, List[int]] = field(default_factory=dict)
+    person_names: Dict[int, str] = field(default_factory=dict)
+    subproject_labels: Dict[int, str] = field(default_factory=dict)
+    team_names: Dict[int, str] = field(default_factory=dict)
+    team_vehicle_plates: Dict[int, str] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, start: date, end: date) -> "PlanLabelIndex":
+        from extensions import db
+        from models import CellAssignment, PlanCell, Person, Project, SubProject, Team, Vehicle
+
+        idx = cls(start=start, end=end)
+        idx.cells = (
+            PlanCell.query.filter(PlanCell.work_date >= start, PlanCell.work_date <= end)
+            .order_by(PlanCell.work_date.asc(), PlanCell.id.asc())
+            .all()
+        )
+        if not idx.cells:
+            return idx
+
+        idx.cell_by_key = {(c.project_id, c.work_date.isoformat()): c for c in idx.cells}
+        project_ids = {c.project_id for c in idx.cells}
+        idx.projects = (
+            Project.query.filter(Project.id.in_(project_ids))
+            .order_by(Project.region.asc(), Project.project_code.asc())
+            .all()
+        )
+
+        # Atamalar ve personel adları tek sorguda (aralığa göre, hücre id listesi olmadan)
+        rows = (
+            db.session.query(CellAssignment.cell_id, Person.id, Person.full_name)
+            .join(Person, Person.id == CellAssignment.person_id)
+            .join(PlanCell, PlanCell.id == CellAssignment.cell_id)
+            .filter(PlanCell.work_date >= start, PlanCell.work_date <= end)
+            .order_by(CellAssignment.cell_id.asc(), CellAssignment.id.asc())
+            .all()
+        )
+        for cid, pid, name in rows:
+            idx.cell_person_ids.setdefault(int(cid), []).append(int(pid))
+            idx.person_names[int(pid)] = name
+
+        sub_ids = {int(c.subproject_id) for c in idx.cells if c.subproject_id}
+        if sub_ids:
+            for sid, name, code in (
+                db.session.query(SubProject.id, SubProject.name, SubProject.code).filter(SubProject.id.in_(sub_ids)).all()
+            ):
+                idx.subproject_labels[int(sid)] = subproject_label(name, code)
+
+        team_ids = {int(c.team_id) for c in idx.cells if c.team_id}
+        if team_ids:
+            team_rows = (
+                db.session.query(Team.id, Team.name, Vehicle.plate)
+                .outerjoin(Vehicle, Vehicle.id == Team.vehicle_id)
+                .filter(Team.id.in_(team_ids))
+                .all()
+            )
+            for tid, name, plate in team_rows:
+                idx.team_names[int(tid)] = (name or "").strip()
+                if plate:
+                    idx.team_vehicle_plates[int(tid)] = plate
+        return idx
+
+    @classmethod
+    def load_week(cls, week_start: date) -> "PlanLabelIndex":
+        return cls.load(week_start, week_start + timedelta(days=6))
+
+    @property
+    def row_projects(self) -> list:
+        """Tablo satırları: şablon projeler (region == "-") hariç."""
+        return [p for p in self.projects if p.region != "-"]
+
+    def _cells_between(self, start: Optional[date], end: Optional[date]) -> list:
+        if start is None and end is None:
+            return self.cells
+        lo, hi = start or self.start, end or self.end
+        return [c for c in self.cells if lo <= c.work_date <= hi]
+
+    def projects_between(self, start: date, end: date, *, include_templates: bool = False) -> list:
+        """Yalnızca [start, end] içinde işi olan projeler (sıra korunur)."""
+        ids = {c.project_id for c in self._cells_between(start, end)}
+        return [p for p in self.projects if p.id in ids and (include_templates or p.region != "-")]
+
+    def cell(self, project_id: int, d: date):
+        return self.cell_by_key.get((project_id, d.isoformat()))
+
+    def names_for_cell(self, cell_id: int) -> List[str]:
+        return [self.person_names[pid] for pid in self.cell_person_ids.get(cell_id, []) if pid in self.person_names]
+
+    def subproject_label_for(self, cell) -> str:
+        sid = int(getattr(cell, "subproject_id", 0) or 0)
+        return self.subproject_labels.get(sid, "") if sid else ""
+
+    def team_name_for(self, cell) -> str:
+        """Hücredeki ekip adı, yoksa Team kaydındaki ad (utils._effective_team_name_for_cell ile aynı)."""
+        name = (getattr(cell, "team_name", None) or "").strip()
+        if name:
+            return name
+        return self.team_names.get(int(cell.team_id), "") if getattr(cell, "team_id", None) else ""
+
+    def row_subproject_labels(
+        self, anchor: Optional[date] = None, start: Optional[date] = None, end: Optional[date] = None
+    ) -> Dict[int, str]:
+        """
+        Proje satırında gösterilecek tekil alt proje etiketi.
+        Öncelik: anchor (varsayılan: aralığın ilk günü) hücresine set edilen alt proje;
+        yoksa [start, end] (varsayılan: tüm aralık) boyunca tekil kalan alt proje.
+        """
+        anchor_key = (anchor or start or self.start).isoformat()
+        sub_ids_by_project: Dict[int, set] = {}
+        for c in self._cells_between(start, end):
+            sid = int(c.subproject_id or 0)
+            if sid > 0:
+                sub_ids_by_project.setdefault(int(c.project_id), set()).add(sid)
+
+        out: Dict[int, str] = {}
+        for pid, sids in sub_ids_by_project.items():
+            anchor_cell = self.cell_by_key.get((pid, anchor_key))
+            sid = int((anchor_cell.subproject_id if anchor_cell else 0) or 0)
+            if sid <= 0 and len(sids) == 1:
+                sid = next(iter(sids))
+            label = self.subproject_labels.get(sid) if sid > 0 else None
+            if label:
+                out[pid] = label
+        return out
@@ -0,0 +1,192 @@
+"""
+Haftalık ve ekip plan maillerinin toplu hazırlanması (bir kez derle, kişiye göre doldur).
+
+Eskiden her kişi için tablo satırları string birleştirmeyle kuruluyor,
+`render_template("email_base.html")` ayrı ayrı çağrılıyor ve her ek dosya
+kişi başına yeniden okunuyordu. `PlanMailBatch`:
+
+- Haftanın atamalarını tek sorguda çeker ve kişiye göre gruplar,
+- şablonu ve şablon bağlamını bir kez hazırlar,
+- her hücrenin tablo satırını bir kez üretir (aynı hücreye atanmış herkes paylaşır),
+- her ek dosyayı bir kez blob deposuna yazar,
+- tüm mailleri `MailService.send_many` ile tek toplu INSERT'le kuyruğa ekler.
+"""
+import html
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from flask import current_app
+
+from services import blob_store
+from services.mail_service import MailService
+
+TABLE_HEAD = """
+          <table border="1" cellpadding="6" cellspacing="0" style="border-collapse:collapse; width:100%; font-size:13px;">
+            <thead>
+              <tr>
+                <th>Tarih</th><th>Il</th><th>Proje</th><th>Vardiya</th><th>Arac</th><th>Ekip</th><th>Is Detay Maili</th><th>Is Detayi</th><th>LLD/HHD</th><th>Tutanak</th>
+              </tr>
+            </thead>
+            <tbody>"""
+TABLE_TAIL = """</tbody>
+          </table>
+        """
+
+
+def _multiline(text: Optional[str]) -> str:
+    return html.escape(text or "").replace("\n", "<br>")
+
+
+@dataclass
+class PlanMailRecipient:
+    person_id: int
+    full_name: str
+    email: str
+    cell_ids: List[int] = field(default_factory=list)
+
+
+@dataclass
+class PlanMailBatch:
+    week_start: date
+    team_name: Optional[str] = None
+    recipients: List[PlanMailRecipient] = field(default_factory=list)
+    # Atanmış işi olup e-postası olmayan kişiler
+    without_email: List[str] = field(default_factory=list)
+    row_html: Dict[int, str] = field(default_factory=dict)
+    cell_files: Dict[int, List[str]] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, week_start: date, team_name: Optional[str] = None) -> "PlanMailBatch":
+        """Haftanın atamalarını tek sorguda yükler; team_name verilirse yalnızca o ekibin hücreleri."""
+        from extensions import db
+        from models import CellAssignment, PlanCell, Person, Project, Team
+        from utils import _parse_files, iso
+
+        batch = cls(week_start=week_start, team_name=team_name)
+        end = week_start + timedelta(days=6)
+        rows = (
+            db.session.query(
+                Person.id, Person.full_name, Person.email,
+                PlanCell.id, PlanCell.work_date,
+                Project.region, Project.project_code, Project.project_name,
+                PlanCell.shift, PlanCell.note, PlanCell.vehicle_info,
+                PlanCell.job_mail_body, PlanCell.lld_hhd_files, PlanCell.tutanak_files, PlanCell.lld_hhd_path, PlanCell.tutanak_path,
+                Team.name, PlanCell.team_name
+            )
+            .join(CellAssignment, CellAssignment.person_id == Person.id)
+            .join(PlanCell, PlanCell.id == CellAssignment.cell_id)
+            .join(Project, Project.id == PlanCell.project_id)
+            .outerjoin(Team, Team.id == PlanCell.team_id)
+            .filter(PlanCell.work_date >= week_start, PlanCell.work_date <= end)
+            .order_by(Person.full_name.asc(), PlanCell.work_date.asc())
+            .all()
+        )
+
+        by_person: Dict[int, PlanMailRecipient] = {}
+        for (pid, pname, pemail, cid, wd, region, pcode, pname2, shift, note, vehicle, job_mail_body,
+             lld_list_str, tut_list_str, lld_single, tut_single, tname, tname_alt) in rows:
+            effective_team = (tname or tname_alt or "").strip()
+            if team_name is not None and effective_team != team_name:
+                continue
+
+            if cid not in batch.row_html:
+                lld_list = _parse_files(lld_list_str)
+                tut_list = _parse_files(tut_list_str)
+                if lld_single and not lld_list:
+                    lld_list = [lld_single]
+                if tut_single and not tut_list:
+                    tut_list = [tut_single]
+                batch.cell_files[cid] = lld_list + tut_list
+                batch.row_html[cid] = f"""
+              <tr>
+                <td>{iso(wd)}</td>
+                <td>{html.escape(region or "")}</td>
+                <td>{html.escape(f"{pcode} - {pname2}")}</td>
+                <td>{html.escape(shift or "")}</td>
+                <td>{html.escape(vehicle or "")}</td>
+                <td>{html.escape(effective_team)}</td>
+                <td>{_multiline(job_mail_body)}</td>
+                <td>{_multiline(note)}</td>
+                <td>{", ".join(os.path.basename(x) for x in lld_list)}</td>
+                <td>{", ".join(os.path.basename(x) for x in tut_list)}</td>
+              </tr>
+            """
+
+            r = by_person.get(pid)
+            if r is None:
+                r = by_person[pid] = PlanMailRecipient(int(pid), pname or "", (pemail or "").strip())
+            r.cell_ids.append(cid)
+
+        for r in by_person.values():
+            if r.email:
+                batch.recipients.append(r)
+            else:
+                batch.without_email.append(r.full_name)
+        return batch
+
+    def table_html(self, r: PlanMailRecipient) -> str:
+        return TABLE_HEAD + "".join(self.row_html[cid] for cid in r.cell_ids) + TABLE_TAIL
+
+    def attachment_names(self, r: PlanMailRecipient) -> List[str]:
+        return sorted({f for cid in r.cell_ids for f in self.cell_files.get(cid, []) if f})
+
+    def _stored_attachments(self) -> Dict[str, dict]:
+        """Her tekil ek dosyayı bir kez blob deposuna yazar: yüklenen dosya adı -> ek kaydı."""
+        folder = current_app.config["UPLOAD_FOLDER"]
+        out: Dict[str, dict] = {}
+        for fname in sorted({f for files in self.cell_files.values() for f in files if f}):
+            full_path = os.path.join(folder, fname)
+            if not os.path.exists(full_path):
+                continue
+            sha, size = blob_store.put_file(full_path)
+            out[fname] = {
+                "filename": os.path.basename(full_path),
+                "content_type": mimetypes.guess_type(full_path)[0] or "application/octet-stream",
+                "blob": sha,
+                "size": size,
+            }
+        return out
+
+    def compose(self, *, mail_type: str, subject: str, heading: str, intro: str, user_id: Optional[int] = None) -> List[dict]:
+        """
+        Kişi başına `MailService.send` argümanları. `intro` içinde {name} kişinin
+        (kaçışlanmış) adıyla doldurulur. Şablon bir kez derlenir.
+        """
+        from utils import iso
+
+        template = current_app.jinja_env.get_template("email_base.html")
+        ctx = dict(
+            title=subject,
+            heading=heading,
+            table_headers=None,
+            table_rows=None,
+            footer=f"Hafta baslangic: {iso(self.week_start)}",
+        )
+        current_app.update_template_context(ctx)
+        stored = self._stored_attachments()
+
+        messages = []
+        for r in self.recipients:
+            names = self.attachment_names(r)
+            ctx["intro"] = intro.format(name=html.escape(r.full_name))
+            ctx["body_html"] = self.table_html(r)
+            messages.append(dict(
+                mail_type=mail_type,
+                recipients=[r.email],
+                subject=subject,
+                html=template.render(ctx),
+                attachments=[stored[f] for f in names if f in stored],
+                week_start=self.week_start,
+                team_name=self.team_name,
+                user_id=user_id,
+                meta={"type": mail_type, "attachments": names},
+            ))
+        return messages
+
+    def enqueue(self, **compose_kwargs) -> int:
+        """Tüm mailleri tek toplu INSERT ile kuyruğa ekler; eklenen mail sayısını döner."""
+        messages = self.compose(**compose_kwargs)
+        return MailService.send_many(messages) if messages else 0
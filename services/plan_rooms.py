@@ -0,0 +1,162 @@
+"""
+Plan güncellemelerinin hafta odalarına (Socket.IO) birleştirilerek yayılması.
+
+Plan sayfası bağlanınca gösterdiği haftanın odasına (`plan_week_<pazartesi>`)
+ve tüm plan izleyicilerinin odasına (`plan_weeks`) katılır. Hücre değişiklikleri
+yalnızca o haftayı izleyenlere gider:
+
+- `publish_cells` hücre deltalarını oda başına `COALESCE_SECONDS` boyunca toplar
+  ve tek `cells_updated` ({"week_start", "cells": [...]}) olarak yayar; aynı
+  hücrenin pencere içindeki eski deltası yenisiyle değiştirilir.
+- `refresh` o haftalar için `update_table` ister (istemci delta senkronizasyonu
+  yapar); aynı penceredeki bekleyen deltalar bu isteğe dahil olur. Tarih
+  verilmezse (proje satırı gibi tüm haftaları etkileyen değişiklik) tüm plan
+  izleyicilerine gider.
+- `emit_to_weeks` kilit / iptal / mesai gibi olayları beklemeden ilgili hafta
+  odalarına yollar.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+log = logging.getLogger(__name__)
+
+COALESCE_SECONDS = 0.1
+ROOM_PREFIX = "plan_week_"
+ALL_WEEKS_ROOM = "plan_weeks"
+
+
+def week_start_iso(d) -> Optional[str]:
+    if d is None or d == "":
+        return None
+    if isinstance(d, datetime):
+        d = d.date()
+    if not isinstance(d, date):
+        try:
+            d = datetime.strptime(str(d)[:10], "%Y-%m-%d").date()
+        except ValueError:
+            return None
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+
+def week_room(d) -> Optional[str]:
+    ws = week_start_iso(d)
+    return f"{ROOM_PREFIX}{ws}" if ws else None
+
+
+def _emit(event: str, data: dict, room: str) -> None:
+    try:
+        from extensions import socketio
+
+        socketio.emit(event, data, room=room, namespace="/")
+    except Exception as e:
+        log.error(f"Plan room emit error ({event} -> {room}): {e}")
+
+
+class RoomCoalescer:
+    """Oda başına delta tamponu; ilk delta pencereyi başlatır, pencere sonunda tek mesaj gider."""
+
+    def __init__(self, window: float = COALESCE_SECONDS):
+        self.window = window
+        self._pending: Dict[str, "OrderedDict[object, dict]"] = {}
+        self._refresh: set = set()
+        self._scheduled: set = set()
+        self._lock = threading.Lock()
+        self.flushes = 0
+
+    def add(self, room: str, delta: Optional[dict] = None, refresh: bool = False) -> None:
+        with self._lock:
+            bucket = self._pending.setdefault(room, OrderedDict())
+            if delta is not None:
+                key = delta.get("cell_id") or (delta.get("project_id"), delta.get("work_date"))
+                bucket.pop(key, None)
+                bucket[key] = delta
+            if refresh:
+                self._refresh.add(room)
+            if room in self._scheduled:
+                return
+            self._scheduled.add(room)
+        self._schedule(room)
+
+    def _schedule(self, room: str) -> None:
+        if self.window <= 0:
+            self.flush(room)
+            return
+        try:
+            from extensions import socketio
+
+            socketio.start_background_task(self._flush_later, room)
+        except Exception as e:
+            log.error(f"Plan room flush schedule error: {e}")
+            self.flush(room)
+
+    def _flush_later(self, room: str) -> None:
+        try:
+            from extensions import socketio
+
+            socketio.sleep(self.window)
+        except Exception:
+            pass
+        self.flush(room)
+
+    def flush(self, room: str) -> None:
+        with self._lock:
+            bucket = self._pending.pop(room, None)
+            refresh = room in self._refresh
+            self._refresh.discard(room)
+            self._scheduled.discard(room)
+            if bucket or refresh:
+                self.flushes += 1
+        week = room[len(ROOM_PREFIX):] if room.startswith(ROOM_PREFIX) else None
+        if refresh:
+            _emit("update_table", {"week_start": week}, room)
+        elif bucket:
+            _emit("cells_updated", {"week_start": week, "cells": list(bucket.values())}, room)
+
+    def flush_all(self) -> None:
+        with self._lock:
+            rooms = list(self._pending.keys() | self._refresh)
+        for room in rooms:
+            self.flush(room)
+
+
+_coalescer = RoomCoalescer()
+
+
+def get_coalescer() -> RoomCoalescer:
+    return _coalescer
+
+
+def publish_cells(deltas: Iterable[dict]) -> None:
+    """Hücre deltalarını (en az cell_id / project_id / work_date) haftalarının odasına kuyruğa al."""
+    for delta in deltas:
+        room = week_room(delta.get("work_date"))
+        if room:
+            _coalescer.add(room, delta)
+
+
+def refresh(*dates) -> None:
+    """Verilen tarihlerin haftalarına `update_table`; tarih yoksa tüm plan izleyicilerine."""
+    rooms = {week_room(d) for d in dates if d}
+    rooms.discard(None)
+    if not rooms:
+        rooms = {ALL_WEEKS_ROOM}
+    for room in rooms:
+        _coalescer.add(room, refresh=True)
+
+
+def emit_to_weeks(event: str, data: dict, *dates) -> None:
+    """Olayı (birleştirmeden) tarihlerin hafta odalarına gönderir."""
+    rooms: List[str] = []
+    for d in dates:
+        room = week_room(d)
+        if room and room not in rooms:
+            rooms.append(room)
+    for room in rooms or [ALL_WEEKS_ROOM]:
+        _emit(event, data, room)
+
+
+def flush_all() -> None:
+    _coalescer.flush_all()
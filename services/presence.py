@@ -0,0 +1,299 @@
+"""
+Kullanıcı çevrimiçi durumu (presence) - bellekte tutulur, veritabanına toplu yazılır.
+
+Her istek / socket heartbeat'i eskiden User.last_seen için ayrı bir commit
+yapıyordu; 150 kullanıcıda bu, planlayıcı yazımlarıyla yarışan sürekli küçük
+SQLite işlemleri demekti. Artık:
+
+- `touch` yalnızca bellekteki kaydı günceller; çevrimdışıdan çevrimiçine
+  geçişte `presence_changed` yayar.
+- `flush` kirli kayıtları tek bir toplu UPDATE (executemany) ile User'a yazar.
+- `start_presence_worker` her `PRESENCE_FLUSH_SECONDS` saniyede bir flush yapar
+  ve `ONLINE_WINDOW` boyunca sesi çıkmayanlar için `presence_changed` (çevrimdışı) yayar.
+
+Listeler kullanıcı satırlarını (ad, rol) veritabanından okur; çevrimiçi durumu
+`state_for` ile belleğe göre (bellekte daha yeni bir kayıt varsa o) hesaplanır.
+
+Birden fazla işçide (services/shared_state paylaşılansa) `touch` son etkinliği
+SHARED_TOUCH_SECONDS aralıkla paylaşılan depoya da yazar. Kullanıcı başka bir
+işçide zaten çevrimiçiyse çevrimiçi olayı tekrar yayılmaz; başka bir işçide hâlâ
+etkinse `sweep` onu çevrimdışı ilan etmez. Listeler diğer işçilerin gördüğü
+etkinliği veritabanına flush edildikten sonra (en geç PRESENCE_FLUSH_SECONDS) görür.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set, Tuple
+
+from services import shared_state
+
+log = logging.getLogger(__name__)
+
+ONLINE_WINDOW = timedelta(minutes=2)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name) or default))
+    except ValueError:
+        return default
+
+
+PRESENCE_FLUSH_SECONDS = _env_int("PRESENCE_FLUSH_SECONDS", 30)
+SHARED_TOUCH_SECONDS = 15
+
+
+class PresenceRegistry:
+    def __init__(self, window: timedelta = ONLINE_WINDOW):
+        self.window = window
+        self._seen: Dict[int, Tuple[datetime, datetime]] = {}  # user_id -> (last_seen, online_since)
+        self._online: Set[int] = set()
+        self._dirty: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def touch(self, user_id: int, now: Optional[datetime] = None, *,
+              last_seen: Optional[datetime] = None, online_since: Optional[datetime] = None) -> bool:
+        """
+        Etkinlik kaydı. `last_seen` / `online_since` verilirse (veritabanındaki değerler)
+        oturum yeni açılmış sayılmaz. Dönüş: kullanıcı bu çağrıyla çevrimiçi olduysa True.
+        """
+        now = now or datetime.now()
+        uid = int(user_id)
+        with self._lock:
+            prev = self._seen.get(uid)
+            prev_seen = max(filter(None, [prev[0] if prev else None, last_seen]), default=None)
+            was_offline = not prev_seen or prev_seen < now - self.window
+            if was_offline:
+                since = now
+            else:
+                since = (prev[1] if prev else None) or online_since or now
+            self._seen[uid] = (now, since)
+            self._dirty.add(uid)
+            became_online = uid not in self._online
+            self._online.add(uid)
+        return became_online and was_offline
+
+    def get(self, user_id: int) -> Optional[Tuple[datetime, datetime]]:
+        with self._lock:
+            return self._seen.get(int(user_id))
+
+    def state_for(self, user, now: Optional[datetime] = None) -> Tuple[bool, Optional[datetime], Optional[datetime]]:
+        """(çevrimiçi mi, last_seen, online_since) - bellekteki kayıt ile User satırının yenisi."""
+        now = now or datetime.now()
+        last_seen = getattr(user, "last_seen", None)
+        online_since = getattr(user, "online_since", None)
+        mem = self.get(user.id) if user is not None and getattr(user, "id", None) else None
+        if mem and (not last_seen or mem[0] >= last_seen):
+            last_seen, online_since = mem
+        return bool(last_seen and last_seen >= now - self.window), last_seen, online_since
+
+    def online_ids(self, now: Optional[datetime] = None) -> Set[int]:
+        cutoff = (now or datetime.now()) - self.window
+        with self._lock:
+            return {uid for uid, (seen, _since) in self._seen.items() if seen >= cutoff}
+
+    def expire(self, now: Optional[datetime] = None) -> Set[int]:
+        """Pencere dışında kalan çevrimiçi kullanıcıları çevrimdışı işaretler; onların id'lerini döner."""
+        cutoff = (now or datetime.now()) - self.window
+        with self._lock:
+            gone = {uid for uid in self._online if self._seen.get(uid, (cutoff,))[0] < cutoff}
+            self._online -= gone
+        return gone
+
+    def take_dirty(self) -> Dict[int, Tuple[datetime, datetime]]:
+        with self._lock:
+            rows = {uid: self._seen[uid] for uid in self._dirty if uid in self._seen}
+            self._dirty.clear()
+        return rows
+
+    def mark_dirty(self, user_ids) -> None:
+        with self._lock:
+            self._dirty.update(int(u) for u in user_ids)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._seen.clear()
+            self._online.clear()
+            self._dirty.clear()
+
+
+_registry = PresenceRegistry()
+
+
+def get_registry() -> PresenceRegistry:
+    return _registry
+
+
+def _emit_changed(user_id: int, is_online: bool, online_since: Optional[datetime] = None) -> None:
+    try:
+        from extensions import socketio
+
+        socketio.emit("presence_changed", {
+            "user_id": int(user_id),
+            "is_online": bool(is_online),
+            "online_since": online_since.isoformat() if online_since else None,
+        }, namespace="/")
+    except Exception:
+        pass
+
+
+_shared_written: Dict[int, datetime] = {}
+
+
+def _shared_key(uid: int) -> str:
+    return f"presence:{int(uid)}"
+
+
+def _shared_get(uid: int) -> Optional[Tuple[datetime, datetime]]:
+    """Diğer işçilerin paylaşılan depoya yazdığı (last_seen, online_since); yoksa None."""
+    try:
+        raw = shared_state.get_state().get(_shared_key(uid))
+        return (datetime.fromisoformat(raw[0]), datetime.fromisoformat(raw[1])) if raw else None
+    except Exception:
+        return None
+
+
+def _active_elsewhere(uid: int, cutoff: datetime) -> bool:
+    state = _shared_get(uid)
+    return bool(state and state[0] >= cutoff)
+
+
+def _shared_put(uid: int, seen: datetime, since: datetime, force: bool = False) -> None:
+    prev = _shared_written.get(uid)
+    if not force and prev and seen - prev < timedelta(seconds=SHARED_TOUCH_SECONDS):
+        return
+    try:
+        ttl = (ONLINE_WINDOW + timedelta(seconds=SHARED_TOUCH_SECONDS)).total_seconds()
+        shared_state.get_state().set(_shared_key(uid), [seen.isoformat(), since.isoformat()], ttl=ttl)
+        _shared_written[uid] = seen
+    except Exception as e:
+        log.error(f"Shared presence write error: {e}")
+
+
+def touch(user, now: Optional[datetime] = None) -> bool:
+    """User nesnesi ya da id alır; veritabanına yazmaz."""
+    if user is None:
+        return False
+    now = now or datetime.now()
+    uid = int(user if isinstance(user, int) else user.id)
+    last_seen = None if isinstance(user, int) else getattr(user, "last_seen", None)
+    online_since = None if isinstance(user, int) else getattr(user, "online_since", None)
+    prev = _registry.get(uid)
+    elsewhere = None
+    if shared_state.is_shared() and (prev is None or prev[0] < now - ONLINE_WINDOW):
+        elsewhere = _shared_get(uid)
+    if elsewhere:
+        # Başka bir işçide çevrimiçi: oturum yeni açılmış sayılmaz
+        last_seen = max(filter(None, [last_seen, elsewhere[0]]))
+        online_since = elsewhere[1]
+    became = _registry.touch(uid, now, last_seen=last_seen, online_since=online_since)
+    state = _registry.get(uid)
+    if shared_state.is_shared() and state:
+        _shared_put(uid, state[0], state[1], force=became)
+    if became:
+        _emit_changed(uid, True, state[1] if state else None)
+    return became
+
+
+def state_for(user, now: Optional[datetime] = None):
+    return _registry.state_for(user, now)
+
+
+def is_online(user, now: Optional[datetime] = None) -> bool:
+    if not user:
+        return False
+    return state_for(user, now)[0]
+
+
+def online_user_ids(now: Optional[datetime] = None) -> Set[int]:
+    """Bu süreçte etkinliği görülen çevrimiçi kullanıcılar ile veritabanına göre çevrimiçi olanlar."""
+    from extensions import db
+    from models import User
+
+    cutoff = (now or datetime.now()) - ONLINE_WINDOW
+    ids = _registry.online_ids(now)
+    ids |= {
+        int(uid) for (uid,) in db.session.query(User.id).filter(User.last_seen != None, User.last_seen >= cutoff).all()
+    }
+    return ids
+
+
+def flush() -> int:
+    """
+    Kirli kayıtları tek toplu UPDATE ile yazar; yazılan kullanıcı sayısını döner (uygulama bağlamında).
+    Core executemany kullanılır: ORM'in birincil anahtarlı toplu UPDATE'i silinmiş bir kullanıcıda
+    StaleDataError verir ve tüm grubu her turda yeniden kuyruğa sokardı.
+    """
+    from extensions import db
+    from models import User
+    from sqlalchemy import bindparam, update
+
+    rows = _registry.take_dirty()
+    if not rows:
+        return 0
+    users = User.__table__
+    stmt = (
+        update(users)
+        .where(users.c.id == bindparam("uid"))
+        .values(last_seen=bindparam("seen"), online_since=bindparam("since"))
+    )
+    try:
+        db.session.execute(
+            stmt,
+            [{"uid": uid, "seen": seen, "since": since} for uid, (seen, since) in rows.items()],
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        _registry.mark_dirty(rows.keys())
+        log.error(f"Presence flush error: {e}")
+        return 0
+    return len(rows)
+
+
+def sweep(now: Optional[datetime] = None) -> int:
+    gone = _registry.expire(now)
+    if gone and shared_state.is_shared():
+        # Başka bir işçide hâlâ etkin olanlar çevrimdışı ilan edilmez
+        cutoff = (now or datetime.now()) - ONLINE_WINDOW
+        gone = {uid for uid in gone if not _active_elsewhere(uid, cutoff)}
+    for uid in gone:
+        _shared_written.pop(uid, None)
+        _emit_changed(uid, False)
+    return len(gone)
+
+
+def start_presence_worker(app) -> None:
+    """Periyodik toplu yazım ve çevrimdışı tespiti (süreç başına bir thread)."""
+    if getattr(app, "_presence_worker_started", False):
+        return
+    if getattr(app, "config", {}).get("TESTING"):
+        log.info("Presence worker skipped (TESTING=1).")
+        return
+
+    def worker():
+        while True:
+            time.sleep(PRESENCE_FLUSH_SECONDS)
+            try:
+                sweep()
+                with app.app_context():
+                    flush()
+            except Exception as e:
+                log.error(f"Presence worker error: {e}")
+
+    t = threading.Thread(target=worker, name="presence-worker", daemon=True)
+    t.start()
+    setattr(app, "_presence_worker_started", True)
+
+    import atexit
+
+    def _final_flush():
+        try:
+            with app.app_context():
+                flush()
+        except Exception:
+            pass
+
+    atexit.register(_final_flush)
@@ -0,0 +1,78 @@
+"""
+Dosya tabanlı ayarlar için stat anahtarlı önbellek (mail_settings.json, Arvento ayarları).
+
+Her gönderimde / araç sorgusunda ayar dosyasını okuyup ayrıştırmak (Arvento
+için ayrıca Fernet şifre çözme) yerine sonuç (dosya yolu, etiket) anahtarıyla
+saklanır. Geçerlilik dosyanın stat imzasıyla (mtime_ns, boyut, inode) kontrol
+edilir: dosya başka bir süreçte değişse bile sonraki çağrı yeniden yükler.
+Uygulama içinden kaydederken `invalidate(path)` ile hemen düşürülür.
+"""
+import copy
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = ("missing",)
+
+
+def _signature(path: str) -> tuple:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return _MISSING
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class SettingsCache:
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], Tuple[tuple, Any]] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+
+    def get(self, path: str, loader: Callable[[], Any], *, tag: str = "", extra: Hashable = None) -> Any:
+        """
+        `path` değişmediyse önbellekteki değerin kopyasını, değiştiyse `loader()` sonucunu döner.
+        `extra` imzaya eklenir (ör. şifreleme anahtarı). loader hata fırlatırsa önbelleğe yazılmaz.
+        """
+        key = (os.path.abspath(path), tag)
+        sig = (_signature(path), extra)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == sig:
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+        value = loader()
+        with self._lock:
+            self._entries[key] = (sig, value)
+            self.loads += 1
+        return copy.deepcopy(value)
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Dosyanın tüm etiketlerini (path=None ise her şeyi) düşürür."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            full = os.path.abspath(path)
+            for key in [k for k in self._entries if k[0] == full]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "loads": self.loads, "hits": self.hits}
+
+
+_cache = SettingsCache()
+
+
+def get(path: str, loader: Callable[[], Any], *, tag: str = "", extra: Hashable = None) -> Any:
+    return _cache.get(path, loader, tag=tag, extra=extra)
+
+
+def invalidate(path: Optional[str] = None) -> None:
+    _cache.invalidate(path)
+
+
+def stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,455 @@
+"""
+İşçiler arası paylaşılan durum (anahtar/değer, sayaç, hız sınırı, kiralık kilit).
+
+Uygulama eskiden tek gunicorn işçisi varsayıyordu: hız sınırı kovaları, geocode
+önbelleği, günlük görev maili durumu ve arka plan işçisi kilitleri süreç
+içindeydi. Bu katman aynı arayüzü iki depoyla sunar:
+
+    SHARED_STATE_URL=memory (varsayılan)   süreç içi; tek işçi
+    SHARED_STATE_URL=redis://host:6379/0    Redis protokolü konuşan her sunucu
+                                            (redis-server, Valkey, KeyDB; yerelde
+                                            docker-compose'daki `redis` servisi)
+
+Paylaşılan depo seçildiğinde Flask-SocketIO da aynı adresi `message_queue` olarak
+kullanır (SOCKETIO_MESSAGE_QUEUE ile ayrıca verilebilir); böylece bir işçideki
+emit diğer işçilere bağlı istemcilere ve odalara ulaşır. Süreç içi depoyla
+GUNICORN_WORKERS / WEB_CONCURRENCY > 1 ise uygulama açılmaz (`require_shared_for_workers`).
+
+`signal` / `relay_signals` arka plan işçilerini başka bir işçiden uyandırır
+(mail ve outbox işçileri tek süreçte çalışır, kayıt ise herhangi birinde olur).
+
+Değerler JSON olarak saklanır; `ttl` saniye cinsindendir.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "planner:"
+SINGLETON_LEASE_SECONDS = 60
+
+
+class LocalState:
+    """Süreç içi depo (tek işçi). Süresi dolan anahtarlar okunurken temizlenir."""
+
+    shared = False
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._mutex = threading.Lock()
+        self._signals: Dict[str, int] = {}
+        self._signal = threading.Condition()
+
+    def _live(self, key: str, now: float):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= now:
+            self._data.pop(key, None)
+            return None
+        return item
+
+    def get(self, key: str, default=None):
+        with self._mutex:
+            item = self._live(key, time.time())
+        return item[0] if item else default
+
+    def set(self, key: str, value, ttl: Optional[float] = None) -> None:
+        with self._mutex:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def add(self, key: str, value, ttl: Optional[float] = None) -> bool:
+        """Anahtar yoksa yazar (SET NX)."""
+        now = time.time()
+        with self._mutex:
+            if self._live(key, now):
+                return False
+            self._data[key] = (value, now + ttl if ttl else None)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._mutex:
+            self._data.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        with self._mutex:
+            item = self._live(key, time.time())
+            value = int(item[0] if item else 0) + int(amount)
+            self._data[key] = (value, item[1] if item else None)
+            return value
+
+    def rate_hit(self, key: str, limit: int, window: float, now: Optional[float] = None) -> bool:
+        """Kayan pencere: pencere içindeki istek sayısı `limit` altındaysa kaydeder ve True döner."""
+        now = time.time() if now is None else now
+        cutoff = now - float(window or 0)
+        key = f"rate:{key}"
+        with self._mutex:
+            item = self._live(key, now)
+            hits = [t for t in (item[0] if item else []) if t >= cutoff]
+            allowed = len(hits) < int(limit or 0)
+            if allowed:
+                hits.append(now)
+            self._data[key] = (hits, now + float(window or 0))
+            return allowed
+
+    def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        """Kilit boşsa ya da zaten `owner`'ınsa alır/uzatır."""
+        now = time.time()
+        key = f"lock:{name}"
+        with self._mutex:
+            item = self._live(key, now)
+            if item and item[0] != owner:
+                return False
+            self._data[key] = (owner, now + ttl)
+            return True
+
+    def release_lock(self, name: str, owner: str) -> bool:
+        key = f"lock:{name}"
+        with self._mutex:
+            item = self._live(key, time.time())
+            if not item or item[0] != owner:
+                return False
+            self._data.pop(key, None)
+            return True
+
+    def signal(self, name: str) -> None:
+        with self._signal:
+            self._signals[name] = self._signals.get(name, 0) + 1
+            self._signal.notify_all()
+
+    def wait_signal(self, name: str, timeout: float) -> bool:
+        """Bekleyen sinyal varsa tüketir; yoksa `timeout` kadar bekler."""
+        with self._signal:
+            if not self._signals.get(name):
+                self._signal.wait(timeout)
+            return bool(self._signals.pop(name, 0))
+
+    def clear(self) -> None:
+        with self._mutex:
+            self._data.clear()
+
+
+_RATE_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1] - ARGV[2])
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+  return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+redis.call('PEXPIRE', KEYS[1], math.ceil(ARGV[2] * 1000))
+return 1
+"""
+
+_LOCK_LUA = """
+local cur = redis.call('GET', KEYS[1])
+if cur and cur ~= ARGV[1] then
+  return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+return 1
+"""
+
+_UNLOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisState:
+    """Redis protokolüyle paylaşılan depo (`redis` paketi gerekir)."""
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = KEY_PREFIX):
+        import redis  # isteğe bağlı bağımlılık
+
+        self.url = url
+        self._r = redis.Redis.from_url(url, decode_responses=True)
+        self._prefix = prefix
+        self._rate = self._r.register_script(_RATE_LUA)
+        self._lock = self._r.register_script(_LOCK_LUA)
+        self._unlock = self._r.register_script(_UNLOCK_LUA)
+        self._seq = 0
+
+    def _k(self, key: str) -> str:
+        return f"{self._prefix}{key}"
+
+    def get(self, key: str, default=None):
+        raw = self._r.get(self._k(key))
+        return json.loads(raw) if raw is not None else default
+
+    def set(self, key: str, value, ttl: Optional[float] = None) -> None:
+        self._r.set(self._k(key), json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key: str, value, ttl: Optional[float] = None) -> bool:
+        return bool(self._r.set(self._k(key), json.dumps(value), nx=True, px=int(ttl * 1000) if ttl else None))
+
+    def delete(self, key: str) -> None:
+        self._r.delete(self._k(key))
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        return int(self._r.incrby(self._k(key), int(amount)))
+
+    def rate_hit(self, key: str, limit: int, window: float, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        self._seq += 1
+        member = f"{now}:{os.getpid()}:{threading.get_ident()}:{self._seq}"
+        return bool(self._rate(keys=[self._k(f"rate:{key}")], args=[now, float(window or 0), int(limit or 0), member]))
+
+    def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        return bool(self._lock(keys=[self._k(f"lock:{name}")], args=[owner, int(ttl * 1000)]))
+
+    def release_lock(self, name: str, owner: str) -> bool:
+        return bool(self._unlock(keys=[self._k(f"lock:{name}")], args=[owner]))
+
+    def signal(self, name: str) -> None:
+        # Tek elemanlı liste: art arda gelen sinyaller tek uyandırmada birleşir
+        key = self._k(f"signal:{name}")
+        pipe = self._r.pipeline()
+        pipe.lpush(key, 1)
+        pipe.ltrim(key, 0, 0)
+        pipe.expire(key, 300)
+        pipe.execute()
+
+    def wait_signal(self, name: str, timeout: float) -> bool:
+        return self._r.blpop([self._k(f"signal:{name}")], timeout=max(1, int(timeout))) is not None
+
+    def clear(self) -> None:
+        for k in self._r.scan_iter(f"{self._prefix}*"):
+            self._r.delete(k)
+
+
+def backend_url() -> str:
+    return (os.getenv("SHARED_STATE_URL") or "memory").strip()
+
+
+def _is_remote(url: str) -> bool:
+    return url.startswith(("redis://", "rediss://", "unix://"))
+
+
+def _make_state():
+    url = backend_url()
+    if _is_remote(url):
+        try:
+            return RedisState(url)
+        except Exception as e:
+            log.error(f"SHARED_STATE_URL kullanılamıyor, süreç içi depoya dönülüyor: {e}")
+    return LocalState()
+
+
+_state = _make_state()
+
+
+def get_state():
+    return _state
+
+
+def set_state(state) -> None:
+    """Depoyu değiştir (testler / özel kurulumlar)."""
+    global _state
+    _state = state
+
+
+def is_shared() -> bool:
+    return bool(getattr(_state, "shared", False))
+
+
+def shared_url() -> Optional[str]:
+    """Paylaşılan deponun adresi (diğer servisler aynı sunucuyu kullanabilsin); süreç içiyse None."""
+    return getattr(_state, "url", None) if is_shared() else None
+
+
+def message_queue_url() -> Optional[str]:
+    """
+    Flask-SocketIO `message_queue` adresi: SOCKETIO_MESSAGE_QUEUE, yoksa paylaşılan depo.
+    Süreç içi depoda None (tek işçi; kuyruğa gerek yok).
+    """
+    if not is_shared():
+        return None
+    explicit = (os.getenv("SOCKETIO_MESSAGE_QUEUE") or "").strip()
+    if explicit:
+        return None if explicit.lower() in ("0", "off", "none") else explicit
+    return shared_url()
+
+
+def configured_workers() -> int:
+    """GUNICORN_WORKERS / WEB_CONCURRENCY ile yapılandırılmış işçi sayısı (yoksa 1)."""
+    best = 1
+    for name in ("GUNICORN_WORKERS", "WEB_CONCURRENCY"):
+        try:
+            best = max(best, int(os.getenv(name) or 1))
+        except ValueError:
+            pass
+    return best
+
+
+def require_shared_for_workers() -> None:
+    """Birden fazla işçi süreç içi depoyla çalışamaz: hız sınırları, kilitler ve önbellek ayrışır."""
+    workers = configured_workers()
+    if workers > 1 and not is_shared():
+        raise RuntimeError(
+            f"{workers} işçi yapılandırılmış ama paylaşılan durum deposu yok "
+            f"(SHARED_STATE_URL={backend_url()!r}). SHARED_STATE_URL=redis://... verin "
+            "ya da GUNICORN_WORKERS=1 kullanın."
+        )
+
+
+def process_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+@contextmanager
+def critical_section(name: str, ttl: float = 300, timeout: float = 300, poll: float = 0.2):
+    """
+    Tüm işçilerde aynı anda tek çalışan bölüm (ör. şema göçü). Süreç içi depoda
+    çağıranın kendi kilidi yeterlidir; kilit `timeout` içinde alınamazsa yine de devam edilir.
+    """
+    owner = f"{process_owner()}:{threading.get_ident()}"
+    deadline = time.monotonic() + timeout
+    held = False
+    try:
+        while True:
+            try:
+                held = _state.acquire_lock(name, owner, ttl)
+            except Exception as e:
+                log.error(f"Shared lock error ({name}): {e}")
+                break
+            if held or time.monotonic() >= deadline:
+                break
+            time.sleep(poll)
+        if not held:
+            log.warning(f"Shared lock {name} alınamadı; kilitsiz devam ediliyor.")
+        yield held
+    finally:
+        if held:
+            try:
+                _state.release_lock(name, owner)
+            except Exception:
+                pass
+
+
+def _file_lock(app, name: str) -> bool:
+    """instance_path altında dosya kilidi: aynı makinedeki süreçler arasında tek sahip."""
+    try:
+        instance_path = getattr(app, "instance_path", None) or "instance"
+        os.makedirs(instance_path, exist_ok=True)
+        f = open(os.path.join(instance_path, f"{name}.lock"), "a+")
+        # Kilit, dosya tutamacı yaşadıkça sürer
+        setattr(app, f"_{name}_lock_handle", f)
+        if os.name == "nt":
+            import msvcrt
+
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                return False
+        else:
+            import fcntl
+
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except OSError:
+                return False
+    except Exception:
+        # Kilit beklenmedik bir nedenle kurulamazsa uygulamanın açılmasını engelleme
+        return True
+
+
+_held: Dict[str, threading.Event] = {}
+
+
+def singleton_held(name: str) -> bool:
+    """Bu süreç `name` işinin sahibi mi? Kiralama yenilenemezse iş döngüleri duraklamalıdır."""
+    ev = _held.get(name)
+    return bool(ev and ev.is_set())
+
+
+def hold_singleton(app, name: str, on_acquired: Optional[Callable[[], None]] = None,
+                   lease: float = SINGLETON_LEASE_SECONDS) -> bool:
+    """
+    Tüm işçiler arasında tek kopya çalışması gereken arka plan işi için sahiplik.
+
+    Süreç içi depoda dosya kilidi kullanılır (aynı makine). Paylaşılan depoda kiralık
+    kilit alınır ve arka planda `lease / 3` aralıkla uzatılır; alınamazsa ve
+    `on_acquired` verilmişse bekleme thread'i sahibin kiralaması düşünce kilidi
+    alıp `on_acquired()` çağırır. Uzatma başarısız olursa `singleton_held(name)`
+    False döner ve iş döngüsü kilit geri alınana kadar bekler (başka bir süreç
+    devralmış olabilir). Dönüş: kilit şimdi alındıysa True.
+    """
+    held = _held.setdefault(name, threading.Event())
+    if not is_shared():
+        acquired = _file_lock(app, name)
+        if acquired:
+            held.set()
+        return acquired
+
+    owner = process_owner()
+    key = f"singleton:{name}"
+
+    def _try() -> bool:
+        try:
+            ok = _state.acquire_lock(key, owner, lease)
+        except Exception as e:
+            log.error(f"Singleton lock error ({name}): {e}")
+            ok = False
+        if ok:
+            held.set()
+        elif held.is_set():
+            held.clear()
+            log.warning(f"{name}: kiralama yenilenemedi, iş duraklatıldı ({owner}).")
+        return ok
+
+    acquired = _try()
+    started = {"done": acquired}
+
+    def _keep():
+        # İş bir kez başlatılır; kiralama kaçarsa döngüler `singleton_held` ile bekler
+        while True:
+            time.sleep(lease / 3.0)
+            if _try() and not started["done"] and on_acquired is not None:
+                started["done"] = True
+                log.info(f"{name}: devralındı ({owner}).")
+                try:
+                    on_acquired()
+                except Exception as e:
+                    log.error(f"{name} start failed: {e}")
+
+    if acquired or on_acquired is not None:
+        threading.Thread(target=_keep, name=f"{name}-lease", daemon=True).start()
+    return acquired
+
+
+def signal(name: str) -> None:
+    """Diğer işçilerdeki `relay_signals(name, ...)` dinleyicisini uyandırır (süreç içi depoda no-op)."""
+    if not is_shared():
+        return
+    try:
+        _state.signal(name)
+    except Exception as e:
+        log.error(f"Shared signal error ({name}): {e}")
+
+
+def relay_signals(name: str, callback: Callable[[], None], timeout: float = 5.0) -> None:
+    """Paylaşılan depoda `signal(name)` geldikçe bu süreçte `callback()` çağıran thread başlatır."""
+    if not is_shared():
+        return
+
+    def _relay():
+        while True:
+            try:
+                if _state.wait_signal(name, timeout):
+                    callback()
+            except Exception as e:
+                log.error(f"Shared signal relay error ({name}): {e}")
+                time.sleep(1)
+
+    threading.Thread(target=_relay, name=f"{name}-signal", daemon=True).start()
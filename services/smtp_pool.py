@@ -0,0 +1,219 @@
+"""
+Kalıcı (keep-alive) SMTP oturum havuzu.
+
+Eskiden her alıcı için ayrı bağlantı açılıyordu (bağlan, EHLO, STARTTLS,
+login, sendmail, kapat). Havuz oturumları (host, port, user, tls, ssl)
+anahtarıyla saklar: aynı sunucuya giden ardışık gönderimler tek TLS el
+sıkışması ve tek login üzerinden yapılır. Boşta bekleyen oturum tekrar
+kullanılmadan önce NOOP ile yoklanır; cevap vermezse kapatılıp yenisi açılır.
+
+Kullanım:
+    key = PoolKey(host, port, user, use_tls, use_ssl)
+    with smtp_pool.session(key, password) as s:
+        s.sendmail(from_addr, [to], msg_str)
+"""
+import logging
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional
+
+from services.mail_metrics import phase_timer
+
+log = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 30
+# Bu süreden uzun boşta kalan oturum yoklanmadan kapatılır (sunucular boştaki bağlantıyı düşürür)
+IDLE_TIMEOUT = 60
+# Sunucu limitlerine takılmamak için oturum başına en fazla mesaj
+MAX_MESSAGES_PER_SESSION = 100
+# Anahtar başına boşta tutulacak en fazla oturum
+MAX_IDLE_PER_KEY = 2
+
+# Bu hatalardan sonra bağlantı hâlâ kullanılabilir (RSET ile temizlenir)
+_RECOVERABLE = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class PoolKey(NamedTuple):
+    host: str
+    port: int
+    user: str
+    use_tls: bool
+    use_ssl: bool
+
+
+class SmtpSession:
+    """Login olmuş tek bir SMTP bağlantısı."""
+
+    def __init__(self, key: PoolKey, server):
+        self.key = key
+        self.server = server
+        self.opened_at = time.monotonic()
+        self.last_used = self.opened_at
+        self.sent = 0
+
+    @property
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_used
+
+    def is_healthy(self) -> bool:
+        try:
+            code, _ = self.server.noop()
+            return code == 250
+        except Exception:
+            return False
+
+    def sendmail(self, from_addr: str, to_addrs: List[str], msg: str):
+        with phase_timer("data"):
+            result = self.server.sendmail(from_addr, to_addrs, msg)
+        self.sent += 1
+        self.last_used = time.monotonic()
+        return result
+
+    def reset(self) -> bool:
+        try:
+            self.server.rset()
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+
+class SmtpPool:
+    def __init__(self):
+        self._idle: Dict[PoolKey, List[SmtpSession]] = {}
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.reuses = 0
+        self.discarded = 0
+
+    def _open(self, key: PoolKey):
+        if key.use_ssl:
+            return smtplib.SMTP_SSL(key.host, key.port, timeout=CONNECT_TIMEOUT)
+        return smtplib.SMTP(key.host, key.port, timeout=CONNECT_TIMEOUT)
+
+    def _connect(self, key: PoolKey, password: str) -> SmtpSession:
+        with phase_timer("connect"):
+            server = self._open(key)
+        try:
+            try:
+                server.ehlo()
+            except Exception:
+                pass
+            if (not key.use_ssl) and key.use_tls:
+                with phase_timer("tls"):
+                    server.starttls()
+                    try:
+                        server.ehlo()
+                    except Exception:
+                        pass
+            with phase_timer("auth"):
+                server.login(key.user, password)
+        except Exception:
+            SmtpSession(key, server).close()
+            raise
+        with self._lock:
+            self.connects += 1
+        return SmtpSession(key, server)
+
+    def _discard(self, s: SmtpSession):
+        with self._lock:
+            self.discarded += 1
+        s.close()
+
+    def checkout(self, key: PoolKey, password: str) -> SmtpSession:
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                s = idle.pop() if idle else None
+            if s is None:
+                return self._connect(key, password)
+            if s.idle_seconds > IDLE_TIMEOUT or not s.is_healthy():
+                log.debug("SMTP oturumu yenileniyor host=%s user=%s", key.host, key.user)
+                self._discard(s)
+                continue
+            with self._lock:
+                self.reuses += 1
+            return s
+
+    def checkin(self, s: SmtpSession, *, broken: bool = False):
+        if broken or s.sent >= MAX_MESSAGES_PER_SESSION:
+            self._discard(s)
+            return
+        with self._lock:
+            idle = self._idle.setdefault(s.key, [])
+            if len(idle) < MAX_IDLE_PER_KEY:
+                idle.append(s)
+                return
+        self._discard(s)
+
+    @contextmanager
+    def session(self, key: PoolKey, password: str):
+        s = self.checkout(key, password)
+        broken = False
+        try:
+            yield s
+        except _RECOVERABLE:
+            broken = not s.reset()
+            raise
+        except BaseException:
+            broken = True
+            raise
+        finally:
+            self.checkin(s, broken=broken)
+
+    def reap_idle(self, max_idle: float = IDLE_TIMEOUT) -> int:
+        """Uzun süredir boşta olan oturumları kapatır. Dönüş: kapatılan oturum sayısı."""
+        stale: List[SmtpSession] = []
+        with self._lock:
+            for key, idle in self._idle.items():
+                keep = [s for s in idle if s.idle_seconds <= max_idle]
+                stale.extend(s for s in idle if s.idle_seconds > max_idle)
+                self._idle[key] = keep
+        for s in stale:
+            self._discard(s)
+        return len(stale)
+
+    def close_all(self):
+        with self._lock:
+            sessions = [s for idle in self._idle.values() for s in idle]
+            self._idle.clear()
+        for s in sessions:
+            s.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "reuses": self.reuses,
+                "discarded": self.discarded,
+                "idle": sum(len(v) for v in self._idle.values()),
+            }
+
+
+_pool = SmtpPool()
+
+
+def get_pool() -> SmtpPool:
+    return _pool
+
+
+def session(key: PoolKey, password: str):
+    return _pool.session(key, password)
+
+
+def reap_idle(max_idle: Optional[float] = None) -> int:
+    return _pool.reap_idle(IDLE_TIMEOUT if max_idle is None else max_idle)
+
+
+def close_all():
+    _pool.close_all()
@@ -6,6 +6,9 @@ if (typeof io === 'undefined') {
 }
 
 const socket = typeof io !== 'undefined' ? io({
+    // Yalnızca WebSocket: çok işçili kurulumda sticky session gerekmez
+    transports: ['websocket'],
+    upgrade: false,
     reconnection: true,
     reconnectionDelay: 1000,
     reconnectionDelayMax: 5000,
@@ -776,6 +779,10 @@ function initSocketEvents() {
     if (!socket) return;
     socket.on('connect', () => {
         socket.emit('join_plan_updates');
+        // Hücre güncellemeleri yalnızca görüntülenen haftanın odasına gelir
+        if (window.PLAN_WEEK_START) {
+            socket.emit('join_plan_week', { week_start: window.PLAN_WEEK_START });
+        }
         console.log('Socket bağlandı');
     });
 
@@ -800,7 +807,7 @@ function initSocketEvents() {
         }
     });
 
-    socket.on('cell_updated', (data) => {
+    const handleCellUpdated = (data) => {
         if (data.updated_by_id !== getCurrentUserId()) {
             // EditingStateManager ile düzenleme durumu kontrolü
             if (window.EditingStateManager && window.EditingStateManager.isEditing()) {
@@ -849,6 +856,13 @@ function initSocketEvents() {
             //     showNotification('Hücre Güncellendi', `${data.updated_by} bir hücreyi güncelledi`);
             // }
         }
+    };
+
+    socket.on('cell_updated', handleCellUpdated);
+
+    // /api/cells/batch: tek olayda birden çok hücre
+    socket.on('cells_updated', (payload) => {
+        ((payload && payload.cells) || []).forEach(handleCellUpdated);
     });
 
     socket.on('cell_cancelled', (data) => {
@@ -2122,7 +2136,71 @@ function moveTaskDOM(sourceCellId, targetCellId, data) {
     }
 }
 
+function _findPlanCell(c) {
+    return window.getCellEl(c.cell_id) ||
+        document.querySelector(`.cell[data-project-id="${c.project_id}"][data-date="${c.work_date}"]`);
+}
+
+/**
+ * /api/plan/week?since_version=N ile yalnızca değişen hücreleri çekip tabloyu yerinde günceller.
+ * Hücrenin satırı sayfada yoksa (yeni proje satırı vb.) false döner; çağıran tam yenileme yapar.
+ */
+async function syncPlanWeekDelta() {
+    const weekStart = window.PLAN_WEEK_START;
+    const since = Number(window.PLAN_CHANGE_VERSION);
+    if (!weekStart || !Number.isFinite(since) || since < 0) return false;
+
+    const resp = await fetch(`/api/plan/week?week_start=${encodeURIComponent(weekStart)}&since_version=${since}`, {
+        credentials: 'same-origin',
+        headers: { 'Accept': 'application/json' }
+    });
+    if (!resp.ok) return false;
+    const data = await resp.json();
+    if (!data || !data.ok || data.full) return false;
+
+    const cells = data.cells || [];
+    const deleted = data.deleted || [];
+    // Önce hepsinin yerini bul; eksik satır varsa hiç dokunmadan tam yenilemeye bırak
+    const targets = cells.map(_findPlanCell);
+    if (targets.some(el => !el)) return false;
+
+    deleted.forEach(c => {
+        const el = _findPlanCell(c);
+        if (!el) return;
+        clearCellDOM(el);
+        el.classList.remove('filled-personnel', 'has-important-note');
+        el.setAttribute('data-cell-id', '0');
+        el.setAttribute('data-person-ids', '');
+    });
+
+    cells.forEach((c, i) => {
+        const el = targets[i];
+        el.setAttribute('data-cell-id', c.cell_id);
+        el.setAttribute('data-version', c.version || 1);
+        el.setAttribute('data-person-ids', (c.person_ids || []).slice().sort((a, b) => a - b).join(','));
+        el.classList.toggle('filled-personnel', (c.person_ids || []).length > 0);
+        el.classList.toggle('has-important-note', !!c.important_note);
+        if (c.important_note) {
+            el.setAttribute('data-important-note', c.important_note);
+        } else {
+            el.removeAttribute('data-important-note');
+        }
+
+        const isEmpty = !c.shift && !c.note && !c.vehicle_info && !(c.person_ids || []).length;
+        if (isEmpty && c.status !== 'cancelled') {
+            clearCellDOM(el);
+            el.classList.remove('filled-personnel');
+        } else {
+            updateCellDOM(c.cell_id, c);
+        }
+    });
+
+    window.PLAN_CHANGE_VERSION = data.version || since;
+    return true;
+}
+
 // Window'a ata
+window.syncPlanWeekDelta = syncPlanWeekDelta;
 window.updateCellDOM = updateCellDOM;
 window.moveTaskDOM = moveTaskDOM;
 window.clearCellDOM = clearCellDOM;
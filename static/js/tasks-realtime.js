@@ -2,7 +2,7 @@
 
 document.addEventListener('DOMContentLoaded', () => {
     // Socket initialization is handled in base.html usually, but if not, we use the global one
-    const socket = window.__socket || (window.io ? window.io() : null);
+    const socket = window.__socket || (window.io ? window.io({ transports: ['websocket'], upgrade: false }) : null);
 
     if (!socket) {
         console.error("Socket.io not initialized");
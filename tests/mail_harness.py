@@ -0,0 +1,154 @@
+"""
+Mail kuyruğu testleri için ortak düzenek: sahte SMTP sunucusu, SMTP ayarları ve
+geçici veritabanlı temel test sınıfı. Test modülü değildir; pytest.ini
+`pythonpath` ile tests/ dizinini yola ekler.
+"""
+import os
+import smtplib
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+
+class FakeSMTP:
+    instances = []
+    fail_next = 0
+    refuse = {}
+
+    def __init__(self, host, port, timeout=None):
+        self.host = host
+        self.port = port
+        self.logins = 0
+        self.tls = False
+        self.alive = True
+        self.sent = []
+        FakeSMTP.instances.append(self)
+
+    def ehlo(self):
+        return 250, b"ok"
+
+    def starttls(self):
+        self.tls = True
+
+    def login(self, user, pw):
+        self.logins += 1
+
+    def noop(self):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("gone")
+        return 250, b"ok"
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        if FakeSMTP.fail_next:
+            FakeSMTP.fail_next -= 1
+            self.alive = False
+            raise smtplib.SMTPServerDisconnected("dropped")
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("gone")
+        refused = {r: FakeSMTP.refuse[r] for r in to_addrs if r in FakeSMTP.refuse}
+        if len(refused) == len(to_addrs):
+            raise smtplib.SMTPRecipientsRefused(refused)
+        self.sent.append((from_addr, list(to_addrs), msg))
+        return refused
+
+    def rset(self):
+        return 250, b"ok"
+
+    def quit(self):
+        self.alive = False
+
+    def close(self):
+        self.alive = False
+
+
+CFG = {
+    "host": "smtp.example.com",
+    "port": 587,
+    "user": "planner@example.com",
+    "password": "pw",
+    "from_addr": "planner@example.com",
+    "use_tls": True,
+    "use_ssl": False,
+}
+
+
+class MailQueueTestCase(unittest.TestCase):
+    """Geçici veritabanı + FakeSMTP; mail kuyruğu testleri (test_smtp_pool.py, test_mail_*.py) bundan türer."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._db_path = os.path.join(cls._tmpdir.name, "test.db")
+        os.environ["DB_URL"] = f"sqlite:///{cls._db_path}"
+
+        import importlib
+
+        sys.modules.pop("app", None)
+        cls.appmod = importlib.import_module("app")
+        cls.app = cls.appmod.app
+        cls.db = cls.appmod.db
+        try:
+            cls.appmod.db.engine.dispose()
+        except Exception:
+            pass
+        cls.app.config["TESTING"] = True
+        # Ek blob'ları geçici dizine yazılsın
+        cls.app.instance_path = cls._tmpdir.name
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            cls.db.session.remove()
+            cls.db.engine.dispose()
+        except Exception:
+            pass
+
+        try:
+            for _ in range(5):
+                try:
+                    cls._tmpdir.cleanup()
+                    break
+                except PermissionError:
+                    time.sleep(0.05)
+        except Exception:
+            pass
+
+    def setUp(self):
+        from services import mail_metrics, mail_rate, smtp_pool
+
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+            self.appmod.ensure_schema()
+        FakeSMTP.instances = []
+        FakeSMTP.fail_next = 0
+        FakeSMTP.refuse = {}
+        smtp_pool.close_all()
+        mail_rate.reset()
+        mail_metrics.reset()
+        self.smtp_patch = mock.patch.object(smtplib, "SMTP", FakeSMTP)
+        self.smtp_patch.start()
+
+    def tearDown(self):
+        from services import smtp_pool
+
+        smtp_pool.close_all()
+        self.smtp_patch.stop()
+
+    def _sent_to(self):
+        return [to for inst in FakeSMTP.instances for _f, to, _m in inst.sent]
+
+    def _login_admin(self, client):
+        with self.app.app_context():
+            admin = self.appmod.User(username="admin", email="admin@example.com", full_name="Admin", role="admin", is_admin=True, is_active=True)
+            admin.set_password("pw")
+            self.db.session.add(admin)
+            self.db.session.commit()
+            admin_id = admin.id
+        with client.session_transaction() as sess:
+            sess["user_id"] = admin_id
+            sess["role"] = "admin"
+            sess["is_admin"] = True
+            sess["_csrf_token"] = "t"
@@ -0,0 +1,132 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import date, timedelta
+
+
+class AssignmentReconcileTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._db_path = os.path.join(cls._tmpdir.name, "test.db")
+        os.environ["DB_URL"] = f"sqlite:///{cls._db_path}"
+
+        import importlib
+
+        sys.modules.pop("app", None)
+        cls.appmod = importlib.import_module("app")
+        cls.app = cls.appmod.app
+        cls.db = cls.appmod.db
+        try:
+            cls.appmod.db.engine.dispose()
+        except Exception:
+            pass
+        cls.app.config["TESTING"] = True
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            cls.db.session.remove()
+            cls.db.engine.dispose()
+        except Exception:
+            pass
+
+        try:
+            for _ in range(5):
+                try:
+                    cls._tmpdir.cleanup()
+                    break
+                except PermissionError:
+                    time.sleep(0.05)
+        except Exception:
+            pass
+
+    def setUp(self):
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+            self.appmod.ensure_schema()
+
+            proj = self.appmod.Project(
+                region="Istanbul",
+                project_code="P1",
+                project_name="Proj",
+                responsible="Resp",
+                is_active=True,
+            )
+            self.db.session.add(proj)
+            people = [self.appmod.Person(full_name=name) for name in ("Ali", "Banu", "Cem", "Deniz")]
+            self.db.session.add_all(people)
+            self.db.session.commit()
+
+            self.project_id = proj.id
+            self.person_ids = [p.id for p in people]
+
+    def _assignment_rows(self, model, owner_attr, owner_id):
+        rows = model.query.filter(getattr(model, owner_attr) == owner_id).all()
+        return {r.person_id: r.id for r in rows}
+
+    def test_cell_save_only_touches_changed_people(self):
+        from utils import set_assignments_and_team
+
+        a, b, c, d = self.person_ids
+        with self.app.app_context():
+            cell = self.appmod.PlanCell(project_id=self.project_id, work_date=date.today(), note="x")
+            self.db.session.add(cell)
+            self.db.session.flush()
+
+            added = set_assignments_and_team(cell, [a, b, c])
+            self.db.session.commit()
+            self.assertEqual(added, {a, b, c})
+            before = self._assignment_rows(self.appmod.CellAssignment, "cell_id", cell.id)
+
+            added = set_assignments_and_team(cell, [b, c, d])
+            self.db.session.commit()
+            self.assertEqual(added, {d})
+            after = self._assignment_rows(self.appmod.CellAssignment, "cell_id", cell.id)
+
+            self.assertEqual(set(after), {b, c, d})
+            # Değişmeyen satırlar yerinde kalır
+            self.assertEqual(after[b], before[b])
+            self.assertEqual(after[c], before[c])
+            self.assertEqual(sorted(x.person_id for x in cell.assignments), [b, c, d])
+
+    def test_reconcile_many_jobs_reports_row_counts(self):
+        from services.assignment_reconcile import reconcile
+
+        a, b, c, d = self.person_ids
+        with self.app.app_context():
+            cells = [
+                self.appmod.PlanCell(project_id=self.project_id, work_date=date.today() + timedelta(days=i), note="x")
+                for i in range(3)
+            ]
+            self.db.session.add_all(cells)
+            self.db.session.flush()
+            jobs = [self.appmod.Job(cell_id=cl.id, project_id=self.project_id, work_date=cl.work_date) for cl in cells]
+            self.db.session.add_all(jobs)
+            self.db.session.flush()
+            j1, j2, j3 = [j.id for j in jobs]
+
+            first = reconcile(self.appmod.JobAssignment, "job_id", {j1: [a, b], j2: [c], j3: []})
+            self.db.session.commit()
+            self.assertEqual((first.rows_added, first.rows_removed), (3, 0))
+
+            again = reconcile(self.appmod.JobAssignment, "job_id", {j1: [b, a], j2: [c], j3: []})
+            self.assertEqual(again.changed, 0)
+
+            diff = reconcile(self.appmod.JobAssignment, "job_id", {j1: [a], j2: [c, d], j3: [b]})
+            self.db.session.commit()
+            self.assertEqual(diff.removed, {j1: {b}})
+            self.assertEqual(diff.added, {j2: {d}, j3: {b}})
+            self.assertEqual((diff.rows_added, diff.rows_removed), (2, 1))
+
+            pairs = sorted(
+                (r.job_id, r.person_id) for r in self.appmod.JobAssignment.query.all()
+            )
+            self.assertEqual(pairs, sorted([(j1, a), (j2, c), (j2, d), (j3, b)]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import date
+
+
+class AvailabilityMatrixTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._db_path = os.path.join(cls._tmpdir.name, "test.db")
+        os.environ["DB_URL"] = f"sqlite:///{cls._db_path}"
+
+        import importlib
+
+        sys.modules.pop("app", None)
+        cls.appmod = importlib.import_module("app")
+        cls.app = cls.appmod.app
+        cls.db = cls.appmod.db
+        try:
+            cls.appmod.db.engine.dispose()
+        except Exception:
+            pass
+        cls.app.config["TESTING"] = True
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            cls.db.session.remove()
+            cls.db.engine.dispose()
+        except Exception:
+            pass
+
+        try:
+            for _ in range(5):
+                try:
+                    cls._tmpdir.cleanup()
+                    break
+                except PermissionError:
+                    time.sleep(0.05)
+        except Exception:
+            pass
+
+    def setUp(self):
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+            self.appmod.ensure_schema()
+
+            admin = self.appmod.User(
+                username="admin",
+                email="admin@example.com",
+                full_name="Admin",
+                role="admin",
+                is_admin=True,
+                is_active=True,
+            )
+            admin.set_password("pw")
+            self.db.session.add(admin)
+
+            ana = self.appmod.Seviye(name="Ana kadro")
+            yrd = self.appmod.Seviye(name="Yardımcı")
+            firma = self.appmod.Firma(name="Netmon")
+            self.db.session.add_all([ana, yrd, firma])
+            self.db.session.flush()
+
+            proj = self.appmod.Project(region="Istanbul", project_code="P1", project_name="Proj", responsible="Resp", is_active=True)
+            office = self.appmod.Project(region="Istanbul", project_code="9026-0001", project_name="Ofis", responsible="Resp", is_active=True)
+            self.db.session.add_all([proj, office])
+            self.db.session.flush()
+
+            office_type = self.appmod.PersonnelStatusType(name="Ofis", code="office", display_order=1)
+            leave_type = self.appmod.PersonnelStatusType(name="İzinli", code="leave", display_order=2)
+            self.db.session.add_all([office_type, leave_type])
+
+            people = {}
+            for name, seviye in (("Ali", ana), ("Banu", yrd), ("Cem", ana), ("Deniz", None), ("Ece", ana)):
+                p = self.appmod.Person(full_name=name, seviye_id=(seviye.id if seviye else None), firma_id=firma.id)
+                self.db.session.add(p)
+                people[name] = p
+            self.db.session.flush()
+
+            self.day = date.today()
+            work = self.appmod.PlanCell(project_id=proj.id, work_date=self.day, shift="08:30 - 18:00")
+            desk = self.appmod.PlanCell(project_id=office.id, work_date=self.day)
+            self.db.session.add_all([work, desk])
+            self.db.session.flush()
+            self.db.session.add_all([
+                self.appmod.CellAssignment(cell_id=work.id, person_id=people["Ali"].id),
+                self.appmod.CellAssignment(cell_id=desk.id, person_id=people["Banu"].id),
+                self.appmod.PersonDayStatus(person_id=people["Cem"].id, work_date=self.day, status="leave", status_type_id=None),
+            ])
+            self.db.session.commit()
+
+            self.admin_id = admin.id
+            self.office_type_id = office_type.id
+            self.leave_type_id = leave_type.id
+
+    def _login_as(self, client, user_id, *, role):
+        with client.session_transaction() as sess:
+            sess["user_id"] = user_id
+            sess["username"] = "x"
+            sess["is_admin"] = (role == "admin")
+            sess["role"] = role
+            sess["_csrf_token"] = "t"
+
+    def test_day_summary_sets(self):
+        from services import availability_service
+
+        with self.app.app_context():
+            matrix = availability_service.load_day(self.day)
+            summary = matrix.day_summary(self.day.isoformat())
+
+        self.assertEqual(summary["total_names"], ["Deniz", "Ece"])
+        self.assertEqual(summary["ana_kadro_names"], ["Ece"])
+        self.assertEqual(summary["yardimci"], 0)
+        self.assertEqual(summary["firm_available_counts"], {"Netmon": 2})
+        self.assertEqual(summary["status_categories"][self.office_type_id]["names"], ["Banu"])
+        self.assertEqual(summary["status_categories"][self.leave_type_id]["names"], ["Cem"])
+
+    def test_endpoints_use_matrix(self):
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+        day = self.day.isoformat()
+
+        data = client.get(f"/api/personnel/idle?work_date={day}").get_json()
+        self.assertEqual([p["full_name"] for p in data["idle_personnel"]], ["Deniz", "Ece"])
+
+        data = client.get(f"/api/availability?date={day}&shift=Gündüz").get_json()
+        self.assertEqual([p["name"] for p in data["busy"]], ["Ali"])
+        self.assertEqual([p["name"] for p in data["leave"]], ["Cem"])
+
+        data = client.get(f"/api/personnel/day-summary?work_date={day}").get_json()
+        self.assertEqual(data["idle"]["count"], 2)
+        self.assertEqual(data["idle"]["by_seviye"]["ana_kadro"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
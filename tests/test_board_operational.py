@@ -3,6 +3,7 @@ import sys
 import tempfile
 import time
 import unittest
+from datetime import date, timedelta
 
 
 class OperationalBoardTests(unittest.TestCase):
@@ -89,6 +90,11 @@ class OperationalBoardTests(unittest.TestCase):
             self.db.session.add(cell)
             self.db.session.commit()
 
+            # Job'lar kirli hücre kuyruğundan senkronize edilir (okuma uçları yazmaz)
+            from services import job_sync
+
+            job_sync.drain()
+
             self.admin_id = admin.id
             self.field_id = field.id
             self.project_id = proj.id
@@ -102,6 +108,31 @@ class OperationalBoardTests(unittest.TestCase):
             sess["role"] = role
             sess["_csrf_token"] = "t"
 
+    def test_board_refresh_is_read_only(self):
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+
+        from sqlalchemy import event
+
+        writes = []
+
+        def _capture(conn, cursor, statement, params, context, executemany):
+            if not statement.lstrip().upper().startswith(("SELECT", "PRAGMA")):
+                writes.append(statement)
+
+        with self.app.app_context():
+            engine = self.db.engine
+        event.listen(engine, "before_cursor_execute", _capture)
+        try:
+            start = date.today() - timedelta(days=45)
+            end = date.today() + timedelta(days=45)
+            res = client.get(f"/api/board/jobs?start={start.isoformat()}&end={end.isoformat()}")
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(len(res.get_json().get("rows") or []), 1)
+        finally:
+            event.remove(engine, "before_cursor_execute", _capture)
+        self.assertEqual([w for w in writes if "job" in w.lower() or "plan" in w.lower()], [])
+
     def test_field_cannot_access_board(self):
         client = self.app.test_client()
         self._login_as(client, self.field_id, role="field")
@@ -0,0 +1,152 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import date
+from unittest import mock
+
+
+class CellLockTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._db_path = os.path.join(cls._tmpdir.name, "test.db")
+        os.environ["DB_URL"] = f"sqlite:///{cls._db_path}"
+
+        import importlib
+
+        sys.modules.pop("app", None)
+        cls.appmod = importlib.import_module("app")
+        cls.app = cls.appmod.app
+        cls.db = cls.appmod.db
+        try:
+            cls.appmod.db.engine.dispose()
+        except Exception:
+            pass
+        cls.app.config["TESTING"] = True
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            cls.db.session.remove()
+            cls.db.engine.dispose()
+        except Exception:
+            pass
+
+        try:
+            for _ in range(5):
+                try:
+                    cls._tmpdir.cleanup()
+                    break
+                except PermissionError:
+                    time.sleep(0.05)
+        except Exception:
+            pass
+
+    def setUp(self):
+        from services import cell_locks
+
+        cell_locks.set_store(cell_locks.MemoryLockStore())
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+            self.appmod.ensure_schema()
+
+            users = []
+            for name in ("ayse", "mehmet"):
+                u = self.appmod.User(username=name, email=f"{name}@example.com", full_name=name.title(), role="planner", is_active=True)
+                u.set_password("pw")
+                self.db.session.add(u)
+                users.append(u)
+            project = self.appmod.Project(region="IST", project_code="P1", project_name="Proje", responsible="X")
+            self.db.session.add(project)
+            self.db.session.commit()
+            self.user_ids = [u.id for u in users]
+            self.project_id = project.id
+
+    def _client(self, user_id):
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = user_id
+            sess["role"] = "planner"
+            sess["_csrf_token"] = "t"
+        return client
+
+    def _lock(self, client, **extra):
+        payload = {"csrf_token": "t", "project_id": self.project_id, "work_date": "2026-03-02"}
+        payload.update(extra)
+        return client.post("/api/cell/lock", json=payload)
+
+    def test_lock_traffic_does_not_write_to_database(self):
+        from sqlalchemy import event
+
+        a, b = (self._client(uid) for uid in self.user_ids)
+        # Oturum yüklemesi (ilk istek) yazabilir; ölçüm sonrasında başlar
+        a.get("/api/cell/locks")
+        b.get("/api/cell/locks")
+
+        writes = []
+
+        def on_execute(conn, cursor, statement, params, context, executemany):
+            if statement.lstrip().split(" ", 1)[0].upper() in ("INSERT", "UPDATE", "DELETE"):
+                writes.append(statement)
+
+        with self.app.app_context():
+            engine = self.db.engine
+        event.listen(engine, "before_cursor_execute", on_execute)
+        try:
+            res = self._lock(a)
+            self.assertEqual(res.status_code, 200)
+            self.assertTrue(res.get_json()["ok"])
+
+            res = self._lock(b)
+            self.assertEqual(res.status_code, 409)
+            self.assertEqual(res.get_json()["locked_by"], "Ayse")
+
+            # Aynı kullanıcı uzatır
+            self.assertEqual(self._lock(a).status_code, 200)
+
+            locks = b.get("/api/cell/locks").get_json()["locks"]
+            self.assertEqual([(l["project_id"], l["work_date"], l["locked_by_id"]) for l in locks],
+                             [(self.project_id, "2026-03-02", self.user_ids[0])])
+
+            # Başkası kaldıramaz, sahibi kaldırır
+            b.post("/api/cell/unlock", json={"csrf_token": "t", "project_id": self.project_id, "work_date": "2026-03-02"})
+            self.assertEqual(len(a.get("/api/cell/locks").get_json()["locks"]), 1)
+            a.post("/api/cell/unlock", json={"csrf_token": "t", "project_id": self.project_id, "work_date": "2026-03-02"})
+            self.assertEqual(self._lock(b).status_code, 200)
+        finally:
+            event.remove(engine, "before_cursor_execute", on_execute)
+
+        self.assertEqual([w for w in writes if "last_seen" not in w], [])
+        with self.app.app_context():
+            self.assertEqual(self.appmod.PlanCell.query.count(), 0)
+
+    def test_sweeper_releases_expired_locks_and_emits_unlocked(self):
+        from services import cell_locks
+
+        now = time.time()
+        ok, _ = cell_locks.acquire(self.project_id, date(2026, 3, 2), self.user_ids[0], user_name="Ayse", ttl=60)
+        self.assertTrue(ok)
+        ok, rec = cell_locks.acquire(self.project_id, date(2026, 3, 2), self.user_ids[1], ttl=60)
+        self.assertFalse(ok)
+        self.assertEqual(rec["owner"], self.user_ids[0])
+        cell_locks.acquire(self.project_id, date(2026, 3, 3), self.user_ids[1], ttl=600)
+
+        with mock.patch("extensions.socketio.emit") as emit:
+            self.assertEqual(cell_locks.sweep(now=now + 61), 1)
+            self.assertEqual(cell_locks.sweep(now=now + 61), 0)
+        emit.assert_called_once()
+        name, payload = emit.call_args[0]
+        self.assertEqual(name, "cell_unlocked")
+        self.assertEqual((payload["work_date"], payload["reason"]), ("2026-03-02", "expired"))
+
+        # Süresi dolan kilidi başka kullanıcı alabilir
+        ok, _ = cell_locks.acquire(self.project_id, date(2026, 3, 2), self.user_ids[1])
+        self.assertTrue(ok)
+        self.assertEqual(len(cell_locks.active_locks()), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,225 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import date
+
+
+class CellMergeTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._db_path = os.path.join(cls._tmpdir.name, "test.db")
+        os.environ["DB_URL"] = f"sqlite:///{cls._db_path}"
+
+        import importlib
+
+        sys.modules.pop("app", None)
+        cls.appmod = importlib.import_module("app")
+        cls.app = cls.appmod.app
+        cls.db = cls.appmod.db
+        try:
+            cls.appmod.db.engine.dispose()
+        except Exception:
+            pass
+        cls.app.config["TESTING"] = True
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            cls.db.session.remove()
+            cls.db.engine.dispose()
+        except Exception:
+            pass
+
+        try:
+            for _ in range(5):
+                try:
+                    cls._tmpdir.cleanup()
+                    break
+                except PermissionError:
+                    time.sleep(0.05)
+        except Exception:
+            pass
+
+    def setUp(self):
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+            self.appmod.ensure_schema()
+
+            users = []
+            for name in ("ayse", "mehmet"):
+                u = self.appmod.User(username=name, email=f"{name}@example.com", full_name=name.title(), role="planner", is_active=True)
+                u.set_password("pw")
+                self.db.session.add(u)
+                users.append(u)
+            project = self.appmod.Project(region="IST", project_code="P1", project_name="Proje", responsible="X")
+            self.db.session.add(project)
+            self.db.session.commit()
+            cell = self.appmod.PlanCell(project_id=project.id, work_date=date(2026, 3, 2), note="ilk", vehicle_info="34 AB 1", version=1)
+            self.db.session.add(cell)
+            self.db.session.commit()
+            from services import cell_merge
+
+            cell_merge.record_version(cell, users[0].id, "create")
+            self.db.session.commit()
+            self.user_ids = [u.id for u in users]
+            self.cell_id = cell.id
+
+    def _client(self, user_id):
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = user_id
+            sess["role"] = "planner"
+            sess["_csrf_token"] = "t"
+        return client
+
+    def _save(self, client, version, **fields):
+        payload = {"csrf_token": "t", "cell_id": self.cell_id, "version": version}
+        payload.update(fields)
+        return client.post("/api/cell/save-with-version", json=payload)
+
+    def _cell(self):
+        with self.app.app_context():
+            return self.db.session.get(self.appmod.PlanCell, self.cell_id)
+
+    def test_non_overlapping_edits_are_merged(self):
+        a, b = (self._client(uid) for uid in self.user_ids)
+
+        res = self._save(a, 1, note="a notu", vehicle_info="34 AB 1")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()["version"], 2)
+        self.assertFalse(res.get_json()["merged"])
+
+        # B hâlâ sürüm 1'i görüyor; yalnızca aracı değiştirdi (notu okuduğu gibi geri yolluyor)
+        res = self._save(b, 1, note="ilk", vehicle_info="06 XY 2")
+        self.assertEqual(res.status_code, 200)
+        body = res.get_json()
+        self.assertTrue(body["merged"])
+        self.assertEqual(body["version"], 3)
+        self.assertEqual(body["merged_fields"], ["note"])
+        self.assertEqual((body["data"]["note"], body["data"]["vehicle_info"]), ("a notu", "06 XY 2"))
+
+        cell = self._cell()
+        self.assertEqual((cell.note, cell.vehicle_info, cell.version), ("a notu", "06 XY 2", 3))
+
+    def test_same_field_conflict_returns_409_with_fields(self):
+        a, b = (self._client(uid) for uid in self.user_ids)
+        self.assertEqual(self._save(a, 1, note="a notu").status_code, 200)
+
+        res = self._save(b, 1, note="b notu", shift="Gece")
+        self.assertEqual(res.status_code, 409)
+        body = res.get_json()
+        self.assertEqual(body["error"], "version_conflict")
+        self.assertEqual(body["conflicts"], [{"field": "note", "base": "ilk", "mine": "b notu", "theirs": "a notu"}])
+        cell = self._cell()
+        self.assertEqual((cell.note, cell.shift, cell.version), ("a notu", None, 2))
+
+        # Aynı değere varan eşzamanlı düzenleme çakışma değildir
+        res = self._save(b, 1, note="a notu", shift="Gece")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self._cell().shift, "Gece")
+
+    def test_missing_base_snapshot_keeps_old_behaviour(self):
+        with self.app.app_context():
+            cell = self.db.session.get(self.appmod.PlanCell, self.cell_id)
+            cell.version = 5
+            self.db.session.commit()
+        res = self._save(self._client(self.user_ids[1]), 4, vehicle_info="06 XY 2")
+        self.assertEqual(res.status_code, 409)
+        self.assertTrue(res.get_json()["base_missing"])
+
+    def test_write_between_read_and_save_is_rejected(self):
+        from unittest import mock
+
+        from services import cell_merge
+
+        parse = cell_merge.parse_changes
+
+        def parse_then_race(data):
+            # Başka bir işçi okuma ile yazma arasında hücreyi kaydediyor
+            with self.db.engine.begin() as conn:
+                conn.execute(self.db.text("UPDATE plan_cell SET version = 2, note = 'yarış' WHERE id = :id"), {"id": self.cell_id})
+            return parse(data)
+
+        with mock.patch.object(cell_merge, "parse_changes", parse_then_race):
+            res = self._save(self._client(self.user_ids[0]), 1, vehicle_info="06 XY 2")
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(res.get_json()["current_version"], 2)
+        cell = self._cell()
+        self.assertEqual((cell.note, cell.vehicle_info, cell.version), ("yarış", "34 AB 1", 2))
+
+    def test_planner_cell_save_bumps_version_for_merge(self):
+        a, b = (self._client(uid) for uid in self.user_ids)
+        res = a.post(
+            "/api/cell",
+            json={"project_id": self._cell().project_id, "work_date": "2026-03-02", "note": "planlayıcı", "vehicle_info": "34 AB 1"},
+            headers={"X-CSRF-Token": "t"},
+        )
+        self.assertTrue(res.get_json().get("ok"))
+        self.assertEqual(self._cell().version, 2)
+
+        # Sürüm 1'i okumuş editör yalnızca aracı değiştirdi: /api/cell kaydı ezilmez
+        res = self._save(b, 1, note="ilk", vehicle_info="06 XY 2")
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.get_json()["merged"])
+        cell = self._cell()
+        self.assertEqual((cell.note, cell.vehicle_info, cell.version), ("planlayıcı", "06 XY 2", 3))
+
+    def test_move_keeps_target_version_increasing(self):
+        with self.app.app_context():
+            target = self.appmod.PlanCell(project_id=self._cell().project_id, work_date=date(2026, 3, 3), version=4)
+            self.db.session.add(target)
+            self.db.session.commit()
+            target_id = target.id
+
+        res = self._client(self.user_ids[0]).put(
+            "/api/update-task-date", json={"csrf_token": "t", "cell_id": self.cell_id, "new_date": "2026-03-03"}
+        )
+        self.assertEqual(res.status_code, 200)
+        with self.app.app_context():
+            self.assertEqual(self.db.session.get(self.appmod.PlanCell, target_id).version, 5)
+
+    def test_copy_to_friday_bumps_target_versions(self):
+        from services import cell_merge
+
+        with self.app.app_context():
+            tuesday = self.appmod.PlanCell(project_id=self._cell().project_id, work_date=date(2026, 3, 3), note="salı", version=1)
+            self.db.session.add(tuesday)
+            self.db.session.commit()
+            cell_merge.record_version(tuesday, self.user_ids[1], "create")
+            self.db.session.commit()
+            tuesday_id = tuesday.id
+
+        a, b = (self._client(uid) for uid in self.user_ids)
+        res = a.post(
+            "/api/cell/copy_to_friday",
+            json={"project_id": self._cell().project_id, "work_date": "2026-03-02"},
+            headers={"X-CSRF-Token": "t"},
+        )
+        self.assertTrue(res.get_json().get("ok"))
+        with self.app.app_context():
+            self.assertEqual(self.db.session.get(self.appmod.PlanCell, tuesday_id).version, 2)
+
+        # Kopyadan önce sürüm 1'i okumuş editör: aynı alanda 409, diğer alanlar birleştirilir
+        def save(**fields):
+            payload = {"csrf_token": "t", "cell_id": tuesday_id, "version": 1, "note": "salı"}
+            payload.update(fields)
+            return b.post("/api/cell/save-with-version", json=payload)
+
+        res = save(vehicle_info="06 XY 2")
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual([c["field"] for c in res.get_json()["conflicts"]], ["vehicle_info"])
+
+        res = save(shift="Gece")
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.get_json()["merged"])
+        with self.app.app_context():
+            cell = self.db.session.get(self.appmod.PlanCell, tuesday_id)
+            self.assertEqual((cell.note, cell.vehicle_info, cell.shift, cell.version), ("ilk", "34 AB 1", "Gece", 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
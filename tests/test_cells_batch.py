@@ -0,0 +1,166 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import date, timedelta
+
+
+class CellsBatchTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._db_path = os.path.join(cls._tmpdir.name, "test.db")
+        os.environ["DB_URL"] = f"sqlite:///{cls._db_path}"
+
+        import importlib
+
+        sys.modules.pop("app", None)
+        cls.appmod = importlib.import_module("app")
+        cls.app = cls.appmod.app
+        cls.db = cls.appmod.db
+        try:
+            cls.appmod.db.engine.dispose()
+        except Exception:
+            pass
+        cls.app.config["TESTING"] = True
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            cls.db.session.remove()
+            cls.db.engine.dispose()
+        except Exception:
+            pass
+
+        try:
+            for _ in range(5):
+                try:
+                    cls._tmpdir.cleanup()
+                    break
+                except PermissionError:
+                    time.sleep(0.05)
+        except Exception:
+            pass
+
+    def setUp(self):
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+            self.appmod.ensure_schema()
+
+            admin = self.appmod.User(
+                username="admin",
+                email="admin@example.com",
+                full_name="Admin",
+                role="admin",
+                is_admin=True,
+                is_active=True,
+            )
+            admin.set_password("pw")
+            self.db.session.add(admin)
+
+            proj = self.appmod.Project(
+                region="Istanbul",
+                project_code="P1",
+                project_name="Proj",
+                responsible="Resp",
+                is_active=True,
+            )
+            self.db.session.add(proj)
+            people = [self.appmod.Person(full_name=name) for name in ("Ali", "Banu")]
+            self.db.session.add_all(people)
+            self.db.session.commit()
+
+            self.admin_id = admin.id
+            self.project_id = proj.id
+            self.person_ids = [p.id for p in people]
+
+        self.monday = date.today() - timedelta(days=date.today().weekday())
+
+    def _login_as(self, client, user_id, *, role):
+        with client.session_transaction() as sess:
+            sess["user_id"] = user_id
+            sess["username"] = "x"
+            sess["is_admin"] = (role == "admin")
+            sess["role"] = role
+            sess["_csrf_token"] = "t"
+
+    def test_batch_applies_all_cells_in_one_request(self):
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+
+        cells = [
+            {
+                "project_id": self.project_id,
+                "work_date": (self.monday + timedelta(days=i)).isoformat(),
+                "shift": "08:30 - 18:00",
+                "note": f"Gün {i}",
+                "person_ids": self.person_ids,
+            }
+            for i in range(5)
+        ]
+        res = client.post("/api/cells/batch", json={"cells": cells}, headers={"X-CSRF-Token": "t"})
+        self.assertEqual(res.status_code, 200)
+        data = res.get_json()
+        self.assertTrue(data.get("ok"))
+        self.assertEqual(data.get("count"), 5)
+
+        with self.app.app_context():
+            rows = self.appmod.PlanCell.query.order_by(self.appmod.PlanCell.work_date.asc()).all()
+            self.assertEqual([r.note for r in rows], [f"Gün {i}" for i in range(5)])
+            team_ids = {r.team_id for r in rows}
+            self.assertEqual(len(team_ids), 1)
+            self.assertEqual(self.appmod.CellAssignment.query.count(), 10)
+            # İş senkronizasyonu outbox üzerinden, tek olay olarak
+            from models import OutboxEvent
+
+            self.assertEqual(OutboxEvent.query.count(), 1)
+
+        from services import outbox
+
+        outbox.drain(self.app)
+        with self.app.app_context():
+            self.assertEqual(self.appmod.Job.query.count(), 5)
+
+    def test_batch_rejects_everything_when_one_cell_is_invalid(self):
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+
+        cells = [
+            {"project_id": self.project_id, "work_date": self.monday.isoformat(), "note": "ok"},
+            {"project_id": 0, "work_date": self.monday.isoformat(), "note": "bad"},
+        ]
+        res = client.post("/api/cells/batch", json={"cells": cells}, headers={"X-CSRF-Token": "t"})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual([e["index"] for e in res.get_json().get("errors")], [1])
+
+        with self.app.app_context():
+            self.assertEqual(self.appmod.PlanCell.query.count(), 0)
+
+    def test_batch_reports_malformed_fields_by_index(self):
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+
+        day = self.monday.isoformat()
+        cells = [
+            {"project_id": self.project_id, "work_date": day, "note": "ok"},
+            {"project_id": self.project_id, "work_date": day, "subproject_id": "abc"},
+            {"project_id": self.project_id, "work_date": day, "person_ids": "1,2"},
+            {"project_id": self.project_id, "work_date": day, "person_ids": ["x"]},
+            {"project_id": self.project_id, "work_date": day, "note": 5},
+        ]
+        res = client.post("/api/cells/batch", json={"cells": cells}, headers={"X-CSRF-Token": "t"})
+        self.assertEqual(res.status_code, 400)
+        errors = res.get_json().get("errors")
+        self.assertEqual([e["index"] for e in errors], [1, 2, 3, 4])
+        self.assertIn("subproject_id", errors[0]["error"])
+        self.assertIn("person_ids", errors[1]["error"])
+        self.assertIn("note", errors[3]["error"])
+
+        with self.app.app_context():
+            self.assertEqual(self.appmod.PlanCell.query.count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,324 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from io import BytesIO
+from datetime import date, timedelta
+
+
+class ExcelExportTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._db_path = os.path.join(cls._tmpdir.name, "test.db")
+        os.environ["DB_URL"] = f"sqlite:///{cls._db_path}"
+
+        import importlib
+
+        sys.modules.pop("app", None)
+        cls.appmod = importlib.import_module("app")
+        cls.app = cls.appmod.app
+        cls.db = cls.appmod.db
+        try:
+            cls.appmod.db.engine.dispose()
+        except Exception:
+            pass
+        cls.app.config["TESTING"] = True
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            cls.db.session.remove()
+            cls.db.engine.dispose()
+        except Exception:
+            pass
+
+        try:
+            for _ in range(5):
+                try:
+                    cls._tmpdir.cleanup()
+                    break
+                except PermissionError:
+                    time.sleep(0.05)
+        except Exception:
+            pass
+
+    def setUp(self):
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+            self.appmod.ensure_schema()
+
+            admin = self.appmod.User(
+                username="admin",
+                email="admin@example.com",
+                full_name="Admin",
+                role="admin",
+                is_admin=True,
+                is_active=True,
+            )
+            admin.set_password("pw")
+            self.db.session.add(admin)
+
+            proj = self.appmod.Project(
+                region="Istanbul",
+                project_code="P1",
+                project_name="Proj",
+                responsible="Resp",
+                is_active=True,
+            )
+            self.db.session.add(proj)
+            people = [self.appmod.Person(full_name=name, durum="Aktif") for name in ("Ali", "Banu")]
+            self.db.session.add_all(people)
+            self.db.session.flush()
+
+            self.monday = date.today() - timedelta(days=date.today().weekday())
+            cell = self.appmod.PlanCell(project_id=proj.id, work_date=self.monday, shift="08:30 - 18:00", note="Kurulum")
+            self.db.session.add(cell)
+            self.db.session.flush()
+            for p in people:
+                self.db.session.add(self.appmod.CellAssignment(cell_id=cell.id, person_id=p.id))
+            self.db.session.commit()
+
+            from services import job_sync
+
+            job_sync.drain()
+            self.admin_id = admin.id
+
+    def _login_as(self, client, user_id, *, role):
+        with client.session_transaction() as sess:
+            sess["user_id"] = user_id
+            sess["username"] = "x"
+            sess["is_admin"] = (role == "admin")
+            sess["role"] = role
+            sess["_csrf_token"] = "t"
+
+    def _load(self, res):
+        import openpyxl
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("spreadsheetml", res.headers.get("Content-Type", ""))
+        self.assertIn("attachment", res.headers.get("Content-Disposition", ""))
+        return openpyxl.load_workbook(BytesIO(res.get_data()))
+
+    def test_plan_export_streams_styled_week(self):
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+
+        wb = self._load(client.get(f"/plan/export/excel?week_start={self.monday.isoformat()}"))
+        ws = wb.active
+        self.assertEqual(ws["A1"].value, "İL")
+        self.assertTrue(ws["A1"].font.b)
+        self.assertEqual(ws["A2"].value, "Istanbul")
+        self.assertIn("Ali", ws["D2"].value)
+        self.assertIn("Not: Kurulum", ws["D2"].value)
+        self.assertEqual(ws["D2"].fill.fgColor.rgb, "00A7F3D0")
+        self.assertEqual(ws["E2"].value, "-")
+        self.assertEqual(ws.row_dimensions[2].height, 60)
+
+    def test_list_exports_produce_rows(self):
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+
+        ws = self._load(client.get("/people/export.xlsx")).active
+        self.assertEqual([r[0] for r in ws.iter_rows(min_row=2, values_only=True)], ["Ali", "Banu"])
+
+        ws = self._load(client.get(f"/timesheet.xlsx?week_start={self.monday.isoformat()}")).active
+        self.assertIn("P1 Proj", ws["D2"].value)
+
+        start = (self.monday - timedelta(days=1)).isoformat()
+        end = (self.monday + timedelta(days=7)).isoformat()
+        wb = self._load(client.get(f"/board/export.xlsx?start={start}&end={end}"))
+        self.assertEqual(wb.sheetnames, ["Jobs", "Summary"])
+        self.assertEqual(wb["Jobs"].max_row, 2)
+        self.assertEqual(wb["Summary"]["B2"].value, 1)
+
+        for url in (
+            "/projects/export/excel?type=main",
+            "/projects/export/excel?type=sub",
+            "/reports/mail-log.xlsx",
+            f"/reports.xlsx?week_start={self.monday.isoformat()}",
+            f"/reports/advanced.xlsx?start={start}&end={end}",
+            f"/admin/reports.xlsx?start={start}&end={end}",
+            f"/board.xlsx?start={start}&end={end}",
+        ):
+            with self.subTest(url=url):
+                self._load(client.get(url))
+
+    def test_admin_and_analytics_exports_stream(self):
+        with self.app.app_context():
+            self.db.session.add(self.appmod.MailLog(mail_type="job", kind="send", ok=False, to_addr="a@example.com", subject="Konu", error="550"))
+            self.db.session.commit()
+
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+
+        ws = self._load(client.get("/admin/mail-logs/export")).active
+        self.assertEqual(ws.title, "Mail Loglari")
+        self.assertEqual(list(next(ws.iter_rows(min_row=2, values_only=True)))[2:], ["job (send)", "Hata", "a@example.com", "Konu", "550"])
+
+        start = (self.monday - timedelta(days=1)).isoformat()
+        end = (self.monday + timedelta(days=7)).isoformat()
+        ws = self._load(client.get(f"/analytics/export?type=projects_detailed&start_date={start}&end_date={end}")).active
+        self.assertEqual(ws["A1"].fill.fgColor.rgb, "004F81BD")
+        self.assertEqual(list(next(ws.iter_rows(min_row=2, max_col=4, values_only=True))), ["P1", "Proj", "-", 1])
+
+    def _count_statements(self, fn):
+        from sqlalchemy import event
+
+        with self.app.app_context():
+            engine = self.db.engine
+        seen = []
+
+        def _before(conn, cursor, statement, params, context, executemany):
+            seen.append(statement)
+
+        event.listen(engine, "before_cursor_execute", _before)
+        try:
+            fn()
+        finally:
+            event.remove(engine, "before_cursor_execute", _before)
+        return len(seen)
+
+    def test_plan_week_labels_load_in_constant_queries(self):
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+        url = f"/plan/export/excel?week_start={self.monday.isoformat()}"
+
+        def export():
+            self._load(client.get(url))
+
+        def snapshot():
+            from routes.realtime import generate_full_plan_html
+
+            with self.app.app_context():
+                return generate_full_plan_html(self.monday)
+
+        # Tek hücre: alt proje ve ekip etiketli
+        with self.app.app_context():
+            m = self.appmod
+            vehicle = m.Vehicle(plate="34ABC01", brand="Ford")
+            self.db.session.add(vehicle)
+            self.db.session.flush()
+            team = m.Team(name="Ekip 1", signature="sig-1", vehicle_id=vehicle.id)
+            self.db.session.add(team)
+            first = m.PlanCell.query.first()
+            sub = m.SubProject(project_id=first.project_id, name="Alt", code="S")
+            self.db.session.add(sub)
+            self.db.session.flush()
+            first.subproject_id = sub.id
+            first.team_id = team.id
+            team_id = team.id
+            self.db.session.commit()
+
+        export()  # ilk istek varsayılan kayıtları tohumlar; ölçüme katılmasın
+        sparse_export = self._count_statements(export)
+        sparse_html = self._count_statements(snapshot)
+
+        # Yoğun hafta: 15 proje x 7 gün, her hücrede alt proje, ekip ve personel
+        with self.app.app_context():
+            people = m.Person.query.all()
+            for i in range(15):
+                proj = m.Project(region="Ankara", project_code=f"D{i:02d}", project_name=f"Dense {i}", responsible="R", is_active=True)
+                self.db.session.add(proj)
+                self.db.session.flush()
+                sub = m.SubProject(project_id=proj.id, name=f"Alt {i}", code=f"S{i}")
+                self.db.session.add(sub)
+                self.db.session.flush()
+                for d in range(7):
+                    cell = m.PlanCell(project_id=proj.id, work_date=self.monday + timedelta(days=d), subproject_id=sub.id, team_id=team_id)
+                    self.db.session.add(cell)
+                    self.db.session.flush()
+                    for p in people:
+                        self.db.session.add(m.CellAssignment(cell_id=cell.id, person_id=p.id))
+            self.db.session.commit()
+
+        self.assertEqual(self._count_statements(export), sparse_export)
+        self.assertEqual(self._count_statements(snapshot), sparse_html)
+
+        ws = self._load(client.get(url)).active
+        self.assertIn("Alt 3 (S3)", ws["J5"].value)
+        self.assertIn("Ali, Banu", ws["J5"].value)
+
+        html = snapshot()
+        self.assertIn("Dense 14", html)
+
+    def test_plan_range_export_by_week_and_continuous(self):
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+
+        with self.app.app_context():
+            m = self.appmod
+            proj = m.Project.query.first()
+            later = self.monday + timedelta(days=16)  # iki hafta sonrasının Çarşambası
+            self.db.session.add(m.PlanCell(project_id=proj.id, work_date=later, note="Sonraki"))
+            self.db.session.commit()
+
+        start = self.monday.isoformat()
+        end = (self.monday + timedelta(days=20)).isoformat()
+        wb = self._load(client.get(f"/plan/export/excel?start={start}&end={end}"))
+        self.assertEqual(len(wb.sheetnames), 3)
+        self.assertEqual(wb.sheetnames[0], f"Hafta {self.monday.strftime('%d.%m.%Y')}")
+        self.assertIn("Ali", wb.worksheets[0]["D2"].value)
+        # Ortadaki haftada iş yok: yalnızca başlık satırı
+        self.assertEqual(wb.worksheets[1].max_row, 1)
+        self.assertIn("Not: Sonraki", wb.worksheets[2]["F2"].value)
+
+        ws = self._load(client.get(f"/plan/export/excel?start={start}&end={end}&layout=continuous")).active
+        self.assertEqual(ws.freeze_panes, "D2")
+        self.assertEqual(ws.max_column, 3 + 21)
+        self.assertEqual(ws.max_row, 2)
+        self.assertIn("Ali", ws["D2"].value)
+        self.assertIn("Not: Sonraki", ws.cell(row=2, column=3 + 17).value)
+
+        res = client.get(f"/plan/export/excel?start={end}&end={start}")
+        self.assertEqual(res.status_code, 302)
+        res = client.get(f"/plan/export/excel?start={start}&end={(self.monday + timedelta(days=400)).isoformat()}")
+        self.assertEqual(res.status_code, 302)
+
+        from routes.realtime import generate_full_plan_html
+
+        with self.app.app_context():
+            html = generate_full_plan_html(self.monday, self.monday + timedelta(days=20))
+            self.assertEqual(html.count("<table"), 3)
+            self.assertIn("Sonraki", html)
+            html = generate_full_plan_html(self.monday, self.monday + timedelta(days=20), "continuous")
+            self.assertEqual(html.count("<table"), 1)
+            self.assertEqual(html.count("<th "), 3 + 21)
+
+    def test_engine_writes_generator_rows_in_write_only_mode(self):
+        from services import excel_export
+
+        produced = []
+
+        def rows():
+            for i in range(1000):
+                produced.append(i)
+                yield [i, excel_export.styled(f"r{i}", excel_export.CellStyle(fill="FEF3C7"))]
+
+        sheet = excel_export.Sheet("S", [excel_export.Column("N", 10), excel_export.Column("V")], rows())
+        data = b"".join(excel_export.build_chunks([sheet]))
+
+        import openpyxl
+
+        ws = openpyxl.load_workbook(BytesIO(data)).active
+        self.assertEqual(len(produced), 1000)
+        self.assertEqual(ws.max_row, 1001)
+        self.assertEqual(ws["B1001"].value, "r999")
+        self.assertEqual(ws["B1001"].fill.fgColor.rgb, "00FEF3C7")
+
+    def test_engine_freezes_panes_before_streaming_rows(self):
+        from services import excel_export
+
+        import openpyxl
+
+        for ref in ("B2", "A2", "C1"):
+            sheet = excel_export.Sheet("S", [excel_export.Column("A"), excel_export.Column("B")], ([i, i] for i in range(5)), freeze_panes=ref)
+            ws = openpyxl.load_workbook(BytesIO(b"".join(excel_export.build_chunks([sheet])))).active
+            self.assertEqual(ws.freeze_panes, ref)
+            self.assertEqual(ws.max_row, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
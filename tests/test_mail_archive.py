@@ -0,0 +1,141 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+
+
+class MailArchiveTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._db_path = os.path.join(cls._tmpdir.name, "test.db")
+        os.environ["DB_URL"] = f"sqlite:///{cls._db_path}"
+
+        import importlib
+
+        sys.modules.pop("app", None)
+        cls.appmod = importlib.import_module("app")
+        cls.app = cls.appmod.app
+        cls.db = cls.appmod.db
+        try:
+            cls.appmod.db.engine.dispose()
+        except Exception:
+            pass
+        cls.app.config["TESTING"] = True
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            cls.db.session.remove()
+            cls.db.engine.dispose()
+        except Exception:
+            pass
+
+        try:
+            for _ in range(5):
+                try:
+                    cls._tmpdir.cleanup()
+                    break
+                except PermissionError:
+                    time.sleep(0.05)
+        except Exception:
+            pass
+
+    def setUp(self):
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+            self.appmod.ensure_schema()
+
+    def _login_admin(self, client):
+        with self.app.app_context():
+            admin = self.appmod.User(username="admin", email="admin@example.com", full_name="Admin", role="admin", is_admin=True, is_active=True)
+            admin.set_password("pw")
+            self.db.session.add(admin)
+            self.db.session.commit()
+            admin_id = admin.id
+        with client.session_transaction() as sess:
+            sess["user_id"] = admin_id
+            sess["role"] = "admin"
+            sess["is_admin"] = True
+            sess["_csrf_token"] = "t"
+
+    def _add_logs(self):
+        MailLog = self.appmod.MailLog
+        body = "<table>" + "".join(f"<tr><td>Satir {i}</td><td>Istanbul</td><td>Kurulum</td></tr>" for i in range(200)) + "</table>"
+        now = datetime.now()
+        with self.app.app_context():
+            for i in range(7):
+                self.db.session.add(MailLog(
+                    created_at=now - timedelta(days=120 + i),
+                    mail_type="weekly", kind="send", ok=(i % 2 == 0),
+                    to_addr=f"eski{i}@example.com", subject=f"Eski plan {i}",
+                    body_preview=body[:1000], body_html=body, error=None if i % 2 == 0 else "timeout",
+                    meta_json='{"type": "weekly"}', team_name="Ekip A", body_size_bytes=len(body),
+                ))
+            self.db.session.add(MailLog(
+                created_at=now - timedelta(days=2), mail_type="weekly", kind="send", ok=True,
+                to_addr="yeni@example.com", subject="Yeni plan", body_html=body,
+            ))
+            self.db.session.commit()
+        return body
+
+    def test_old_logs_move_to_compressed_archive_and_stay_readable(self):
+        from services import mail_archive
+
+        body = self._add_logs()
+        MailLog = self.appmod.MailLog
+        MailLogArchive = self.appmod.MailLogArchive
+
+        with self.app.app_context():
+            old_ids = sorted(i for (i,) in self.db.session.query(MailLog.id).filter(MailLog.subject.like("Eski%")).all())
+            moved = mail_archive.archive_older_than(days=90, batch_size=3)
+            self.assertEqual(moved, 7)
+            self.assertEqual(MailLog.query.count(), 1)
+            self.assertEqual(sorted(i for (i,) in self.db.session.query(MailLogArchive.id).all()), old_ids)
+
+            row = self.db.session.get(MailLogArchive, old_ids[1])
+            self.assertLess(len(row.body_z), len(body) // 5)
+            self.assertEqual(row.body_html, body)
+            self.assertEqual(row.error, "timeout")
+            self.assertEqual(row.team_name, "Ekip A")
+            # Tekrar çalıştırmak bir şey taşımaz
+            self.assertEqual(mail_archive.archive_older_than(days=90), 0)
+            self.assertEqual(mail_archive.archive_older_than(days=0), 0)
+
+        client = self.app.test_client()
+        self._login_admin(client)
+
+        res = client.get(f"/api/mail/log/detail/{old_ids[1]}")
+        self.assertEqual(res.status_code, 200)
+        data = res.get_json()["log"]
+        self.assertTrue(data["archived"])
+        self.assertEqual(data["body_html"], body)
+        self.assertEqual(data["meta"], {"type": "weekly"})
+
+        res = client.get(f"/admin/mail-log/{old_ids[0]}")
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("Eski plan", res.get_data(as_text=True))
+
+        start = (datetime.now() - timedelta(days=200)).date().isoformat()
+        end = datetime.now().date().isoformat()
+        res = client.get(f"/reports/mail-log?source=archive&start_date={start}&end_date={end}&ok=0")
+        self.assertEqual(res.status_code, 200)
+        html = res.get_data(as_text=True)
+        self.assertIn("eski1@example.com", html)
+        self.assertNotIn("eski0@example.com", html)
+        self.assertNotIn("yeni@example.com", html)
+
+        res = client.get("/api/mail/logs?source=archive&status=error")
+        self.assertEqual(res.get_json()["total"], 3)
+
+        res = client.post(f"/api/mail/log/delete/{old_ids[0]}", headers={"X-CSRF-Token": "t"})
+        self.assertTrue(res.get_json()["ok"])
+        with self.app.app_context():
+            self.assertIsNone(mail_archive.get_log(old_ids[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
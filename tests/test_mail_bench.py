@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+
+class MailBenchTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._db_path = os.path.join(cls._tmpdir.name, "test.db")
+        os.environ["DB_URL"] = f"sqlite:///{cls._db_path}"
+
+        import importlib
+
+        sys.modules.pop("app", None)
+        cls.appmod = importlib.import_module("app")
+        cls.app = cls.appmod.app
+        cls.db = cls.appmod.db
+        try:
+            cls.appmod.db.engine.dispose()
+        except Exception:
+            pass
+        cls.app.config["TESTING"] = True
+        cls.app.instance_path = cls._tmpdir.name
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            cls.db.session.remove()
+            cls.db.engine.dispose()
+        except Exception:
+            pass
+
+        try:
+            for _ in range(5):
+                try:
+                    cls._tmpdir.cleanup()
+                    break
+                except PermissionError:
+                    time.sleep(0.05)
+        except Exception:
+            pass
+
+    def setUp(self):
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+            self.appmod.ensure_schema()
+
+    def test_benchmark_drains_queue_through_local_sink_with_injected_failures(self):
+        from scripts.bench_mail_queue import run_benchmark
+
+        result = run_benchmark(self.app, count=30, attachment_kb=8, fail_rate=0.1, drop_rate=0.05, seed=3)
+
+        self.assertEqual(result["statuses"], {"sent": 30})
+        sink = result["sink"]
+        self.assertEqual(sink["accepted"], 30)
+        # Her enjekte hata bir tekrar denemeye karşılık gelir; gönderilen mail tekrar gönderilmez
+        self.assertEqual(result["retries"], sink["failed_injected"] + sink["dropped_injected"])
+        self.assertGreater(result["retries"], 0)
+        self.assertEqual(result["smtp_connects"], sink["connections"])
+        self.assertLessEqual(sink["connections"], 1 + sink["dropped_injected"])
+        self.assertGreater(result["mails_per_second"], 0)
+        self.assertIsNotNone(result["latency_p95"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import os
+import unittest
+
+from mail_harness import CFG, FakeSMTP, MailQueueTestCase
+
+
+class MailBlobStoreTests(MailQueueTestCase):
+    def test_attachment_is_stored_once_and_released_after_send(self):
+        import email
+
+        from services import blob_store
+        from services.mail_service import MailService
+
+        payload = os.urandom(200 * 1024)
+        src = os.path.join(self._tmpdir.name, "plan.xlsx")
+        with open(src, "wb") as f:
+            f.write(payload)
+        att = {"filename": "plan.xlsx", "path": src, "content_type": "application/vnd.ms-excel"}
+
+        with self.app.app_context():
+            for to in ("a@example.com", "b@example.com", "c@example.com"):
+                MailService.send(mail_type="weekly", recipients=to, subject="Plan", html="<p>x</p>", attachments=[att], cfg_override=CFG)
+            blob = self.appmod.MailBlob.query.one()
+            self.assertEqual((blob.ref_count, blob.size), (3, len(payload)))
+            for q in self.appmod.MailQueue.query.all():
+                self.assertNotIn("data_b64", q.meta_json)
+                self.assertLess(len(q.meta_json), 2048)
+            sha = blob.sha256
+        self.assertTrue(os.path.exists(os.path.join(self._tmpdir.name, "mail_blobs", sha[:2], sha)))
+
+        MailService.process_queue(self.app)
+
+        sent = FakeSMTP.instances[0].sent
+        self.assertEqual(len(sent), 3)
+        msg = email.message_from_string(sent[0][2])
+        parts = [p for p in msg.walk() if p.get_filename() == "plan.xlsx"]
+        self.assertEqual(parts[0].get_payload(decode=True), payload)
+
+        with self.app.app_context():
+            self.assertEqual(self.appmod.MailBlob.query.one().ref_count, 0)
+            for q in self.appmod.MailQueue.query.all():
+                meta = json.loads(q.meta_json)
+                self.assertEqual(meta["_attachments"][0]["filename"], "plan.xlsx")
+                self.assertNotIn("blob", meta["_attachments"][0])
+            self.assertEqual(blob_store.collect_garbage(grace_seconds=0), 1)
+            self.assertEqual(self.appmod.MailBlob.query.count(), 0)
+        self.assertFalse(os.path.exists(os.path.join(self._tmpdir.name, "mail_blobs", sha[:2], sha)))
+
+    def test_clearing_failed_items_releases_attachment_refs(self):
+        from services.mail_service import MailService
+
+        with self.app.app_context():
+            for to in ("a@example.com", "b@example.com"):
+                MailService.send(
+                    mail_type="weekly", recipients=to, subject="Plan", html="<p>x</p>",
+                    attachments=[{"filename": "a.txt", "data": b"ortak ek", "content_type": "text/plain"}], cfg_override=CFG,
+                )
+            self.appmod.MailQueue.query.filter_by(recipients=json.dumps(["a@example.com"])).update({"status": "failed"})
+            self.db.session.commit()
+
+        client = self.app.test_client()
+        self._login_admin(client)
+        res = client.post("/admin/mail-queue/clear-failed", headers={"X-CSRF-Token": "t"})
+        self.assertEqual(res.status_code, 302)
+
+        with self.app.app_context():
+            self.assertEqual(self.appmod.MailQueue.query.count(), 1)
+            self.assertEqual(self.appmod.MailBlob.query.one().ref_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from mail_harness import CFG, MailQueueTestCase
+
+
+class MailDigestTests(MailQueueTestCase):
+    def test_notifications_to_same_recipient_are_coalesced_into_digest(self):
+        import utils
+        from services import mail_digest
+        from services.mail_service import MailService
+
+        MailQueue = self.appmod.MailQueue
+        with mock.patch.object(mail_digest, "MAIL_DIGEST_SECONDS", 120), self.app.app_context():
+            utils.save_mail_settings(CFG)
+            for i in range(3):
+                MailService.send(
+                    mail_type="deadline_expired", recipients="a@example.com", subject=f"[Görev] T-{i}", html="<p>tek</p>",
+                    task_id=i + 1, digest={"title": f"T-{i} - Kablo", "intro": "Süre doldu.", "body_html": f"<p>detay {i}</p>", "recipient_name": "Ali"},
+                )
+            MailService.send(
+                mail_type="deadline_expired", recipients="b@example.com", subject="[Görev] T-9", html="<p>tek b</p>",
+                digest={"title": "T-9", "body_html": "<p>b</p>"},
+            )
+            MailService.send(mail_type="weekly", recipients="a@example.com", subject="Plan", html="<p>plan</p>")
+            held = MailQueue.query.filter(MailQueue.digest_key != None).all()
+            self.assertEqual(len(held), 4)
+            self.assertTrue(all(q.next_attempt_at > datetime.now() for q in held))
+
+            # Pencere dolmadan yalnızca özetlenmeyen mail gider
+            MailService.process_queue(self.app)
+            self.assertEqual(self._sent_to(), [["a@example.com"]])
+
+            MailQueue.query.filter(MailQueue.digest_key != None).update({"next_attempt_at": datetime.now() - timedelta(seconds=1)})
+            self.db.session.commit()
+            MailService.process_queue(self.app)
+
+            self.assertEqual(sorted(map(tuple, self._sent_to())), [("a@example.com",), ("a@example.com",), ("b@example.com",)])
+            rows = MailQueue.query.order_by(MailQueue.id).all()
+            self.assertEqual([q.status for q in rows], ["sent", "sent", "sent"])
+            digest = [q for q in rows if q.subject.startswith("[Görev] Süresi Dolan")][0]
+            self.assertEqual(json.loads(digest.meta_json)["task_ids"], [1, 2, 3])
+            self.assertEqual(digest.task_id, 1)
+            for i in range(3):
+                self.assertIn(f"detay {i}", digest.html_content)
+            self.assertIn("Ali", digest.html_content)
+            single_b = [q for q in rows if q.subject == "[Görev] T-9"]
+            self.assertEqual(len(single_b), 1)
+
+    def test_digest_keeps_shared_links(self):
+        from models import MailQueue
+        from services import mail_digest
+        from services.mail_service import MailService
+
+        with mock.patch.object(mail_digest, "MAIL_DIGEST_SECONDS", 120), self.app.app_context():
+            for i in range(2):
+                MailService.send(
+                    mail_type="task_comment", recipients="a@example.com", subject=f"Yorum {i}", html="<p>x</p>",
+                    task_id=7, project_id=3, user_id=5 + i, digest={"title": f"Yorum {i}"},
+                )
+            MailQueue.query.update({"next_attempt_at": datetime.now() - timedelta(seconds=1)})
+            self.db.session.commit()
+            self.assertEqual(mail_digest.coalesce("w"), 2)
+            row = MailQueue.query.one()
+            # Ortak görev ve proje korunur; farklı olan kullanıcı boş kalır
+            self.assertEqual((row.task_id, row.project_id, row.user_id), (7, 3, None))
+            self.assertEqual(json.loads(row.meta_json)["task_ids"], [7, 7])
+
+
+if __name__ == "__main__":
+    unittest.main()
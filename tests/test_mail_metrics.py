@@ -0,0 +1,73 @@
+import unittest
+from unittest import mock
+
+from mail_harness import CFG, FakeSMTP, MailQueueTestCase
+
+
+class MailMetricsTests(MailQueueTestCase):
+    def test_metrics_endpoint_reports_depth_latency_and_errors(self):
+        from services.mail_service import MailService
+
+        with self.app.app_context():
+            for to in ("a@example.com", "b@example.com", "c@example.com"):
+                MailService.send(mail_type="weekly", recipients=to, subject="Plan", html="<p>x</p>", cfg_override=CFG)
+        FakeSMTP.fail_next = 1
+        MailService.process_queue(self.app)
+
+        client = self.app.test_client()
+        self._login_admin(client)
+        res = client.get("/admin/mail-queue/metrics")
+        self.assertEqual(res.status_code, 200)
+        data = res.get_json()
+        self.assertEqual(data["queue"]["depth"], {"sent": 2, "pending": 1})
+        self.assertEqual(data["queue"]["due"], 0)
+        self.assertEqual(data["queue"]["latency_seconds"]["count"], 2)
+        self.assertEqual(data["worker"]["sent"], 2)
+        self.assertEqual(data["worker"]["errors"], {"disconnected": 1})
+        phases = data["worker"]["smtp_phases"]
+        self.assertEqual((phases["connect"]["count"], phases["tls"]["count"], phases["auth"]["count"]), (2, 2, 2))
+        self.assertEqual(phases["data"]["count"], 3)
+        self.assertIn("connects", data["smtp_pool"])
+
+        res = client.get("/admin/mail-queue/metrics?format=prometheus")
+        self.assertTrue(res.content_type.startswith("text/plain"))
+        text = res.get_data(as_text=True)
+        self.assertIn('mail_queue_depth{status="sent"} 2', text)
+        self.assertIn('mail_errors_total{code="disconnected"} 1', text)
+        self.assertIn('mail_smtp_phase_seconds_count{phase="data"} 3', text)
+        self.assertIn("# TYPE mail_sent_total counter", text)
+
+    def test_other_workers_report_the_published_worker_counters(self):
+        from services import mail_metrics, shared_state, smtp_pool
+        from services.mail_service import MailService
+
+        class _SharedStore(shared_state.LocalState):
+            shared = True
+            url = "redis://stand-in"
+
+        orig = shared_state.get_state()
+        shared_state.set_state(_SharedStore())
+        self.addCleanup(shared_state.set_state, orig)
+
+        with self.app.app_context():
+            MailService.send(mail_type="weekly", recipients="a@example.com", subject="Plan", html="<p>x</p>", cfg_override=CFG)
+        MailService.process_queue(self.app)
+        with mock.patch.object(shared_state, "singleton_held", return_value=True):
+            self.assertTrue(mail_metrics.publish(force=True))
+            pool_stats = smtp_pool.get_pool().stats()
+            with self.app.app_context():
+                self.assertEqual(mail_metrics.collect()["worker"]["sent"], 1)
+
+        # Sahip olmayan süreç: yerel sayaçlar boş, yayınlanan kopya döner
+        mail_metrics.get_metrics().reset()
+        with mock.patch.object(shared_state, "singleton_held", return_value=False):
+            with self.app.app_context():
+                data = mail_metrics.collect()
+        self.assertEqual(data["worker"]["sent"], 1)
+        self.assertEqual(data["worker"]["totals"]["sent"], 1)
+        self.assertEqual(data["smtp_pool"], pool_stats)
+        self.assertIn('mail_sent_total 1', mail_metrics.prometheus_text(data))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from mail_harness import CFG, MailQueueTestCase
+
+
+class MailWorkerPoolTests(MailQueueTestCase):
+    def test_parallel_workers_claim_disjoint_batches(self):
+        import threading
+
+        from services import mail_service
+        from services.mail_service import MailService
+
+        cfg = dict(CFG, rate_per_minute=6000, rate_burst=100)
+        rcpts = [f"u{i}@example.com" for i in range(12)]
+        with self.app.app_context():
+            for r in rcpts:
+                MailService.send(mail_type="weekly", recipients=r, subject="Plan", html="<p>x</p>", cfg_override=cfg)
+
+        with mock.patch.object(mail_service, "MAIL_BATCH_SIZE", 3), \
+                mock.patch.object(mail_service, "_domain_slots", mail_service.mail_rate.DomainSlots(10)):
+            def run(wid):
+                while MailService.process_queue(self.app, worker_id=wid):
+                    pass
+
+            workers = [threading.Thread(target=run, args=(f"t{i}",)) for i in range(3)]
+            for t in workers:
+                t.start()
+            for t in workers:
+                t.join(30)
+
+        sent = sorted(to[0] for to in self._sent_to())
+        self.assertEqual(sent, sorted(rcpts))  # her alıcı tam bir kez
+        with self.app.app_context():
+            rows = self.appmod.MailQueue.query.all()
+            self.assertEqual({q.status for q in rows}, {"sent"})
+            self.assertEqual({q.lease_owner for q in rows}, {None})
+
+    def test_expired_lease_is_recovered_and_busy_domain_is_deferred(self):
+        from services import mail_service
+        from services.mail_service import MailService
+
+        with self.app.app_context():
+            MailService.send(mail_type="weekly", recipients="a@busy.example", subject="Plan", html="<p>x</p>", cfg_override=CFG)
+            item = self.appmod.MailQueue.query.one()
+            item.status = "processing"
+            item.lease_owner = "dead-worker:1"
+            item.lease_until = datetime.now() - timedelta(seconds=1)
+            self.db.session.commit()
+
+        slots = mail_service.mail_rate.DomainSlots(1)
+        held = slots.try_acquire(["busy.example"])
+        with mock.patch.object(mail_service, "_domain_slots", slots):
+            MailService.process_queue(self.app)  # kira dolmuş -> kurtarılır (backoff ile ertelenir)
+            with self.app.app_context():
+                item = self.appmod.MailQueue.query.one()
+                self.assertEqual((item.status, item.retry_count, item.lease_owner), ("pending", 1, None))
+                item.next_attempt_at = None
+                self.db.session.commit()
+
+            MailService.process_queue(self.app)  # alan adı dolu -> deneme sayılmadan ertelenir
+            self.assertEqual(self._sent_to(), [])
+            with self.app.app_context():
+                item = self.appmod.MailQueue.query.one()
+                self.assertEqual((item.status, item.retry_count), ("pending", 1))
+                self.assertGreater(item.next_attempt_at, datetime.now())
+                item.next_attempt_at = None
+                self.db.session.commit()
+
+            slots.release(held)
+            MailService.process_queue(self.app)
+        self.assertEqual(self._sent_to(), [["a@busy.example"]])
+
+    def test_enqueue_wakes_waiting_workers_and_admin_shows_pool(self):
+        import threading
+
+        from services import mail_service
+        from services.mail_service import MailService
+
+        seen = mail_service._wake_seq
+        woke = []
+        waiter = threading.Thread(target=lambda: woke.append(mail_service._wait_for_work(seen, 10)))
+        started = time.monotonic()
+        waiter.start()
+        with self.app.app_context():
+            MailService.send(mail_type="weekly", recipients="a@example.com", subject="Plan", html="<p>x</p>", cfg_override=CFG)
+        waiter.join(10)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(woke, [seen + 1])
+
+        with self.app.app_context():
+            admin = self.appmod.User(username="admin", email="admin@example.com", full_name="Admin", role="admin", is_admin=True, is_active=True)
+            admin.set_password("pw")
+            self.db.session.add(admin)
+            self.db.session.commit()
+            admin_id = admin.id
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = admin_id
+            sess["role"] = "admin"
+            sess["is_admin"] = True
+        res = client.get("/admin/mail-queue")
+        self.assertEqual(res.status_code, 200)
+        body = res.get_data(as_text=True)
+        self.assertIn("İşçiler", body)
+        self.assertIn(f"Parti: {mail_service.MAIL_BATCH_SIZE}", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import date, timedelta
+
+
+class OutboxTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._db_path = os.path.join(cls._tmpdir.name, "test.db")
+        os.environ["DB_URL"] = f"sqlite:///{cls._db_path}"
+
+        import importlib
+
+        sys.modules.pop("app", None)
+        cls.appmod = importlib.import_module("app")
+        cls.app = cls.appmod.app
+        cls.db = cls.appmod.db
+        try:
+            cls.appmod.db.engine.dispose()
+        except Exception:
+            pass
+        cls.app.config["TESTING"] = True
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            cls.db.session.remove()
+            cls.db.engine.dispose()
+        except Exception:
+            pass
+
+        try:
+            for _ in range(5):
+                try:
+                    cls._tmpdir.cleanup()
+                    break
+                except PermissionError:
+                    time.sleep(0.05)
+        except Exception:
+            pass
+
+    def setUp(self):
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+            self.appmod.ensure_schema()
+
+            admin = self.appmod.User(
+                username="admin",
+                email="admin@example.com",
+                full_name="Admin",
+                role="admin",
+                is_admin=True,
+                is_active=True,
+            )
+            admin.set_password("pw")
+            self.db.session.add(admin)
+
+            proj = self.appmod.Project(
+                region="Istanbul",
+                project_code="P1",
+                project_name="Proj",
+                responsible="Resp",
+                is_active=True,
+            )
+            self.db.session.add(proj)
+            people = [
+                self.appmod.Person(full_name="Ali", email="ali@example.com"),
+                self.appmod.Person(full_name="Banu"),
+            ]
+            ali_user = self.appmod.User(
+                username="ali",
+                email="ali@example.com",
+                full_name="Ali",
+                role="field",
+                is_active=True,
+            )
+            ali_user.set_password("pw")
+            self.db.session.add(ali_user)
+            self.db.session.add_all(people)
+            self.db.session.commit()
+
+            self.admin_id = admin.id
+            self.project_id = proj.id
+            self.person_ids = [p.id for p in people]
+            self.ali_user_id = ali_user.id
+
+        self.monday = date.today() - timedelta(days=date.today().weekday())
+
+    def _login_as(self, client, user_id, *, role):
+        with client.session_transaction() as sess:
+            sess["user_id"] = user_id
+            sess["username"] = "x"
+            sess["is_admin"] = (role == "admin")
+            sess["role"] = role
+            sess["_csrf_token"] = "t"
+
+    def _save_cell(self, client):
+        res = client.post(
+            "/api/cell",
+            json={
+                "project_id": self.project_id,
+                "work_date": self.monday.isoformat(),
+                "shift": "08:30 - 18:00",
+                "note": "Kurulum",
+                "person_ids": self.person_ids,
+            },
+            headers={"X-CSRF-Token": "t"},
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.get_json().get("ok"))
+
+    def test_cell_save_defers_side_effects_to_outbox(self):
+        from models import OutboxEvent
+        from services import outbox
+
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+        self._save_cell(client)
+
+        with self.app.app_context():
+            self.assertEqual(self.appmod.PlanCell.query.count(), 1)
+            self.assertEqual(self.appmod.Job.query.count(), 0)
+            ev = OutboxEvent.query.one()
+            self.assertEqual(ev.status, "pending")
+
+        outbox.drain(self.app)
+        outbox.drain(self.app)
+
+        with self.app.app_context():
+            self.assertEqual(OutboxEvent.query.one().status, "done")
+            job = self.appmod.Job.query.one()
+            self.assertEqual(job.project_id, self.project_id)
+            notes = self.appmod.Notification.query.filter_by(user_id=self.ali_user_id, event="new_assignment").all()
+            self.assertEqual(len(notes), 1)
+
+    def test_failed_event_is_retried_with_backoff(self):
+        from models import OutboxEvent
+        from services import outbox
+
+        calls = []
+
+        def flaky(payload):
+            calls.append(payload)
+            if len(calls) == 1:
+                raise RuntimeError("geçici hata")
+
+        outbox.register_handler("test_flaky", flaky)
+        with self.app.app_context():
+            outbox.enqueue("test_flaky", {"n": 1}, key="test_flaky:1")
+            outbox.enqueue("test_flaky", {"n": 1}, key="test_flaky:1")
+            self.db.session.commit()
+            self.assertEqual(OutboxEvent.query.count(), 1)
+
+        outbox.drain(self.app)
+        with self.app.app_context():
+            ev = OutboxEvent.query.one()
+            self.assertEqual((ev.status, ev.attempts), ("pending", 1))
+            self.assertIn("geçici hata", ev.last_error)
+            ev.next_attempt_at = ev.next_attempt_at - timedelta(minutes=10)
+            self.db.session.commit()
+
+        outbox.drain(self.app)
+        with self.app.app_context():
+            ev = OutboxEvent.query.one()
+            self.assertEqual((ev.status, ev.attempts), ("done", 2))
+        self.assertEqual(len(calls), 2)
+
+    def test_retention_prunes_old_done_events(self):
+        from datetime import datetime
+
+        from models import OutboxEvent
+        from services import outbox
+
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+        self._save_cell(client)
+        outbox.drain(self.app)
+
+        with self.app.app_context():
+            outbox.enqueue("test_unknown", {}, key="test_unknown:1")
+            self.db.session.commit()
+            self.assertEqual(outbox.prune_done(), 0)
+            later = datetime.now() + timedelta(days=outbox.DONE_RETENTION_DAYS + 1)
+            self.assertEqual(outbox.prune_done(later), 1)
+            self.assertEqual([ev.status for ev in OutboxEvent.query.all()], ["pending"])
+
+
+if __name__ == "__main__":
+    unittest.main()
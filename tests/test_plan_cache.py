@@ -0,0 +1,214 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import date, timedelta
+
+
+class PlanWeekCacheTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._db_path = os.path.join(cls._tmpdir.name, "test.db")
+        os.environ["DB_URL"] = f"sqlite:///{cls._db_path}"
+
+        import importlib
+
+        sys.modules.pop("app", None)
+        cls.appmod = importlib.import_module("app")
+        cls.app = cls.appmod.app
+        cls.db = cls.appmod.db
+        try:
+            cls.appmod.db.engine.dispose()
+        except Exception:
+            pass
+        cls.app.config["TESTING"] = True
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            cls.db.session.remove()
+            cls.db.engine.dispose()
+        except Exception:
+            pass
+
+        try:
+            for _ in range(5):
+                try:
+                    cls._tmpdir.cleanup()
+                    break
+                except PermissionError:
+                    time.sleep(0.05)
+        except Exception:
+            pass
+
+    def setUp(self):
+        from services import plan_cache
+
+        plan_cache.clear()
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+            self.appmod.ensure_schema()
+
+            admin = self.appmod.User(
+                username="admin",
+                email="admin@example.com",
+                full_name="Admin",
+                role="admin",
+                is_admin=True,
+                is_active=True,
+            )
+            admin.set_password("pw")
+            self.db.session.add(admin)
+
+            proj = self.appmod.Project(
+                region="Istanbul",
+                project_code="P1",
+                project_name="Proj",
+                responsible="Resp",
+                is_active=True,
+            )
+            self.db.session.add(proj)
+            self.db.session.commit()
+
+            self.admin_id = admin.id
+            self.project_id = proj.id
+
+        self.monday = date.today() - timedelta(days=date.today().weekday())
+
+    def _login_as(self, client, user_id, *, role):
+        with client.session_transaction() as sess:
+            sess["user_id"] = user_id
+            sess["username"] = "x"
+            sess["is_admin"] = (role == "admin")
+            sess["role"] = role
+            sess["_csrf_token"] = "t"
+
+    def test_unchanged_week_returns_304(self):
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+
+        url = f"/plan?week_start={self.monday.isoformat()}"
+        res = client.get(url)
+        self.assertEqual(res.status_code, 200)
+        etag = res.headers.get("ETag")
+        self.assertTrue(etag)
+
+        res = client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 304)
+
+    def test_cell_write_changes_etag_and_content(self):
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+
+        url = f"/plan?week_start={self.monday.isoformat()}"
+        res = client.get(url)
+        etag = res.headers.get("ETag")
+        self.assertNotIn("Cache note", res.get_data(as_text=True))
+
+        res = client.post(
+            "/api/cell",
+            json={"project_id": self.project_id, "work_date": self.monday.isoformat(), "note": "Cache note"},
+            headers={"X-CSRF-Token": "t"},
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.get_json().get("ok"))
+
+        res = client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers.get("ETag"), etag)
+        self.assertIn("Cache note", res.get_data(as_text=True))
+
+    def test_week_delta_returns_only_changed_cells(self):
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+        week = self.monday.isoformat()
+
+        res = client.get(f"/api/plan/week?week_start={week}")
+        data = res.get_json()
+        self.assertTrue(data.get("full"))
+        since = int(data.get("version") or 0)
+
+        for day, note in ((self.monday, "A"), (self.monday + timedelta(days=1), "B")):
+            client.post(
+                "/api/cell",
+                json={"project_id": self.project_id, "work_date": day.isoformat(), "note": note},
+                headers={"X-CSRF-Token": "t"},
+            )
+
+        data = client.get(f"/api/plan/week?week_start={week}&since_version={since}").get_json()
+        self.assertFalse(data.get("full"))
+        self.assertEqual(sorted(c["note"] for c in data["cells"]), ["A", "B"])
+        self.assertGreater(data["version"], since)
+
+        data = client.get(f"/api/plan/week?week_start={week}&since_version={data['version']}").get_json()
+        self.assertEqual(data["cells"], [])
+        self.assertEqual(data["deleted"], [])
+
+    def test_person_delete_reaches_delta_clients(self):
+        with self.app.app_context():
+            boss = self.appmod.User(username="kivanc", email="k@example.com", full_name="K", role="admin", is_admin=True, is_active=True)
+            boss.set_password("pw")
+            person = self.appmod.Person(full_name="Ali")
+            self.db.session.add_all([boss, person])
+            self.db.session.commit()
+            boss_id, person_id = boss.id, person.id
+
+        client = self.app.test_client()
+        self._login_as(client, boss_id, role="admin")
+        week = self.monday.isoformat()
+        res = client.post(
+            "/api/cell",
+            json={"project_id": self.project_id, "work_date": week, "note": "A", "person_ids": [person_id]},
+            headers={"X-CSRF-Token": "t"},
+        )
+        self.assertTrue(res.get_json().get("ok"))
+        since = client.get(f"/api/plan/week?week_start={week}").get_json()["version"]
+
+        res = client.post(f"/people/{person_id}/delete", data={"csrf_token": "t"})
+        self.assertEqual(res.status_code, 302)
+
+        data = client.get(f"/api/plan/week?week_start={week}&since_version={since}").get_json()
+        self.assertFalse(data.get("full"))
+        self.assertEqual([c["note"] for c in data["cells"]], ["A"])
+        with self.app.app_context():
+            self.assertEqual(self.appmod.CellAssignment.query.count(), 0)
+
+    def test_pruned_cursor_gets_full_reload(self):
+        from datetime import datetime
+
+        from services import plan_changes
+
+        client = self.app.test_client()
+        self._login_as(client, self.admin_id, role="admin")
+        week = self.monday.isoformat()
+        since = client.get(f"/api/plan/week?week_start={week}").get_json()["version"]
+        for day, note in ((self.monday, "A"), (self.monday + timedelta(days=1), "B")):
+            client.post(
+                "/api/cell",
+                json={"project_id": self.project_id, "work_date": day.isoformat(), "note": note},
+                headers={"X-CSRF-Token": "t"},
+            )
+        version = client.get(f"/api/plan/week?week_start={week}").get_json()["version"]
+
+        with self.app.app_context():
+            self.assertEqual(plan_changes.prune(), 0)
+            later = datetime.now() + timedelta(days=plan_changes.PLAN_CHANGE_RETENTION_DAYS + 1)
+            self.assertGreater(plan_changes.prune(later), 0)
+            # En son kayıt kalır; sürüm geriye gitmez
+            self.assertEqual(plan_changes.current_version(), version)
+
+        data = client.get(f"/api/plan/week?week_start={week}&since_version={since}").get_json()
+        self.assertTrue(data["full"])
+        self.assertEqual(sorted(c["note"] for c in data["cells"]), ["A", "B"])
+        self.assertEqual(data["version"], version)
+
+        data = client.get(f"/api/plan/week?week_start={week}&since_version={version}").get_json()
+        self.assertFalse(data["full"])
+        self.assertEqual(data["cells"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+
+class PlanMailBatchTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._db_path = os.path.join(cls._tmpdir.name, "test.db")
+        os.environ["DB_URL"] = f"sqlite:///{cls._db_path}"
+
+        import importlib
+
+        sys.modules.pop("app", None)
+        cls.appmod = importlib.import_module("app")
+        cls.app = cls.appmod.app
+        cls.db = cls.appmod.db
+        try:
+            cls.appmod.db.engine.dispose()
+        except Exception:
+            pass
+        cls.app.config["TESTING"] = True
+        cls.app.instance_path = cls._tmpdir.name
+        cls.upload_dir = os.path.join(cls._tmpdir.name, "uploads")
+        os.makedirs(cls.upload_dir, exist_ok=True)
+        cls.app.config["UPLOAD_FOLDER"] = cls.upload_dir
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            cls.db.session.remove()
+            cls.db.engine.dispose()
+        except Exception:
+            pass
+
+        try:
+            for _ in range(5):
+                try:
+                    cls._tmpdir.cleanup()
+                    break
+                except PermissionError:
+                    time.sleep(0.05)
+        except Exception:
+            pass
+
+    def setUp(self):
+        for name, body in (("lld.pdf", b"lld" * 1000), ("tutanak.pdf", b"tt" * 1000)):
+            with open(os.path.join(self.upload_dir, name), "wb") as f:
+                f.write(body)
+
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+            self.appmod.ensure_schema()
+
+            admin = self.appmod.User(username="admin", email="admin@example.com", full_name="Admin", role="admin", is_admin=True, is_active=True)
+            admin.set_password("pw")
+            self.db.session.add(admin)
+            proj = self.appmod.Project(region="Istanbul", project_code="P1", project_name="Proj", responsible="Resp", is_active=True)
+            self.db.session.add(proj)
+            people = [self.appmod.Person(full_name=f"Kisi {i}", email=f"k{i}@example.com", durum="Aktif") for i in range(6)]
+            people.append(self.appmod.Person(full_name="Epostasiz", durum="Aktif"))
+            self.db.session.add_all(people)
+            self.db.session.flush()
+
+            self.monday = date.today() - timedelta(days=date.today().weekday())
+            c1 = self.appmod.PlanCell(project_id=proj.id, work_date=self.monday, team_name="Ekip A", note="Kurulum <1>", lld_hhd_files=json.dumps(["lld.pdf"]))
+            c2 = self.appmod.PlanCell(project_id=proj.id, work_date=self.monday + timedelta(days=1), team_name="Ekip B", tutanak_files=json.dumps(["tutanak.pdf"]))
+            self.db.session.add_all([c1, c2])
+            self.db.session.flush()
+            for p in people:
+                self.db.session.add(self.appmod.CellAssignment(cell_id=c1.id, person_id=p.id))
+            for p in people[:2]:
+                self.db.session.add(self.appmod.CellAssignment(cell_id=c2.id, person_id=p.id))
+            self.db.session.commit()
+            self.admin_id = admin.id
+
+    def _client(self):
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = self.admin_id
+            sess["role"] = "admin"
+            sess["is_admin"] = True
+            sess["_csrf_token"] = "t"
+        return client
+
+    def _queue(self):
+        with self.app.app_context():
+            return {
+                json.loads(q.recipients)[0]: (q.html_content, json.loads(q.meta_json))
+                for q in self.appmod.MailQueue.query.all()
+            }
+
+    def test_weekly_mails_are_composed_once_and_bulk_enqueued(self):
+        from sqlalchemy import event
+
+        from services import blob_store
+
+        client = self._client()
+        client.get("/")  # ilk istek varsayılan verileri oluşturur
+
+        inserts = []
+
+        def _count(conn, cursor, statement, params, context, executemany):
+            if statement.lstrip().upper().startswith("INSERT INTO MAIL_QUEUE"):
+                inserts.append(executemany)
+
+        with self.app.app_context():
+            engine = self.db.engine
+        event.listen(engine, "before_cursor_execute", _count)
+        try:
+            with mock.patch.object(blob_store, "put_file", wraps=blob_store.put_file) as put_file:
+                res = client.post("/api/send_weekly_emails", json={"week_start": self.monday.isoformat()}, headers={"X-CSRF-Token": "t"})
+        finally:
+            event.remove(engine, "before_cursor_execute", _count)
+
+        self.assertEqual(res.status_code, 200)
+        body = res.get_json()
+        self.assertEqual((body["sent"], body["errors"]), (6, []))
+        self.assertEqual(body["skipped"], 1)
+        self.assertEqual(inserts, [True])
+        self.assertEqual(put_file.call_count, 2)
+
+        queue = self._queue()
+        self.assertEqual(len(queue), 6)
+        html0, meta0 = queue["k0@example.com"]
+        self.assertIn("Merhaba Kisi 0,", html0)
+        self.assertIn("Kurulum &lt;1&gt;", html0)
+        self.assertEqual(html0.count("<td>Istanbul</td>"), 2)
+        self.assertEqual(meta0["attachments"], ["lld.pdf", "tutanak.pdf"])
+        html5, meta5 = queue["k5@example.com"]
+        self.assertEqual(html5.count("<td>Istanbul</td>"), 1)
+        self.assertEqual([a["filename"] for a in meta5["_attachments"]], ["lld.pdf"])
+
+        with self.app.app_context():
+            refs = {b.size: b.ref_count for b in self.appmod.MailBlob.query.all()}
+        self.assertEqual(refs, {3000: 6, 2000: 2})
+
+    def test_team_mails_only_include_team_cells(self):
+        client = self._client()
+        res = client.post(
+            "/api/send_team_emails",
+            json={"week_start": self.monday.isoformat(), "team_name": "Ekip B"},
+            headers={"X-CSRF-Token": "t"},
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()["sent"], 2)
+
+        queue = self._queue()
+        self.assertEqual(sorted(queue), ["k0@example.com", "k1@example.com"])
+        html0, meta0 = queue["k0@example.com"]
+        self.assertIn("Ekip Plani: Ekip B", html0)
+        self.assertNotIn("Kurulum", html0)
+        self.assertEqual(meta0["attachments"], ["tutanak.pdf"])
+        self.assertEqual(meta0["_team_name"], "Ekip B")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+
+class PlanRoomTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._db_path = os.path.join(cls._tmpdir.name, "test.db")
+        os.environ["DB_URL"] = f"sqlite:///{cls._db_path}"
+
+        import importlib
+
+        sys.modules.pop("app", None)
+        cls.appmod = importlib.import_module("app")
+        cls.app = cls.appmod.app
+        cls.db = cls.appmod.db
+        try:
+            cls.appmod.db.engine.dispose()
+        except Exception:
+            pass
+        cls.app.config["TESTING"] = True
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            cls.db.session.remove()
+            cls.db.engine.dispose()
+        except Exception:
+            pass
+
+        try:
+            for _ in range(5):
+                try:
+                    cls._tmpdir.cleanup()
+                    break
+                except PermissionError:
+                    time.sleep(0.05)
+        except Exception:
+            pass
+
+    def setUp(self):
+        from services import plan_rooms
+
+        self.coalescer = plan_rooms.get_coalescer()
+        # Arka plan zamanlayıcısı testte araya girmesin; pencere elle kapatılır
+        self._window = self.coalescer.window
+        self.coalescer.window = 60
+        self.coalescer.flush_all()
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+            self.appmod.ensure_schema()
+            u = self.appmod.User(username="planner", email="planner@example.com", full_name="Planner", role="planner", is_active=True)
+            u.set_password("pw")
+            self.db.session.add(u)
+            self.db.session.commit()
+            self.user_id = u.id
+
+    def tearDown(self):
+        self.coalescer.window = self._window
+
+    def _socket(self, week_start=None):
+        from extensions import socketio
+
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = self.user_id
+            sess["role"] = "planner"
+        sio = socketio.test_client(self.app, flask_test_client=client)
+        sio.emit("join_plan_updates")
+        if week_start:
+            sio.emit("join_plan_week", {"week_start": week_start})
+        sio.get_received()
+        return sio
+
+    def test_cell_deltas_are_coalesced_per_week_room(self):
+        from services import plan_rooms
+
+        week1 = self._socket("2026-03-04")  # çarşamba -> 2026-03-02 haftası
+        week2 = self._socket("2026-03-09")
+        other_page = self._socket()
+
+        plan_rooms.publish_cells([
+            {"cell_id": 1, "project_id": 5, "work_date": "2026-03-02", "note": "a"},
+            {"cell_id": 2, "project_id": 5, "work_date": "2026-03-03", "note": "b"},
+        ])
+        plan_rooms.publish_cells([{"cell_id": 1, "project_id": 5, "work_date": "2026-03-02", "note": "c"}])
+        plan_rooms.emit_to_weeks("cell_locked", {"project_id": 5, "work_date": "2026-03-10"}, "2026-03-10")
+        plan_rooms.flush_all()
+
+        got = [(m["name"], m["args"][0]) for m in week1.get_received()]
+        self.assertEqual(len(got), 1)
+        name, payload = got[0]
+        self.assertEqual(name, "cells_updated")
+        self.assertEqual(payload["week_start"], "2026-03-02")
+        self.assertEqual([(c["cell_id"], c["note"]) for c in payload["cells"]], [(2, "b"), (1, "c")])
+
+        self.assertEqual([m["name"] for m in week2.get_received()], ["cell_locked"])
+        self.assertEqual(other_page.get_received(), [])
+
+        # Tüm haftaları etkileyen yenileme yalnızca plan izleyicilerine gider
+        plan_rooms.publish_cells([{"cell_id": 3, "project_id": 5, "work_date": "2026-03-09"}])
+        plan_rooms.refresh()
+        plan_rooms.refresh("2026-03-11")
+        plan_rooms.flush_all()
+        self.assertEqual([m["name"] for m in week1.get_received()], ["update_table"])
+        self.assertEqual([m["name"] for m in week2.get_received()], ["update_table", "update_table"])
+        self.assertEqual(other_page.get_received(), [])
+
+        # Hafta değiştiren istemci eski odadan çıkar
+        week1.emit("join_plan_week", {"week_start": "2026-03-09"})
+        plan_rooms.publish_cells([{"cell_id": 1, "project_id": 5, "work_date": "2026-03-02"}])
+        plan_rooms.flush_all()
+        self.assertEqual(week1.get_received(), [])
+
+        for sio in (week1, week2, other_page):
+            sio.disconnect()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+
+
+class PresenceTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        cls._db_path = os.path.join(cls._tmpdir.name, "test.db")
+        os.environ["DB_URL"] = f"sqlite:///{cls._db_path}"
+
+        import importlib
+
+        sys.modules.pop("app", None)
+        cls.appmod = importlib.import_module("app")
+        cls.app = cls.appmod.app
+        cls.db = cls.appmod.db
+        try:
+            cls.appmod.db.engine.dispose()
+        except Exception:
+            pass
+        cls.app.config["TESTING"] = True
+
+    @classmethod
+    def tearDownClass(cls):
+        try:
+            cls.db.session.remove()
+            cls.db.engine.dispose()
+        except Exception:
+            pass
+
+        try:
+            for _ in range(5):
+                try:
+                    cls._tmpdir.cleanup()
+                    break
+                except PermissionError:
+                    time.sleep(0.05)
+        except Exception:
+            pass
+
+    def setUp(self):
+        from services import presence
+
+        self.presence = presence
+        presence.get_registry().clear()
+        with self.app.app_context():
+            self.db.drop_all()
+            self.db.create_all()
+            self.appmod.ensure_schema()
+            ids = []
+            for name in ("alice", "bob"):
+                u = self.appmod.User(username=name, email=f"{name}@example.com", full_name=name.title(), role="planner", is_active=True)
+                u.set_password("pw")
+                self.db.session.add(u)
+                self.db.session.commit()
+                ids.append(u.id)
+            self.alice_id, self.bob_id = ids
+
+    def tearDown(self):
+        self.presence.get_registry().clear()
+
+    def _client(self, uid):
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = uid
+            sess["role"] = "planner"
+            sess["_csrf_token"] = "t"
+        return client
+
+    def _count_writes(self):
+        from sqlalchemy import event
+
+        writes = []
+
+        def _on_exec(conn, cursor, statement, params, context, executemany):
+            if statement.lstrip().upper().startswith(("UPDATE USER", 'UPDATE "USER"')):
+                writes.append(statement)
+
+        with self.app.app_context():
+            engine = self.db.engine
+        event.listen(engine, "before_cursor_execute", _on_exec)
+        self.addCleanup(event.remove, engine, "before_cursor_execute", _on_exec)
+        return writes
+
+    def test_activity_is_kept_in_memory_and_flushed_in_one_update(self):
+        writes = self._count_writes()
+        alice = self._client(self.alice_id)
+        bob = self._client(self.bob_id)
+
+        self.assertEqual(alice.post("/api/heartbeat", headers={"X-CSRF-Token": "t"}).status_code, 200)
+        self.assertEqual(bob.post("/api/heartbeat", headers={"X-CSRF-Token": "t"}).status_code, 200)
+        self.assertEqual(alice.post("/api/heartbeat", headers={"X-CSRF-Token": "t"}).status_code, 200)
+        self.assertEqual(writes, [])
+
+        res = alice.get("/api/online_users?only_online=1")
+        self.assertEqual(res.status_code, 200)
+        data = res.get_json()
+        self.assertEqual(sorted(it["id"] for it in data["items"]), sorted([self.alice_id, self.bob_id]))
+
+        res = alice.get("/api/chat/users?only_online=1")
+        self.assertEqual([it["id"] for it in res.get_json()["items"]], [self.bob_id])
+
+        with self.app.app_context():
+            self.assertIsNone(self.db.session.get(self.appmod.User, self.bob_id).last_seen)
+            self.assertEqual(self.presence.flush(), 2)
+            self.assertEqual(self.presence.flush(), 0)
+            self.db.session.expire_all()
+            bob_row = self.db.session.get(self.appmod.User, self.bob_id)
+            self.assertIsNotNone(bob_row.last_seen)
+            self.assertIsNotNone(bob_row.online_since)
+        self.assertEqual(len(writes), 1)
+
+    def test_flush_skips_deleted_users(self):
+        now = datetime.now()
+        self.presence.touch(self.alice_id, now)
+        self.presence.touch(self.bob_id, now)
+        with self.app.app_context():
+            self.db.session.delete(self.db.session.get(self.appmod.User, self.bob_id))
+            self.db.session.commit()
+            self.assertEqual(self.presence.flush(), 2)
+            self.assertEqual(self.presence.flush(), 0)
+            self.db.session.expire_all()
+            self.assertIsNotNone(self.db.session.get(self.appmod.User, self.alice_id).last_seen)
+
+    def test_transitions_emit_presence_changed(self):
+        from extensions import socketio
+
+        watcher = socketio.test_client(self.app, flask_test_client=self._client(self.alice_id))
+        watcher.get_received()
+
+        now = datetime.now()
+        self.assertTrue(self.presence.touch(self.bob_id, now))
+        self.assertFalse(self.presence.touch(self.bob_id, now + timedelta(seconds=20)))
+        events = [m["args"][0] for m in watcher.get_received() if m["name"] == "presence_changed"]
+        self.assertEqual([(e["user_id"], e["is_online"]) for e in events], [(self.bob_id, True)])
+
+        later = now + self.presence.ONLINE_WINDOW + timedelta(minutes=1)
+        self.presence.sweep(later)
+        self.assertNotIn(self.bob_id, self.presence.get_registry().online_ids(later))
+        events = [m["args"][0] for m in watcher.get_received() if m["name"] == "presence_changed"]
+        self.assertIn((self.bob_id, False), [(e["user_id"], e["is_online"]) for e in events])
+
+        # Yeniden etkinlikte online_since sıfırlanır
+        self.assertTrue(self.presence.touch(self.bob_id, later))
+        self.assertEqual(self.presence.get_registry().get(self.bob_id)[1], later)
+        watcher.disconnect()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+
+class SettingsCacheTests(unittest.TestCase):
+    def setUp(self):
+        from services import settings_cache
+
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__, instance_path=self._tmpdir.name)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        settings_cache.invalidate()
+        self.env = mock.patch.dict(os.environ, {"ARVENTO_ENCRYPTION_KEY": ""})
+        self.env.start()
+
+    def tearDown(self):
+        from services import settings_cache
+
+        self.env.stop()
+        settings_cache.invalidate()
+        self.ctx.pop()
+        self._tmpdir.cleanup()
+
+    def test_mail_settings_are_read_once_until_file_changes(self):
+        import utils
+
+        utils.save_mail_settings({"host": "smtp.a.com", "port": 25})
+        with mock.patch.object(utils, "_read_mail_settings_file", wraps=utils._read_mail_settings_file) as read:
+            for _ in range(5):
+                self.assertEqual(utils.load_mail_settings()["host"], "smtp.a.com")
+            self.assertEqual(read.call_count, 1)
+
+            # Dönen sözlüğü değiştirmek önbelleği bozmaz
+            utils._load_mail_settings_file()["host"] = "x"
+            self.assertEqual(utils.load_mail_settings()["host"], "smtp.a.com")
+
+            # Kaydetme önbelleği düşürür
+            utils.save_mail_settings({"host": "smtp.b.com", "port": 25})
+            self.assertEqual(utils.load_mail_settings()["host"], "smtp.b.com")
+            self.assertEqual(read.call_count, 2)
+
+            # Uygulama dışından (başka süreç) yazılan dosya stat değişince fark edilir
+            path = os.path.join(self._tmpdir.name, "mail_settings.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"host": "smtp.other-process.com"}, f)
+            self.assertEqual(utils.load_mail_settings()["host"], "smtp.other-process.com")
+            self.assertEqual(read.call_count, 3)
+
+    def test_arvento_credentials_are_decrypted_once_per_save(self):
+        from services import arvento_service
+
+        arvento_service.save_arvento_settings("kullanici", "1111", "2222")
+        with mock.patch.object(arvento_service, "decrypt_value", wraps=arvento_service.decrypt_value) as dec:
+            for _ in range(4):
+                self.assertEqual(arvento_service.get_decrypted_credentials()["pin1"], "1111")
+            self.assertEqual(dec.call_count, 3)
+
+            arvento_service.save_arvento_settings("kullanici", "3333", "2222")
+            self.assertEqual(arvento_service.get_decrypted_credentials()["pin1"], "3333")
+            self.assertEqual(dec.call_count, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import time
+import unittest
+from datetime import date
+
+
+class _SharedLocalState:
+    """Paylaşılan depo gibi davranan süreç içi depo (başka işçilerin yazdıklarını taklit etmek için)."""
+
+    def __init__(self):
+        from services.shared_state import LocalState
+
+        self.inner = LocalState()
+        self.shared = True
+        self.url = "redis://stand-in"
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+class SharedStateTests(unittest.TestCase):
+    def setUp(self):
+        from services import plan_cache, shared_state
+
+        self.shared_state = shared_state
+        self.plan_cache = plan_cache
+        self._orig = shared_state.get_state()
+        plan_cache.clear()
+
+    def tearDown(self):
+        self.shared_state.set_state(self._orig)
+        self.plan_cache.clear()
+        self.plan_cache._shared_epoch = None
+
+    def test_local_state_semantics(self):
+        from services.shared_state import LocalState
+
+        st = LocalState()
+        self.assertTrue(st.add("k", 1, ttl=60))
+        self.assertFalse(st.add("k", 2))
+        self.assertEqual(st.get("k"), 1)
+        self.assertEqual(st.incr("n"), 1)
+        self.assertEqual(st.incr("n", 4), 5)
+
+        st.set("gone", "x", ttl=0.001)
+        time.sleep(0.01)
+        self.assertIsNone(st.get("gone"))
+
+        self.assertTrue(st.acquire_lock("job", "a", 60))
+        self.assertTrue(st.acquire_lock("job", "a", 60))  # sahibi uzatabilir
+        self.assertFalse(st.acquire_lock("job", "b", 60))
+        self.assertFalse(st.release_lock("job", "b"))
+        self.assertTrue(st.release_lock("job", "a"))
+        self.assertTrue(st.acquire_lock("job", "b", 60))
+
+        self.assertEqual([st.rate_hit("ip", 2, 10, now=100 + i) for i in range(3)], [True, True, False])
+        self.assertTrue(st.rate_hit("ip", 2, 10, now=111))
+
+    def test_rate_limit_and_geocode_use_store(self):
+        import utils
+
+        st = _SharedLocalState()
+        self.shared_state.set_state(st)
+        self.assertEqual([utils._rate_limit("login:ip:x", limit=2, window_seconds=60) for _ in range(3)], [True, True, False])
+        # Başka bir işçinin kaydettiği sonuç HTTP isteği yapılmadan kullanılır
+        st.set("geocode:ankara", [39.9, 32.8])
+        self.assertEqual(utils.geocode_city("Ankara "), (39.9, 32.8))
+
+    def test_message_queue_follows_shared_url(self):
+        import os
+        from unittest import mock
+
+        from services.shared_state import LocalState
+
+        self.shared_state.set_state(_SharedLocalState())
+        with mock.patch.dict(os.environ, {"SOCKETIO_MESSAGE_QUEUE": ""}):
+            self.assertEqual(self.shared_state.message_queue_url(), "redis://stand-in")
+        with mock.patch.dict(os.environ, {"SOCKETIO_MESSAGE_QUEUE": "off"}):
+            self.assertIsNone(self.shared_state.message_queue_url())
+        # Redis adresi verilmiş ama depo süreç içine düşmüşse kuyruk da kullanılmaz
+        self.shared_state.set_state(LocalState())
+        with mock.patch.dict(os.environ, {"SHARED_STATE_URL": "redis://q:6379/0", "SOCKETIO_MESSAGE_QUEUE": "redis://q"}):
+            self.assertIsNone(self.shared_state.message_queue_url())
+
+    def test_several_workers_require_shared_store(self):
+        import os
+        from unittest import mock
+
+        from services.shared_state import LocalState
+
+        self.shared_state.set_state(LocalState())
+        with mock.patch.dict(os.environ, {"GUNICORN_WORKERS": "1", "WEB_CONCURRENCY": ""}):
+            self.shared_state.require_shared_for_workers()
+        with mock.patch.dict(os.environ, {"GUNICORN_WORKERS": "", "WEB_CONCURRENCY": "4"}):
+            with self.assertRaises(RuntimeError):
+                self.shared_state.require_shared_for_workers()
+        self.shared_state.set_state(_SharedLocalState())
+        with mock.patch.dict(os.environ, {"GUNICORN_WORKERS": "4"}):
+            self.shared_state.require_shared_for_workers()
+
+    def test_singleton_pauses_when_lease_is_lost(self):
+        st = _SharedLocalState()
+        self.shared_state.set_state(st)
+        self.assertTrue(self.shared_state.hold_singleton(None, "test_lease", lease=0.3))
+        self.assertTrue(self.shared_state.singleton_held("test_lease"))
+
+        # Kiralama başka bir sürece geçti (ör. bağlantı kesintisi sırasında süresi doldu)
+        st.inner.set("lock:singleton:test_lease", "other-host:1", ttl=0.5)
+        time.sleep(0.25)
+        self.assertFalse(self.shared_state.singleton_held("test_lease"))
+
+        st.inner.delete("lock:singleton:test_lease")
+        time.sleep(0.25)
+        self.assertTrue(self.shared_state.singleton_held("test_lease"))
+
+    def test_signal_reaches_other_worker(self):
+        import threading
+
+        self.shared_state.set_state(_SharedLocalState())
+        woke = threading.Event()
+        self.shared_state.relay_signals("test_wake", woke.set, timeout=0.1)
+        self.shared_state.signal("test_wake")
+        self.assertTrue(woke.wait(2))
+
+    def test_presence_is_shared_between_workers(self):
+        from datetime import datetime, timedelta
+        from unittest import mock
+
+        from services import presence
+
+        st = _SharedLocalState()
+        self.shared_state.set_state(st)
+        presence.get_registry().clear()
+        self.addCleanup(presence.get_registry().clear)
+        now = datetime(2026, 3, 2, 9, 0)
+        emitted = []
+
+        with mock.patch.object(presence, "_emit_changed", lambda uid, online, since=None: emitted.append((uid, online))):
+            # Kullanıcı başka bir işçide zaten çevrimiçi: bu işçi çevrimiçi olayını yinelemez
+            st.set("presence:41", [now.isoformat(), now.replace(hour=8).isoformat()])
+            self.assertFalse(presence.touch(41, now))
+            self.assertEqual(presence.get_registry().get(41)[1], now.replace(hour=8))
+
+            self.assertTrue(presence.touch(42, now))
+            self.assertEqual(st.get("presence:42")[0], now.isoformat())
+
+            # 42 bu işçide sessiz ama diğerinde etkin: yalnızca 41 çevrimdışı ilan edilir
+            later = now + presence.ONLINE_WINDOW + timedelta(minutes=1)
+            st.set("presence:42", [later.isoformat(), now.isoformat()])
+            st.delete("presence:41")
+            self.assertEqual(presence.sweep(later), 1)
+        self.assertEqual(emitted, [(42, True), (41, False)])
+
+    def test_plan_cache_versions_are_shared_between_workers(self):
+        st = _SharedLocalState()
+        self.shared_state.set_state(st)
+        builds = []
+
+        def builder(ws):
+            builds.append(ws)
+            return {"n": len(builds)}
+
+        d = date(2026, 3, 4)
+        self.assertEqual(self.plan_cache.get_week_view(d, builder), {"n": 1})
+        self.assertEqual(self.plan_cache.get_week_view(d, builder), {"n": 1})
+        etag = self.plan_cache.etag_for_week(d)
+
+        # Başka bir işçi aynı haftaya yazdı
+        st.incr("plan_cache:week:2026-03-02")
+        self.assertEqual(self.plan_cache.week_version(d), 1)
+        self.assertEqual(self.plan_cache.get_week_view(d, builder), {"n": 2})
+        self.assertNotEqual(self.plan_cache.etag_for_week(d), etag)
+
+        self.plan_cache.invalidate_catalog()
+        self.assertEqual(st.get("plan_cache:catalog"), 1)
+        self.assertEqual(self.plan_cache.get_week_view(d, builder), {"n": 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import json
+import smtplib
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from mail_harness import CFG, FakeSMTP, MailQueueTestCase
+
+
+class SmtpPoolTests(MailQueueTestCase):
+    def test_queue_drains_over_one_authenticated_session(self):
+        from services.mail_service import MailService
+
+        with self.app.app_context():
+            MailService.send(mail_type="weekly", recipients=["a@example.com", "b@example.com"], subject="Plan", html="<p>1</p>", cfg_override=CFG)
+            MailService.send(mail_type="weekly", recipients="c@example.com", subject="Plan", html="<p>2</p>", cfg_override=CFG)
+            MailService.send(mail_type="team", recipients="d@example.com", subject="Ekip", html="<p>3</p>", cfg_override=CFG)
+
+        MailService.process_queue(self.app)
+
+        self.assertEqual(len(FakeSMTP.instances), 1)
+        server = FakeSMTP.instances[0]
+        self.assertEqual(server.logins, 1)
+        self.assertTrue(server.tls)
+        self.assertEqual([to for _f, to, _m in server.sent], [["a@example.com"], ["b@example.com"], ["c@example.com"], ["d@example.com"]])
+        # Her mesajın To başlığı yalnızca kendi alıcısı
+        self.assertTrue(server.sent[1][2].startswith("To: b@example.com\n"))
+        self.assertNotIn("a@example.com", server.sent[1][2])
+
+        with self.app.app_context():
+            statuses = {q.status for q in self.appmod.MailQueue.query.all()}
+        self.assertEqual(statuses, {"sent"})
+
+    def test_refused_recipients_are_not_counted_as_delivered(self):
+        import utils
+
+        cfg = dict(CFG, recipients_per_message=3)
+        FakeSMTP.refuse = {"b@example.com": (450, b"mailbox busy")}
+        delivered = []
+        with self.app.app_context():
+            with self.assertRaises(utils.MailSendError) as ctx:
+                utils.send_email_smtp(["a@example.com", "b@example.com", "c@example.com"], "Plan", "<p>x</p>",
+                                      cfg_override=cfg, delivered=delivered)
+        self.assertEqual(ctx.exception.code, "recipient_deferred")
+        self.assertEqual(ctx.exception.recipient, "b@example.com")
+        self.assertEqual(delivered, ["a@example.com", "c@example.com"])
+        self.assertTrue(FakeSMTP.instances[0].sent[0][2].startswith("To: undisclosed-recipients:;\n"))
+
+        # Yeniden denemede yalnızca reddedilen alıcıya gider; 5xx kalıcı hatadır
+        FakeSMTP.refuse = {"b@example.com": (550, b"no such user")}
+        with self.app.app_context():
+            with self.assertRaises(utils.MailSendError) as ctx:
+                utils.send_email_smtp(["a@example.com", "b@example.com", "c@example.com"], "Plan", "<p>x</p>",
+                                      cfg_override=cfg, delivered=delivered)
+        self.assertEqual(ctx.exception.code, "recipient_refused")
+        self.assertEqual(len(FakeSMTP.instances[0].sent), 1)
+
+    def test_partially_refused_queue_item_retries_only_refused(self):
+        from services.mail_service import MailService
+
+        FakeSMTP.refuse = {"b@example.com": (451, b"try later")}
+        with self.app.app_context():
+            MailService.send(mail_type="weekly", recipients=["a@example.com", "b@example.com"], subject="Plan", html="<p>x</p>", cfg_override=CFG)
+        MailService.process_queue(self.app)
+        with self.app.app_context():
+            item = self.appmod.MailQueue.query.one()
+            self.assertEqual((item.status, item.retry_count), ("pending", 1))
+            self.assertEqual(json.loads(item.meta_json)["_delivered"], ["a@example.com"])
+            item.next_attempt_at = datetime.now() - timedelta(seconds=1)
+            self.db.session.commit()
+
+        FakeSMTP.refuse = {}
+        MailService.process_queue(self.app)
+        self.assertEqual(self._sent_to(), [["a@example.com"], ["b@example.com"]])
+        with self.app.app_context():
+            self.assertEqual(self.appmod.MailQueue.query.one().status, "sent")
+
+    def test_rate_limit_defers_item_and_resumes_without_resending(self):
+        from services import mail_rate
+        from services.mail_service import MailService
+
+        cfg = dict(CFG, rate_per_minute=60, rate_burst=2)
+        rcpts = [f"p{i}@example.com" for i in range(5)]
+        with self.app.app_context():
+            MailService.send(mail_type="weekly", recipients=rcpts, subject="Plan", html="<p>x</p>", cfg_override=cfg)
+
+        before = datetime.now()
+        MailService.process_queue(self.app)
+        self.assertEqual(self._sent_to(), [[r] for r in rcpts[:2]])
+        with self.app.app_context():
+            item = self.appmod.MailQueue.query.one()
+            self.assertEqual(item.status, "pending")
+            self.assertEqual(item.retry_count, 0)
+            self.assertGreater(item.next_attempt_at, before)
+            self.assertEqual(json.loads(item.meta_json)["_delivered"], rcpts[:2])
+
+            # Henüz zamanı gelmedi: işlenmez
+            MailService.process_queue(self.app)
+            self.assertEqual(len(self._sent_to()), 2)
+
+            item.next_attempt_at = datetime.now() - timedelta(seconds=1)
+            self.db.session.commit()
+
+        mail_rate.reset()
+        MailService.process_queue(self.app)
+        self.assertEqual(self._sent_to(), [[r] for r in rcpts[:4]])
+
+        mail_rate.reset()
+        with self.app.app_context():
+            item = self.appmod.MailQueue.query.one()
+            item.next_attempt_at = None
+            self.db.session.commit()
+        MailService.process_queue(self.app)
+        self.assertEqual(self._sent_to(), [[r] for r in rcpts])
+        with self.app.app_context():
+            item = self.appmod.MailQueue.query.one()
+            self.assertEqual(item.status, "sent")
+            self.assertNotIn("_delivered", json.loads(item.meta_json))
+
+    def test_transient_failure_is_rescheduled_with_backoff(self):
+        from services.mail_service import MailService
+
+        with self.app.app_context():
+            MailService.send(mail_type="weekly", recipients="a@example.com", subject="Plan", html="<p>x</p>", cfg_override=CFG)
+
+        FakeSMTP.fail_next = 1
+        started = time.monotonic()
+        MailService.process_queue(self.app)
+        self.assertLess(time.monotonic() - started, 2)  # işçi içinde uyumaz
+        with self.app.app_context():
+            item = self.appmod.MailQueue.query.one()
+            self.assertEqual(item.status, "pending")
+            self.assertEqual(item.retry_count, 1)
+            self.assertGreater(item.next_attempt_at, datetime.now() + timedelta(seconds=20))
+            item.next_attempt_at = datetime.now() - timedelta(seconds=1)
+            self.db.session.commit()
+
+        MailService.process_queue(self.app)
+        with self.app.app_context():
+            self.assertEqual(self.appmod.MailQueue.query.one().status, "sent")
+        self.assertEqual(self._sent_to(), [["a@example.com"]])
+
+    def test_dead_idle_session_is_replaced(self):
+        from services import smtp_pool
+
+        pool = smtp_pool.SmtpPool()
+        key = smtp_pool.PoolKey("smtp.example.com", 587, "u", True, False)
+
+        with pool.session(key, "pw") as s:
+            s.sendmail("u@example.com", ["x@example.com"], "To: x@example.com\n\nhi")
+        with pool.session(key, "pw") as s:
+            self.assertIs(s.server, FakeSMTP.instances[0])
+
+        # Sunucu boştaki bağlantıyı düşürdü: NOOP başarısız -> yeni bağlantı
+        FakeSMTP.instances[0].alive = False
+        with pool.session(key, "pw") as s:
+            self.assertIs(s.server, FakeSMTP.instances[1])
+        self.assertEqual(pool.stats()["connects"], 2)
+
+        # Gönderim sırasında kopan oturum havuza geri dönmez
+        with self.assertRaises(smtplib.SMTPServerDisconnected):
+            with pool.session(key, "pw") as s:
+                s.server.alive = False
+                s.sendmail("u@example.com", ["x@example.com"], "x")
+        self.assertEqual(pool.stats()["idle"], 0)
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,6 +24,7 @@ from email import encoders
 # from jinja2 import Environment, BaseLoader, select_autoescape, StrictUndefined  # Removed unused import
 from extensions import db, socketio
 from models import *
+from services import plan_changes, assignment_reconcile, presence, shared_state
 from sqlalchemy import or_, and_, desc, func, text as _sql_text, insert
 from sqlalchemy.exc import IntegrityError
 
@@ -223,13 +224,17 @@ def format_date_range(start_date: date, end_date: date) -> str:
     return f"{start_date.strftime('%d.%m.%Y')}-{end_date.strftime('%d.%m.%Y')}"
 
 
-def ensure_cell(project_id: int, work_date: date) -> PlanCell:
+def ensure_cell(project_id: int, work_date: date, commit: bool = True) -> PlanCell:
+    """Hücreyi bul ya da oluştur. commit=False ise yalnızca flush eder (çağıranın transaction'ı)."""
     cell = PlanCell.query.filter_by(project_id=project_id, work_date=work_date).first()
     if cell:
         return cell
     cell = PlanCell(project_id=project_id, work_date=work_date)
     db.session.add(cell)
-    db.session.commit()
+    if commit:
+        db.session.commit()
+    else:
+        db.session.flush()
     return cell
 
 
@@ -249,6 +254,7 @@ def ensure_team_for_people(person_ids: List[int]) -> Optional[Team]:
     next_no = (db.session.query(db.func.count(Team.id)).scalar() or 0) + 1
     t = Team(name=f"Ekip {next_no}", signature=sig)
     db.session.add(t)
+    db.session.flush()  # cell.team_id = t.id için id gerekli
     return t
 
 
@@ -350,17 +356,17 @@ def get_team_members_names(team_id: int) -> List[str]:
 
 
 def set_assignments_and_team(cell: PlanCell, person_ids: List[int], preferred_vehicle_info: Optional[str] = None):
-    # Eski personelleri al
-    old_person_ids = {a.person_id for a in CellAssignment.query.filter_by(cell_id=cell.id).all()}
-    
-    CellAssignment.query.filter_by(cell_id=cell.id).delete()
+    # Yalnızca eklenen/çıkarılan personel satırları yazılır (küme farkı)
     ids = sorted({int(x) for x in person_ids})
-    for pid in ids:
-        db.session.add(CellAssignment(cell_id=cell.id, person_id=pid))
-    
+    diff = assignment_reconcile.reconcile(CellAssignment, "cell_id", {cell.id: ids})
+    if diff.changed:
+        # Toplu yazım ORM'i atladığı için: ilişki önbelleği ve plan değişiklik günlüğü
+        db.session.expire(cell, ["assignments"])
+        plan_changes.record_cells([cell])
+
     # PersonDayStatus güncelle
     # Çıkarılan personeller için, eğer başka işte değillerse 'available' yap
-    removed_ids = old_person_ids - set(ids)
+    removed_ids = diff.removed.get(cell.id, set())
     for pid in removed_ids:
         # Bu personelin başka işleri var mı kontrol et
         other_assignments = CellAssignment.query.join(PlanCell, PlanCell.id == CellAssignment.cell_id)\
@@ -372,7 +378,7 @@ def set_assignments_and_team(cell: PlanCell, person_ids: List[int], preferred_ve
                 status_rec.status = 'available'
     
     # Eklenen personeller için 'production' yap
-    added_ids = set(ids) - old_person_ids
+    added_ids = diff.added.get(cell.id, set())
     for pid in added_ids:
         status_rec = PersonDayStatus.query.filter_by(person_id=pid, work_date=cell.work_date).first()
         if not status_rec:
@@ -404,8 +410,10 @@ def apply_team_vehicle_to_cells(team: Team, vehicle: Optional[Vehicle], commit:
     if not team:
         return
     plate = vehicle.plate if vehicle else None
-    db.session.query(PlanCell).filter(PlanCell.team_id == team.id).update(
-        {PlanCell.vehicle_info: plate}, synchronize_session=False
+    team_cells_q = db.session.query(PlanCell).filter(PlanCell.team_id == team.id)
+    plan_changes.record_query(team_cells_q)
+    team_cells_q.update(
+        {PlanCell.vehicle_info: plate, PlanCell.version: PlanCell.version + 1}, synchronize_session=False
     )
     if commit:
         db.session.commit()
@@ -495,12 +503,27 @@ def apply_snapshot(cell: PlanCell, snap: dict):
     set_assignments_and_team(cell, snap.get("person_ids") or [])
 
 
-_geocode_cache = {}
+GEOCODE_TTL_SECONDS = 30 * 24 * 3600
+GEOCODE_MISS_TTL_SECONDS = 3600
+
+
+def _geocode_remember(city: str, lat, lon) -> None:
+    # Bulunamayan / hata veren şehirler kısa süre saklanır, sonra yeniden denenir
+    ttl = GEOCODE_TTL_SECONDS if lat is not None else GEOCODE_MISS_TTL_SECONDS
+    try:
+        shared_state.get_state().set(f"geocode:{city}", [lat, lon], ttl=ttl)
+    except Exception:
+        pass
+
 
 def geocode_city(city: str):
     city = city.strip().lower()
-    if city in _geocode_cache:
-        return _geocode_cache[city]
+    try:
+        cached = shared_state.get_state().get(f"geocode:{city}")
+    except Exception:
+        cached = None
+    if cached is not None:
+        return tuple(cached)
     
     try:
         r = requests.get(
@@ -512,13 +535,13 @@ def geocode_city(city: str):
         r.raise_for_status()
         data = r.json()
         if not data:
-            _geocode_cache[city] = (None, None)
+            _geocode_remember(city, None, None)
             return None, None
         lat, lon = float(data[0]["lat"]), float(data[0]["lon"])
-        _geocode_cache[city] = (lat, lon)
+        _geocode_remember(city, lat, lon)
         return lat, lon
     except Exception:
-        _geocode_cache[city] = (None, None)
+        _geocode_remember(city, None, None)
         return None, None
 
 
@@ -590,17 +613,29 @@ def _set_secure_file_permissions(path: str):
         pass
 
 
-def _load_mail_settings_file() -> dict:
+def _mail_settings_path() -> str:
+    return os.path.join(current_app.instance_path, "mail_settings.json")
+
+
+def _read_mail_settings_file(path: str) -> dict:
     import json
-    if not os.path.exists(os.path.join(current_app.instance_path, "mail_settings.json")):
+    if not os.path.exists(path):
         return {}
     try:
-        with open(os.path.join(current_app.instance_path, "mail_settings.json"), "r", encoding="utf-8") as f:
+        with open(path, "r", encoding="utf-8") as f:
             data = json.load(f)
             return data if isinstance(data, dict) else {}
     except Exception:
         return {}
 
+
+def _load_mail_settings_file() -> dict:
+    # Dosya her gönderimde okunmaz; değiştiğinde (stat) ya da kaydedilince yeniden yüklenir
+    from services import settings_cache
+
+    path = _mail_settings_path()
+    return settings_cache.get(path, lambda: _read_mail_settings_file(path))
+
 def _env_bool(name: str) -> bool:
     v = (os.getenv(name) or '').strip().lower()
     return v in ('1', 'true', 'yes', 'y', 'on')
@@ -618,6 +653,10 @@ def load_mail_settings() -> dict:
         'use_ssl': False,
         'notify_to': '',
         'notify_cc': '',
+        # Gönderim hız sınırı (bkz. services/mail_rate.py)
+        'rate_per_minute': 40,
+        'rate_burst': 5,
+        'recipients_per_message': 1,
     }
     cfg.update(_load_mail_settings_file())
 
@@ -642,6 +681,10 @@ def load_mail_settings() -> dict:
         cfg['use_tls'] = _env_bool('SMTP_TLS')
     if os.getenv('SMTP_SSL'):
         cfg['use_ssl'] = _env_bool('SMTP_SSL')
+    for env_name, key in (('SMTP_RATE_PER_MINUTE', 'rate_per_minute'), ('SMTP_RATE_BURST', 'rate_burst'),
+                          ('SMTP_RCPT_PER_MESSAGE', 'recipients_per_message')):
+        if os.getenv(env_name):
+            cfg[key] = os.getenv(env_name)
 
     # normalize types
     try:
@@ -654,13 +697,17 @@ def load_mail_settings() -> dict:
 
 def save_mail_settings(data: dict):
     import json
+    from services import settings_cache
+
     os.makedirs(current_app.instance_path, exist_ok=True)
-    tmp_path = os.path.join(current_app.instance_path, "mail_settings.json") + ".tmp"
+    path = _mail_settings_path()
+    tmp_path = path + ".tmp"
     with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
     _set_secure_file_permissions(tmp_path)
-    os.replace(tmp_path, os.path.join(current_app.instance_path, "mail_settings.json"))
-    _set_secure_file_permissions(os.path.join(current_app.instance_path, "mail_settings.json"))
+    os.replace(tmp_path, path)
+    _set_secure_file_permissions(path)
+    settings_cache.invalidate(path)
 
 
 def _split_email_list(val) -> List[str]:
@@ -854,6 +901,8 @@ def _smtp_user_message(code: str) -> str:
         return 'SMTP baglanti reddedildi: host/port veya firewall kontrol edin.'
     if code == 'recipient_refused':
         return 'Alici adresi reddedildi.'
+    if code == 'recipient_deferred':
+        return 'Alici adresi gecici olarak reddedildi; tekrar denenecek.'
     if code == 'disconnected':
         return 'SMTP baglantisi kesildi: sunucu baglantiyi kapatti.'
     if code == 'config':
@@ -863,30 +912,31 @@ def _smtp_user_message(code: str) -> str:
     return 'SMTP gonderim hatasi.'
 
 
-def _smtp_open(host: str, port: int, *, use_ssl: bool):
-    if use_ssl:
-        return smtplib.SMTP_SSL(host, port, timeout=30)
-    return smtplib.SMTP(host, port, timeout=30)
-
+def _base64_file(path: str, chunk_lines: int = 1024) -> str:
+    """Dosyayı MIME base64 metnine çevirir; 57 baytlık satır katlarıyla okunur (76 karakterlik satırlar)."""
+    import base64
 
-def _smtp_close(server):
-    if not server:
-        return
-    try:
-        server.quit()
-    except Exception:
-        try:
-            server.close()
-        except Exception:
-            pass
+    out = []
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(57 * chunk_lines)
+            if not chunk:
+                break
+            out.append(base64.encodebytes(chunk).decode('ascii'))
+    return ''.join(out)
 
 
 def send_email_smtp(to_addr, subject: str, html_body: str, attachments: Optional[List[dict]] = None,
-                    cc_addrs=None, bcc_addrs=None, cfg_override: Optional[dict] = None):
-    import time
-    import random
-    import copy
+                    cc_addrs=None, bcc_addrs=None, cfg_override: Optional[dict] = None,
+                    delivered: Optional[List[str]] = None, max_wait: Optional[float] = None):
+    """
+    Tek deneme yapar; tekrar denemeler kuyruğa aittir (MailQueue.next_attempt_at).
+    delivered: daha önce teslim edilen alıcılar (atlanır); başarılı gönderimler listeye eklenir.
+    max_wait: hız sınırı için en fazla bekleme (sn). Aşılırsa mail_rate.Throttled;
+              None ise jeton açılana kadar beklenir.
+    """
     from email.utils import formataddr
+    from services import mail_rate, smtp_pool
 
     cfg = dict(load_mail_settings())
     if cfg_override:
@@ -938,59 +988,67 @@ def send_email_smtp(to_addr, subject: str, html_body: str, attachments: Optional
         for att in attachments:
             try:
                 fname = att.get('filename') or 'dosya'
-                data = att.get('data') or b''
                 content_type = att.get('content_type') or 'application/octet-stream'
                 maintype, subtype = content_type.split('/', 1) if '/' in content_type else ('application', 'octet-stream')
                 part = MIMEBase(maintype, subtype)
-                part.set_payload(data)
-                encoders.encode_base64(part)
+                if att.get('path'):
+                    # Dosyadan parça parça base64'e (ham içerik bütün olarak belleğe alınmaz)
+                    part.set_payload(_base64_file(att['path']))
+                    part['Content-Transfer-Encoding'] = 'base64'
+                else:
+                    part.set_payload(att.get('data') or b'')
+                    encoders.encode_base64(part)
                 part.add_header('Content-Disposition', 'attachment; filename="%s"' % fname)
                 base_msg.attach(part)
             except Exception:
                 continue
 
-    def _send_one(recipient: str):
-        delays = [0, 5, 10]
-        last_exc = None
-        for attempt, wait_s in enumerate(delays, start=1):
-            if wait_s:
-                _time.sleep(wait_s)
-            server = None
-            try:
-                server = _smtp_open(host, port, use_ssl=use_ssl)
-                try:
-                    server.ehlo()
-                except Exception:
-                    pass
-                if (not use_ssl) and use_tls:
-                    server.starttls()
-                    try:
-                        server.ehlo()
-                    except Exception:
-                        pass
-                server.login(user, pw)
-
-                msg = copy.deepcopy(base_msg)
-                if 'To' in msg:
-                    del msg['To']
-                msg['To'] = recipient
-
-                server.sendmail(from_addr, [recipient], msg.as_string())
-                return
-            except Exception as e:
-                last_exc = e
-                code = _smtp_error_code(e)
-                log.exception('SMTP send failed attempt=%s code=%s to=%s host=%s port=%s ssl=%s tls=%s', attempt, code, recipient, host, port, bool(use_ssl), bool(use_tls))
-            finally:
-                _smtp_close(server)
-
-        code = _smtp_error_code(last_exc or Exception('unknown'))
-        raise MailSendError(code, _smtp_user_message(code), recipient=recipient, debug_detail=_smtp_exception_detail(last_exc or Exception("unknown")))
-
-    for i, r in enumerate(rcpt):
-        _send_one(r)
-        if len(rcpt) > 1 and i < len(rcpt) - 1:
-            _time.sleep(random.uniform(1.0, 2.0))
+    # Mesaj bir kez serileştirilir; alıcıya özel tek fark To başlığıdır. Başlık,
+    # mesajın kendi policy'siyle katlanır (as_string'in bir kopyada üreteceği satırın aynısı)
+    base_str = base_msg.as_string()
+    policy = base_msg.policy
+    pool_key = smtp_pool.PoolKey(host, port, user, use_tls, use_ssl)
+    rate = mail_rate.RateConfig.from_settings(cfg)
+
+    done = set(delivered or [])
+    pending = [r for r in rcpt if r not in done]
+    step = rate.recipients_per_message
+    refused_all = {}
+    for i in range(0, len(pending), step):
+        batch = pending[i:i + step]
+        # Birden çok alıcılı mesajda alıcılar birbirini görmez
+        to_value = formataddr(("", batch[0])) if len(batch) == 1 else "undisclosed-recipients:;"
+        to_line = policy.fold("To", to_value)
+        mail_rate.acquire(host, rate, max_wait=max_wait)
+        try:
+            # Havuzdaki oturum (NOOP ile yoklanmış) kullanılır, yoksa yeni bağlantı + login
+            with smtp_pool.session(pool_key, pw) as smtp:
+                refused = smtp.sendmail(from_addr, batch, to_line + base_str)
+        except smtplib.SMTPRecipientsRefused as e:
+            # Partideki herkes reddedildi: diğer partilere devam, sonda birlikte raporlanır
+            refused = dict(e.recipients or {}) or {r: (550, b'') for r in batch}
+        except Exception as e:
+            code = _smtp_error_code(e)
+            log.exception('SMTP send failed code=%s to=%s host=%s port=%s ssl=%s tls=%s', code, ",".join(batch), host, port, bool(use_ssl), bool(use_tls))
+            raise MailSendError(code, _smtp_user_message(code), recipient=batch[0], debug_detail=_smtp_exception_detail(e))
+        refused = refused or {}
+        if refused:
+            log.warning('SMTP refused some recipients host=%s refused=%s', host, sorted(refused))
+            refused_all.update(refused)
+        if delivered is not None:
+            # Reddedilenler teslim sayılmaz: kuyruk yalnızca onlar için yeniden dener / başarısız sayar
+            delivered.extend(r for r in batch if r not in refused)
+
+    if refused_all:
+        # 4xx geçicidir (yeniden denenir), 5xx kalıcı
+        first = sorted(refused_all)[0]
+        permanent = any(int(c or 0) >= 500 for c, _m in refused_all.values())
+        code = 'recipient_refused' if permanent else 'recipient_deferred'
+        detail = "; ".join(
+            f"{addr}: {c} {m.decode('utf-8', 'replace') if isinstance(m, bytes) else m}"
+            for addr, (c, m) in sorted(refused_all.items())
+        )
+        raise MailSendError(code, _smtp_user_message(code), recipient=first, debug_detail=detail)
 
 def create_mail_log(*, kind: str, ok: bool, to_addr: str, subject: str, week_start_val: Optional[date] = None,
                     team_name: Optional[str] = None, error: Optional[str] = None, meta: Optional[dict] = None,
@@ -1256,30 +1314,20 @@ def get_person_status_map(days: List[date]) -> Dict[Tuple[int, str], str]:
 
 # ===================== AUTH HELPERS =====================
 
-ONLINE_WINDOW = timedelta(minutes=2)
+ONLINE_WINDOW = presence.ONLINE_WINDOW
 LAST_SEEN_THROTTLE_SECONDS = 15
 
 def _touch_user_activity(user: "User", now: Optional[datetime] = None) -> bool:
     """
-    Updates user's last_seen on activity.
-    If the user was offline (last_seen older than ONLINE_WINDOW), sets online_since = now.
+    Records user activity in the presence registry (services.presence).
+    last_seen / online_since are flushed to the User table in batches by the presence worker.
     """
     if not user:
         return False
-    now = now or datetime.now()
     try:
-        was_offline = (not getattr(user, "last_seen", None)) or (user.last_seen < (now - ONLINE_WINDOW))
-        user.last_seen = now
-        if was_offline:
-            user.online_since = now
-        db.session.add(user)
-        db.session.commit()
+        presence.touch(user, now or datetime.now())
         return True
     except Exception:
-        try:
-            db.session.rollback()
-        except Exception:
-            pass
         return False
 
 def login_required(f):
@@ -1392,7 +1440,8 @@ def _touch_last_seen_before_request():
         except Exception:
             pass
 
-        user = User.query.get(uid)
+        # Bellekte kaydı olan kullanıcı için satırı tekrar okumaya gerek yok
+        user = int(uid) if presence.get_registry().get(uid) else User.query.get(uid)
         if not user:
             return None
         if _touch_user_activity(user, now=now):
@@ -1664,27 +1713,18 @@ def _save_feedback_uploads(files, *, feedback_id: int) -> List["JobFeedbackMedia
     return out
 
 
-_RATE_LOCK = _threading2.Lock()
-_RATE_BUCKETS: Dict[str, List[float]] = {}
-
-
 def _rate_limit(key: str, *, limit: int, window_seconds: int) -> bool:
     """
     Returns True if allowed, False if rate-limited.
+    Buckets live in the shared state store so the limit holds across workers.
     """
     if not key:
         return True
-    now = _time.time()
-    cutoff = now - float(window_seconds or 0)
-    with _RATE_LOCK:
-        arr = _RATE_BUCKETS.get(key) or []
-        arr = [t for t in arr if t >= cutoff]
-        if len(arr) >= int(limit or 0):
-            _RATE_BUCKETS[key] = arr
-            return False
-        arr.append(now)
-        _RATE_BUCKETS[key] = arr
-    return True
+    try:
+        return shared_state.get_state().rate_hit(key, int(limit or 0), float(window_seconds or 0))
+    except Exception:
+        # Depo erişilemezse isteği engelleme
+        return True
 
 
 # ---------- MAIL SETTINGS PAGE ----------
@@ -1788,12 +1828,7 @@ def observer_required(f):
 
 
 def _is_user_online(user_obj, *, now=None):
-    if not user_obj:
-        return False
-    now = now or datetime.now()
-    cutoff = now - ONLINE_WINDOW
-    last_seen = getattr(user_obj, "last_seen", None)
-    return bool(last_seen and last_seen >= cutoff)
+    return presence.is_online(user_obj, now)
 
 
 def _fetch_announcements(user, limit=5):
@@ -1901,10 +1936,8 @@ def _sync_job_from_cell(job: "Job", cell: "PlanCell"):
         person_ids = [a.person_id for a in (cell.assignments or []) if a and a.person_id]
     except Exception:
         person_ids = []
-    person_ids = sorted({int(x) for x in person_ids})
-    JobAssignment.query.filter_by(job_id=job.id).delete()
-    for pid in person_ids:
-        db.session.add(JobAssignment(job_id=job.id, person_id=pid))
+    if assignment_reconcile.reconcile(JobAssignment, "job_id", {job.id: person_ids}).changed:
+        db.session.expire(job, ["assignments"])
 
 def _is_sqlite_db() -> bool:
     try:
@@ -1963,52 +1996,17 @@ def _publish_cell(cell: "PlanCell", *, publisher: "User", now: Optional[datetime
     db.session.add(job)
     return job
 
-def upsert_jobs_for_range(start: date, end: date):
-    """
-    Backfill/sync Job + JobAssignment from PlanCell for given range (idempotent).
-    Keeps Job.status in sync with latest JobFeedback if present.
-    """
-    if not start or not end or start > end:
-        return
-
-    cells = PlanCell.query.filter(PlanCell.work_date >= start, PlanCell.work_date <= end).all()
-    cell_ids = [c.id for c in cells]
-
-    # Eğer bu tarih aralığında hiç hücre yoksa, yayınlanmamış tüm işleri temizle
-    if not cells:
-        jobs_to_delete = Job.query.filter(
-            Job.work_date >= start,
-            Job.work_date <= end,
-            db.or_(Job.is_published == False, Job.is_published == None),
-        ).all()
-        if jobs_to_delete:
-            for j in jobs_to_delete:
-                JobAssignment.query.filter_by(job_id=j.id).delete()
-                JobFeedback.query.filter_by(job_id=j.id).delete()
-                db.session.delete(j)
-            db.session.commit()
-        return
-
-    existing_jobs = Job.query.filter(Job.cell_id.in_(cell_ids)).all()
-    job_by_cell = {j.cell_id: j for j in existing_jobs}
+def _delete_jobs(jobs) -> None:
+    for j in jobs:
+        JobAssignment.query.filter_by(job_id=j.id).delete()
+        JobFeedback.query.filter_by(job_id=j.id).delete()
+        db.session.delete(j)
 
-    # Hücresi kalmamış ama iş tablosunda duran yayınlanmamış kayıtları temizle
-    dangling_jobs = (
-        Job.query.filter(
-            Job.work_date >= start,
-            Job.work_date <= end,
-            db.or_(Job.cell_id == None, ~Job.cell_id.in_(cell_ids)),  # noqa: E711
-            db.or_(Job.is_published == False, Job.is_published == None),  # noqa: E712
-        ).all()
-    )
-    if dangling_jobs:
-        for j in dangling_jobs:
-            JobAssignment.query.filter_by(job_id=j.id).delete()
-            JobFeedback.query.filter_by(job_id=j.id).delete()
-            db.session.delete(j)
-        db.session.commit()
 
-    # feedback latest per job
+def _latest_feedback_by_job(cell_ids) -> dict:
+    """{job_id: en son kapatılan JobFeedback} - verilen hücrelerin işleri için."""
+    if not cell_ids:
+        return {}
     feedback_rows = (
         db.session.query(JobFeedback.job_id, db.func.max(JobFeedback.closed_at))
         .join(Job, Job.id == JobFeedback.job_id)
@@ -2024,15 +2022,23 @@ def upsert_jobs_for_range(start: date, end: date):
         for r in rows:
             if latest_feedback_at_by_job.get(r.job_id) == r.closed_at:
                 latest_feedback_by_job[r.job_id] = r
+    return latest_feedback_by_job
+
+
+def _reconcile_cell_jobs(cells, job_by_cell: dict) -> "assignment_reconcile.LinkDiff":
+    """
+    Hücre listesini Job/JobAssignment ile eşitler; commit çağırana aittir.
+    JobAssignment farkı tüm işler için tek seferde uygulanır; dönüş değişen satır özetidir.
+    """
+    latest_feedback_by_job = _latest_feedback_by_job([c.id for c in cells])
+    desired_people: Dict[int, List[int]] = {}
 
     for cell in cells:
         has_job = _cell_has_meaningful_job(cell)
         job = job_by_cell.get(cell.id)
         if not has_job:
             if job:
-                JobAssignment.query.filter_by(job_id=job.id).delete()
-                JobFeedback.query.filter_by(job_id=job.id).delete()
-                db.session.delete(job)
+                _delete_jobs([job])
             continue
 
         if not job:
@@ -2061,10 +2067,7 @@ def upsert_jobs_for_range(start: date, end: date):
                 person_ids = [a.person_id for a in (cell.assignments or []) if a and a.person_id]
             except Exception:
                 person_ids = []
-            person_ids = sorted({int(x) for x in person_ids})
-            JobAssignment.query.filter_by(job_id=job.id).delete()
-            for pid in person_ids:
-                db.session.add(JobAssignment(job_id=job.id, person_id=pid))
+            desired_people[job.id] = person_ids
         else:
             # Yayınlanmış işte de atanan kişi her zaman hücreyle senkronize edilsin (Benim İşlerim'de görünsün)
             job.assigned_user_id = getattr(cell, "assigned_user_id", None) or None
@@ -2080,7 +2083,85 @@ def upsert_jobs_for_range(start: date, end: date):
             job.status = "pending"
             job.closed_at = None
 
+    diff = assignment_reconcile.reconcile(JobAssignment, "job_id", desired_people)
+    for job in job_by_cell.values():
+        if job.id in diff.added or job.id in diff.removed:
+            db.session.expire(job, ["assignments"])
+    return diff
+
+
+def upsert_jobs_for_range(start: date, end: date):
+    """
+    Backfill/sync Job + JobAssignment from PlanCell for given range (idempotent).
+    Keeps Job.status in sync with latest JobFeedback if present.
+    Tam tarama yapar; günlük akışta kirli hücreler için sync_jobs_for_cells kullanılır
+    (bkz. services/job_sync.py). Bakım/yedekten dönüş için saklanıyor.
+    Dönüş: JobAssignment farkı (LinkDiff) ya da aralıkta hücre yoksa None.
+    """
+    if not start or not end or start > end:
+        return
+
+    cells = PlanCell.query.filter(PlanCell.work_date >= start, PlanCell.work_date <= end).all()
+    cell_ids = [c.id for c in cells]
+
+    # Eğer bu tarih aralığında hiç hücre yoksa, yayınlanmamış tüm işleri temizle
+    if not cells:
+        jobs_to_delete = Job.query.filter(
+            Job.work_date >= start,
+            Job.work_date <= end,
+            db.or_(Job.is_published == False, Job.is_published == None),
+        ).all()
+        if jobs_to_delete:
+            _delete_jobs(jobs_to_delete)
+            db.session.commit()
+        return
+
+    existing_jobs = Job.query.filter(Job.cell_id.in_(cell_ids)).all()
+    job_by_cell = {j.cell_id: j for j in existing_jobs}
+
+    # Hücresi kalmamış ama iş tablosunda duran yayınlanmamış kayıtları temizle
+    dangling_jobs = (
+        Job.query.filter(
+            Job.work_date >= start,
+            Job.work_date <= end,
+            db.or_(Job.cell_id == None, ~Job.cell_id.in_(cell_ids)),  # noqa: E711
+            db.or_(Job.is_published == False, Job.is_published == None),  # noqa: E712
+        ).all()
+    )
+    if dangling_jobs:
+        _delete_jobs(dangling_jobs)
+        db.session.commit()
+
+    diff = _reconcile_cell_jobs(cells, job_by_cell)
     db.session.commit()
+    return diff
+
+
+def sync_jobs_for_cells(cell_ids) -> int:
+    """
+    Yalnızca verilen hücreler için Job senkronizasyonu (kirli kuyruk motoru kullanır).
+    Silinmiş hücrelerin yayınlanmamış işleri de temizlenir. Commit çağırana aittir.
+    Dönüş: işlenen hücre sayısı.
+    """
+    cell_ids = sorted({int(x) for x in (cell_ids or []) if x})
+    if not cell_ids:
+        return 0
+
+    cells = PlanCell.query.filter(PlanCell.id.in_(cell_ids)).all()
+    live_ids = {c.id for c in cells}
+    jobs = Job.query.filter(Job.cell_id.in_(cell_ids)).all()
+
+    gone = [
+        j for j in jobs
+        if j.cell_id not in live_ids and not bool(getattr(j, "is_published", False))
+    ]
+    if gone:
+        _delete_jobs(gone)
+
+    job_by_cell = {j.cell_id: j for j in jobs if j.cell_id in live_ids}
+    diff = _reconcile_cell_jobs(cells, job_by_cell)
+    log.debug("sync_jobs_for_cells: %d hücre, +%d/-%d JobAssignment", len(cell_ids), diff.rows_added, diff.rows_removed)
+    return len(cell_ids)
 
 
 def _sqlite_db_path():